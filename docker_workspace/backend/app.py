@@ -1,31 +1,79 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from lib.tools.files_checker import filesChecker
-from lib.middleware.middleware import LogRequestsMiddleware
+from lib.middleware.middleware import InstrumentationMiddleware
 from lib.instances.instance import Instance
 from lib.routers.get import router as get_router
 from lib.routers.post import router as post_router
 from lib.routers.put import router as put_router
 from lib.routers.delete import router as delete_router
+from lib.tools.job_queue import JobWorkerPool
+from lib.jobs.upload_jobs import UPLOAD_JOB_HANDLERS, UPLOAD_FAILURE_HANDLERS, VECTOR_STORES_DIR
+from lib.ai.vector_store.corpus import removeUnreferencedDocuments
 from contextlib import asynccontextmanager
-import asyncio
+import asyncio, logging
+
+EXPIRED_UPLOAD_CHECK_INTERVAL = 3600  # Seconds between removals of abandoned uploads
+UNREFERENCED_DOCUMENT_CHECK_INTERVAL = 3600  # Seconds between removals of stored documents no session references
 
 # Create an instance of the application configuration
 instance = Instance()
 
+async def _removeExpiredUploads() -> None:
+    """
+    @brief Periodically removes the files of uploads sent in parts that expired unfinished.
+
+    The bytes reserved for them are returned to the quota of their sessions.
+    """
+    while True:
+        try:
+            for upload in await instance.upload_store.removeExpiredUploads():
+                await instance.upload_quota.releaseBytes(session_id=upload["session_id"], byte_count=upload["file_size"])
+        except Exception as e:
+            logging.error(f"Failed to remove expired uploads: {str(e)}")
+        await asyncio.sleep(EXPIRED_UPLOAD_CHECK_INTERVAL)
+
+async def _removeUnreferencedDocuments() -> None:
+    """
+    @brief Periodically removes the documents of the shared corpus that no session references.
+
+    Ending, clearing or expiring a session deletes its vector store and with it the manifest
+    referencing its documents, so documents of deleted sessions are removed by the next pass.
+    """
+    while True:
+        try:
+            await removeUnreferencedDocuments(corpus_dir=instance.corpus_dir, vector_stores_dir=VECTOR_STORES_DIR)
+        except Exception as e:
+            logging.error(f"Failed to remove unreferenced documents: {str(e)}")
+        await asyncio.sleep(UNREFERENCED_DOCUMENT_CHECK_INTERVAL)
+
 @asynccontextmanager
 async def lifespan(router: FastAPI):
     """
     @brief Manages the lifespan of the FastAPI application.
 
-    This context manager listens for Redis session expirations and ensures that
-    all active sessions are cleared upon application shutdown.
+    This context manager listens for Redis session expirations, runs the upload job
+    workers unless they are disabled in favour of separate worker processes, removes
+    abandoned uploads sent in parts and stored documents no session references, and ensures that all active sessions are cleared
+    upon application shutdown.
 
     @param router (FastAPI): The FastAPI application instance.
     """
     task = asyncio.create_task(instance.redis_tool._listenForExpirations())  # Start listening for session expirations
+    cleanup_task = asyncio.create_task(_removeExpiredUploads())  # Remove the files of abandoned uploads sent in parts
+    corpus_cleanup_task = asyncio.create_task(_removeUnreferencedDocuments())  # Remove the documents of deleted sessions
+
+    worker_pool = None
+    if instance.job_local_workers:
+        worker_pool = JobWorkerPool(job_queue=instance.job_queue, handlers=UPLOAD_JOB_HANDLERS, concurrency=instance.job_worker_concurrency, failure_handlers=UPLOAD_FAILURE_HANDLERS)
+        worker_pool.start()  # Process the queued uploads in this process
     yield
 
+    if worker_pool is not None:
+        await worker_pool.stop()
+    cleanup_task.cancel()
+    corpus_cleanup_task.cancel()
+
     # Retrieve and delete all active sessions upon shutdown
     session_keys = await instance.redis_tool.getAllSessions()
     for key in session_keys:
@@ -36,6 +84,8 @@ async def lifespan(router: FastAPI):
     task.cancel()
     await task
 
+    instance.password_hasher.shutdown()  # Stop the password hashing threads
+
 del filesChecker  # Delete the filesChecker instance
 
 app_ip = instance.app_ip
@@ -51,10 +101,11 @@ app.add_middleware(
     allow_credentials=True,  # Allow credentials in CORS requests
     allow_methods=["GET", "POST", "PUT", "DELETE"],  # Specify allowed HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Trace-Id"],  # Let the frontend read the trace id of a request
 )
 
-# Add custom logging middleware
-app.add_middleware(LogRequestsMiddleware)
+# Record request metrics and traces and log unexpected errors; added last, so it also measures the CORS middleware
+app.add_middleware(InstrumentationMiddleware)
 
 # Include routers for handling different HTTP methods
 app.include_router(get_router)
@@ -0,0 +1,468 @@
+"""
+@brief Load tests the application end to end with the scenario of its users.
+
+Every virtual user signs up once and then repeats the scenario: login, start_session, a CSV
+upload waited for until its job completed, a series of sql_query calls, a PDF upload waited
+for likewise, a series of rag_query calls, and end_session. The virtual users run
+concurrently. Latency percentiles and throughput are reported per endpoint and written to a
+JSON file, and --compare diffs them against the results of an earlier release.
+
+The LLM and embedding calls don't leave the machine, so the results show the application's
+own overhead (Postgres, FAISS, Redis, serialization) and are reproducible:
+- With --base-url the requests go to a running server, which must be configured with
+  llm_backend: fake and embedding_backend: hashing in config/config.yaml.
+- Without it the application runs in this process with its lifespan, its LLM and embeddings
+  are replaced by the fake backends, and the requests go straight to the ASGI application.
+Both need the Postgres and Redis servers of config/config.yaml, and upload job workers: the
+local ones of the application or separate worker.py processes.
+
+Every virtual user asks the same questions, so the LLM cache and the answer cache would answer
+most of them without running the agents. Unless --with-caches is given, every user therefore
+uploads files of its own, and the application in this process runs without both caches; a
+server given with --base-url should be configured with llm_cache: false and answer_cache: false.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --users 16 --iterations 3 --output load_test.json
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --users 32 --compare load_test.json
+"""
+from lib.config_parser.config_parser import Configuration
+from datetime import datetime, timezone
+import numpy as np
+import argparse, asyncio, contextlib, json, os, random, time, uuid
+import httpx
+
+PASSWORD = "load-test-password"
+JOB_POLL_INTERVAL = 0.1  # Seconds between two progress requests while an upload job runs
+JOB_TIMEOUT = 300  # Seconds an upload job may take before the iteration fails
+
+# Names of the waits for upload jobs, reported next to the endpoints but not counted as requests
+JOB_STEPS = ("upload_csv_job", "upload_pdf_job")
+
+SQL_QUESTIONS = [
+    "How many orders are there?",
+    "What is the total revenue per region?",
+    "Which product sold the most units?",
+    "What is the average unit price of each product?",
+    "How many orders were placed each month?",
+]
+RAG_QUESTIONS = [
+    "What does the report say about revenue growth?",
+    "Which risks are mentioned for the supply chain?",
+    "Summarize the outlook for the next quarter.",
+]
+
+REGIONS = ["north", "south", "east", "west", "central"]
+PRODUCTS = ["laptop", "monitor", "keyboard", "mouse", "dock", "headset", "webcam", "tablet"]
+WORDS = ("revenue growth quarter outlook supply chain risk customer market margin product region "
+         "demand forecast inventory cost pricing strategy investment operations report analysis").split()
+
+class ScenarioError(Exception):
+    """
+    @brief Raised when a step of the scenario fails, ending the iteration of the virtual user.
+    """
+
+def createCSV(row_count: int, seed: int = 0) -> bytes:
+    """
+    @brief Creates a CSV file of sales orders.
+
+    @param row_count (int): The number of rows.
+    @param seed (int): The random seed.
+    @return The content of the file.
+    """
+    rng = random.Random(seed)
+    lines = ["order_id,region,product,units,unit_price,order_date"]
+    for order_id in range(1, row_count + 1):
+        lines.append(
+            f"{order_id},{rng.choice(REGIONS)},{rng.choice(PRODUCTS)},{rng.randint(1, 20)},"
+            f"{rng.uniform(5, 2000):.2f},2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def createPDF(page_count: int, seed: int = 0) -> bytes:
+    """
+    @brief Creates a PDF file of pages of text, without PDF libraries.
+
+    @param page_count (int): The number of pages.
+    @param seed (int): The random seed.
+    @return The content of the file.
+    """
+    rng = random.Random(seed)
+    page_ids = [4 + 2 * page for page in range(page_count)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{page_id} 0 R' for page_id in page_ids)}] /Count {page_count} >>".encode("ascii"),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id in page_ids:
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(45)]
+        stream = ("BT /F1 10 Tf 14 TL 50 790 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET").encode("ascii")
+        objects[page_id] = f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode("ascii")
+        objects[page_id + 1] = f"<< /Length {len(stream)} >>\nstream\n".encode("ascii") + stream + b"\nendstream"
+
+    content = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id in sorted(objects):
+        offsets.append(len(content))
+        content += f"{object_id} 0 obj\n".encode("ascii") + objects[object_id] + b"\nendobj\n"
+    xref_offset = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    content += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+    return bytes(content)
+
+class LoadStats:
+    """
+    @brief Collects the latencies and errors of the requests per endpoint.
+
+    Attributes:
+    - latencies (dict): The latencies of the successful requests in seconds, by endpoint.
+    - errors (dict): The number of failed requests, by endpoint.
+    """
+
+    def __init__(self) -> None:
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        """
+        @brief Records a request.
+
+        @param name (str): The endpoint, or the wait for an upload job.
+        @param seconds (float): The latency.
+        @param ok (bool): Whether the request succeeded.
+        """
+        self.latencies.setdefault(name, [])
+        self.errors.setdefault(name, 0)
+        if ok:
+            self.latencies[name].append(seconds)
+        else:
+            self.errors[name] += 1
+
+    def summarize(self, elapsed: float) -> dict:
+        """
+        @brief Computes the latency percentiles and throughput per endpoint and in total.
+
+        @param elapsed (float): The duration of the load test in seconds.
+        @return The summary by endpoint, with the requests of all endpoints under "total".
+        """
+        def summarizeLatencies(latencies: list, error_count: int) -> dict:
+            summary = {"requests": len(latencies) + error_count, "errors": error_count, "throughput_rps": round(len(latencies) / elapsed, 3)}
+            if not latencies:
+                return {**summary, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+            milliseconds = np.array(latencies) * 1000
+            p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+            values = {"mean_ms": milliseconds.mean(), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": milliseconds.max()}
+            return {**summary, **{key: round(float(value), 3) for key, value in values.items()}}
+
+        summary = {name: summarizeLatencies(latencies, self.errors[name]) for name, latencies in sorted(self.latencies.items())}
+        requests = [name for name in self.latencies if name not in JOB_STEPS]
+        summary["total"] = summarizeLatencies(
+            [latency for name in requests for latency in self.latencies[name]],
+            sum(self.errors[name] for name in requests)
+        )
+        return summary
+
+class VirtualUser:
+    """
+    @brief A user going through the scenario with its own connections and session cookie.
+
+    Attributes:
+    - client (httpx.AsyncClient): The HTTP client of the user.
+    - endpoints (dict): The endpoint paths by name.
+    - stats (LoadStats): Receives the measurements.
+    - email (str): The e-mail address the user signs up with.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, endpoints: dict, stats: LoadStats, email: str) -> None:
+        self.client = client
+        self.endpoints = endpoints
+        self.stats = stats
+        self.email = email
+
+    async def request(self, name: str, method: str, expected_status: tuple = (200,), **kwargs) -> httpx.Response:
+        """
+        @brief Sends a request to an endpoint and records its latency.
+
+        @param name (str): The name of the endpoint.
+        @param method (str): The HTTP method.
+        @param expected_status (tuple): The status codes of a successful request.
+        @return The response.
+
+        @exception ScenarioError If the request failed or was answered with another status.
+        """
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, self.endpoints[name], **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(name, time.perf_counter() - start, ok=False)
+            raise ScenarioError(f"{name}: {type(e).__name__} {e}")
+        self.stats.record(name, time.perf_counter() - start, ok=response.status_code in expected_status)
+        if response.status_code not in expected_status:
+            raise ScenarioError(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+        return response
+
+    async def signup(self) -> None:
+        """
+        @brief Registers the user, without recording the request, as signing up isn't part of the scenario.
+
+        @exception ScenarioError If the user couldn't be registered.
+        """
+        try:
+            response = await self.client.post(self.endpoints["signup"], json={"email": self.email, "password": PASSWORD})
+        except httpx.HTTPError as e:
+            raise ScenarioError(f"signup: {type(e).__name__} {e}")
+        if response.status_code not in (201, 400):
+            raise ScenarioError(f"signup: HTTP {response.status_code} {response.text[:200]}")
+
+    async def login(self) -> None:
+        """
+        @brief Logs the user in and keeps the session cookie.
+
+        The cookie is set as secure, which clients don't send over plain HTTP, so it's kept without the flag.
+        """
+        response = await self.request("login", "POST", json={"email": self.email, "password": PASSWORD})
+        self.client.cookies.clear()
+        self.client.cookies.set("session_id", response.cookies["session_id"])
+
+    async def upload(self, name: str, file_name: str, content: bytes, content_type: str) -> None:
+        """
+        @brief Uploads a file and waits until its job completed.
+
+        The wait, from sending the upload to the completion of its job, is recorded as "<name>_job".
+
+        @param name (str): The upload endpoint, "upload_csv" or "upload_pdf".
+        @param file_name (str): The name of the file.
+        @param content (bytes): The content of the file.
+        @param content_type (str): The media type of the file.
+
+        @exception ScenarioError If the upload or its job failed or the job timed out.
+        """
+        start = time.perf_counter()
+        await self.request(name, "PUT", expected_status=(202,), files={"files": (file_name, content, content_type)})
+        while time.perf_counter() - start < JOB_TIMEOUT:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            progress = (await self.request("progress", "GET")).json()
+            if progress.get("status") in ("completed", "failed"):
+                ok = progress["status"] == "completed"
+                self.stats.record(f"{name}_job", time.perf_counter() - start, ok=ok)
+                if not ok:
+                    raise ScenarioError(f"{name}_job: {progress.get('message', '')}")
+                return
+        self.stats.record(f"{name}_job", time.perf_counter() - start, ok=False)
+        raise ScenarioError(f"{name}_job: timed out after {JOB_TIMEOUT} seconds")
+
+    async def runScenario(self, args: argparse.Namespace, csv_content: bytes, pdf_content: bytes) -> None:
+        """
+        @brief Goes through the scenario once.
+
+        @param args (argparse.Namespace): The settings of the load test.
+        @param csv_content (bytes): The uploaded CSV file.
+        @param pdf_content (bytes): The uploaded PDF file.
+        """
+        await self.login()
+        try:
+            await self.request("start_session", "GET")
+            await self.upload("upload_csv", "sales.csv", csv_content, "text/csv")
+            for i in range(args.sql_queries):
+                await self.request("sql_query", "POST", json={"humanMessage": SQL_QUESTIONS[i % len(SQL_QUESTIONS)]})
+            await self.upload("upload_pdf", "report.pdf", pdf_content, "application/pdf")
+            for i in range(args.rag_queries):
+                await self.request("rag_query", "POST", json={"humanMessage": RAG_QUESTIONS[i % len(RAG_QUESTIONS)]})
+        finally:
+            # A failed iteration still ends its session, so the temporary databases don't pile up
+            await self.request("end_session", "POST")
+
+def getEndpoints() -> dict:
+    """
+    @brief Reads the endpoint paths of the scenario from the configuration.
+
+    @return The endpoint paths by name.
+    """
+    config = Configuration(config_file_path="./config/config.yaml")
+    return {
+        "signup": config.getSignUpEndpoint(),
+        "login": config.getLoginEndpoint(),
+        "start_session": config.getStartSessionEndpoint(),
+        "upload_csv": config.getUploadCsvEndpoint(),
+        "upload_pdf": config.getUploadPdfEndpoint(),
+        "progress": config.getProgressEndpoint(),
+        "sql_query": config.getSqlQueryEndpoint(),
+        "rag_query": config.getRagQueryEndpoint(),
+        "end_session": config.getEndSessionEndpoint(),
+    }
+
+async def runLoadTest(args: argparse.Namespace, base_url: str, transport: httpx.AsyncBaseTransport = None) -> dict:
+    """
+    @brief Signs the virtual users up, runs their scenarios concurrently and summarizes the requests.
+
+    @param args (argparse.Namespace): The settings of the load test.
+    @param base_url (str): The URL of the application.
+    @param transport (httpx.AsyncBaseTransport): The transport to the application in this process, None for the network.
+    @return The duration of the load test and the summary by endpoint.
+    """
+    endpoints = getEndpoints()
+    stats = LoadStats()
+    # Without caches every user gets files of its own, so no upload or answer is reused across users
+    seeds = [args.seed if args.with_caches else args.seed + index for index in range(args.users)]
+    uploads = {seed: (createCSV(args.csv_rows, seed=seed), createPDF(args.pdf_pages, seed=seed)) for seed in set(seeds)}
+    run_id = uuid.uuid4().hex[:8]  # New users for every run, so runs don't share data
+    failures = []
+
+    async def runUser(user: VirtualUser, seed: int) -> None:
+        csv_content, pdf_content = uploads[seed]
+        for _ in range(args.iterations):
+            try:
+                await user.runScenario(args, csv_content, pdf_content)
+            except ScenarioError as e:
+                failures.append(str(e))
+
+    async with contextlib.AsyncExitStack() as stack:
+        users = []
+        for index in range(args.users):
+            client = await stack.enter_async_context(httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout))
+            users.append(VirtualUser(client, endpoints, stats, email=f"load-{run_id}-{index}@example.com"))
+        await asyncio.gather(*[user.signup() for user in users])
+
+        start = time.perf_counter()
+        await asyncio.gather(*[runUser(user, seed) for user, seed in zip(users, seeds)])
+        elapsed = time.perf_counter() - start
+
+    for failure in failures[:10]:
+        print(f"failed: {failure}")
+    if len(failures) > 10:
+        print(f"... and {len(failures) - 10} more failures")
+    return {"duration_s": round(elapsed, 3), "endpoints": stats.summarize(elapsed)}
+
+async def runInProcess(args: argparse.Namespace) -> dict:
+    """
+    @brief Runs the load test against the application in this process, with the fake LLM and embedding backends.
+
+    The LLM cache and the answer cache are turned off unless --with-caches is given.
+
+    @param args (argparse.Namespace): The settings of the load test.
+    @return The duration of the load test and the summary by endpoint.
+    """
+    # No request reaches OpenAI, but the configured client is created before it's replaced
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    from app import app, instance
+    from lib.ai.llm.llm import LLM
+    from lib.ai.llm.llm_cache import CachedLLM
+    from lib.ai.llm.hashing_embeddings import HashingEmbeddings
+
+    fake_llm = LLM(
+        llm_model_name=instance.llm_model_name,
+        backend="fake",
+        script_path=instance.fake_llm_script,
+        latency_distribution=args.llm_latency_distribution,
+        latency_mean=args.llm_latency_mean,
+        latency_stddev=args.llm_latency_stddev,
+        seed=args.seed
+    )
+    if not args.with_caches:
+        # Repeated questions would be answered from the caches instead of by the agents
+        if isinstance(instance.llm, CachedLLM):
+            instance.llm = instance.llm.llm
+        instance.answer_cache = None
+
+    # The configured scheduler, and the LLM cache if kept, stay in front of the model
+    wrapper = instance.llm
+    while not isinstance(wrapper.llm, LLM):
+        wrapper = wrapper.llm
+    wrapper.llm = fake_llm
+    instance.embedding = HashingEmbeddings(dimensions=instance.embedding_dimensions)
+    instance.embedding_scheduler.embeddings = instance.embedding
+
+    async with app.router.lifespan_context(app):
+        return await runLoadTest(args, base_url="http://loadtest", transport=httpx.ASGITransport(app=app))
+
+def printSummary(endpoints: dict) -> None:
+    """
+    @brief Prints the summary of a load test as a table.
+
+    @param endpoints (dict): The summary by endpoint.
+    """
+    def formatValue(value) -> str:
+        return f"{value:.1f}" if value is not None else "-"
+
+    print(f"{'endpoint':<15} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}")
+    for name, summary in endpoints.items():
+        print(
+            f"{name:<15} {summary['requests']:>8} {summary['errors']:>6} {summary['throughput_rps']:>8.2f} {formatValue(summary['p50_ms']):>9} "
+            f"{formatValue(summary['p95_ms']):>9} {formatValue(summary['p99_ms']):>9} {formatValue(summary['max_ms']):>9}"
+        )
+
+def printComparison(baseline: dict, results: dict) -> None:
+    """
+    @brief Prints the change of the latency percentiles and throughput per endpoint against earlier results.
+
+    @param baseline (dict): The results of the earlier load test.
+    @param results (dict): The results of this load test.
+    """
+    def formatChange(old, new) -> str:
+        if old is None or new is None:
+            return "-"
+        if old == 0:
+            return "+0.0%" if new == 0 else "new"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"\nChange against {baseline.get('started_at', 'the baseline')}:")
+    print(f"{'endpoint':<15} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'errors':>11}")
+    for name, summary in results["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if old is None:
+            print(f"{name:<15} {'new':>8}")
+            continue
+        print(
+            f"{name:<15} {formatChange(old['p50_ms'], summary['p50_ms']):>8} {formatChange(old['p95_ms'], summary['p95_ms']):>8} "
+            f"{formatChange(old['p99_ms'], summary['p99_ms']):>8} {formatChange(old['throughput_rps'], summary['throughput_rps']):>8} "
+            f"{old['errors']:>5} -> {summary['errors']:<3}"
+        )
+
+async def benchmark(args: argparse.Namespace) -> None:
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if args.base_url:
+        results = await runLoadTest(args, base_url=args.base_url)
+    else:
+        results = await runInProcess(args)
+
+    results = {"started_at": started_at, "target": args.base_url or "in-process", "settings": {
+        "users": args.users, "iterations": args.iterations, "sql_queries": args.sql_queries, "rag_queries": args.rag_queries,
+        "csv_rows": args.csv_rows, "pdf_pages": args.pdf_pages, "seed": args.seed, "with_caches": args.with_caches,
+        "llm_latency": None if args.base_url else {"distribution": args.llm_latency_distribution, "mean": args.llm_latency_mean, "stddev": args.llm_latency_stddev},
+    }, **results}
+
+    print(f"\n{args.users} users x {args.iterations} iterations in {results['duration_s']:.1f} s")
+    printSummary(results["endpoints"])
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            printComparison(json.load(file), results)
+    if args.output:
+        # Sorted keys and indentation keep the files of two releases diffable line by line
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"\nResults written to {args.output}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the application end to end with concurrent virtual users.")
+    parser.add_argument("--base-url", default=None, help="URL of a running server; the application runs in this process if omitted.")
+    parser.add_argument("--users", type=int, default=8, help="Number of concurrent virtual users.")
+    parser.add_argument("--iterations", type=int, default=2, help="Scenarios each user goes through.")
+    parser.add_argument("--sql-queries", type=int, default=5, help="sql_query calls per scenario.")
+    parser.add_argument("--rag-queries", type=int, default=3, help="rag_query calls per scenario.")
+    parser.add_argument("--csv-rows", type=int, default=5000, help="Rows of the uploaded CSV file.")
+    parser.add_argument("--pdf-pages", type=int, default=10, help="Pages of the uploaded PDF file.")
+    parser.add_argument("--llm-latency-distribution", default="lognormal", choices=("fixed", "uniform", "normal", "lognormal"),
+                        help="Latency distribution of the fake LLM in this process.")
+    parser.add_argument("--llm-latency-mean", type=float, default=0.5, help="Mean latency of the fake LLM in seconds.")
+    parser.add_argument("--llm-latency-stddev", type=float, default=0.2, help="Standard deviation of the fake LLM's latency in seconds.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the uploaded files and the fake LLM's latency.")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="Share the uploaded files between the users and keep the LLM and answer caches of the application in this process.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout of a request in seconds.")
+    parser.add_argument("--output", default=None, help="JSON file the results are written to.")
+    parser.add_argument("--compare", default=None, help="JSON file of earlier results to compare against.")
+    asyncio.run(benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
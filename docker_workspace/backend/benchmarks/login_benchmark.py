@@ -0,0 +1,112 @@
+"""
+@brief Measures login throughput under concurrent load and how much it stalls other requests.
+
+Every login verifies a password against a stored hash, as the login endpoint does, either
+inline on the event loop or in the PasswordHasher's thread pool. While the logins run, a
+probe standing in for the other requests of the server wakes up every few milliseconds
+and records how late it was. The benchmark reports logins per second, login latencies and
+the lag of the probe for each hashing scheme and mode.
+
+Run from the backend directory:
+    python -m benchmarks.login_benchmark --logins 64 --concurrency 16 --workers 4
+"""
+from lib.database.securities.security import createPasswordContext, verifyPassword, PasswordHasher
+from passlib.hash import bcrypt
+import numpy as np
+import argparse, asyncio, time
+
+PROBE_INTERVAL = 0.005  # Seconds between two wake-ups of the event loop probe
+PASSWORD = "correct horse battery staple"
+
+async def probeEventLoop(lags: list, stop: asyncio.Event) -> None:
+    """
+    @brief Records how late the event loop wakes up a task, until stopped.
+
+    @param lags (list): Receives the lags in milliseconds.
+    @param stop (asyncio.Event): Set when the logins finished.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+async def runLogins(verify, stored_hash: str, login_count: int, concurrency: int) -> dict:
+    """
+    @brief Runs logins concurrently and measures them.
+
+    @param verify (Callable): Async function verifying a password against a hash.
+    @param stored_hash (str): The hash of the logging in user.
+    @param login_count (int): The number of logins.
+    @param concurrency (int): The number of logins in flight.
+    @return The measured throughput, login latencies and event loop lags.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+
+    async def login() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await verify(PASSWORD, stored_hash)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    probe = asyncio.create_task(probeEventLoop(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(login_count)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    return {
+        "logins_s": login_count / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "lag_p95_ms": float(np.percentile(lags, 95)) if lags else elapsed * 1000,
+        "lag_max_ms": max(lags) if lags else elapsed * 1000,
+    }
+
+async def benchmark(args: argparse.Namespace) -> None:
+    context = createPasswordContext(
+        bcrypt_rounds=args.bcrypt_rounds,
+        argon2_time_cost=args.argon2_time_cost,
+        argon2_memory_cost=args.argon2_memory_cost,
+        argon2_parallelism=args.argon2_parallelism
+    )
+    stored_hashes = {
+        "bcrypt": bcrypt.using(rounds=args.bcrypt_rounds).hash(PASSWORD),
+        "argon2": context.hash(PASSWORD),
+    }
+    hasher = PasswordHasher(context=context, max_workers=args.workers)
+
+    async def verifyInline(password: str, hashed_password: str) -> bool:
+        # The login endpoint before the hasher: the event loop is blocked for the whole hash
+        return verifyPassword(password, hashed_password, context)
+
+    modes = {"inline": verifyInline, f"pool({args.workers})": hasher.verify}
+
+    print(f"{'scheme':<8} {'mode':<9} {'logins/s':>9} {'p50_ms':>8} {'p95_ms':>8} {'lag_p95_ms':>11} {'lag_max_ms':>11}")
+    try:
+        for scheme, stored_hash in stored_hashes.items():
+            for mode, verify in modes.items():
+                result = await runLogins(verify, stored_hash, args.logins, args.concurrency)
+                print(
+                    f"{scheme:<8} {mode:<9} {result['logins_s']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                    f"{result['lag_p95_ms']:>11.1f} {result['lag_max_ms']:>11.1f}"
+                )
+    finally:
+        hasher.shutdown()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure login throughput and event loop stalls under concurrent load.")
+    parser.add_argument("--logins", type=int, default=64, help="Number of logins per run.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of logins in flight.")
+    parser.add_argument("--workers", type=int, default=4, help="Threads of the password hasher.")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Log2 cost of the bcrypt hashes.")
+    parser.add_argument("--argon2-time-cost", type=int, default=3, help="Number of argon2 iterations.")
+    parser.add_argument("--argon2-memory-cost", type=int, default=65536, help="Memory of argon2 in KiB.")
+    parser.add_argument("--argon2-parallelism", type=int, default=1, help="Number of argon2 lanes.")
+    asyncio.run(benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+@brief Measures the per-request overhead of the request middleware.
+
+The same FastAPI route is served without middleware, behind a pass-through
+BaseHTTPMiddleware, as the request logging middleware was implemented before, and behind
+the InstrumentationMiddleware. Requests are sent straight to the ASGI application, without
+a server or network, so the difference between the runs is the cost of the middleware.
+
+Run from the backend directory:
+    python -m benchmarks.middleware_benchmark --requests 20000
+"""
+from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import FastAPI
+from lib.middleware.instrumentation import InstrumentationMiddleware
+import argparse, asyncio, time
+
+class PassThroughMiddleware(BaseHTTPMiddleware):
+    """
+    @brief A BaseHTTPMiddleware doing nothing but calling the application.
+    """
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+def createApp(middleware) -> FastAPI:
+    """
+    @brief Creates an application with one JSON route behind a middleware.
+
+    @param middleware (type): The middleware class, or None.
+    @return The application.
+    """
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.post("/items/{item_id}")
+    async def item_route(item_id: int):
+        return {"item": item_id}
+
+    return app
+
+async def measure(app: FastAPI, request_count: int) -> float:
+    """
+    @brief Sends requests to an application and measures them.
+
+    @param app (FastAPI): The application.
+    @param request_count (int): The number of requests.
+    @return The mean time per request in microseconds.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/items/1", "raw_path": b"/items/1", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json"), (b"content-length", b"2")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80)
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up the routing and validation caches
+    for _ in range(100):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(request_count):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / request_count * 1e6
+
+async def benchmark(request_count: int, rounds: int) -> None:
+    apps = {
+        "none": createApp(None),
+        "BaseHTTPMiddleware": createApp(PassThroughMiddleware),
+        "InstrumentationMiddleware": createApp(InstrumentationMiddleware),
+    }
+
+    # The best of several rounds is least disturbed by other processes
+    results = {name: min([await measure(app, request_count) for _ in range(rounds)]) for name, app in apps.items()}
+
+    print(f"{'middleware':<26} {'us/request':>11} {'overhead_us':>12}")
+    for name, microseconds in results.items():
+        print(f"{name:<26} {microseconds:>11.1f} {microseconds - results['none']:>12.1f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the per-request overhead of the request middleware.")
+    parser.add_argument("--requests", type=int, default=20000, help="Number of requests per round.")
+    parser.add_argument("--rounds", type=int, default=3, help="Number of rounds per middleware.")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.requests, args.rounds))
+
+if __name__ == "__main__":
+    main()
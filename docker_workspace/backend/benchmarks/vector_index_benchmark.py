@@ -0,0 +1,101 @@
+"""
+@brief Compares vector index types on a synthetic corpus.
+
+For every embedding size and FAISS index factory string, the benchmark builds the index the
+same way vector store segments do, then reports build time, index size on disk, per-query
+search latency and recall@k against exact search.
+
+Run from the backend directory:
+    python -m benchmarks.vector_index_benchmark --vectors 20000 --dimensions 256 1024 3072
+"""
+from lib.ai.vector_store.segment import createIndex
+import numpy as np
+import faiss, argparse, time
+
+def createCorpus(vector_count: int, dimension: int, query_count: int, seed: int = 0) -> tuple:
+    """
+    @brief Creates clustered, unit-length vectors resembling text embeddings, and queries near them.
+
+    @param vector_count (int): The number of corpus vectors.
+    @param dimension (int): The vector dimension.
+    @param query_count (int): The number of query vectors.
+    @param seed (int): The random seed.
+    @return A (corpus, queries) tuple of float32 arrays.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, vector_count // 100), dimension))
+    corpus = centers[rng.integers(0, len(centers), vector_count)] + 0.5 * rng.normal(size=(vector_count, dimension))
+    queries = corpus[rng.integers(0, vector_count, query_count)] + 0.3 * rng.normal(size=(query_count, dimension))
+
+    corpus = (corpus / np.linalg.norm(corpus, axis=1, keepdims=True)).astype(np.float32)
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    return corpus, queries
+
+def benchmarkIndex(index_factory: str, corpus: np.ndarray, queries: np.ndarray, ground_truth: np.ndarray, k: int) -> dict:
+    """
+    @brief Builds one index type and measures it.
+
+    @param index_factory (str): The FAISS index factory string.
+    @param corpus (np.ndarray): The corpus vectors.
+    @param queries (np.ndarray): The query vectors.
+    @param ground_truth (np.ndarray): The exact top k ids of every query.
+    @param k (int): The number of results per query.
+    @return The measured build time, size, latencies and recall.
+    """
+    start = time.perf_counter()
+    index = createIndex(corpus, index_factory)
+    index.add(corpus)
+    build_seconds = time.perf_counter() - start
+
+    # Queries are served one at a time, so measure single-threaded latency
+    thread_count = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[np.newaxis, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    faiss.omp_set_num_threads(thread_count)
+
+    recall = np.mean([len(set(ids) & set(truth)) / k for ids, truth in zip(found, ground_truth)])
+    index_bytes = len(faiss.serialize_index(index))
+
+    return {
+        "index": type(index).__name__,
+        "build_s": build_seconds,
+        "size_mb": index_bytes / 2**20,
+        "bytes_per_vector": index_bytes / len(corpus),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        f"recall@{k}": float(recall),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare vector index types on a synthetic corpus.")
+    parser.add_argument("--vectors", type=int, default=20000, help="Number of corpus vectors.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries.")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 1024, 3072], help="Embedding sizes to compare.")
+    parser.add_argument("--factories", nargs="+", default=["Flat", "HNSW32", "IVF256,PQ32", "IVF256,SQ8", "SQ8"], help="FAISS index factory strings.")
+    parser.add_argument("-k", type=int, default=10, help="Results per query.")
+    args = parser.parse_args()
+
+    print(f"{'dim':>5} {'factory':<14} {'index':<22} {'build_s':>8} {'size_mb':>8} {'B/vec':>7} {'p50_ms':>7} {'p95_ms':>7} {'recall@' + str(args.k):>9}")
+    for dimension in args.dimensions:
+        corpus, queries = createCorpus(args.vectors, dimension, args.queries)
+
+        exact_index = faiss.IndexFlatL2(dimension)
+        exact_index.add(corpus)
+        _, ground_truth = exact_index.search(queries, args.k)
+
+        for index_factory in args.factories:
+            result = benchmarkIndex(index_factory, corpus, queries, ground_truth, args.k)
+            print(
+                f"{dimension:>5} {index_factory:<14} {result['index']:<22} {result['build_s']:>8.2f} {result['size_mb']:>8.1f} "
+                f"{result['bytes_per_vector']:>7.0f} {result['p50_ms']:>7.3f} {result['p95_ms']:>7.3f} {result[f'recall@{args.k}']:>9.3f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from lib.tools.metrics import Counter, Histogram
+from lib.tools.tracing import TRACER
+from lib.ai.llm.llm_scheduler import LLM_ITERATION
+from lib.ai.llm.deadline import Deadline, DeadlineExceededError
+from typing import Awaitable
+import asyncio
+
+# Buckets of the number of LLM turns per question
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+# Metrics shared by the agents, labelled with the agent ("sql" or "rag")
+LLM_REQUEST_DURATION = Histogram("llm_request_duration_seconds", "Latency of the LLM calls of the agents.", ("agent",))
+LLM_REQUEST_ERRORS = Counter("llm_request_errors_total", "LLM calls of the agents that raised an error.", ("agent",))
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations", "LLM turns an agent needed to answer a question, by whether it answered, reached the maximum iteration or ran out of time.",
+    ("agent", "outcome"), buckets=ITERATION_BUCKETS
+)
+SQL_QUERY_DURATION = Histogram("sql_query_duration_seconds", "Execution time of the SQL queries of the SQL agent, by whether they succeeded.", ("outcome",))
+RETRIEVAL_DURATION = Histogram("rag_retrieval_duration_seconds", "Duration of the hybrid retrieval steps of the RAG agent.")
+
+async def measureLLMCall(agent: str, call: Awaitable, iteration: int = 1, deadline: Deadline = None):
+    """
+    @brief Awaits an LLM call of an agent and records its latency and its span.
+
+    The iteration is made known to the LLMScheduler, which serves later iterations first.
+    The call is cancelled when the deadline of the question passes.
+
+    @param agent The agent making the call, "sql" or "rag".
+    @param call The awaitable LLM call.
+    @param iteration The iteration of the agent making the call, starting at 1.
+    @param deadline The deadline of the question, None for no deadline.
+    @return The result of the call.
+
+    @exception DeadlineExceededError If the deadline passed before the call answered.
+    """
+    token = LLM_ITERATION.set(iteration)
+    with LLM_REQUEST_DURATION.time(agent), TRACER.span("llm.ainvoke", kind="CLIENT", attributes={"agent": agent}):
+        try:
+            return await asyncio.wait_for(call, deadline.remaining() if deadline is not None else None)
+        except TimeoutError:
+            if deadline is None or not deadline.expired():
+                LLM_REQUEST_ERRORS.inc(agent)
+                raise  # A timeout of the model client itself
+            raise DeadlineExceededError(f"The time budget of the {agent} agent ran out.") from None
+        except Exception:
+            LLM_REQUEST_ERRORS.inc(agent)
+            raise
+        finally:
+            LLM_ITERATION.reset(token)
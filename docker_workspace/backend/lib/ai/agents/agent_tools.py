@@ -0,0 +1,51 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List
+
+class RunSqlTool(BaseModel):
+    """Executes a single SQL query against the session's PostgreSQL database and returns the fetched rows or the error."""
+    model_config = ConfigDict(title="run_sql")
+
+    query: str = Field(..., description="The SQL query to execute.")
+
+class RetrieveTool(BaseModel):
+    """Retrieves the document chunks most relevant to a search query from one or more uploaded files in a single step."""
+    model_config = ConfigDict(title="retrieve")
+
+    files: List[str] = Field(default_factory=list, description="The names of the files to search in. Must be available file names. Empty means all files.")
+    query: str = Field(..., description="The search query used to find relevant chunks.")
+
+class FinalAnswerTool(BaseModel):
+    """Returns the final answer to the user and ends the conversation turn."""
+    model_config = ConfigDict(title="final_answer")
+
+    answer: str = Field(..., description="The final answer shown to the user.")
+
+# Tool sets offered to each agent in tool calling mode
+SQL_AGENT_TOOLS = [RunSqlTool, FinalAnswerTool]
+RAG_AGENT_TOOLS = [RetrieveTool, FinalAnswerTool]
+
+# Tool result of a final answer requested together with other tools, whose results the answer couldn't consider
+FINAL_ANSWER_NOT_ALONE_MESSAGE = "The final answer was not accepted because other tools were called in the same turn. Review their results, then call final_answer alone."
+
+# Answer of the agents when they reach the maximum iteration without an answer
+NO_ANSWER_MESSAGE = "I couldn't generate an answer according to your question. Please change your question and try again."
+
+# Start of the answers of the agents when their time budget runs out
+PARTIAL_ANSWER_PREFIX = "I couldn't finish answering your question in time."
+MAX_PARTIAL_RESULT_CHARS = 2000  # Characters of the last result quoted in a partial answer
+
+def getBestEffortAnswer(command_result_pair: list) -> str:
+    """
+    @brief Builds the answer of an agent whose time budget ran out from the last result it got.
+
+    @param command_result_pair (list): The commands of the agent with their results, in order.
+    @return The partial answer quoting the last successful result, if there is one.
+    """
+    for pair in reversed(command_result_pair):
+        result = list(pair.values())[-1]
+        if result and not isinstance(result, Exception):
+            text = str(result)
+            if len(text) > MAX_PARTIAL_RESULT_CHARS:
+                text = text[:MAX_PARTIAL_RESULT_CHARS] + "..."
+            return f"{PARTIAL_ANSWER_PREFIX} This is the last result I found:\n{text}"
+    return f"{PARTIAL_ANSWER_PREFIX} Please try again or ask a simpler question."
@@ -0,0 +1,249 @@
+from lib.tools.metrics import Counter, Gauge, Histogram
+from lib.tools.tracing import getCurrentSpan
+from collections import OrderedDict
+import faiss, hashlib, json, time
+import numpy as np
+
+# Buckets of the similarity of a question to the most similar cached question
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)
+
+ANSWER_CACHE_REQUESTS = Counter(
+    "answer_cache_requests_total", "Questions to the agents by whether the answer to a similar question on the same dataset was returned.",
+    ("agent", "outcome")
+)
+ANSWER_CACHE_EVICTIONS = Counter(
+    "answer_cache_evictions_total", "Cached answers removed, by whether they expired, exceeded the capacity of their dataset or their dataset was evicted.",
+    ("agent", "reason")
+)
+ANSWER_CACHE_ENTRIES = Gauge("answer_cache_entries", "Cached answers held in memory.", ("agent",))
+ANSWER_CACHE_SIMILARITY = Histogram(
+    "answer_cache_similarity", "Cosine similarity of a question to the most similar cached question of its dataset.",
+    ("agent",), buckets=SIMILARITY_BUCKETS
+)
+
+def getDatasetVersion(fingerprints: dict) -> str:
+    """
+    @brief Computes the version of a dataset from the fingerprints of its parts.
+
+    Sessions holding the same data under the same names get the same version, so they
+    share their cached answers.
+
+    @param fingerprints (dict): The content hash of every table or file, by its name.
+    @return The version of the dataset.
+    """
+    return hashlib.sha256(json.dumps(fingerprints, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _normalize(vector: list) -> np.ndarray:
+    """
+    @brief Converts an embedding to a unit length row vector, so inner products are cosine similarities.
+
+    @param vector (list): The embedding.
+    @return The normalized vector of shape (1, dimension).
+    """
+    vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class _CachedAnswer:
+    """
+    @brief A cached question with its answer.
+
+    @param question The question.
+    @param answer The answer of the agent.
+    @param stored_at The monotonic time the answer was stored.
+    """
+
+    def __init__(self, question: str, answer: str, stored_at: float) -> None:
+        self.question = question
+        self.answer = answer
+        self.stored_at = stored_at
+
+class _DatasetAnswers:
+    """
+    @brief The cached answers of one dataset, with a FAISS index of their questions.
+
+    @param dimension The size of the question vectors.
+    """
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.entries = OrderedDict()  # Answers by vector id, least recently used first
+        self.next_id = 0
+
+    def search(self, vector: np.ndarray) -> tuple:
+        """
+        @brief Finds the cached question most similar to a question.
+
+        @param vector The normalized vector of the question.
+        @return Tuple of the id and the similarity of the most similar question, (None, 0.0) if there is none.
+        """
+        if not self.entries:
+            return None, 0.0
+        similarities, ids = self.index.search(vector, 1)
+        return int(ids[0][0]), float(similarities[0][0])
+
+    def add(self, vector: np.ndarray, answer: _CachedAnswer) -> None:
+        """
+        @brief Adds an answer.
+
+        @param vector The normalized vector of the question.
+        @param answer The answer.
+        """
+        self.index.add_with_ids(vector, np.array([self.next_id], dtype=np.int64))
+        self.entries[self.next_id] = answer
+        self.next_id += 1
+
+    def remove(self, ids: list) -> None:
+        """
+        @brief Removes answers.
+
+        @param ids The vector ids of the answers.
+        """
+        self.index.remove_ids(np.array(ids, dtype=np.int64))
+        for entry_id in ids:
+            del self.entries[entry_id]
+
+class SemanticAnswerCache:
+    """
+    @brief Answers questions similar to earlier questions on the same dataset with the earlier answers.
+
+    Every version of a dataset has a small FAISS index of the vectors of the questions answered on
+    it. A question whose cosine similarity to a cached question reaches the threshold gets the
+    cached answer without running the agent. Questions are compared on their own, without the
+    conversation before them, so callers only look up and store questions opening a conversation.
+    Answers expire after a time to live; beyond the capacity of a dataset
+    the least recently used answers are evicted, and beyond the number of datasets the least
+    recently used dataset. The cache is held in the memory of the process.
+
+    Attributes:
+    - threshold (float): The similarity from which a cached answer is returned.
+    - max_entries (int): The number of answers cached per dataset.
+    - max_datasets (int): The number of datasets answers are cached for.
+    - ttl (int): Seconds an answer is cached.
+    - datasets (OrderedDict): The answers of every dataset by (agent, dataset version), least recently used first.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, max_datasets: int = 1024, ttl: int = 3600) -> None:
+        """
+        @brief Initializes an empty cache.
+
+        @param threshold (float): The similarity from which a cached answer is returned.
+        @param max_entries (int): The number of answers cached per dataset.
+        @param max_datasets (int): The number of datasets answers are cached for.
+        @param ttl (int): Seconds an answer is cached.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_datasets = max_datasets
+        self.ttl = ttl
+        self.datasets = OrderedDict()
+
+    def lookup(self, agent: str, dataset_version: str, vector: list) -> str:
+        """
+        @brief Looks up the answer to a question similar to the given one.
+
+        @param agent (str): The agent answering the question, "sql" or "rag".
+        @param dataset_version (str): The version of the dataset the question is asked on.
+        @param vector (list): The embedding of the question.
+        @return The cached answer, or None if no cached question is similar enough.
+        """
+        answer = None
+        answers = self.getAnswers(agent, dataset_version)
+        if answers is not None:
+            entry_id, similarity = answers.search(_normalize(vector))
+            if entry_id is not None:
+                ANSWER_CACHE_SIMILARITY.observe(similarity, agent)
+                if similarity >= self.threshold:
+                    answers.entries.move_to_end(entry_id)
+                    answer = answers.entries[entry_id].answer
+
+        outcome = "hit" if answer is not None else "miss"
+        ANSWER_CACHE_REQUESTS.inc(agent, outcome)
+        getCurrentSpan().setAttribute("answer_cache", outcome)
+        return answer
+
+    def store(self, agent: str, dataset_version: str, vector: list, question: str, answer: str) -> None:
+        """
+        @brief Caches the answer to a question.
+
+        An answer to a question similar enough to a cached one replaces the cached answer.
+
+        @param agent (str): The agent that answered the question, "sql" or "rag".
+        @param dataset_version (str): The version of the dataset the question was asked on.
+        @param vector (list): The embedding of the question.
+        @param question (str): The question.
+        @param answer (str): The answer of the agent.
+        """
+        vector = _normalize(vector)
+        answers = self.getAnswers(agent, dataset_version)
+        if answers is None or answers.dimension != vector.shape[1]:
+            if answers is not None:
+                self.evictDataset(agent, dataset_version)  # The embedding model changed
+            answers = self.datasets[(agent, dataset_version)] = _DatasetAnswers(vector.shape[1])
+            self.evictDatasets()
+
+        cached = _CachedAnswer(question=question, answer=answer, stored_at=time.monotonic())
+        entry_id, similarity = answers.search(vector)
+        if entry_id is not None and similarity >= self.threshold:
+            answers.entries[entry_id] = cached
+            answers.entries.move_to_end(entry_id)
+            return
+
+        if len(answers.entries) >= self.max_entries:
+            evicted_ids = list(answers.entries)[:len(answers.entries) - self.max_entries + 1]
+            answers.remove(evicted_ids)
+            self.recordEvictions(agent, "capacity", len(evicted_ids))
+        answers.add(vector, cached)
+        ANSWER_CACHE_ENTRIES.inc(agent)
+
+    def getAnswers(self, agent: str, dataset_version: str) -> _DatasetAnswers:
+        """
+        @brief Retrieves the answers of a dataset, removing those that expired.
+
+        @param agent (str): The agent, "sql" or "rag".
+        @param dataset_version (str): The version of the dataset.
+        @return The answers of the dataset, or None if none are cached.
+        """
+        key = (agent, dataset_version)
+        answers = self.datasets.get(key)
+        if answers is None:
+            return None
+        self.datasets.move_to_end(key)
+
+        now = time.monotonic()
+        expired_ids = [entry_id for entry_id, cached in answers.entries.items() if now - cached.stored_at >= self.ttl]
+        if expired_ids:
+            answers.remove(expired_ids)
+            self.recordEvictions(agent, "expired", len(expired_ids))
+        return answers
+
+    def evictDatasets(self) -> None:
+        """
+        @brief Evicts the least recently used datasets beyond the number of datasets.
+        """
+        while len(self.datasets) > self.max_datasets:
+            agent, dataset_version = next(iter(self.datasets))
+            self.evictDataset(agent, dataset_version)
+
+    def evictDataset(self, agent: str, dataset_version: str) -> None:
+        """
+        @brief Evicts all answers of a dataset.
+
+        @param agent (str): The agent, "sql" or "rag".
+        @param dataset_version (str): The version of the dataset.
+        """
+        answers = self.datasets.pop((agent, dataset_version))
+        self.recordEvictions(agent, "dataset", len(answers.entries))
+
+    def recordEvictions(self, agent: str, reason: str, count: int) -> None:
+        """
+        @brief Counts evicted answers.
+
+        @param agent (str): The agent, "sql" or "rag".
+        @param reason (str): "expired", "capacity" or "dataset".
+        @param count (int): The number of evicted answers.
+        """
+        if count:
+            ANSWER_CACHE_EVICTIONS.inc(agent, reason, amount=count)
+            ANSWER_CACHE_ENTRIES.dec(agent, amount=count)
@@ -1,9 +1,16 @@
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.vectorstores.faiss import FAISS
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
 from lib.ai.memory.memory import CustomSQLMemory
 from lib.ai.llm.llm import LLM
 from lib.ai.llm.embedding import Embedding
+from lib.ai.agents.agent_metrics import AGENT_ITERATIONS, RETRIEVAL_DURATION, measureLLMCall
+from lib.tools.tracing import TRACER
+from lib.ai.agents.agent_tools import RAG_AGENT_TOOLS, NO_ANSWER_MESSAGE, FINAL_ANSWER_NOT_ALONE_MESSAGE, getBestEffortAnswer
+from lib.ai.llm.deadline import Deadline, DeadlineExceededError
+from lib.ai.vector_store.vector_store import SessionVectorStore
+from lib.ai.vector_store.dedup import removeOverlappingResults
+import asyncio
 
 class RagQueryAgent:
     """
@@ -16,28 +23,36 @@ class RagQueryAgent:
     Attributes:
     - max_iteration (int): The maximum number of iterations for processing queries.
     - memory (CustomSQLMemory): The memory instance for storing conversation context.
-    - vector_store (FAISS): The vector store used for document retrieval.
-    - retriever: The retriever for fetching relevant documents from the vector store.
+    - time_budget (float): The seconds a question may take across all iterations, None for no budget.
+    - agent_mode (str): "prompt" to parse "Filter Command:" prefixes, "tool_calling" to use native tool calls.
+    - vector_store (SessionVectorStore): The per-file vector store used for document retrieval.
+    - top_k (int): The number of merged documents returned by one retrieval step.
     - llm_chain: The combined prompt template and LLM for generating responses.
+    - tool_prompt_template: The system prompt used in tool calling mode.
     """
     
-    def __init__(self, llm: LLM, memory: CustomSQLMemory, vector_store_path: str, embeddings: Embedding, max_iteration: int) -> None:
+    def __init__(self, llm: LLM, memory: CustomSQLMemory, vector_store_path: str, embeddings: Embedding, max_iteration: int, agent_mode: str = "prompt", time_budget: float = None) -> None:
         """
         @brief Initializes the RagQueryAgent with required components.
 
         @param llm (LLM): The language model used for generating responses.
         @param memory (CustomSQLMemory): The memory instance for storing context.
-        @param vector_store_path (str): Path to the FAISS vector store.
+        @param vector_store_path (str): Path to the session's vector store.
         @param embeddings (Embedding): The embedding model for document retrieval.
         @param max_iteration (int): The maximum number of iterations for processing.
+        @param agent_mode (str): The action selection mode, "prompt" or "tool_calling".
+        @param time_budget (float): The seconds a question may take across all iterations, None for no budget.
         """
+        self.llm = llm  # Store the LLM for tool calling mode
         self.max_iteration = max_iteration  # Set the maximum iteration limit
         self.memory = memory  # Store the memory instance
+        self.agent_mode = agent_mode  # Store the action selection mode
+        self.time_budget = time_budget  # Bounds the LLM calls of a question
+        self.deadline = Deadline(time_budget)
         
-        # Load the FAISS vector store from the specified path
-        self.vector_store = FAISS.load_local(vector_store_path + "/faiss", embeddings, allow_dangerous_deserialization=True)
-        # Create a retriever for fetching relevant documents
-        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 10})
+        # Open the session's vector store, its per-file indexes are loaded on first search
+        self.vector_store = SessionVectorStore(vector_store_path=vector_store_path, embeddings=embeddings)
+        self.top_k = 10  # Number of documents returned by one retrieval step
         
         # Define the prompt template for the LLM
         prompt_template = PromptTemplate(
@@ -45,7 +60,7 @@ class RagQueryAgent:
             template=("""You are an AI assistant that helps users by retrieving relevant information \
                     from a database of documents and answering their questions. Also, you are working in iterations.
 
-                    You have access to the file names:
+                    You have access to the files, listed with their page and chunk counts:
 
                         File names: "{file_names}"
 
@@ -64,8 +79,9 @@ class RagQueryAgent:
                     Your Task:
 
                         Use the conversation history to decide whether you need to execute a new filter command or provide a final answer.
-                        Filter command must only be a file name.
+                        Filter command must be a file name, or several file names separated by commas, or "*" to search all files.
                         Filter command must only be string, not list, not dict or not any other types.
+                        If the question may concern several files, put all of them in one filter command instead of filtering them one by one.
                         Consider that the user query may be related to past results or previous user queries. \
                     If the query relates to prior interactions, take that context into account when generating your response.
                         The user may upload more files after a while and ask questions about all files or new files. So, pay attention to the file names. 
@@ -93,6 +109,30 @@ class RagQueryAgent:
 
         # Create a chain of prompt template, LLM, and output parser
         self.llm_chain = prompt_template | llm | StrOutputParser()
+
+        # Define the system prompt for tool calling mode
+        self.tool_prompt_template = PromptTemplate(
+            input_variables=["file_names", "history", "max_iteration"],
+            template=("""You are an AI assistant that helps users by retrieving relevant information \
+                    from a database of documents and answering their questions.
+
+                    You have access to the files, listed with their page and chunk counts:
+
+                        File names: "{file_names}"
+
+                    Past conversation history (the user does not see the retrieval results):
+
+                        Conversation History: "{history}"
+
+                    Your Task:
+
+                        Use the "retrieve" tool to search files for relevant information. The files argument must only contain file names \
+                    from the list; leave it empty to search all files. Put every file that may be relevant into one call.
+                        You may call it several times in one turn, for example with different search queries.
+                        The user may upload more files after a while and ask questions about all files or new files. So, pay attention to the file names.
+                        When you have enough information, call "final_answer" alone with your response to the user. \
+                    Do not explicitly state that your answer is based on previous queries.
+                        You must call "final_answer" within "{max_iteration}" turns."""))
     
     async def execute(self, user_query: str) -> str:
         """
@@ -104,39 +144,173 @@ class RagQueryAgent:
         @param user_query (str): The input query from the user.
         @return The generated response as a string.
         """
+        self.deadline = Deadline(self.time_budget)  # Shared by all iterations
+        if self.agent_mode == "tool_calling":
+            return await self.executeWithTools(user_query)
+
         result = None
         filter_file_result_pair = []  # Initialize a list to store filter command results
         
         for i in range(self.max_iteration):
-            # Retrieve conversation history from memory
-            history = await self.getHistoryFromMemory()
-            # Invoke the LLM chain with the input data
-            result = await self.llm_chain.ainvoke(input={
-                "file_names": self.getAvailableFiles(),
-                "history": history,
-                "command_result_pair": filter_file_result_pair,
-                "max_iteration": self.max_iteration,
-                "iteration": i,
-                "input": user_query
-            })
+            with TRACER.span("rag_agent.iteration", attributes={"agent.iteration": i + 1}):
+                # Retrieve conversation history from memory
+                history = await self.getHistoryFromMemory()
+                # Invoke the LLM chain with the input data
+                try:
+                    result = await measureLLMCall("rag", self.llm_chain.ainvoke(input={
+                        "file_names": self.getFileCatalog(),
+                        "history": history,
+                        "command_result_pair": filter_file_result_pair,
+                        "max_iteration": self.max_iteration,
+                        "iteration": i,
+                        "input": user_query
+                    }), iteration=i + 1, deadline=self.deadline)
+                except DeadlineExceededError:
+                    return await self.answerAfterDeadline(user_query, filter_file_result_pair, i + 1)
             
-            if "Filter Command:" in result:
-                # Extract filter command from the result
-                filter_file = result.split("Filter Command:")[-1].strip()
-                self.retriever.search_kwargs["filter"] = {"filename": filter_file}  # Set filter for document retrieval
-                relevant_doc = await self.retriever.ainvoke(user_query)  # Retrieve relevant documents
-                result = "\n\n".join([doc.page_content for doc in relevant_doc])  # Concatenate document contents
-                # Store the filter command and its results
-                filter_file_result_pair.append({f"Filter Command {i}": filter_file, f"Filter Command Result {i}": result})
-            else:
-                # Save the interaction to memory and return the result
-                await self.addHistoryToMemory(user_query, filter_file_result_pair, result)
-                return result
+                if "Filter Command:" in result:
+                    # Extract filter command from the result
+                    filter_file = result.split("Filter Command:")[-1].strip()
+                    relevant_doc = await self.retrieveDocuments(user_query, self.parseFilterCommand(filter_file))  # Retrieve relevant documents
+                    result = "\n\n".join([doc.page_content for doc in relevant_doc])  # Concatenate document contents
+                    # Store the filter command and its results
+                    filter_file_result_pair.append({f"Filter Command {i}": filter_file, f"Filter Command Result {i}": result})
+                else:
+                    # Save the interaction to memory and return the result
+                    AGENT_ITERATIONS.observe(i + 1, "rag", "answer")
+                    await self.addHistoryToMemory(user_query, filter_file_result_pair, result)
+                    return result
             
         # If maximum iterations reached without a valid response
         result = "Max iteration was reached."
+        AGENT_ITERATIONS.observe(self.max_iteration, "rag", "max_iteration")
         await self.addHistoryToMemory(user_query, filter_file_result_pair, result)
-        return "I couldn't generate an answer according to your question. Please change your question and try again."
+        return NO_ANSWER_MESSAGE
+
+    async def executeWithTools(self, user_query: str) -> str:
+        """
+        @brief Executes the RAG query using the model's native tool calling.
+
+        Every turn the model may request several "retrieve" calls, which are executed
+        concurrently and returned as tool messages, or call "final_answer" to finish. A
+        "final_answer" requested together with other tools is rejected, since it was written
+        without their results; the other tools run and the model is asked to answer again.
+
+        @param user_query (str): The input query from the user.
+        @return The generated response as a string.
+        """
+        filter_file_result_pair = []  # Initialize a list to store retrieval results
+
+        history = await self.getHistoryFromMemory()
+        system_prompt = self.tool_prompt_template.format(
+            file_names=self.getFileCatalog(),
+            history=history,
+            max_iteration=self.max_iteration
+        )
+        messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_query)]
+
+        for i in range(self.max_iteration):
+            with TRACER.span("rag_agent.iteration", attributes={"agent.iteration": i + 1}):
+                try:
+                    ai_message = await measureLLMCall("rag", self.llm.ainvoke(messages, tools=RAG_AGENT_TOOLS), iteration=i + 1, deadline=self.deadline)
+                except DeadlineExceededError:
+                    return await self.answerAfterDeadline(user_query, filter_file_result_pair, i + 1)
+                messages.append(ai_message)
+
+                if not ai_message.tool_calls:
+                    # A plain text reply is treated as the final answer
+                    AGENT_ITERATIONS.observe(i + 1, "rag", "answer")
+                    await self.addHistoryToMemory(user_query, filter_file_result_pair, ai_message.content)
+                    return ai_message.content
+
+                # A final answer is only accepted alone, since it was written without the results of the other tools
+                tool_calls = [call for call in ai_message.tool_calls if call["name"] != "final_answer"]
+                if not tool_calls:
+                    result = ai_message.tool_calls[0]["args"].get("answer", "")
+                    AGENT_ITERATIONS.observe(i + 1, "rag", "answer")
+                    await self.addHistoryToMemory(user_query, filter_file_result_pair, result)
+                    return result
+
+                # Run all requested retrievals of this turn concurrently
+                results = await asyncio.gather(*[self.runToolCall(call) for call in tool_calls])
+
+                for call, result in zip(tool_calls, results):
+                    messages.append(ToolMessage(content=result, tool_call_id=call["id"]))
+                    filter_file_result_pair.append({f"Filter Command {i}": call["args"].get("files", []), f"Filter Command Result {i}": result})
+
+                for call in ai_message.tool_calls:
+                    if call["name"] == "final_answer":
+                        # Every tool call needs a result, so a rejected answer gets one asking to answer alone
+                        messages.append(ToolMessage(content=FINAL_ANSWER_NOT_ALONE_MESSAGE, tool_call_id=call["id"]))
+
+        # If maximum iterations reached without a valid response
+        result = "Max iteration was reached."
+        AGENT_ITERATIONS.observe(self.max_iteration, "rag", "max_iteration")
+        await self.addHistoryToMemory(user_query, filter_file_result_pair, result)
+        return NO_ANSWER_MESSAGE
+
+    async def answerAfterDeadline(self, user_query: str, command_result_pair: list, iteration: int) -> str:
+        """
+        @brief Gives a best-effort answer once the time budget of the question ran out.
+
+        @param user_query (str): The input query from the user.
+        @param command_result_pair (list): The commands run so far with their results.
+        @param iteration (int): The iteration the budget ran out in.
+        @return The last result found, or a message that the question took too long.
+        """
+        AGENT_ITERATIONS.observe(iteration, "rag", "deadline")
+        await self.addHistoryToMemory(user_query, command_result_pair, "Time budget was reached.")
+        return getBestEffortAnswer(command_result_pair)
+
+    async def runToolCall(self, tool_call: dict) -> str:
+        """
+        @brief Executes a single tool call requested by the model.
+
+        @param tool_call (dict): The tool call with its name, arguments and id.
+        @return The result of the tool call as a string.
+        """
+        if tool_call["name"] == "retrieve":
+            file_names = tool_call["args"].get("files") or self.getAvailableFiles()  # An empty file list means all files
+            relevant_doc = await self.retrieveDocuments(tool_call["args"].get("query", ""), file_names)
+            return "\n\n".join([doc.page_content for doc in relevant_doc])
+        return f"Unknown tool: {tool_call['name']}"
+
+    async def retrieveDocuments(self, query: str, file_names: list) -> list:
+        """
+        @brief Retrieves the most relevant documents from several files in one step.
+
+        The per-file indexes of all given files are searched concurrently with hybrid dense
+        and BM25 retrieval. Twice top_k fused, reranked documents are fetched, so top_k remain
+        after near-duplicates and the text overlapping neighbouring chunks are removed.
+
+        @param query (str): The search query.
+        @param file_names (list): The names of the files to search in.
+        @return The merged list of the most relevant documents.
+        """
+        with RETRIEVAL_DURATION.time(), TRACER.span("rag.retrieve", attributes={"rag.file_count": len(file_names), "rag.top_k": self.top_k}):
+            matches = await self.vector_store.hybridSearch(query, k=self.top_k * 2, file_names=file_names)
+        return removeOverlappingResults([doc for doc, _ in matches])[:self.top_k]
+
+    def parseFilterCommand(self, filter_command: str) -> list:
+        """
+        @brief Converts a filter command into the list of files to search.
+
+        A filter command is a single file name, several file names separated by commas,
+        or "*" for all files.
+
+        @param filter_command (str): The filter command generated by the LLM.
+        @return The list of file names to search in.
+        """
+        filter_command = filter_command.strip().strip('"').strip("'")
+        available_files = self.getAvailableFiles()
+
+        if filter_command in ("*", ""):
+            return available_files
+        if filter_command in available_files:
+            return [filter_command]  # A single file name, which may itself contain commas
+
+        # Split multiple file names and strip any quotes around them
+        return [file_name.strip().strip('"').strip("'") for file_name in filter_command.split(",") if file_name.strip()]
     
     async def addHistoryToMemory(self, user_query: dict, filter_file_result_pair: list, result: dict) -> None:
         """
@@ -168,4 +342,15 @@ class RagQueryAgent:
 
         @return A list of unique file names.
         """
-        return list(set(doc.metadata['filename'] for doc in self.vector_store.docstore._dict.values()))  # Return unique file names
\ No newline at end of file
+        return self.vector_store.getFileNames()  # Read from the cached manifest
+
+    def getFileCatalog(self) -> list:
+        """
+        @brief Retrieves the available files with the statistics shown to the LLM.
+
+        @return A list of dictionaries with the file name and its page and chunk counts.
+        """
+        return [
+            {"file_name": file_name, "pages": stats.get("pages", 0), "chunks": stats.get("chunks", 0)}
+            for file_name, stats in sorted(self.vector_store.getFileStats().items())
+        ]
\ No newline at end of file
@@ -1,10 +1,16 @@
 from fastapi import HTTPException, status
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
 from sqlalchemy import text
 from lib.ai.memory.memory import CustomSQLMemory
 from lib.ai.llm.llm import LLM
+from lib.ai.agents.agent_metrics import AGENT_ITERATIONS, SQL_QUERY_DURATION, measureLLMCall
+from lib.tools.tracing import TRACER
+from lib.ai.agents.agent_tools import SQL_AGENT_TOOLS, NO_ANSWER_MESSAGE, FINAL_ANSWER_NOT_ALONE_MESSAGE, getBestEffortAnswer
+from lib.ai.llm.deadline import Deadline, DeadlineExceededError
 from lib.database.config.configuration import getAsyncDB
+import asyncio, time
 
 class SqlQueryAgent:
     """
@@ -18,10 +24,13 @@ class SqlQueryAgent:
     - memory (CustomSQLMemory): The memory instance for storing context.
     - temp_database_path (str): Path to the temporary database.
     - max_iteration (int): The maximum number of iterations for processing queries.
+    - time_budget (float): The seconds a question may take across all iterations, None for no budget.
+    - agent_mode (str): "prompt" to parse "SQL Query:" prefixes, "tool_calling" to use native tool calls.
     - llm_chain: The combined prompt template and LLM for generating SQL queries.
+    - tool_prompt_template: The system prompt used in tool calling mode.
     """
 
-    def __init__(self, llm: LLM, memory: CustomSQLMemory, temp_database_path: str, max_iteration: int) -> None:
+    def __init__(self, llm: LLM, memory: CustomSQLMemory, temp_database_path: str, max_iteration: int, agent_mode: str = "prompt", time_budget: float = None) -> None:
         """
         @brief Initializes the SqlQueryAgent with required components.
 
@@ -29,10 +38,16 @@ class SqlQueryAgent:
         @param memory (CustomSQLMemory): The memory instance for storing context.
         @param temp_database_path (str): Path to the temporary database.
         @param max_iteration (int): The maximum number of iterations for processing.
+        @param agent_mode (str): The action selection mode, "prompt" or "tool_calling".
+        @param time_budget (float): The seconds a question may take across all iterations, None for no budget.
         """
+        self.llm = llm  # Store the LLM for tool calling mode
         self.memory = memory  # Store the memory instance
         self.temp_database_path = temp_database_path  # Store the path to the temporary database
         self.max_iteration = max_iteration  # Set the maximum iteration limit
+        self.agent_mode = agent_mode  # Store the action selection mode
+        self.time_budget = time_budget  # Bounds the LLM calls of a question
+        self.deadline = Deadline(time_budget)
 
         # Define the prompt template for the LLM
         prompt_template = PromptTemplate(
@@ -89,6 +104,31 @@ class SqlQueryAgent:
         # Create a chain of prompt template, LLM, and output parser
         self.llm_chain = prompt_template | llm | StrOutputParser()
 
+        # Define the system prompt for tool calling mode
+        self.tool_prompt_template = PromptTemplate(
+            input_variables=["table_names", "column_names", "history", "max_iteration"],
+            template=("""You are a data scientist with access to a postgresql database created from one or more CSV files. \
+                      Each table in the database corresponds to a CSV file and each table in the database is a dataset.
+
+                        Database Information:
+
+                            Table names: "{table_names}"
+                            Column names of each table: "{column_names}"
+
+                        Past conversation history (the user does not see the commands and their results):
+
+                            Conversation History: "{history}"
+
+                        Your Task:
+
+                            Use the "run_sql" tool to execute SQL queries. You may call it several times in one turn \
+                      when the queries are independent of each other.
+                            If a SQL query fails, adjust it and try again.
+                            If the user directly asks for a SQL query, return the SQL command through "final_answer" without running it.
+                            When you have enough information, call "final_answer" alone with your response to the user. \
+                      Do not explicitly state that your answer is based on previous queries.
+                            You must call "final_answer" within "{max_iteration}" turns."""))
+
     async def execute(self, user_query: str) -> str:
         """
         @brief Executes the SQL query based on the user input.
@@ -99,8 +139,144 @@ class SqlQueryAgent:
         @param user_query (str): The input query from the user.
         @return The generated response as a string.
         """
+        self.deadline = Deadline(self.time_budget)  # Shared by all iterations
+        if self.agent_mode == "tool_calling":
+            return await self.executeWithTools(user_query)
+
         result = None
         command_result_pair = []  # Initialize a list to store command-result pairs
+
+        table_names, column_names = await self.getDatabaseSchema()
+
+        # Iterate to generate responses based on user queries
+        for i in range(self.max_iteration):
+            with TRACER.span("sql_agent.iteration", attributes={"agent.iteration": i + 1}):
+                history = await self.getHistoryFromMemory()  # Retrieve conversation history from memory
+                try:
+                    result = await measureLLMCall("sql", self.llm_chain.ainvoke(input={
+                        "table_names": table_names,
+                        "column_names": column_names,
+                        "input": user_query, 
+                        "history": history,
+                        "command_result_pair": command_result_pair,
+                        "iteration": i + 1, 
+                        "max_iteration": self.max_iteration
+                    }), iteration=i + 1, deadline=self.deadline)
+                except DeadlineExceededError:
+                    return await self.answerAfterDeadline(user_query, command_result_pair, i + 1)
+                if "SQL Query:" in result:
+                    # Extract the SQL query from the result
+                    sql_query = result.split("SQL Query:")[-1].strip()
+                    result = await self.runSQLQuery(sql_query)  # Execute the generated SQL query
+                    command_result_pair.append({f"SQL Query {i}": sql_query, f"SQL Query Result {i}": result})  # Store the command-result pair
+                else:
+                    AGENT_ITERATIONS.observe(i + 1, "sql", "answer")
+                    await self.addHistoryToMemory(user_query, command_result_pair, result)  # Save history to memory
+                    return result  # Return the result if it's not a SQL command
+
+        # If maximum iterations reached without a valid response
+        result = "Max iteration was reached."
+        AGENT_ITERATIONS.observe(self.max_iteration, "sql", "max_iteration")
+        await self.addHistoryToMemory(user_query, command_result_pair, result)  # Save final state to memory
+        return NO_ANSWER_MESSAGE
+
+    async def executeWithTools(self, user_query: str) -> str:
+        """
+        @brief Executes the user query using the model's native tool calling.
+
+        Every turn the model may request several "run_sql" calls, which are executed
+        concurrently and returned as tool messages, or call "final_answer" to finish. A
+        "final_answer" requested together with other tools is rejected, since it was written
+        without their results; the other tools run and the model is asked to answer again.
+
+        @param user_query (str): The input query from the user.
+        @return The generated response as a string.
+        """
+        command_result_pair = []  # Initialize a list to store command-result pairs
+
+        table_names, column_names = await self.getDatabaseSchema()
+        history = await self.getHistoryFromMemory()
+
+        system_prompt = self.tool_prompt_template.format(
+            table_names=table_names,
+            column_names=column_names,
+            history=history,
+            max_iteration=self.max_iteration
+        )
+        messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_query)]
+
+        for i in range(self.max_iteration):
+            with TRACER.span("sql_agent.iteration", attributes={"agent.iteration": i + 1}):
+                try:
+                    ai_message = await measureLLMCall("sql", self.llm.ainvoke(messages, tools=SQL_AGENT_TOOLS), iteration=i + 1, deadline=self.deadline)
+                except DeadlineExceededError:
+                    return await self.answerAfterDeadline(user_query, command_result_pair, i + 1)
+                messages.append(ai_message)
+
+                if not ai_message.tool_calls:
+                    # A plain text reply is treated as the final answer
+                    AGENT_ITERATIONS.observe(i + 1, "sql", "answer")
+                    await self.addHistoryToMemory(user_query, command_result_pair, ai_message.content)
+                    return ai_message.content
+
+                # A final answer is only accepted alone, since it was written without the results of the other tools
+                tool_calls = [call for call in ai_message.tool_calls if call["name"] != "final_answer"]
+                if not tool_calls:
+                    result = ai_message.tool_calls[0]["args"].get("answer", "")
+                    AGENT_ITERATIONS.observe(i + 1, "sql", "answer")
+                    await self.addHistoryToMemory(user_query, command_result_pair, result)
+                    return result
+
+                # Run all requested SQL queries of this turn concurrently
+                results = await asyncio.gather(*[self.runToolCall(call) for call in tool_calls])
+
+                for call, result in zip(tool_calls, results):
+                    messages.append(ToolMessage(content=str(result), tool_call_id=call["id"]))
+                    command_result_pair.append({f"SQL Query {i}": call["args"].get("query", ""), f"SQL Query Result {i}": result})
+
+                for call in ai_message.tool_calls:
+                    if call["name"] == "final_answer":
+                        # Every tool call needs a result, so a rejected answer gets one asking to answer alone
+                        messages.append(ToolMessage(content=FINAL_ANSWER_NOT_ALONE_MESSAGE, tool_call_id=call["id"]))
+
+        # If maximum iterations reached without a valid response
+        result = "Max iteration was reached."
+        AGENT_ITERATIONS.observe(self.max_iteration, "sql", "max_iteration")
+        await self.addHistoryToMemory(user_query, command_result_pair, result)
+        return NO_ANSWER_MESSAGE
+
+    async def answerAfterDeadline(self, user_query: str, command_result_pair: list, iteration: int) -> str:
+        """
+        @brief Gives a best-effort answer once the time budget of the question ran out.
+
+        @param user_query (str): The input query from the user.
+        @param command_result_pair (list): The commands run so far with their results.
+        @param iteration (int): The iteration the budget ran out in.
+        @return The last result found, or a message that the question took too long.
+        """
+        AGENT_ITERATIONS.observe(iteration, "sql", "deadline")
+        await self.addHistoryToMemory(user_query, command_result_pair, "Time budget was reached.")
+        return getBestEffortAnswer(command_result_pair)
+
+    async def runToolCall(self, tool_call: dict):
+        """
+        @brief Executes a single tool call requested by the model.
+
+        @param tool_call (dict): The tool call with its name, arguments and id.
+        @return The result of the tool call.
+        """
+        if tool_call["name"] == "run_sql":
+            return await self.runSQLQuery(tool_call["args"].get("query", ""))
+        return f"Unknown tool: {tool_call['name']}"
+
+    async def getDatabaseSchema(self) -> tuple:
+        """
+        @brief Retrieves the table names and column names of the temporary database.
+
+        @return Tuple of the table names and the column names of the tables.
+
+        @exception HTTPException If no dataset was uploaded.
+        """
         column_names = None  # Initialize column names as None
 
         # Retrieve the names of tables in the temporary database
@@ -115,31 +291,7 @@ class SqlQueryAgent:
             # Raise an error if no datasets are uploaded
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Any dataset was not uploaded.")
 
-        # Iterate to generate responses based on user queries
-        for i in range(self.max_iteration):
-            history = await self.getHistoryFromMemory()  # Retrieve conversation history from memory
-            result = await self.llm_chain.ainvoke(input={
-                "table_names": table_names,
-                "column_names": column_names,
-                "input": user_query, 
-                "history": history,
-                "command_result_pair": command_result_pair,
-                "iteration": i + 1, 
-                "max_iteration": self.max_iteration
-            })
-            if "SQL Query:" in result:
-                # Extract the SQL query from the result
-                sql_query = result.split("SQL Query:")[-1].strip()
-                result = await self.runSQLQuery(sql_query)  # Execute the generated SQL query
-                command_result_pair.append({f"SQL Query {i}": sql_query, f"SQL Query Result {i}": result})  # Store the command-result pair
-            else:
-                await self.addHistoryToMemory(user_query, command_result_pair, result)  # Save history to memory
-                return result  # Return the result if it's not a SQL command
-
-        # If maximum iterations reached without a valid response
-        result = "Max iteration was reached."
-        await self.addHistoryToMemory(user_query, command_result_pair, result)  # Save final state to memory
-        return "I couldn't generate an answer according to your question. Please change your question and try again."
+        return table_names, column_names
     
     async def runSQLQuery(self, sqlQuery: str) -> str:
         """
@@ -150,14 +302,20 @@ class SqlQueryAgent:
         @param sqlQuery (str): The SQL query to be executed.
         @return The results of the SQL query execution.
         """
-        async for db in getAsyncDB(self.temp_database_path):
-            try:
-                # Execute the SQL query and fetch the results
-                result = await db.execute(text(sqlQuery))
-                result = result.fetchall()  # Retrieve all results
-                return result  # Return the results
-            except Exception as e:
-                return e  # Return the error if execution fails
+        with TRACER.span("db.query", kind="CLIENT", attributes={"db.system": "postgresql", "db.statement": sqlQuery}) as span:
+            async for db in getAsyncDB(self.temp_database_path):
+                start = time.perf_counter()
+                try:
+                    # Execute the SQL query and fetch the results
+                    result = await db.execute(text(sqlQuery))
+                    result = result.fetchall()  # Retrieve all results
+                    SQL_QUERY_DURATION.observe(time.perf_counter() - start, "success")
+                    span.setAttribute("db.response.returned_rows", len(result))
+                    return result  # Return the results
+                except Exception as e:
+                    SQL_QUERY_DURATION.observe(time.perf_counter() - start, "error")
+                    span.recordException(e)  # The error is returned to the agent, not raised
+                    return e  # Return the error if execution fails
     
     async def addHistoryToMemory(self, user_query: dict, command_result_pair_list: list, result: dict) -> None:
         """
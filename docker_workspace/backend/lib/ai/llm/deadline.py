@@ -0,0 +1,40 @@
+import time
+
+class DeadlineExceededError(Exception):
+    """
+    @brief Raised when the time budget of a question runs out during an LLM call.
+    """
+
+class Deadline:
+    """
+    @brief The time budget of a question, shared by all iterations of the agent answering it.
+
+    Attributes:
+    - expires_at (float): The monotonic time the budget runs out, None for no budget.
+    """
+
+    def __init__(self, budget: float = None) -> None:
+        """
+        @brief Starts the budget.
+
+        @param budget (float): The seconds the question may take, None or 0 for no budget.
+        """
+        self.expires_at = time.monotonic() + budget if budget else None
+
+    def remaining(self) -> float:
+        """
+        @brief Computes the time left, which bounds the next LLM call.
+
+        @return The seconds left, never negative, or None if there is no budget.
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        @brief Checks whether the budget ran out.
+
+        @return True if no time is left.
+        """
+        return self.remaining() == 0.0
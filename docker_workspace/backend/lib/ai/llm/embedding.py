@@ -1,5 +1,7 @@
 from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
+from lib.ai.llm.hashing_embeddings import HashingEmbeddings
 import os
 import sys
 
@@ -7,14 +9,14 @@ class Embedding:
     """
     @brief Manages the embedding model for generating vector representations.
 
-    This class initializes an embedding model using the OpenAI API and
-    provides a method to retrieve the embedding instance.
+    This class initializes an embedding model using the OpenAI API, or a local
+    hashing model for load tests, and provides a method to retrieve the embedding instance.
 
     Attributes:
-    - embedding (OpenAIEmbeddings): The embedding model instance.
+    - embedding (Embeddings): The embedding model instance.
     """
     
-    def __init__(self, model_name: str) -> None:
+    def __init__(self, model_name: str, dimensions: int = None, backend: str = "openai") -> None:
         """
         @brief Initializes the Embedding instance with the specified model.
 
@@ -22,21 +24,29 @@ class Embedding:
         creates an instance of the OpenAI embeddings model.
 
         @param model_name (str): The name of the model to be used for embeddings.
+        @param dimensions (int): The size of the returned vectors. None keeps the model's native size;
+                                 text-embedding-3 models can return shortened vectors.
+        @param backend (str): "openai", or "hashing" for the local deterministic model making no API calls.
         """
         load_dotenv()  # Load environment variables from .env file
 
         try:
-            # Initialize the OpenAIEmbeddings with the specified model name and API key
-            self.embedding = OpenAIEmbeddings(model=model_name, openai_api_key=os.getenv("OPENAI_API_KEY"))
+            if backend == "hashing":
+                self.embedding = HashingEmbeddings(dimensions=dimensions)
+            else:
+                # Initialize the OpenAIEmbeddings with the specified model name and API key.
+                # Failed requests aren't retried by the client; the EmbeddingScheduler retries rate limits and
+                # transient errors with a backoff shared by all sessions instead
+                self.embedding = OpenAIEmbeddings(model=model_name, dimensions=dimensions, max_retries=0, openai_api_key=os.getenv("OPENAI_API_KEY"))
         except Exception as e:
             # Print the error and exit if initialization fails
             print(e)
             sys.exit(-1)
     
-    def get_embedding(self) -> OpenAIEmbeddings:
+    def get_embedding(self) -> Embeddings:
         """
         @brief Retrieves the embedding model instance.
 
-        @return The OpenAIEmbeddings instance used for generating embeddings.
+        @return The OpenAIEmbeddings or hashing instance used for generating embeddings.
         """
         return self.embedding  # Return the initialized embedding instance
\ No newline at end of file
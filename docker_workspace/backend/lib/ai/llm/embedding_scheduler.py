@@ -0,0 +1,322 @@
+from langchain_core.embeddings import Embeddings
+from collections import OrderedDict, deque
+from functools import lru_cache
+from lib.tools.metrics import Counter, Gauge, Histogram
+from lib.tools.tracing import TRACER
+import asyncio, random, logging, time
+
+MAX_BATCH_INPUTS = 2048  # Inputs the embeddings API accepts per request
+
+EMBEDDING_BATCH_DURATION = Histogram(
+    "embedding_batch_duration_seconds", "Duration of embedding requests, by whether they succeeded, were rate limited, failed transiently or failed.", ("outcome",)
+)
+EMBEDDING_BATCH_SIZE = Histogram("embedding_batch_texts", "Texts per embedding request.", buckets=(1, 4, 16, 64, 256, 1024, MAX_BATCH_INPUTS))
+EMBEDDING_TEXTS = Counter("embedding_texts_total", "Texts submitted to be embedded.")
+EMBEDDING_QUEUE_DEPTH = Gauge("embedding_queue_depth", "Texts waiting to be sent to the embedding model.")
+
+@lru_cache(maxsize=1)
+def _getEncoding():
+    """
+    @brief Loads the tokenizer of the OpenAI embedding models once.
+
+    @return The tiktoken encoding, or None if it can't be loaded.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logging.warning(f"Falling back to estimated token counts for embedding batches: {str(e)}")
+        return None
+
+def countTokens(text: str) -> int:
+    """
+    @brief Counts the tokens of a text as the embedding models do.
+
+    @param text (str): The text to embed.
+    @return The token count, or an estimate of four characters per token if the tokenizer isn't available.
+    """
+    encoding = _getEncoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def isRateLimitError(error: Exception) -> bool:
+    """
+    @brief Checks whether an embedding request failed because of the provider's rate limit.
+
+    @param error (Exception): The raised error.
+    @return True for HTTP 429 errors.
+    """
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def isTransientError(error: Exception) -> bool:
+    """
+    @brief Checks whether an embedding request failed for a reason that may be gone on a retry.
+
+    @param error (Exception): The raised error.
+    @return True for server errors (HTTP 5xx), timeouts and connection errors.
+    """
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int) and status_code >= 500:
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in ("APITimeoutError", "APIConnectionError", "InternalServerError")
+
+def getRetryAfter(error: Exception) -> float:
+    """
+    @brief Reads the delay a rate limited or failed response asks for.
+
+    @param error (Exception): The error of the request.
+    @return The Retry-After delay in seconds, 0 if the response has none.
+    """
+    try:
+        return float(error.response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+class _EmbeddingRequest:
+    """
+    @brief One text waiting to be embedded.
+
+    Attributes:
+    - session_id (str): The session the text was submitted by.
+    - text (str): The text to embed.
+    - tokens (int): The token count of the text.
+    - future (asyncio.Future): Resolved with the vector of the text.
+    - attempts (int): The number of rate limited or transiently failed attempts so far.
+    """
+    __slots__ = ("session_id", "text", "tokens", "future", "attempts")
+
+    def __init__(self, session_id: str, text: str, tokens: int, future: asyncio.Future) -> None:
+        self.session_id = session_id
+        self.text = text
+        self.tokens = tokens
+        self.future = future
+        self.attempts = 0
+
+class EmbeddingScheduler:
+    """
+    @brief Schedules the embedding requests of all sessions of the process.
+
+    Texts are queued per session and packed into batches of at most `max_batch_tokens` tokens
+    by taking one text from each waiting session in turn, so a large upload shares every
+    batch with the queries and small uploads of other sessions instead of running ahead of
+    them. At most `concurrency_limit` batches are in flight. A rate limited batch, or one that
+    failed transiently (server error, timeout or connection error), is put back at the front of
+    its sessions' queues and dispatching pauses for an exponentially growing, jittered delay, or
+    the provider's Retry-After; the concurrency limit is halved on every rate limit and raised
+    by one after every successful batch, up to `max_concurrency`.
+
+    Attributes:
+    - embeddings (Embeddings): The embedding model the batches are sent to.
+    - max_batch_tokens (int): The token budget of one batch; a longer text is sent alone.
+    - max_concurrency (int): The maximum number of batches in flight.
+    - max_retries (int): How often a text is retried after rate limits or transient errors before its request fails.
+    - initial_backoff (float): The delay after the first retried failure, in seconds.
+    - max_backoff (float): The maximum delay after retried failures, in seconds.
+    - token_counter (Callable): Returns the token count of a text.
+    - concurrency_limit (int): The current maximum number of batches in flight.
+    - in_flight (int): The number of batches being embedded.
+    - queues (OrderedDict): The waiting requests of every session, in round-robin order.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_tokens: int = 16000, max_concurrency: int = 4, max_retries: int = 6,
+                 initial_backoff: float = 1.0, max_backoff: float = 60.0, token_counter=countTokens) -> None:
+        """
+        @brief Initializes the EmbeddingScheduler.
+
+        @param embeddings (Embeddings): The embedding model the batches are sent to.
+        @param max_batch_tokens (int): The token budget of one batch.
+        @param max_concurrency (int): The maximum number of batches in flight.
+        @param max_retries (int): How often a text is retried after rate limits or transient errors.
+        @param initial_backoff (float): The delay after the first retried failure, in seconds.
+        @param max_backoff (float): The maximum delay after retried failures, in seconds.
+        @param token_counter (Callable): Returns the token count of a text.
+        """
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.token_counter = token_counter
+
+        self.concurrency_limit = max_concurrency
+        self.in_flight = 0
+        self.queues = OrderedDict()
+        self._backoff = 0.0
+        self._paused_until = 0.0
+        self._resume_handle = None
+
+    def forSession(self, session_id: str) -> "SessionEmbeddings":
+        """
+        @brief Creates an embedding model whose requests are scheduled for a session.
+
+        @param session_id (str): The session submitting the texts.
+        @return The Embeddings to pass to vector stores and agents.
+        """
+        return SessionEmbeddings(scheduler=self, session_id=session_id)
+
+    async def embed(self, session_id: str, texts: list) -> list:
+        """
+        @brief Embeds texts once the scheduler has capacity for them.
+
+        @param session_id (str): The session submitting the texts.
+        @param texts (list): The texts to embed.
+        @return The vectors of the texts, in order.
+        """
+        if not texts:
+            return []
+
+        # The span covers the wait for capacity and the batches, which are shared with other sessions
+        with TRACER.span("embeddings.embed", kind="CLIENT", attributes={"embedding.text_count": len(texts)}):
+            loop = asyncio.get_running_loop()
+            requests = [_EmbeddingRequest(session_id, text, self.token_counter(text), loop.create_future()) for text in texts]
+            self.queues.setdefault(session_id, deque()).extend(requests)
+            EMBEDDING_TEXTS.inc(amount=len(requests))
+            self._dispatch()
+
+            return list(await asyncio.gather(*[request.future for request in requests]))
+
+    def _nextBatch(self) -> list:
+        """
+        @brief Takes the next batch from the session queues in round-robin order.
+
+        @return The requests of the batch, empty if nothing is waiting.
+        """
+        batch, tokens = [], 0
+        while self.queues and len(batch) < MAX_BATCH_INPUTS:
+            session_id, queue = next(iter(self.queues.items()))
+            request = queue[0]
+
+            if not request.future.done():  # Skip texts whose caller was cancelled
+                if batch and tokens + request.tokens > self.max_batch_tokens:
+                    break
+                batch.append(request)
+                tokens += request.tokens
+
+            queue.popleft()
+            if queue:
+                self.queues.move_to_end(session_id)
+            else:
+                del self.queues[session_id]
+
+        return batch
+
+    def _dispatch(self) -> None:
+        """
+        @brief Starts batches while there is capacity and dispatching isn't paused.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if loop.time() < self._paused_until:
+                if self._resume_handle is None:
+                    self._resume_handle = loop.call_later(self._paused_until - loop.time(), self._resume)
+                return
+
+            while self.in_flight < self.concurrency_limit:
+                batch = self._nextBatch()
+                if not batch:
+                    return
+                self.in_flight += 1
+                loop.create_task(self._runBatch(batch))
+        finally:
+            EMBEDDING_QUEUE_DEPTH.set(value=sum(len(queue) for queue in self.queues.values()))
+
+    def _resume(self) -> None:
+        """
+        @brief Continues dispatching after a rate limit pause.
+        """
+        self._resume_handle = None
+        self._dispatch()
+
+    async def _runBatch(self, batch: list) -> None:
+        """
+        @brief Embeds one batch and resolves its requests.
+
+        @param batch (list): The requests of the batch.
+        """
+        EMBEDDING_BATCH_SIZE.observe(len(batch))
+        start = time.perf_counter()
+        try:
+            vectors = await self.embeddings.aembed_documents([request.text for request in batch])
+        except Exception as e:
+            if isRateLimitError(e):
+                EMBEDDING_BATCH_DURATION.observe(time.perf_counter() - start, "rate_limited")
+                self._retryLater(batch, e)
+            elif isTransientError(e):
+                EMBEDDING_BATCH_DURATION.observe(time.perf_counter() - start, "transient_error")
+                self._retryLater(batch, e)
+            else:
+                EMBEDDING_BATCH_DURATION.observe(time.perf_counter() - start, "error")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+        else:
+            EMBEDDING_BATCH_DURATION.observe(time.perf_counter() - start, "success")
+            self._backoff = 0.0
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1)
+            for request, vector in zip(batch, vectors):
+                if not request.future.done():
+                    request.future.set_result(vector)
+        finally:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def _retryLater(self, batch: list, error: Exception) -> None:
+        """
+        @brief Requeues a rate limited or transiently failed batch and pauses dispatching.
+
+        Only rate limits lower the concurrency limit, since other failures don't mean the
+        requests are sent too fast.
+
+        @param batch (list): The requests of the failed batch.
+        @param error (Exception): The rate limit or transient error.
+        """
+        for request in reversed(batch):
+            request.attempts += 1
+            if request.future.done():
+                continue
+            if request.attempts > self.max_retries:
+                request.future.set_exception(error)
+                continue
+            # Retried texts go first, and their sessions are served first
+            self.queues.setdefault(request.session_id, deque()).appendleft(request)
+            self.queues.move_to_end(request.session_id, last=False)
+
+        self._backoff = min(self.max_backoff, max(self.initial_backoff, self._backoff * 2))
+        delay = max(getRetryAfter(error), self._backoff * random.uniform(0.5, 1.0))
+        self._paused_until = max(self._paused_until, asyncio.get_running_loop().time() + delay)
+        if isRateLimitError(error):
+            self.concurrency_limit = max(1, self.concurrency_limit // 2)
+
+class SessionEmbeddings(Embeddings):
+    """
+    @brief Embeddings of one session, scheduled by the process' EmbeddingScheduler.
+
+    Attributes:
+    - scheduler (EmbeddingScheduler): The scheduler of the process.
+    - session_id (str): The session the texts are queued for.
+    """
+
+    def __init__(self, scheduler: EmbeddingScheduler, session_id: str) -> None:
+        """
+        @brief Initializes the SessionEmbeddings.
+
+        @param scheduler (EmbeddingScheduler): The scheduler of the process.
+        @param session_id (str): The session the texts are queued for.
+        """
+        self.scheduler = scheduler
+        self.session_id = session_id
+
+    def embed_documents(self, texts: list) -> list:
+        # Synchronous callers bypass the scheduler
+        return self.scheduler.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self.scheduler.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list) -> list:
+        return await self.scheduler.embed(self.session_id, texts)
+
+    async def aembed_query(self, text: str) -> list:
+        return (await self.scheduler.embed(self.session_id, [text]))[0]
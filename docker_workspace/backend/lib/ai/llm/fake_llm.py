@@ -0,0 +1,179 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from typing import Any, List, Optional
+import asyncio, hashlib, json, math, random, re, threading, time
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+# Reply rules driving both agents in both agent modes through one tool round and a final answer.
+# The rules are matched against the rendered conversation, one "<role>: <content>" line per message
+DEFAULT_SCRIPT = {
+    "rules": [
+        # Tool calling mode, after the requested tools returned their results
+        {"match": r"(?m)^tool: ", "tool_calls": [{"name": "final_answer", "args": {"answer": "This is a scripted answer."}}]},
+        # Prompt mode, after a SQL query or a filter command ran
+        {"match": r'Past (SQL|Filter) Commands and Results: "\[\{', "reply": "This is a scripted answer."},
+        # Prompt mode, first iteration
+        {"match": r'(?s)Table names: "\[\(\'(?P<table>[^\']+)\'.*Current Iteration', "reply": 'SQL Query: SELECT * FROM "\\g<table>" LIMIT 10;'},
+        {"match": r"(?s)Filter Command:.*Current Iteration", "reply": "Filter Command: *"},
+        # Tool calling mode, first turn
+        {"match": r'Table names: "\[\(\'(?P<table>[^\']+)\'', "tool_calls": [{"name": "run_sql", "args": {"query": 'SELECT * FROM "\\g<table>" LIMIT 10;'}}]},
+        {"match": r'(?ms)"retrieve" tool.*^human: (?P<question>[^\n]*)', "tool_calls": [{"name": "retrieve", "args": {"files": [], "query": "\\g<question>"}}]},
+    ],
+    "default": "This is a scripted answer."
+}
+
+class LatencyDistribution:
+    """
+    @brief Draws simulated response times from a seeded distribution.
+
+    The same seed yields the same sequence of latencies, so load tests are reproducible.
+
+    Attributes:
+    - distribution (str): "fixed", "uniform", "normal" or "lognormal".
+    - mean (float): The mean latency in seconds.
+    - stddev (float): The standard deviation of the latency in seconds, unused by "fixed".
+    """
+
+    def __init__(self, distribution: str = "fixed", mean: float = 0.0, stddev: float = 0.0, seed: int = 0) -> None:
+        """
+        @brief Initializes the distribution.
+
+        @param distribution (str): "fixed", "uniform", "normal" or "lognormal".
+        @param mean (float): The mean latency in seconds.
+        @param stddev (float): The standard deviation of the latency in seconds.
+        @param seed (int): The seed of the random number generator.
+
+        @exception ValueError If the distribution is unknown or its parameters are negative.
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        if mean < 0 or stddev < 0:
+            raise ValueError("The mean and standard deviation of the latency must not be negative.")
+        self.distribution = distribution
+        self.mean = mean
+        self.stddev = stddev
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()  # Synchronous calls sample from executor threads
+
+    def sample(self) -> float:
+        """
+        @brief Draws the next latency.
+
+        @return The latency in seconds, never negative.
+        """
+        if self.distribution == "fixed" or self.stddev == 0 or self.mean == 0:
+            return self.mean
+        with self.lock:
+            if self.distribution == "uniform":
+                # A uniform distribution of this mean and standard deviation spans mean ± sqrt(3) * stddev
+                half_width = min(math.sqrt(3) * self.stddev, self.mean)
+                return self.random.uniform(self.mean - half_width, self.mean + half_width)
+            if self.distribution == "normal":
+                return max(0.0, self.random.gauss(self.mean, self.stddev))
+            # The parameters of the underlying normal distribution giving this mean and standard deviation
+            sigma = math.sqrt(math.log(1 + (self.stddev / self.mean) ** 2))
+            return self.random.lognormvariate(math.log(self.mean) - sigma ** 2 / 2, sigma)
+
+def loadScript(script_path: str) -> dict:
+    """
+    @brief Loads the reply rules of the scripted chat model from a JSON file.
+
+    The file holds a "rules" list and a "default" reply. Every rule has a "match" regular
+    expression and a "reply" text and/or "tool_calls", a list of {"name", "args"} objects.
+    Groups of the match are substituted into the reply and the string arguments with \\g<name>.
+
+    @param script_path (str): The path of the JSON file, None for the built-in script.
+    @return The script.
+
+    @exception ValueError If a rule has no match or its pattern is invalid.
+    """
+    if script_path is None:
+        return DEFAULT_SCRIPT
+    with open(script_path, "r") as file:
+        script = json.load(file)
+    for rule in script.get("rules", []):
+        if "match" not in rule:
+            raise ValueError(f"A rule of {script_path} has no match pattern.")
+        re.compile(rule["match"])
+    return script
+
+def _expand(match: re.Match, value):
+    """
+    @brief Substitutes the groups of a match into a reply or the arguments of a tool call.
+
+    @param match (re.Match): The match of the rule.
+    @param value The reply, or an argument value possibly nesting lists and dictionaries.
+    @return The value with the groups substituted into its strings.
+    """
+    if isinstance(value, str):
+        return match.expand(value)
+    if isinstance(value, list):
+        return [_expand(match, item) for item in value]
+    if isinstance(value, dict):
+        return {key: _expand(match, item) for key, item in value.items()}
+    return value
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    @brief A local chat model replying by rules, with simulated latency, for load tests without API calls.
+
+    The conversation is rendered as one "<role>: <content>" line per message, and the first rule
+    whose pattern matches decides the reply, so the agents run their usual loops, SQL queries
+    and retrievals. Replies are deterministic; only their latency is drawn from a distribution.
+
+    Attributes:
+    - script (dict): The reply rules and the default reply.
+    - latency (LatencyDistribution): The distribution of the response times.
+    """
+    script: dict = DEFAULT_SCRIPT
+    latency: Any = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: list, **kwargs: Any):
+        """
+        @brief Binds tool schemas to the model, as ChatOpenAI does.
+
+        @param tools (list): The tool schemas.
+        @return The model with the tools bound.
+        """
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def reply(self, messages: list) -> AIMessage:
+        """
+        @brief Builds the scripted reply to a conversation.
+
+        @param messages (list): The messages of the conversation.
+        @return The reply, with its tool calls if the rule has any.
+        """
+        text = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        for rule in self.script.get("rules", []):
+            match = re.search(rule["match"], text)
+            if match is None:
+                continue
+            # Tool call ids only need to be unique within a conversation, which grows every turn
+            call_id = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+            tool_calls = [
+                {"name": call["name"], "args": _expand(match, call.get("args", {})), "id": f"call_{call_id}_{i}"}
+                for i, call in enumerate(rule.get("tool_calls", []))
+            ]
+            return AIMessage(content=_expand(match, rule.get("reply", "")), tool_calls=tool_calls)
+        return AIMessage(content=self.script.get("default", ""))
+
+    def _generate(self, messages: List, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency is not None:
+            time.sleep(self.latency.sample())
+        return ChatResult(generations=[ChatGeneration(message=self.reply(messages))])
+
+    async def _agenerate(self, messages: List, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample())
+        return ChatResult(generations=[ChatGeneration(message=self.reply(messages))])
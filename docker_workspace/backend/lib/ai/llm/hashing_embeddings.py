@@ -0,0 +1,58 @@
+from langchain_core.embeddings import Embeddings
+import hashlib, re
+import numpy as np
+
+DEFAULT_DIMENSIONS = 1024  # Used when no embedding dimensions are configured
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+class HashingEmbeddings(Embeddings):
+    """
+    @brief A local embedding model hashing the words of a text into a vector, for load tests without API calls.
+
+    Every word adds a signed count at a position given by a stable hash, and the vector is
+    normalized to unit length. The vectors are the same on every machine and run, and texts
+    sharing words are similar, so retrieval and deduplication behave sensibly.
+
+    Attributes:
+    - dimensions (int): The size of the vectors.
+    """
+
+    def __init__(self, dimensions: int = None) -> None:
+        """
+        @brief Initializes the embedding model.
+
+        @param dimensions (int): The size of the vectors, None for 1024.
+        """
+        self.dimensions = dimensions or DEFAULT_DIMENSIONS
+
+    def embedText(self, text: str) -> list:
+        """
+        @brief Embeds one text.
+
+        @param text (str): The text.
+        @return The unit length vector of the text.
+        """
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            # blake2b is stable across processes, unlike the salted built-in hash
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            # Texts without words get one shared unit vector, since zero vectors have no direction
+            vector[0] = 1.0
+            return vector.tolist()
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self.embedText(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self.embedText(text)
+
+    async def aembed_documents(self, texts: list) -> list:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list:
+        return self.embed_query(text)
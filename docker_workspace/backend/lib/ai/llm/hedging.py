@@ -0,0 +1,85 @@
+from collections import deque
+from typing import Awaitable, Callable
+from lib.tools.metrics import Counter
+import asyncio
+import numpy as np
+
+LLM_HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total", "Duplicate LLM requests sent because the first one was slow, by whether the duplicate answered first.",
+    ("outcome",)
+)
+
+class LatencyTracker:
+    """
+    @brief Keeps the latencies of the recent LLM calls to estimate their quantiles.
+
+    Attributes:
+    - latencies (deque): The latencies of the recent calls in seconds.
+    - min_samples (int): The number of calls needed before quantiles are estimated.
+    """
+
+    def __init__(self, window: int = 500, min_samples: int = 20) -> None:
+        """
+        @brief Initializes an empty tracker.
+
+        @param window (int): The number of recent calls kept.
+        @param min_samples (int): The number of calls needed before quantiles are estimated.
+        """
+        self.latencies = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, latency: float) -> None:
+        """
+        @brief Adds the latency of a call.
+
+        @param latency (float): The latency in seconds.
+        """
+        self.latencies.append(latency)
+
+    def quantile(self, q: float) -> float:
+        """
+        @brief Estimates a quantile of the recent latencies.
+
+        @param q (float): The quantile, between 0 and 1.
+        @return The quantile in seconds, or None if too few calls were recorded.
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        return float(np.quantile(self.latencies, q))
+
+async def hedgedCall(call: Callable[[], Awaitable], delay: float, duplicate: Callable[[], Awaitable] = None):
+    """
+    @brief Makes a call, and a duplicate of it if the first hasn't answered after a delay.
+
+    The first answer wins and the other call is cancelled. If one call fails the other may
+    still answer; if both fail, the error of the first is raised.
+
+    @param call Starts the call and returns its awaitable.
+    @param delay (float): The seconds after which the duplicate is sent.
+    @param duplicate Starts the duplicate and returns its awaitable; call is used if None.
+    @return The result of the call that answered first.
+    """
+    first = asyncio.ensure_future(call())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future((duplicate or call)())
+        tasks.append(second)
+        LLM_HEDGED_REQUESTS.inc("sent")
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    if task is second:
+                        LLM_HEDGED_REQUESTS.inc("won")
+                    return task.result()
+        return first.result()  # Both failed
+    finally:
+        # The slower call, or both if the caller was cancelled or timed out
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -1,5 +1,7 @@
 from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
+from lib.ai.llm.fake_llm import LatencyDistribution, ScriptedChatModel, loadScript
 import os
 import sys
 
@@ -7,28 +9,39 @@ class LLM:
     """
     @brief Manages the large language model (LLM) for generating responses.
 
-    This class initializes a chat-based LLM using the OpenAI API and
-    provides methods to invoke the model with a query and retrieve the
-    model instance.
+    This class initializes a chat-based LLM using the OpenAI API, or a local
+    scripted model for load tests, and provides methods to invoke the model
+    with a query and retrieve the model instance.
 
     Attributes:
-    - llm (ChatOpenAI): The instance of the chat-based LLM.
+    - llm (BaseChatModel): The instance of the chat-based LLM.
     """
     
-    def __init__(self, llm_model_name: str) -> None:
+    def __init__(self, llm_model_name: str, backend: str = "openai", script_path: str = None, latency_distribution: str = "fixed",
+                 latency_mean: float = 0.0, latency_stddev: float = 0.0, seed: int = 0) -> None:
         """
         @brief Initializes the LLM instance with the specified model.
 
         This method loads environment variables from a .env file and
-        creates an instance of the ChatOpenAI model.
+        creates an instance of the ChatOpenAI model, or of the scripted model.
 
         @param llm_model_name (str): The name of the LLM model to be used.
+        @param backend (str): "openai", or "fake" for the local scripted model making no API calls.
+        @param script_path (str): The JSON file of the scripted model's reply rules, None for the built-in script.
+        @param latency_distribution (str): The distribution of the scripted model's latency ("fixed", "uniform", "normal" or "lognormal").
+        @param latency_mean (float): The mean latency of the scripted model in seconds.
+        @param latency_stddev (float): The standard deviation of the scripted model's latency in seconds.
+        @param seed (int): The seed of the scripted model's latency.
         """
         load_dotenv()  # Load environment variables from .env file
 
         try:
-            # Initialize the ChatOpenAI model with specified parameters
-            self.llm = ChatOpenAI(temperature=0.0, model_name=llm_model_name, openai_api_key=os.getenv("OPENAI_API_KEY"))
+            if backend == "fake":
+                latency = LatencyDistribution(distribution=latency_distribution, mean=latency_mean, stddev=latency_stddev, seed=seed)
+                self.llm = ScriptedChatModel(script=loadScript(script_path), latency=latency)
+            else:
+                # Initialize the ChatOpenAI model with specified parameters
+                self.llm = ChatOpenAI(temperature=0.0, model_name=llm_model_name, openai_api_key=os.getenv("OPENAI_API_KEY"))
         except Exception as e:
             # Print the error and exit if initialization fails
             print(e)
@@ -45,11 +58,25 @@ class LLM:
         @return The generated response as a string.
         """
         return self.llm.invoke(query)  # Invoke the LLM with the query and return the response
+
+    async def ainvoke(self, messages: list, tools: list = None):
+        """
+        @brief Asynchronously invokes the LLM, optionally with native tool calling.
+
+        When tools are given they are bound to the model as typed function schemas,
+        so the returned message may carry several tool calls in a single turn.
+
+        @param messages (list): The chat messages (or a plain string) sent to the model.
+        @param tools (list): Optional tool schemas (Pydantic models) made available to the model.
+        @return The AIMessage produced by the model.
+        """
+        model = self.llm.bind_tools(tools) if tools else self.llm  # Bind the tool schemas if provided
+        return await model.ainvoke(messages)
     
-    def get_baseLLM(self) -> ChatOpenAI:
+    def get_baseLLM(self) -> BaseChatModel:
         """
         @brief Retrieves the base LLM instance.
 
-        @return The ChatOpenAI instance used for generating responses.
+        @return The ChatOpenAI or scripted model instance used for generating responses.
         """
         return self.llm  # Return the initialized LLM instance
\ No newline at end of file
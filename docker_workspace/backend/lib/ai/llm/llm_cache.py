@@ -0,0 +1,216 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+from langchain_core.prompt_values import PromptValue
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from redis.asyncio import Redis
+from lib.ai.llm.llm import LLM
+from lib.tools.metrics import Counter
+from lib.tools.tracing import getCurrentSpan
+import asyncio, hashlib, json, logging
+
+CACHE_KEY_PREFIX = "llm_cache:"
+
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total", "LLM calls by whether they were answered from the cache, joined an identical call in flight or sent to the model.",
+    ("outcome",)
+)
+
+def _toMessages(query) -> list:
+    """
+    @brief Converts the input of an LLM call to the list of messages sent to the model.
+
+    @param query A rendered prompt, a string or a list of messages.
+    @return The list of messages.
+    """
+    if isinstance(query, PromptValue):
+        return query.to_messages()
+    if isinstance(query, str):
+        return [HumanMessage(content=query)]
+    return list(query)
+
+def _renderMessage(message: BaseMessage) -> dict:
+    """
+    @brief Renders what the model receives of a message, without ids and metadata differing between identical prompts.
+
+    @param message (BaseMessage): The message.
+    @return The rendered message.
+    """
+    rendered = {"type": message.type, "content": message.content}
+    if getattr(message, "tool_calls", None):
+        rendered["tool_calls"] = [{"name": call["name"], "args": call["args"], "id": call.get("id")} for call in message.tool_calls]
+    if getattr(message, "tool_call_id", None):
+        rendered["tool_call_id"] = message.tool_call_id
+    return rendered
+
+class CachedLLM:
+    """
+    @brief Answers repeated LLM calls from a cache in Redis and coalesces identical calls in flight.
+
+    A call is keyed by the model and the fully rendered prompt, with its tools. A cached
+    reply is returned without calling the model. Identical calls arriving while the first
+    one waits for the model share its reply, so double submits and popular questions cost
+    one model call. A model call whose callers were all cancelled is cancelled too, so it
+    doesn't keep holding its scheduler slot. Redis errors don't fail calls; the model is
+    called instead.
+
+    Attributes:
+    - llm (LLM): The LLM the calls missing the cache are sent to.
+    - redis (Redis): The Redis client holding the cache.
+    - ttl (int): Seconds a reply is cached.
+    - in_flight (dict): The tasks of the calls waiting for the model, by cache key.
+    - waiters (dict): The number of callers awaiting each task in flight.
+    """
+
+    def __init__(self, llm: LLM, redis: Redis, ttl: int = 3600) -> None:
+        """
+        @brief Initializes the cache around an LLM.
+
+        @param llm (LLM): The LLM the calls missing the cache are sent to.
+        @param redis (Redis): The Redis client holding the cache.
+        @param ttl (int): Seconds a reply is cached.
+        """
+        self.llm = llm
+        self.redis = redis
+        self.ttl = ttl
+        self.in_flight = {}
+        self.waiters = {}
+
+    async def __call__(self, query) -> AIMessage:
+        """
+        @brief Invokes the LLM with a rendered prompt, as the agents' prompt chains do.
+
+        Being a coroutine, the chains run it on the event loop instead of in a thread.
+
+        @param query The rendered prompt.
+        @return The reply of the model.
+        """
+        return await self.ainvoke(query)
+
+    async def ainvoke(self, messages, tools: list = None) -> AIMessage:
+        """
+        @brief Asynchronously invokes the LLM, optionally with native tool calling, through the cache.
+
+        @param messages The chat messages (or a plain string) sent to the model.
+        @param tools (list): Optional tool schemas (Pydantic models) made available to the model.
+        @return The AIMessage produced by the model or taken from the cache.
+        """
+        messages = _toMessages(messages)
+        key = self.getCacheKey(messages, tools)
+
+        if key not in self.in_flight:
+            cached = await self.getCachedReply(key)
+            if cached is not None:
+                self.recordOutcome("hit")
+                return cached
+
+        # Looked up after reading the cache, since an identical call may have started meanwhile
+        task = self.in_flight.get(key)
+        if task is None:
+            self.recordOutcome("miss")
+            task = self.in_flight[key] = asyncio.create_task(self.callModel(key, messages, tools))
+            task.add_done_callback(lambda _: self.finishCall(key, task))
+        else:
+            self.recordOutcome("coalesced")
+
+        self.waiters[task] = self.waiters.get(task, 0) + 1
+        try:
+            # Shielded, so a cancelled caller doesn't cancel the call shared with the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.waiters[task] == 1:
+                # The last caller left, so nobody waits for the reply anymore
+                self.cancelCall(key, task)
+            raise
+        finally:
+            self.waiters[task] -= 1
+            if not self.waiters[task]:
+                del self.waiters[task]
+
+    def cancelCall(self, key: str, task: asyncio.Task) -> None:
+        """
+        @brief Cancels a model call nobody waits for anymore.
+
+        The call is removed from the calls in flight right away, so an identical call arriving
+        while the cancellation is processed starts a model call of its own instead of joining it.
+
+        @param key (str): The cache key of the call.
+        @param task (asyncio.Task): The task of the call.
+        """
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        task.cancel()
+
+    def recordOutcome(self, outcome: str) -> None:
+        """
+        @brief Counts how a call was answered and marks its span.
+
+        @param outcome (str): "hit", "miss" or "coalesced".
+        """
+        LLM_CACHE_REQUESTS.inc(outcome)
+        getCurrentSpan().setAttribute("llm.cache", outcome)
+
+    def finishCall(self, key: str, task: asyncio.Task) -> None:
+        """
+        @brief Removes a finished model call from the calls in flight.
+
+        @param key (str): The cache key of the call.
+        @param task (asyncio.Task): The task of the call.
+        """
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, so a failure whose callers were all cancelled isn't reported as unhandled
+
+    async def callModel(self, key: str, messages: list, tools: list = None) -> AIMessage:
+        """
+        @brief Calls the model and caches its reply.
+
+        @param key (str): The cache key of the call.
+        @param messages (list): The messages sent to the model.
+        @param tools (list): Optional tool schemas made available to the model.
+        @return The reply of the model.
+        """
+        reply = await self.llm.ainvoke(messages, tools=tools)
+        try:
+            await self.redis.set(key, json.dumps(message_to_dict(reply)), ex=self.ttl)
+        except Exception as e:
+            logging.warning(f"Failed to cache an LLM reply: {str(e)}")
+        return reply
+
+    async def getCachedReply(self, key: str) -> AIMessage:
+        """
+        @brief Reads a cached reply.
+
+        @param key (str): The cache key of the call.
+        @return The cached reply, None if it isn't cached or the cache can't be read.
+        """
+        try:
+            cached = await self.redis.get(key)
+            return messages_from_dict([json.loads(cached)])[0] if cached is not None else None
+        except Exception as e:
+            logging.warning(f"Failed to read the LLM cache: {str(e)}")
+            return None
+
+    def getCacheKey(self, messages: list, tools: list = None) -> str:
+        """
+        @brief Computes the cache key of a call from the model, the rendered messages and the tools.
+
+        @param messages (list): The messages sent to the model.
+        @param tools (list): Optional tool schemas made available to the model.
+        @return The Redis key of the call.
+        """
+        base_llm = self.llm.get_baseLLM()
+        call = {
+            "model": getattr(base_llm, "model_name", None) or type(base_llm).__name__,
+            "messages": [_renderMessage(message) for message in messages],
+            "tools": [convert_to_openai_tool(tool) for tool in tools or []],
+        }
+        digest = hashlib.sha256(json.dumps(call, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return CACHE_KEY_PREFIX + digest
+
+    def get_baseLLM(self):
+        """
+        @brief Retrieves the base LLM instance.
+
+        @return The chat model the calls missing the cache are sent to.
+        """
+        return self.llm.get_baseLLM()
@@ -0,0 +1,328 @@
+from contextvars import ContextVar
+from langchain_core.messages import AIMessage
+from langchain_core.prompt_values import PromptValue
+from lib.ai.llm.llm import LLM
+from lib.ai.llm.embedding_scheduler import countTokens
+from lib.ai.llm.hedging import LatencyTracker, hedgedCall
+from lib.tools.metrics import Counter, Gauge, Histogram
+from lib.tools.tracing import getCurrentSpan
+import asyncio, heapq, itertools, math, time
+
+# Priorities of the queued calls; lower values are served first
+CONTINUATION = 0  # A later iteration of a question the agent already works on
+NEW_QUESTION = 1  # The first iteration of a question
+PRIORITY_NAMES = {CONTINUATION: "continuation", NEW_QUESTION: "new_question"}
+
+EXPECTED_COMPLETION_TOKENS = 256  # Reserved for the reply until the call reports its usage
+TOOL_SCHEMA_TOKENS = 100  # Estimated prompt tokens of one tool schema
+
+# The iteration of the agent making the LLM calls of the current task
+LLM_ITERATION = ContextVar("llm_iteration", default=1)
+
+LLM_QUEUE_DEPTH = Gauge("llm_queue_depth", "LLM calls waiting for a concurrency slot or token budget, by priority.", ("priority",))
+LLM_QUEUE_WAIT = Histogram("llm_queue_wait_seconds", "Time LLM calls waited for a concurrency slot and token budget, by priority.", ("priority",))
+LLM_CALLS_IN_FLIGHT = Gauge("llm_calls_in_flight", "LLM calls sent to the model and not answered yet.")
+LLM_CALLS_SHED = Counter("llm_calls_shed_total", "New questions rejected because too many LLM calls were waiting.")
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by the LLM calls, as reported by the model or estimated.")
+
+class LLMOverloadedError(Exception):
+    """
+    @brief Raised when a new question is rejected because too many LLM calls are waiting.
+
+    @param message The error message.
+    @param retry_after The seconds after which the question may be asked again.
+    """
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _estimateTokens(messages, tools: list = None) -> int:
+    """
+    @brief Estimates the tokens of an LLM call before it is sent.
+
+    @param messages The rendered prompt, a string or a list of messages.
+    @param tools (list): Optional tool schemas made available to the model.
+    @return The estimated prompt tokens plus the tokens reserved for the reply.
+    """
+    if isinstance(messages, PromptValue):
+        text = messages.to_string()
+    elif isinstance(messages, str):
+        text = messages
+    else:
+        text = "\n".join(str(message.content) for message in messages)
+    return countTokens(text) + TOOL_SCHEMA_TOKENS * len(tools or []) + EXPECTED_COMPLETION_TOKENS
+
+class _Waiter:
+    """
+    @brief An LLM call waiting for a concurrency slot and token budget.
+
+    @param priority CONTINUATION or NEW_QUESTION.
+    @param tokens The estimated tokens of the call.
+    @param future Resolved once the call may be sent.
+    """
+    __slots__ = ("priority", "tokens", "future", "queued_at")
+
+    def __init__(self, priority: int, tokens: int, future: asyncio.Future) -> None:
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+class LLMScheduler:
+    """
+    @brief Limits the LLM calls of the process by concurrency and by tokens per minute.
+
+    A call is sent once fewer than `max_concurrency` calls are in flight and the token budget,
+    refilled continuously at `tokens_per_minute`, covers its estimated tokens; the estimate is
+    corrected by the usage the model reports. Waiting calls of questions the agents already
+    work on go before the first calls of new questions, so started questions finish instead of
+    all questions slowing down together. When `max_queue` calls are waiting, new questions are
+    rejected at once with LLMOverloadedError carrying the expected wait. With hedging, a call not
+    answered within the given quantile of the recent latencies is sent once more and the slower
+    of the two is cancelled; the duplicate waits for a slot and tokens of its own like any call.
+
+    Attributes:
+    - llm (LLM): The LLM the calls are sent to.
+    - max_concurrency (int): The maximum number of calls in flight.
+    - tokens_per_minute (int): The token budget per minute, 0 for no budget.
+    - max_queue (int): The number of waiting calls from which new questions are rejected.
+    - in_flight (int): The number of calls in flight.
+    - tokens (float): The remaining token budget; negative after calls used more than estimated.
+    - waiters (list): The heap of the waiting calls by priority and arrival.
+    - average_duration (float): The moving average of the call durations in seconds.
+    - hedging (bool): Whether slow calls are duplicated.
+    - hedge_quantile (float): The latency quantile after which a call is duplicated.
+    - latencies (LatencyTracker): The latencies of the recent calls.
+    """
+
+    def __init__(self, llm: LLM, max_concurrency: int = 16, tokens_per_minute: int = 0, max_queue: int = 64, hedging: bool = False, hedge_quantile: float = 0.95) -> None:
+        """
+        @brief Initializes the scheduler around an LLM.
+
+        @param llm (LLM): The LLM the calls are sent to.
+        @param max_concurrency (int): The maximum number of calls in flight.
+        @param tokens_per_minute (int): The token budget per minute, 0 for no budget.
+        @param max_queue (int): The number of waiting calls from which new questions are rejected.
+        @param hedging (bool): Whether calls slower than the hedge quantile are duplicated.
+        @param hedge_quantile (float): The latency quantile after which a call is duplicated.
+        """
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+
+        self.in_flight = 0
+        self.tokens = float(tokens_per_minute)
+        self.waiters = []
+        self.average_duration = 1.0
+        self._sequence = itertools.count()
+        self._refilled_at = time.monotonic()
+        self._wakeup_handle = None
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.latencies = LatencyTracker()
+
+    async def __call__(self, query) -> AIMessage:
+        """
+        @brief Invokes the LLM with a rendered prompt, as the agents' prompt chains do.
+
+        @param query The rendered prompt.
+        @return The reply of the model.
+        """
+        return await self.ainvoke(query)
+
+    async def ainvoke(self, messages, tools: list = None) -> AIMessage:
+        """
+        @brief Asynchronously invokes the LLM, optionally with native tool calling, once the limits allow.
+
+        @param messages The chat messages (or a plain string) sent to the model.
+        @param tools (list): Optional tool schemas (Pydantic models) made available to the model.
+        @return The AIMessage produced by the model.
+
+        @exception LLMOverloadedError If the call starts a new question while too many calls are waiting.
+        """
+        priority = CONTINUATION if LLM_ITERATION.get() > 1 else NEW_QUESTION
+        tokens = _estimateTokens(messages, tools)
+        await self.acquire(priority, tokens)
+        call = self.startCall(tokens, messages, tools)
+
+        # No duplicates until enough calls were timed to know what is slow
+        hedge_delay = self.latencies.quantile(self.hedge_quantile) if self.hedging else None
+        if hedge_delay is None:
+            return await call
+        return await hedgedCall(lambda: call, hedge_delay, duplicate=lambda: self.sendDuplicate(priority, tokens, messages, tools))
+
+    def startCall(self, tokens: int, messages, tools: list = None) -> asyncio.Task:
+        """
+        @brief Sends a call holding a concurrency slot to the model.
+
+        The slot is freed once the call answered, failed or was cancelled, even if it was
+        cancelled before it started.
+
+        @param tokens (int): The estimated tokens of the call.
+        @param messages The chat messages (or a plain string) sent to the model.
+        @param tools (list): Optional tool schemas made available to the model.
+        @return The task of the call.
+        """
+        start = time.perf_counter()
+        task = asyncio.ensure_future(self.llm.ainvoke(messages, tools=tools))
+        task.add_done_callback(lambda _: self.finishCall(task, tokens, time.perf_counter() - start))
+        return task
+
+    def finishCall(self, task: asyncio.Task, tokens: int, duration: float) -> None:
+        """
+        @brief Frees the slot of a finished call, correcting its tokens by the usage the model reported.
+
+        @param task (asyncio.Task): The task of the call.
+        @param tokens (int): The estimated tokens of the call.
+        @param duration (float): The seconds the call took.
+        """
+        reply = task.result() if not task.cancelled() and task.exception() is None else None
+        if reply is not None:
+            self.latencies.record(duration)
+        usage = getattr(reply, "usage_metadata", None) or {}
+        self.release(tokens, usage.get("total_tokens", tokens), duration if reply is not None else None)
+
+    async def sendDuplicate(self, priority: int, tokens: int, messages, tools: list = None) -> AIMessage:
+        """
+        @brief Sends the duplicate of a slow call once the limits allow it.
+
+        @param priority (int): The priority of the duplicated call.
+        @param tokens (int): The estimated tokens of the call.
+        @param messages The chat messages (or a plain string) sent to the model.
+        @param tools (list): Optional tool schemas made available to the model.
+        @return The AIMessage produced by the model.
+        """
+        await self.acquire(priority, tokens)
+        return await self.startCall(tokens, messages, tools)
+
+    async def acquire(self, priority: int, tokens: int) -> None:
+        """
+        @brief Waits until a call may be sent, taking a concurrency slot and its tokens.
+
+        @param priority (int): CONTINUATION or NEW_QUESTION.
+        @param tokens (int): The estimated tokens of the call.
+
+        @exception LLMOverloadedError If the call starts a new question while too many calls are waiting.
+        """
+        if priority == NEW_QUESTION and len(self.waiters) >= self.max_queue:
+            LLM_CALLS_SHED.inc()
+            retry_after = self.getRetryAfter()
+            raise LLMOverloadedError(f"The service is overloaded. Please try again in {retry_after} seconds.", retry_after)
+
+        waiter = _Waiter(priority, tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self.waiters, (priority, next(self._sequence), waiter))
+        LLM_QUEUE_DEPTH.inc(PRIORITY_NAMES[priority])
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(tokens, 0)  # Granted just before the caller was cancelled
+            else:
+                self._removeWaiter(waiter)
+            raise
+
+        wait = time.perf_counter() - waiter.queued_at
+        LLM_QUEUE_WAIT.observe(wait, PRIORITY_NAMES[priority])
+        getCurrentSpan().setAttribute("llm.queue_wait", wait)
+
+    def release(self, tokens: int, used_tokens: int, duration: float = None) -> None:
+        """
+        @brief Frees the concurrency slot of a finished call and corrects its token estimate.
+
+        @param tokens (int): The estimated tokens of the call.
+        @param used_tokens (int): The tokens the call used, as reported by the model or estimated.
+        @param duration (float): The duration of the answered call in seconds, None if it failed.
+        """
+        self.in_flight -= 1
+        LLM_CALLS_IN_FLIGHT.dec()
+
+        LLM_TOKENS.inc(amount=used_tokens)
+        if self.tokens_per_minute:
+            self.tokens -= used_tokens - tokens
+        if duration is not None:
+            self.average_duration = 0.9 * self.average_duration + 0.1 * duration
+        self._dispatch()
+
+    def _removeWaiter(self, waiter: _Waiter) -> None:
+        """
+        @brief Removes the call of a cancelled caller from the queue.
+
+        Callers cancelled by their deadline would otherwise count towards the queue limit and the
+        queue depth until they reached the front of the queue.
+
+        @param waiter (_Waiter): The waiter of the cancelled call.
+        """
+        self.waiters = [queued for queued in self.waiters if queued[2] is not waiter]
+        heapq.heapify(self.waiters)
+        LLM_QUEUE_DEPTH.dec(PRIORITY_NAMES[waiter.priority])
+
+    def getRetryAfter(self) -> int:
+        """
+        @brief Estimates when the waiting calls will have been sent.
+
+        @return The expected wait in whole seconds, at least 1.
+        """
+        wait = (len(self.waiters) / self.max_concurrency + 1) * self.average_duration
+        if self.tokens_per_minute:
+            waiting_tokens = sum(waiter.tokens for _, _, waiter in self.waiters)
+            wait = max(wait, (waiting_tokens - self.tokens) * 60 / self.tokens_per_minute)
+        return max(1, math.ceil(wait))
+
+    def _refill(self) -> None:
+        """
+        @brief Adds the tokens earned since the last refill to the budget, up to one minute's worth.
+        """
+        now = time.monotonic()
+        self.tokens = min(float(self.tokens_per_minute), self.tokens + (now - self._refilled_at) * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _dispatch(self) -> None:
+        """
+        @brief Lets waiting calls go, in priority order, while there are free slots and tokens.
+        """
+        if self.tokens_per_minute:
+            self._refill()
+
+        while self.waiters and self.in_flight < self.max_concurrency:
+            _, _, waiter = self.waiters[0]
+            # A call larger than the whole budget goes once the budget is full
+            needed = min(waiter.tokens, self.tokens_per_minute)
+            if self.tokens_per_minute and self.tokens < needed:
+                self._scheduleWakeup((needed - self.tokens) * 60 / self.tokens_per_minute)
+                return
+
+            heapq.heappop(self.waiters)
+            LLM_QUEUE_DEPTH.dec(PRIORITY_NAMES[waiter.priority])
+            self.in_flight += 1
+            LLM_CALLS_IN_FLIGHT.inc()
+            if self.tokens_per_minute:
+                self.tokens -= waiter.tokens
+            waiter.future.set_result(None)
+
+    def _scheduleWakeup(self, delay: float) -> None:
+        """
+        @brief Dispatches again once the token budget has been refilled enough.
+
+        @param delay (float): The seconds until the next waiting call is covered.
+        """
+        if self._wakeup_handle is None:
+            self._wakeup_handle = asyncio.get_running_loop().call_later(delay, self._wakeup)
+
+    def _wakeup(self) -> None:
+        """
+        @brief Continues dispatching after waiting for the token budget.
+        """
+        self._wakeup_handle = None
+        self._dispatch()
+
+    def get_baseLLM(self):
+        """
+        @brief Retrieves the base LLM instance.
+
+        @return The chat model the calls are sent to.
+        """
+        return self.llm.get_baseLLM()
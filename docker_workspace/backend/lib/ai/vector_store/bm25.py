@@ -0,0 +1,142 @@
+import re, json, math, bisect
+from collections import Counter
+
+# Words, numbers and compound identifiers such as part numbers (ab-1234), versions (1.2.3) or codes (0x80070005)
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+COMPOUND_SEPARATOR_PATTERN = re.compile(r"[-./:]")
+
+def tokenize(text: str) -> list:
+    """
+    @brief Splits a text into lowercase search tokens.
+
+    Compound identifiers are kept as one token so exact part numbers and error codes
+    match, and their parts are added as extra tokens so partial matches still score.
+
+    @param text (str): The text to tokenize.
+    @return The list of tokens.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = COMPOUND_SEPARATOR_PATTERN.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+def createIdFilter(id_ranges: list):
+    """
+    @brief Creates a check of whether a document id lies in one of the given ranges.
+
+    The ranges are sorted once, so every check is a binary search instead of a scan of all ranges.
+
+    @param id_ranges (list): (start, end) document id ranges with exclusive ends, not overlapping.
+    @return A function taking a document id and returning True if it is in a range.
+    """
+    sorted_ranges = sorted(id_ranges)
+    starts = [start for start, _ in sorted_ranges]
+    ends = [end for _, end in sorted_ranges]
+
+    def contains(doc_id: int) -> bool:
+        position = bisect.bisect_right(starts, doc_id) - 1
+        return position >= 0 and doc_id < ends[position]
+
+    return contains
+
+class BM25Index:
+    """
+    @brief A sparse BM25 inverted index over the chunks of one segment.
+
+    Document ids are the positions of the chunks in the segment's FAISS index, so sparse
+    and dense results refer to the same chunks. The index is persisted as JSON next to
+    the FAISS files.
+
+    Attributes:
+    - postings (dict): Maps each term to a list of [document id, term frequency] pairs.
+    - doc_lengths (list): The number of tokens of each document.
+    - k1 (float): The term frequency saturation parameter.
+    - b (float): The document length normalization parameter.
+    """
+
+    def __init__(self, postings: dict, doc_lengths: list, k1: float = 1.5, b: float = 0.75) -> None:
+        """
+        @brief Initializes the BM25Index from its postings and document lengths.
+
+        @param postings (dict): Maps each term to a list of [document id, term frequency] pairs.
+        @param doc_lengths (list): The number of tokens of each document.
+        @param k1 (float): The term frequency saturation parameter.
+        @param b (float): The document length normalization parameter.
+        """
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, texts: list) -> "BM25Index":
+        """
+        @brief Builds an index from the texts of a segment's chunks.
+
+        @param texts (list): The chunk texts, in the order of the FAISS index.
+        @return The built BM25Index.
+        """
+        postings = {}
+        doc_lengths = []
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append([doc_id, frequency])
+
+        return cls(postings=postings, doc_lengths=doc_lengths)
+
+    def search(self, query: str, k: int, id_ranges: list = None) -> list:
+        """
+        @brief Scores the documents containing any query term.
+
+        @param query (str): The search query.
+        @param k (int): The number of documents to return.
+        @param id_ranges (list): (start, end) document id ranges to search in. None searches all documents.
+        @return A list of (document id, score) tuples ordered by descending score.
+        """
+        doc_count = len(self.doc_lengths)
+        if doc_count == 0:
+            return []
+
+        in_ranges = createIdFilter(id_ranges) if id_ranges is not None else None
+        scores = {}
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+
+            idf = math.log(1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for doc_id, frequency in term_postings:
+                if in_ranges is not None and not in_ranges(doc_id):
+                    continue
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_doc_length or 1)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: str) -> None:
+        """
+        @brief Writes the index to a JSON file.
+
+        @param path (str): The path of the JSON file.
+        """
+        with open(path, "w") as index_file:
+            json.dump({"k1": self.k1, "b": self.b, "doc_lengths": self.doc_lengths, "postings": self.postings}, index_file)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        @brief Reads an index from a JSON file.
+
+        @param path (str): The path of the JSON file.
+        @return The loaded BM25Index.
+        """
+        with open(path, "r") as index_file:
+            data = json.load(index_file)
+        return cls(postings=data["postings"], doc_lengths=data["doc_lengths"], k1=data["k1"], b=data["b"])
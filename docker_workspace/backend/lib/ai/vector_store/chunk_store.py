@@ -0,0 +1,127 @@
+from langchain_core.documents import Document
+import numpy as np
+import os, json, mmap
+
+TEXT_FILE_NAME = "chunks_text.bin"
+OFFSETS_FILE_NAME = "chunks_offsets.npy"
+METADATA_CODES_FILE_NAME = "chunks_metadata_codes.npy"
+METADATA_VALUES_FILE_NAME = "chunks_metadata_values.json"
+
+def writeChunks(segment_dir: str, documents: list) -> None:
+    """
+    @brief Writes chunk records in a columnar layout.
+
+    The texts are concatenated into one UTF-8 file indexed by an offsets array. Metadata
+    is stored as a table with one column per metadata key: every column is dictionary
+    encoded, so the table holds small integer codes (-1 for a missing key) and the distinct
+    values of each column, such as file names or page numbers, are stored only once.
+
+    @param segment_dir (str): The directory to write the records to.
+    @param documents (list): The chunks in vector id order.
+    """
+    offsets = [0]
+    with open(os.path.join(segment_dir, TEXT_FILE_NAME), "wb") as text_file:
+        for doc in documents:
+            text = doc.page_content.encode("utf-8")
+            text_file.write(text)
+            offsets.append(offsets[-1] + len(text))
+    np.save(os.path.join(segment_dir, OFFSETS_FILE_NAME), np.asarray(offsets, dtype=np.int64))
+
+    columns = list(dict.fromkeys(key for doc in documents for key in doc.metadata))
+    column_values = {column: [] for column in columns}
+    value_codes = {column: {} for column in columns}  # Serialized value to code, per column
+
+    codes = np.full((len(documents), len(columns)), -1, dtype=np.int32)
+    for doc_id, doc in enumerate(documents):
+        for column_id, column in enumerate(columns):
+            if column not in doc.metadata:
+                continue
+            value = doc.metadata[column]
+            serialized = json.dumps(value, sort_keys=True)
+            code = value_codes[column].get(serialized)
+            if code is None:
+                code = value_codes[column][serialized] = len(column_values[column])
+                column_values[column].append(value)
+            codes[doc_id, column_id] = code
+
+    np.save(os.path.join(segment_dir, METADATA_CODES_FILE_NAME), codes)
+    with open(os.path.join(segment_dir, METADATA_VALUES_FILE_NAME), "w") as values_file:
+        json.dump({"columns": columns, "values": column_values}, values_file)
+
+class ChunkStore:
+    """
+    @brief Read-only, memory-mapped access to the chunk records of a segment by vector id.
+
+    The texts, their offsets and the metadata code table are mapped instead of read, so
+    opening a store costs the same regardless of its size, a lookup only touches the pages
+    of the requested records, and worker processes serving the same session share the
+    page cache. Only the distinct metadata values are held in memory.
+
+    Attributes:
+    - offsets (np.ndarray): The byte offset of every text, followed by the total text size.
+    - metadata_codes (np.ndarray): The metadata value code of every record and column, -1 if missing.
+    - columns (list): The metadata keys, in column order.
+    - column_values (dict): The distinct values of every metadata column.
+    """
+
+    def __init__(self, segment_dir: str) -> None:
+        """
+        @brief Opens the chunk records of a segment.
+
+        @param segment_dir (str): The directory holding the records.
+        """
+        self.offsets = np.load(os.path.join(segment_dir, OFFSETS_FILE_NAME), mmap_mode="r")
+        self.metadata_codes = np.load(os.path.join(segment_dir, METADATA_CODES_FILE_NAME), mmap_mode="r")
+
+        with open(os.path.join(segment_dir, METADATA_VALUES_FILE_NAME), "r") as values_file:
+            metadata_values = json.load(values_file)
+        self.columns = metadata_values["columns"]
+        self.column_values = metadata_values["values"]
+
+        with open(os.path.join(segment_dir, TEXT_FILE_NAME), "rb") as text_file:
+            # Empty files can't be mapped
+            self._text = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] > 0 else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        """
+        @brief Reads one record by vector id, or a list of records by slice.
+
+        @param key (int | slice): The vector id or the range of vector ids.
+        @return The Document, or the list of Documents.
+        """
+        if isinstance(key, slice):
+            return [self[doc_id] for doc_id in range(*key.indices(len(self)))]
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("chunk id out of range")
+
+        return Document(page_content=self.getText(key), metadata=self.getMetadata(key))
+
+    def __iter__(self):
+        return (self[doc_id] for doc_id in range(len(self)))
+
+    def getText(self, doc_id: int) -> str:
+        """
+        @brief Reads the text of one record.
+
+        @param doc_id (int): The vector id of the record.
+        @return The chunk text.
+        """
+        return self._text[int(self.offsets[doc_id]):int(self.offsets[doc_id + 1])].decode("utf-8")
+
+    def getMetadata(self, doc_id: int) -> dict:
+        """
+        @brief Decodes the metadata of one record.
+
+        @param doc_id (int): The vector id of the record.
+        @return The chunk metadata.
+        """
+        return {
+            column: self.column_values[column][code]
+            for column, code in zip(self.columns, self.metadata_codes[doc_id].tolist()) if code != -1
+        }
@@ -0,0 +1,256 @@
+from langchain_core.embeddings import Embeddings
+from lib.ai.vector_store.segment import Segment
+import os, json, hashlib, asyncio, uuid, shutil, time
+
+SEGMENT_DIR_NAME = "segment"
+DOCUMENT_FILE_NAME = "document.pdf"
+INFO_FILE_NAME = "info.json"
+MANIFEST_FILE_NAME = "manifest.json"
+# Seconds an unreferenced document is kept after its last use, so an upload that resolved it
+# but hasn't referenced it from its session yet doesn't lose it
+UNREFERENCED_GRACE_PERIOD = 3600
+# Session specific metadata that isn't stored with shared chunks
+SESSION_METADATA_KEYS = ("filename", "source")
+
+# Running ingestions keyed by document key, so concurrent uploads of a document embed it only once
+_ingestions = {}
+
+class DocumentCorpus:
+    """
+    @brief Content-addressed store of ingested documents shared by all sessions.
+
+    Every document is stored once under a key derived from its content and from the settings
+    it was ingested with (embedding model, dimensions, index type and chunking), together with
+    its parsed chunks and their vectors as an immutable segment. Sessions reference the stored
+    segment instead of ingesting their own copy, so uploading a document that was ingested
+    before is a metadata operation. The manifests of the sessions are the references to the
+    stored documents: deleting a session drops its references, and removeUnreferencedDocuments
+    removes the documents no session references anymore.
+
+    Attributes:
+    - corpus_dir (str): The root directory of the corpus.
+    - embeddings (Embeddings): The embedding model used to ingest documents.
+    - index_factory (str): The FAISS index factory string of the stored segments.
+    - settings_key (str): The serialized ingestion settings that are part of every document key.
+    """
+
+    def __init__(self, corpus_dir: str, embeddings: Embeddings, index_factory: str, ingest_settings: dict) -> None:
+        """
+        @brief Initializes the DocumentCorpus.
+
+        @param corpus_dir (str): The root directory of the corpus.
+        @param embeddings (Embeddings): The embedding model used to ingest documents.
+        @param index_factory (str): The FAISS index factory string of the stored segments.
+        @param ingest_settings (dict): Every setting that changes the ingested chunks or vectors.
+        """
+        self.corpus_dir = corpus_dir
+        self.embeddings = embeddings
+        self.index_factory = index_factory
+        self.settings_key = json.dumps({**ingest_settings, "index_factory": index_factory}, sort_keys=True)
+
+    def getDocumentKey(self, content_hash: str) -> str:
+        """
+        @brief Computes the key of a document from its content hash and the ingestion settings.
+
+        @param content_hash (str): The SHA-256 hex digest of the uploaded file.
+        @return The hex digest identifying the ingested document.
+        """
+        digest = hashlib.sha256(content_hash.encode("utf-8"))
+        digest.update(self.settings_key.encode("utf-8"))
+        return digest.hexdigest()
+
+    def getSegmentDir(self, document_key: str) -> str:
+        """
+        @brief Retrieves the segment directory of a stored document.
+
+        @param document_key (str): The key of the document.
+        @return The path of the document's segment.
+        """
+        return os.path.join(self.corpus_dir, document_key, SEGMENT_DIR_NAME)
+
+    def getEntry(self, document_key: str) -> dict:
+        """
+        @brief Reads the statistics of a stored document.
+
+        @param document_key (str): The key of the document.
+        @return The "chunks", "pages" and "bytes" of the document, or None if it wasn't ingested yet.
+        """
+        try:
+            with open(os.path.join(self.corpus_dir, document_key, INFO_FILE_NAME), "r") as info_file:
+                return json.load(info_file)
+        except FileNotFoundError:
+            return None
+
+    async def getOrIngest(self, file_path: str, content_hash: str, loader) -> tuple:
+        """
+        @brief Returns a stored document, ingesting it first if needed.
+
+        Concurrent calls for the same document in this process share one ingestion. The uploaded
+        file is hashed by the caller while it streams it, so the file is never held in memory.
+
+        @param file_path (str): The path of the uploaded file.
+        @param content_hash (str): The SHA-256 hex digest of the uploaded file.
+        @param loader (Callable): Async function taking the stored file path and returning (split documents, page count).
+        @return A (document key, entry) tuple, where entry holds the document's "chunks", "pages" and "bytes".
+        """
+        document_key = self.getDocumentKey(content_hash)
+        entry = self.getEntry(document_key)
+        if entry is not None:
+            try:
+                # Mark the document as used so it isn't removed before the session references it
+                os.utime(os.path.join(self.corpus_dir, document_key, INFO_FILE_NAME))
+                return document_key, entry
+            except FileNotFoundError:
+                pass  # Removed meanwhile, so it is ingested again
+
+        ingestion = _ingestions.get(document_key)
+        if ingestion is None:
+            ingestion = asyncio.ensure_future(self.ingest(document_key, file_path, loader))
+            _ingestions[document_key] = ingestion
+            ingestion.add_done_callback(lambda _: _ingestions.pop(document_key, None))
+
+        return document_key, await asyncio.shield(ingestion)
+
+    async def ingest(self, document_key: str, file_path: str, loader) -> dict:
+        """
+        @brief Parses, embeds and stores a document.
+
+        The segment is written before the statistics file, and the statistics file is what
+        marks an entry as complete, so a crash leaves no entry that looks usable. If another
+        process stored the same document meanwhile, its segment is kept.
+
+        @param document_key (str): The key of the document.
+        @param file_path (str): The path of the uploaded file.
+        @param loader (Callable): Async function taking the stored file path and returning (split documents, page count).
+        @return The "chunks", "pages" and "bytes" of the document.
+        """
+        entry_dir = os.path.join(self.corpus_dir, document_key)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        document_path = os.path.join(entry_dir, DOCUMENT_FILE_NAME)
+        await asyncio.to_thread(_copyAtomically, file_path, document_path)
+
+        documents, page_count = await loader(document_path)
+        for doc in documents:
+            # Chunks are shared, so they don't keep the name or path of the upload that created them
+            doc.metadata = {key: value for key, value in doc.metadata.items() if key not in SESSION_METADATA_KEYS}
+
+        segment = await Segment.afromDocuments(documents, self.embeddings, self.index_factory)
+        segment_dir = self.getSegmentDir(document_key)
+        if not os.path.isdir(segment_dir):
+            try:
+                await asyncio.to_thread(segment.save, segment_dir)
+            except OSError:
+                if not os.path.isdir(segment_dir):
+                    raise  # Not a concurrent writer that finished first
+
+        entry = {"chunks": len(documents), "pages": page_count, "bytes": os.path.getsize(document_path)}
+        await asyncio.to_thread(_writeAtomically, os.path.join(entry_dir, INFO_FILE_NAME), json.dumps(entry).encode("utf-8"))
+        return entry
+
+async def removeUnreferencedDocuments(corpus_dir: str, vector_stores_dir: str) -> list:
+    """
+    @brief Removes the stored documents that no session references.
+
+    The manifests of all sessions are read first and a document is only removed if none of them
+    references it and it wasn't used for UNREFERENCED_GRACE_PERIOD seconds, so a document that
+    an upload resolved but didn't reference yet, or that is still being ingested, is kept. The
+    statistics file is removed first, so readers never see a partially removed document as
+    complete.
+
+    @param corpus_dir (str): The root directory of the corpus.
+    @param vector_stores_dir (str): The directory holding the vector stores of the sessions.
+    @return The keys of the removed documents.
+    """
+    referenced_dirs = await asyncio.to_thread(_findReferencedSegmentDirs, vector_stores_dir)
+    try:
+        document_keys = await asyncio.to_thread(os.listdir, corpus_dir)
+    except FileNotFoundError:
+        return []
+
+    removed = []
+    for document_key in document_keys:
+        entry_dir = os.path.join(corpus_dir, document_key)
+        if document_key in _ingestions or os.path.abspath(os.path.join(entry_dir, SEGMENT_DIR_NAME)) in referenced_dirs:
+            continue
+        if time.time() - await asyncio.to_thread(_getLastUse, entry_dir) < UNREFERENCED_GRACE_PERIOD:
+            continue
+
+        try:
+            await asyncio.to_thread(os.remove, os.path.join(entry_dir, INFO_FILE_NAME))
+        except FileNotFoundError:
+            pass  # An ingestion that never completed
+        await asyncio.to_thread(shutil.rmtree, entry_dir, ignore_errors=True)
+        removed.append(document_key)
+    return removed
+
+def _findReferencedSegmentDirs(vector_stores_dir: str) -> set:
+    """
+    @brief Collects the corpus segments referenced by the manifests of all sessions.
+
+    A manifest that can't be read raises instead of being skipped, so its documents are never
+    taken for unreferenced ones.
+
+    @param vector_stores_dir (str): The directory holding the vector stores of the sessions.
+    @return The absolute paths of the referenced segment directories.
+    """
+    try:
+        session_dirs = os.listdir(vector_stores_dir)
+    except FileNotFoundError:
+        return set()
+
+    referenced_dirs = set()
+    for session_dir in session_dirs:
+        try:
+            with open(os.path.join(vector_stores_dir, session_dir, MANIFEST_FILE_NAME), "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (FileNotFoundError, NotADirectoryError):
+            continue  # Not a session's vector store, or a session deleted meanwhile
+        referenced_dirs.update(os.path.abspath(segment["path"]) for segment in manifest["segments"].values())
+    return referenced_dirs
+
+def _getLastUse(entry_dir: str) -> float:
+    """
+    @brief Retrieves when a stored document was last ingested or resolved.
+
+    @param entry_dir (str): The directory of the document.
+    @return The time of the last use, or the time the directory last changed if the document is incomplete.
+    """
+    try:
+        return os.path.getmtime(os.path.join(entry_dir, INFO_FILE_NAME))
+    except FileNotFoundError:
+        try:
+            return os.path.getmtime(entry_dir)
+        except FileNotFoundError:
+            return time.time()  # Removed meanwhile
+
+def _copyAtomically(source_path: str, path: str) -> None:
+    """
+    @brief Copies a file through a temporary file so readers never see partial content.
+
+    @param source_path (str): The path of the file to copy.
+    @param path (str): The path of the copy.
+    """
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _writeAtomically(path: str, content: bytes) -> None:
+    """
+    @brief Writes a file through a temporary file so readers never see partial content.
+
+    @param path (str): The path of the file.
+    @param content (bytes): The content to write.
+    """
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,163 @@
+from langchain_core.documents import Document
+import numpy as np
+import re, zlib, hashlib
+
+SHINGLE_SIZE = 5  # Words per shingle
+MINHASH_PRIME = (1 << 31) - 1  # Keeps the hash products of 32-bit shingle hashes within 64 bits
+
+def normalizeText(text: str) -> str:
+    """
+    @brief Normalizes a chunk for duplicate detection.
+
+    Case, punctuation and whitespace are dropped, so chunks differing only in layout compare equal.
+
+    @param text (str): The chunk text.
+    @return The lowercased words of the text separated by single spaces.
+    """
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+def getShingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """
+    @brief Splits a chunk into overlapping word sequences.
+
+    @param text (str): The chunk text.
+    @param size (int): The number of words per shingle.
+    @return The set of shingles of the normalized text; texts shorter than one shingle form a single shingle.
+    """
+    words = normalizeText(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class ChunkDeduplicator:
+    """
+    @brief Drops exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are found by the hash of the normalized text. Near duplicates, such as
+    repeated headers, footers or legal text with a different page number, are found with
+    MinHash signatures of the chunks' word shingles: locality sensitive hashing over bands of
+    the signatures yields the candidates, and a chunk is dropped when its estimated Jaccard
+    similarity to an earlier kept chunk reaches the threshold. The first occurrence is kept.
+
+    Attributes:
+    - threshold (float): The estimated Jaccard similarity from which chunks count as duplicates, 1 for exact duplicates only.
+    - bands (int): The number of LSH bands the signatures are split into.
+    - permutations (tuple): The (a, b) coefficients of the MinHash hash functions.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16) -> None:
+        """
+        @brief Initializes the ChunkDeduplicator.
+
+        @param threshold (float): The estimated Jaccard similarity from which chunks count as duplicates.
+        @param num_perm (int): The number of MinHash hash functions; must be a multiple of bands.
+        @param bands (int): The number of LSH bands.
+        """
+        self.threshold = threshold
+        self.bands = bands
+
+        # A fixed seed keeps signatures comparable between runs
+        rng = np.random.default_rng(0)
+        self.permutations = (
+            rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.uint64),
+            rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+        )
+
+    def getSignature(self, text: str) -> np.ndarray:
+        """
+        @brief Computes the MinHash signature of a chunk.
+
+        @param text (str): The chunk text.
+        @return The minimum hash of the chunk's shingles under every hash function.
+        """
+        shingles = getShingles(text)
+        a, b = self.permutations
+        if not shingles:
+            return np.full(len(a), MINHASH_PRIME, dtype=np.uint64)
+
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        return ((a[:, np.newaxis] * hashes[np.newaxis, :] + b[:, np.newaxis]) % MINHASH_PRIME).min(axis=1)
+
+    def deduplicate(self, documents: list) -> list:
+        """
+        @brief Removes duplicate chunks.
+
+        @param documents (list): The chunks in document order.
+        @return The chunks without duplicates, in their original order.
+        """
+        seen_digests = set()
+        buckets = {}  # (band, band signature) to the ids of kept signatures
+        signatures = []
+        kept = []
+
+        for doc in documents:
+            digest = hashlib.sha1(normalizeText(doc.page_content).encode("utf-8")).digest()
+            if digest in seen_digests:
+                continue
+
+            if self.threshold < 1:
+                signature = self.getSignature(doc.page_content)
+                band_keys = [(band, rows.tobytes()) for band, rows in enumerate(np.split(signature, self.bands))]
+                candidates = {signature_id for key in band_keys for signature_id in buckets.get(key, ())}
+                if any(np.mean(signatures[signature_id] == signature) >= self.threshold for signature_id in candidates):
+                    continue
+
+                for key in band_keys:
+                    buckets.setdefault(key, []).append(len(signatures))
+                signatures.append(signature)
+
+            seen_digests.add(digest)
+            kept.append(doc)
+
+        return kept
+
+def removeOverlappingResults(documents: list, containment_threshold: float = 0.8, min_overlap: int = 50) -> list:
+    """
+    @brief Removes redundant text from ranked retrieval results.
+
+    A result whose shingles are mostly contained in a better ranked result, such as the same
+    boilerplate in another file or a near-identical chunk, is dropped. Text a result shares
+    with a better ranked neighbour chunk of the same file, which the splitter's chunk overlap
+    repeats at their boundary, is cut from the worse ranked one.
+
+    @param documents (list): The results, best first.
+    @param containment_threshold (float): The share of a result's shingles found in a better result from which it is dropped.
+    @param min_overlap (int): The minimum number of characters of a repeated boundary.
+    @return The remaining results, best first.
+    """
+    kept, kept_shingles = [], []
+    for doc in documents:
+        shingles = getShingles(doc.page_content)
+        if any(len(shingles & other) >= containment_threshold * len(shingles) for other in kept_shingles):
+            continue
+
+        text = doc.page_content
+        for other in kept:
+            if other.metadata.get("filename") == doc.metadata.get("filename"):
+                text = text[findOverlap(other.page_content, text, min_overlap):]
+                text = text[:len(text) - findOverlap(other.page_content[::-1], text[::-1], min_overlap)]
+
+        if text.strip():
+            kept.append(doc if text == doc.page_content else Document(page_content=text.strip(), metadata=doc.metadata))
+            kept_shingles.append(shingles)
+
+    return kept
+
+def findOverlap(first: str, second: str, min_overlap: int) -> int:
+    """
+    @brief Finds the longest end of one text that the other text starts with.
+
+    @param first (str): The text whose end is compared.
+    @param second (str): The text whose start is compared.
+    @param min_overlap (int): The minimum length of an overlap.
+    @return The length of the overlap, 0 if there is none of at least min_overlap characters.
+    """
+    if min(len(first), len(second)) < min_overlap:
+        return 0
+
+    position = first.find(second[:min_overlap])
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(second[:min_overlap], position + 1)
+    return 0
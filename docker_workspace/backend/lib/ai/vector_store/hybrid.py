@@ -0,0 +1,50 @@
+from lib.ai.vector_store.bm25 import tokenize
+
+def reciprocalRankFusion(rankings: list, rrf_k: int = 60) -> list:
+    """
+    @brief Fuses several ranked document lists with reciprocal rank fusion (RRF).
+
+    Every document scores 1 / (rrf_k + rank) in each list it appears in. Documents are
+    identified by their content so the same chunk found by several retrievers is merged.
+
+    @param rankings (list): The ranked document lists, best first.
+    @param rrf_k (int): The rank smoothing constant.
+    @return A list of (document, fused score) tuples ordered by descending score.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_score = fused.get(doc.page_content)
+            score = 1.0 / (rrf_k + rank)
+            fused[doc.page_content] = (doc, score if doc_score is None else doc_score[1] + score)
+
+    return sorted(fused.values(), key=lambda item: item[1], reverse=True)
+
+def rerankByTermCoverage(query: str, scored_docs: list, coverage_weight: float = 0.02) -> list:
+    """
+    @brief Reranks fused results by how much of the query each chunk covers.
+
+    A cheap CPU-only rerank: the fused score is boosted by the share of distinct query
+    terms found in the chunk, and identifiers containing digits (part numbers, error
+    codes) count double since an exact match on them is usually decisive.
+
+    @param query (str): The search query.
+    @param scored_docs (list): The (document, fused score) tuples to rerank.
+    @param coverage_weight (float): The weight of the term coverage relative to the fused score.
+    @return A list of (document, score) tuples ordered by descending score.
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return scored_docs
+
+    # Terms with digits are the exact-match terms dense search tends to miss
+    term_weights = {term: 2.0 if any(char.isdigit() for char in term) else 1.0 for term in query_terms}
+    total_weight = sum(term_weights.values())
+
+    reranked = []
+    for doc, score in scored_docs:
+        doc_terms = set(tokenize(doc.page_content))
+        coverage = sum(weight for term, weight in term_weights.items() if term in doc_terms) / total_weight
+        reranked.append((doc, score + coverage_weight * coverage))
+
+    return sorted(reranked, key=lambda item: item[1], reverse=True)
@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+import os, json, fcntl, tempfile
+
+# Loaded manifests keyed by path, stored with the (mtime, size) of the file they were read from
+_manifest_cache = {}
+
+class StoreManifest:
+    """
+    @brief Persists the catalog of files and segments stored in a session's vector store.
+
+    The manifest is a small JSON file in the session directory that lists the referenced
+    segments and, for every file, its statistics (chunk count, page count and byte size)
+    and the segment and offset its chunks are stored at. The manifest is read once and cached in-process; later reads only stat the
+    file to detect updates, so listing files or reading their statistics doesn't depend
+    on the number of stored chunks. Changes hold an exclusive lock on a lock file next to
+    the manifest while they read, change and write it, so concurrent writers in any
+    process don't lose each other's changes.
+
+    Attributes:
+    - manifest_path (str): The path of the manifest file.
+    - lock_path (str): The path of the lock file serializing changes.
+    """
+
+    def __init__(self, vector_store_path: str) -> None:
+        """
+        @brief Initializes the StoreManifest for a session's vector store.
+
+        @param vector_store_path (str): The root directory of the session's vector store.
+        """
+        self.manifest_path = os.path.join(vector_store_path, "manifest.json")
+        self.lock_path = f"{self.manifest_path}.lock"
+
+    def load(self) -> dict:
+        """
+        @brief Loads the manifest, using the cached copy while the file is unchanged.
+
+        @return The manifest data with its "version", "files" and "segments" entries.
+        """
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return {"version": 0, "files": {}, "segments": {}}  # No file was stored yet
+
+        file_signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _manifest_cache.get(self.manifest_path)
+        if cached is not None and cached[0] == file_signature:
+            return cached[1]
+
+        with open(self.manifest_path, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+
+        _manifest_cache[self.manifest_path] = (file_signature, manifest)
+        return manifest
+
+    def save(self, manifest: dict) -> None:
+        """
+        @brief Atomically writes the manifest and refreshes the cache.
+
+        The manifest is written to a uniquely named temporary file in the same directory
+        which then replaces the old one, so readers never see a partially written manifest
+        and concurrent writers never write to the same temporary file.
+
+        @param manifest (dict): The manifest data to write.
+        """
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.manifest_path), prefix="manifest.", suffix=".tmp")
+
+        try:
+            with os.fdopen(file_descriptor, "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.replace(temp_path, self.manifest_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        stat = os.stat(self.manifest_path)
+        _manifest_cache[self.manifest_path] = ((stat.st_mtime_ns, stat.st_size), manifest)
+
+    @contextmanager
+    def lock(self):
+        """
+        @brief Holds the exclusive lock serializing changes to the manifest.
+
+        The lock is released when its file is closed, also if the holding process dies.
+        """
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def getFiles(self) -> dict:
+        """
+        @brief Retrieves the statistics of every stored file.
+
+        @return A dictionary mapping file names to their statistics.
+        """
+        return self.load()["files"]
+
+    def getSegments(self) -> dict:
+        """
+        @brief Retrieves the referenced segments.
+
+        @return A dictionary mapping segment ids to their chunk counts and directories.
+        """
+        return self.load()["segments"]
+
+    def addSegment(self, segment_id: str, chunk_count: int, files: dict, path: str) -> None:
+        """
+        @brief Records a segment and the files stored in it.
+
+        @param segment_id (str): The id of the segment.
+        @param chunk_count (int): The number of chunks in the segment.
+        @param files (dict): Maps the names of the segment's files to their "chunks", "pages", "bytes" and "offset".
+        @param path (str): The directory of the segment in the document corpus.
+        """
+        with self.lock():
+            manifest = self.load()
+            # Copy so the cached manifest isn't changed before saving
+            segments = {**manifest["segments"], segment_id: {"chunks": chunk_count, "path": path}}
+            new_files = {**manifest["files"], **{file_name: {**entry, "segment": segment_id} for file_name, entry in files.items()}}
+            self.save({"version": manifest["version"] + 1, "files": new_files, "segments": segments})
+
@@ -0,0 +1,201 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from lib.ai.vector_store.bm25 import BM25Index
+from lib.ai.vector_store.chunk_store import ChunkStore, writeChunks
+import numpy as np
+import faiss, os, shutil, asyncio, uuid
+
+INDEX_FILE_NAME = "index.faiss"
+BM25_FILE_NAME = "bm25.json"
+DEFAULT_NPROBE = 16  # Inverted lists scanned per query by IVF indexes
+DEFAULT_EF_SEARCH = 64  # Candidate list size of HNSW searches
+
+class Segment:
+    """
+    @brief An immutable unit of the vector store holding vectors and their chunk records.
+
+    A segment directory holds a FAISS index, the chunk records (text and metadata) in
+    vector id order, and a BM25 index over the same chunks. Segments are never modified
+    once written: an upload of a new document writes a new segment, so adding data only
+    costs the new data and a crash can't corrupt existing segments.
+    Since segments are read-only, loaded segments memory-map their index and chunk records.
+
+    Attributes:
+    - index (faiss.Index): The vectors of the segment; vector ids are chunk positions.
+    - documents (list | ChunkStore): The chunk records in vector id order.
+    - bm25_index (BM25Index): The sparse index over the chunk texts.
+    """
+
+    def __init__(self, index: faiss.Index, documents: list, bm25_index: BM25Index) -> None:
+        """
+        @brief Initializes the Segment from its loaded parts.
+
+        @param index (faiss.Index): The vectors of the segment.
+        @param documents (list | ChunkStore): The chunk records in vector id order.
+        @param bm25_index (BM25Index): The sparse index over the chunk texts.
+        """
+        self.index = index
+        self.documents = documents
+        self.bm25_index = bm25_index
+
+    @classmethod
+    def fromEmbeddings(cls, vectors: list, documents: list, index_factory: str = "Flat") -> "Segment":
+        """
+        @brief Builds a segment from already embedded chunks.
+
+        @param vectors (list): The embedding vectors, one per chunk.
+        @param documents (list): The chunks, in the same order as the vectors.
+        @param index_factory (str): The FAISS index factory string of the segment's index.
+        @return The built Segment.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        index = createIndex(vectors, index_factory)
+        index.add(vectors)
+        return cls(index=index, documents=list(documents), bm25_index=BM25Index.build([doc.page_content for doc in documents]))
+
+    @classmethod
+    async def afromDocuments(cls, documents: list, embeddings: Embeddings, index_factory: str = "Flat") -> "Segment":
+        """
+        @brief Embeds chunks and builds a segment from them.
+
+        @param documents (list): The chunks to embed.
+        @param embeddings (Embeddings): The embedding model.
+        @param index_factory (str): The FAISS index factory string of the segment's index.
+        @return The built Segment.
+        """
+        vectors = await embeddings.aembed_documents([doc.page_content for doc in documents])
+        return await asyncio.to_thread(cls.fromEmbeddings, vectors, documents, index_factory)
+
+    def save(self, segment_dir: str) -> None:
+        """
+        @brief Writes the segment to a new directory.
+
+        The files are written to a temporary directory that is renamed into place once
+        complete, so a segment directory is either absent or fully written.
+
+        @param segment_dir (str): The directory of the segment. It must not exist yet.
+        """
+        temp_dir = os.path.join(os.path.dirname(segment_dir), f".{os.path.basename(segment_dir)}.{uuid.uuid4().hex}.tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        try:
+            faiss.write_index(self.index, os.path.join(temp_dir, INDEX_FILE_NAME))
+            writeChunks(temp_dir, self.documents)
+            self.bm25_index.save(os.path.join(temp_dir, BM25_FILE_NAME))
+
+            os.rename(temp_dir, segment_dir)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, segment_dir: str) -> "Segment":
+        """
+        @brief Opens a segment from its directory.
+
+        The FAISS index is opened with IO_FLAG_MMAP, which maps the index data the installed
+        FAISS version supports mapping instead of copying it to the heap, and the chunk records
+        are memory-mapped and only parsed when accessed.
+
+        @param segment_dir (str): The directory of the segment.
+        @return The loaded Segment.
+        """
+        index = faiss.read_index(os.path.join(segment_dir, INDEX_FILE_NAME), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        bm25_index = BM25Index.load(os.path.join(segment_dir, BM25_FILE_NAME))
+        return cls(index=index, documents=ChunkStore(segment_dir), bm25_index=bm25_index)
+
+    def similaritySearchByVector(self, query_embedding: list, k: int, id_ranges: list = None) -> list:
+        """
+        @brief Searches the segment's vectors, optionally restricted to some chunk ranges.
+
+        @param query_embedding (list): The embedded query.
+        @param k (int): The number of documents to return.
+        @param id_ranges (list): (start, end) vector id ranges to search in. None searches all vectors.
+        @return A list of (document, distance) tuples ordered by distance.
+        """
+        query = np.asarray([query_embedding], dtype=np.float32)
+        if id_ranges is None:
+            distances, ids = self.index.search(query, k)
+        else:
+            selector = createIdSelector(id_ranges)
+            try:
+                distances, ids = self.index.search(query, k, params=createSearchParameters(self.index, selector))
+            except RuntimeError:
+                # Index types without selector support (e.g. plain PQ) are scanned fully and filtered
+                distances, ids = self.index.search(query, self.index.ntotal)
+                in_ranges = [any(start <= doc_id < end for start, end in id_ranges) for doc_id in ids[0]]
+                distances, ids = distances[:, in_ranges][:, :k], ids[:, in_ranges][:, :k]
+
+        return [(self.documents[doc_id], float(distance)) for doc_id, distance in zip(ids[0], distances[0]) if doc_id != -1]
+
+    def bm25Search(self, query: str, k: int, id_ranges: list = None) -> list:
+        """
+        @brief Searches the segment's BM25 index, optionally restricted to some chunk ranges.
+
+        @param query (str): The search query.
+        @param k (int): The number of documents to return.
+        @param id_ranges (list): (start, end) chunk ranges to search in. None searches all chunks.
+        @return A list of (document, score) tuples ordered by descending score.
+        """
+        return [(self.documents[doc_id], score) for doc_id, score in self.bm25_index.search(query, k, id_ranges=id_ranges)]
+
+def createIndex(vectors: np.ndarray, index_factory: str = "Flat") -> faiss.Index:
+    """
+    @brief Creates and trains an empty index for the given vectors.
+
+    Index types that need training (IVF, PQ) require enough vectors to learn their centroids;
+    segments too small for that get an exact flat index instead, which is also the fastest
+    choice at that size. IVF indexes scan DEFAULT_NPROBE lists per query and HNSW indexes use
+    a DEFAULT_EF_SEARCH candidate list; both settings are stored with the index.
+
+    @param vectors (np.ndarray): The vectors the index will hold, used for training.
+    @param index_factory (str): The FAISS index factory string, e.g. "Flat", "HNSW32", "IVF256,PQ32" or "SQ8".
+    @return The trained, empty index.
+    """
+    dimension = vectors.shape[1]
+    if index_factory == "Flat":
+        return faiss.IndexFlatL2(dimension)
+
+    index = faiss.index_factory(dimension, index_factory)  # Invalid factory strings raise here
+    if not index.is_trained:
+        try:
+            index.train(vectors)
+        except RuntimeError:
+            return faiss.IndexFlatL2(dimension)  # Too few vectors to train
+
+    index_ivf = faiss.try_extract_index_ivf(index)
+    if index_ivf is not None:
+        index_ivf.nprobe = min(index_ivf.nlist, DEFAULT_NPROBE)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+
+    return index
+
+def createSearchParameters(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """
+    @brief Creates search parameters restricting a search to the selected ids.
+
+    IVF and HNSW indexes need their own parameter types, which also carry the index's
+    search settings since passed parameters override the ones stored in the index.
+
+    @param index (faiss.Index): The index to search.
+    @param selector (faiss.IDSelector): The selector of the ids to search.
+    @return The search parameters.
+    """
+    index_ivf = faiss.try_extract_index_ivf(index)
+    if index_ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index_ivf.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+def createIdSelector(id_ranges: list) -> faiss.IDSelector:
+    """
+    @brief Creates a FAISS selector accepting only the vector ids in the given ranges.
+
+    @param id_ranges (list): (start, end) vector id ranges with exclusive ends.
+    @return The ID selector.
+    """
+    if len(id_ranges) == 1:
+        return faiss.IDSelectorRange(id_ranges[0][0], id_ranges[0][1])
+    return faiss.IDSelectorBatch(np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in id_ranges]))
@@ -0,0 +1,272 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from lib.ai.vector_store.manifest import StoreManifest
+from lib.ai.vector_store.segment import Segment
+from lib.ai.vector_store.hybrid import reciprocalRankFusion, rerankByTermCoverage
+from lib.tools.metrics import Histogram, FAST_LATENCY_BUCKETS
+from lib.tools.tracing import TRACER
+import os, asyncio
+
+SEGMENT_LOAD_DURATION = Histogram("vector_store_segment_load_seconds", "Time to load a vector store segment and its FAISS index from disk.")
+SEARCH_DURATION = Histogram(
+    "vector_store_search_seconds", "Time to search the loaded segments of a vector store, by retriever (dense FAISS or bm25).",
+    ("retriever",), buckets=FAST_LATENCY_BUCKETS
+)
+
+class SessionVectorStore:
+    """
+    @brief Manages the vector store of a session as a set of immutable segments.
+
+    Every file references the immutable segment of its document in the document corpus, which
+    stores every document once for all sessions, so adding a file never rewrites existing data
+    and the session itself only stores a manifest. The manifest lists the referenced segments and
+    where each file's chunks are stored. A search restricted to some files only scans those
+    files' vector id ranges, and an unfiltered search fans out over all segments and merges the
+    results.
+
+    Attributes:
+    - vector_store_path (str): The root directory of the session's vector store.
+    - manifest (StoreManifest): The catalog of stored files and referenced segments.
+    - embeddings (Embeddings): The embedding model used for queries.
+    - segments (dict): The loaded segments keyed by segment id.
+    """
+
+    def __init__(self, vector_store_path: str, embeddings: Embeddings) -> None:
+        """
+        @brief Initializes the SessionVectorStore for a session directory.
+
+        Segments are loaded lazily on first use.
+
+        @param vector_store_path (str): The root directory of the session's vector store.
+        @param embeddings (Embeddings): The embedding model used for queries.
+        """
+        self.vector_store_path = vector_store_path
+        self.manifest = StoreManifest(vector_store_path)
+        self.embeddings = embeddings
+        self.segments = {}  # Loaded segments keyed by segment id
+
+    def getFileNames(self) -> list:
+        """
+        @brief Retrieves the names of the files stored in the vector store.
+
+        @return A sorted list of file names.
+        """
+        return sorted(self.manifest.getFiles())
+
+    def getFileStats(self) -> dict:
+        """
+        @brief Retrieves the statistics of the stored files.
+
+        @return A dictionary mapping file names to their chunk count, page count and byte size.
+        """
+        return {
+            file_name: {"chunks": entry["chunks"], "pages": entry["pages"], "bytes": entry["bytes"]}
+            for file_name, entry in self.manifest.getFiles().items()
+        }
+
+    def addSharedSegment(self, file_name: str, segment_id: str, segment_dir: str, chunk_count: int, page_count: int = 0, byte_size: int = 0) -> None:
+        """
+        @brief References a segment of the document corpus as one of the session's files.
+
+        Nothing is embedded or written besides the manifest.
+
+        @param file_name (str): The name of the file in this session.
+        @param segment_id (str): The document key of the shared segment.
+        @param segment_dir (str): The directory of the shared segment.
+        @param chunk_count (int): The number of chunks in the segment.
+        @param page_count (int): The number of pages of the file.
+        @param byte_size (int): The size of the uploaded file in bytes.
+        """
+        self.manifest.addSegment(
+            segment_id=segment_id,
+            chunk_count=chunk_count,
+            files={file_name: {"chunks": chunk_count, "pages": page_count, "bytes": byte_size, "offset": 0}},
+            path=segment_dir
+        )
+
+    async def getSegment(self, segment_id: str) -> Segment:
+        """
+        @brief Retrieves a segment, loading it from disk if needed.
+
+        @param segment_id (str): The id of the segment.
+        @return The segment, or None if it doesn't exist anymore.
+        """
+        segment = self.segments.get(segment_id)
+        if segment is None:
+            segment_dir = self.manifest.getSegments().get(segment_id, {}).get("path")
+            if segment_dir is None or not os.path.isdir(segment_dir):
+                return None  # Removed from the corpus since the search was planned
+
+            with SEGMENT_LOAD_DURATION.time(), TRACER.span("vector_store.load_segment", attributes={"vector_store.segment_id": segment_id}):
+                segment = await asyncio.to_thread(Segment.load, segment_dir)
+            self.segments[segment_id] = segment
+
+        return segment
+
+    def planSearch(self, file_names: list = None) -> dict:
+        """
+        @brief Finds the segments and vector id ranges holding the given files.
+
+        @param file_names (list): The files to search in. None searches all files.
+        @return A dictionary mapping segment ids to their id ranges, or to None when the whole segment is searched.
+        """
+        files = self.manifest.getFiles()
+        segments = self.manifest.getSegments()
+        if file_names is None:
+            file_names = list(files)
+
+        plan = {}
+        for file_name in dict.fromkeys(file_names):
+            entry = files.get(file_name)
+            if entry is not None:
+                id_ranges = plan.setdefault(entry["segment"], [])
+                id_range = (entry["offset"], entry["offset"] + entry["chunks"])
+                if id_range not in id_ranges:  # The same shared document may be uploaded under several names
+                    id_ranges.append(id_range)
+
+        for segment_id, id_ranges in plan.items():
+            # Ranges never overlap, so covering every chunk means the whole segment is selected
+            if sum(end - start for start, end in id_ranges) == segments[segment_id]["chunks"]:
+                plan[segment_id] = None
+
+        return plan
+
+    def getSharedFileNames(self) -> dict:
+        """
+        @brief Maps every shared segment to the name of its file in this session.
+
+        Shared chunks don't store a file name since it differs between sessions.
+
+        @return A dictionary mapping shared segment ids to file names.
+        """
+        file_names = {}
+        for file_name, entry in sorted(self.manifest.getFiles().items()):
+            file_names.setdefault(entry["segment"], file_name)
+        return file_names
+
+    async def loadPlannedSegments(self, plan: dict) -> list:
+        """
+        @brief Loads the segments of a search plan concurrently.
+
+        @param plan (dict): The search plan created by planSearch.
+        @return A list of (segment, id ranges, file name) tuples for the segments that exist, where
+                file name is the session's name of the segment's file.
+        """
+        shared_file_names = self.getSharedFileNames()
+        segments = await asyncio.gather(*[self.getSegment(segment_id) for segment_id in plan])
+        return [
+            (segment, id_ranges, shared_file_names.get(segment_id))
+            for segment_id, segment, id_ranges in zip(plan, segments, plan.values()) if segment is not None
+        ]
+
+    async def asimilarity_search_with_score(self, query: str, k: int, file_names: list = None) -> list:
+        """
+        @brief Searches the vectors of the given files concurrently.
+
+        The query is embedded once and every segment holding one of the files is searched
+        in a worker thread, restricted to the files' vector id ranges. The results are merged,
+        duplicate chunks are dropped and the best k documents by distance are returned.
+
+        @param query (str): The search query.
+        @param k (int): The number of documents to return.
+        @param file_names (list): The files to search in. None searches all files.
+        @return A list of (document, distance) tuples ordered by distance.
+        """
+        planned_segments = await self.loadPlannedSegments(self.planSearch(file_names))
+        if not planned_segments:
+            return []
+
+        query_embedding = await self.embeddings.aembed_query(query)  # Embed the query once for all segments
+        with SEARCH_DURATION.time("dense"), TRACER.span("vector_store.dense_search", attributes={"vector_store.segment_count": len(planned_segments), "vector_store.k": k}):
+            results = await asyncio.gather(*[
+                asyncio.to_thread(segment.similaritySearchByVector, query_embedding, k, id_ranges)
+                for segment, id_ranges, _ in planned_segments
+            ])
+
+        return mergeSearchResults([
+            nameSharedResults(result, file_name) for result, (_, _, file_name) in zip(results, planned_segments)
+        ], k)
+
+    async def hybridSearch(self, query: str, k: int, file_names: list = None, candidate_factor: int = 3) -> list:
+        """
+        @brief Searches the given files with both dense and BM25 retrieval.
+
+        Each retriever fetches `k * candidate_factor` candidates; their rankings are fused with
+        reciprocal rank fusion and the fused candidates are reranked locally by query term
+        coverage before the best k are returned.
+
+        @param query (str): The search query.
+        @param k (int): The number of documents to return.
+        @param file_names (list): The files to search in. None searches all files.
+        @param candidate_factor (int): How many candidates per result each retriever fetches.
+        @return A list of (document, score) tuples ordered by descending relevance.
+        """
+        candidate_k = k * candidate_factor
+
+        dense_results, sparse_results = await asyncio.gather(
+            self.asimilarity_search_with_score(query, k=candidate_k, file_names=file_names),
+            self.bm25Search(query, k=candidate_k, file_names=file_names)
+        )
+
+        fused = reciprocalRankFusion([[doc for doc, _ in dense_results], [doc for doc, _ in sparse_results]])
+        return rerankByTermCoverage(query, fused)[:k]
+
+    async def bm25Search(self, query: str, k: int, file_names: list = None) -> list:
+        """
+        @brief Searches the BM25 indexes of the given files.
+
+        Every segment is scored in a worker thread, as BM25 scoring is pure Python and would
+        otherwise block the event loop. BM25 scores depend on each segment's term statistics,
+        so the scores are normalized by the best score of their segment before the segments'
+        results are merged.
+
+        @param query (str): The search query.
+        @param k (int): The number of documents to return.
+        @param file_names (list): The files to search in. None searches all files.
+        @return A list of (document, normalized score) tuples ordered by descending score.
+        """
+        planned_segments = await self.loadPlannedSegments(self.planSearch(file_names))
+
+        with SEARCH_DURATION.time("bm25"), TRACER.span("vector_store.bm25_search", attributes={"vector_store.segment_count": len(planned_segments), "vector_store.k": k}):
+            results = await asyncio.gather(*[
+                asyncio.to_thread(segment.bm25Search, query, k, id_ranges)
+                for segment, id_ranges, _ in planned_segments
+            ])
+
+        matches = []
+        for result, (_, _, file_name) in zip(results, planned_segments):
+            segment_matches = nameSharedResults(result, file_name)
+            if segment_matches:
+                best_score = segment_matches[0][1]
+                matches.extend((doc, score / best_score) for doc, score in segment_matches)
+
+        return sorted(matches, key=lambda match: match[1], reverse=True)[:k]
+
+def nameSharedResults(results: list, file_name: str) -> list:
+    """
+    @brief Adds the session's file name to results from a shared segment.
+
+    @param results (list): The (document, score) tuples of one segment.
+    @param file_name (str): The session's name of the segment's file.
+    @return The results, with the file name in the documents' metadata.
+    """
+    return [(Document(page_content=doc.page_content, metadata={**doc.metadata, "filename": file_name}), score) for doc, score in results]
+
+def mergeSearchResults(results: list, k: int) -> list:
+    """
+    @brief Merges (document, distance) result lists of several searches.
+
+    Keeps the best distance of every distinct chunk and returns the k closest ones.
+
+    @param results (list): The result lists to merge.
+    @param k (int): The number of documents to return.
+    @return A list of (document, distance) tuples ordered by distance.
+    """
+    best_matches = {}
+    for doc, score in (match for result in results for match in result):
+        best_match = best_matches.get(doc.page_content)
+        if best_match is None or score < best_match[1]:
+            best_matches[doc.page_content] = (doc, score)
+
+    # Lower FAISS distances are more relevant
+    return sorted(best_matches.values(), key=lambda match: match[1])[:k]
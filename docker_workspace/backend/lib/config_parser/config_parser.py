@@ -73,6 +73,168 @@ class Configuration:
     def getLLMMaxIteration(self) -> int:
         """Returns the maximum iterations for the LLM."""
         return int(self.config_data.llm_configs.llm_max_iteration)
+
+    def getAgentMode(self) -> str:
+        """Returns the agent mode used to select actions ("prompt" or "tool_calling")."""
+        return str(self.config_data.llm_configs.agent_mode)
+
+    def getEmbeddingDimensions(self) -> int:
+        """Returns the dimensions of the embedding vectors, or None for the model's native size."""
+        dimensions = self.config_data.llm_configs.embedding_dimensions
+        return int(dimensions) if dimensions is not None else None
+
+    def getEmbeddingBatchTokens(self) -> int:
+        """Returns the token budget of one embedding request."""
+        return int(self.config_data.llm_configs.embedding_batch_tokens)
+
+    def getEmbeddingMaxConcurrency(self) -> int:
+        """Returns the maximum number of embedding requests in flight."""
+        return int(self.config_data.llm_configs.embedding_max_concurrency)
+
+    def getEmbeddingMaxRetries(self) -> int:
+        """Returns the number of retries of rate limited embedding requests."""
+        return int(self.config_data.llm_configs.embedding_max_retries)
+
+    def getLLMBackend(self) -> str:
+        """Returns the chat model backend ("openai" or "fake")."""
+        return str(self.config_data.llm_configs.llm_backend)
+
+    def getEmbeddingBackend(self) -> str:
+        """Returns the embedding model backend ("openai" or "hashing")."""
+        return str(self.config_data.llm_configs.embedding_backend)
+
+    def getFakeLLMScript(self) -> str:
+        """Returns the JSON file of the fake chat model's reply rules, or None for the built-in script."""
+        script = self.config_data.llm_configs.fake_llm_script
+        return str(script) if script is not None else None
+
+    def getFakeLLMLatencyDistribution(self) -> str:
+        """Returns the distribution of the fake chat model's latency."""
+        return str(self.config_data.llm_configs.fake_llm_latency_distribution)
+
+    def getFakeLLMLatencyMean(self) -> float:
+        """Returns the mean latency of the fake chat model in seconds."""
+        return float(self.config_data.llm_configs.fake_llm_latency_mean)
+
+    def getFakeLLMLatencyStddev(self) -> float:
+        """Returns the standard deviation of the fake chat model's latency in seconds."""
+        return float(self.config_data.llm_configs.fake_llm_latency_stddev)
+
+    def getFakeLLMSeed(self) -> int:
+        """Returns the seed of the fake chat model's latency."""
+        return int(self.config_data.llm_configs.fake_llm_seed)
+
+    def getLLMCache(self) -> bool:
+        """Returns whether LLM replies are cached and identical calls coalesced."""
+        return bool(self.config_data.llm_configs.llm_cache)
+
+    def getLLMCacheTTL(self) -> int:
+        """Returns the number of seconds an LLM reply is cached."""
+        return int(self.config_data.llm_configs.llm_cache_ttl)
+
+    def getLLMMaxConcurrency(self) -> int:
+        """Returns the maximum number of LLM calls in flight."""
+        return int(self.config_data.llm_configs.llm_max_concurrency)
+
+    def getLLMTokensPerMinute(self) -> int:
+        """Returns the token budget of the LLM calls per minute, 0 for no budget."""
+        return int(self.config_data.llm_configs.llm_tokens_per_minute)
+
+    def getLLMMaxQueue(self) -> int:
+        """Returns the number of waiting LLM calls from which new questions are rejected."""
+        return int(self.config_data.llm_configs.llm_max_queue)
+
+    def getLLMRequestBudget(self) -> float:
+        """Returns the seconds an agent may take for a question, 0 for no budget."""
+        return float(self.config_data.llm_configs.llm_request_budget)
+
+    def getLLMHedging(self) -> bool:
+        """Returns whether slow LLM calls are duplicated."""
+        return bool(self.config_data.llm_configs.llm_hedging)
+
+    def getLLMHedgeQuantile(self) -> float:
+        """Returns the latency quantile after which an LLM call is duplicated."""
+        return float(self.config_data.llm_configs.llm_hedge_quantile)
+
+    def getAnswerCache(self) -> bool:
+        """Returns whether answers to similar questions on the same dataset are reused."""
+        return bool(self.config_data.llm_configs.answer_cache)
+
+    def getAnswerCacheThreshold(self) -> float:
+        """Returns the similarity of two questions from which a cached answer is reused."""
+        return float(self.config_data.llm_configs.answer_cache_threshold)
+
+    def getAnswerCacheMaxEntries(self) -> int:
+        """Returns the number of answers cached per dataset."""
+        return int(self.config_data.llm_configs.answer_cache_max_entries)
+
+    def getAnswerCacheMaxDatasets(self) -> int:
+        """Returns the number of datasets answers are cached for."""
+        return int(self.config_data.llm_configs.answer_cache_max_datasets)
+
+    def getAnswerCacheTTL(self) -> int:
+        """Returns the number of seconds an answer is cached."""
+        return int(self.config_data.llm_configs.answer_cache_ttl)
+
+    def getIndexFactory(self) -> str:
+        """Returns the FAISS index factory string of the vector store segments."""
+        return str(self.config_data.vector_store_configs.index_factory)
+
+    def getDedupThreshold(self) -> float:
+        """Returns the similarity from which uploaded chunks count as duplicates."""
+        return float(self.config_data.vector_store_configs.dedup_threshold)
+    
+    def getJobWorkerConcurrency(self) -> int:
+        """Returns the number of jobs a worker pool runs at the same time."""
+        return int(self.config_data.job_configs.worker_concurrency)
+
+    def getJobLocalWorkers(self) -> bool:
+        """Returns whether the web application runs a job worker pool itself."""
+        return bool(self.config_data.job_configs.local_workers)
+
+    def getJobTTL(self) -> int:
+        """Returns the number of seconds job records are kept."""
+        return int(self.config_data.job_configs.job_ttl)
+
+    def getJobVisibilityTimeout(self) -> int:
+        """Returns the number of seconds without a heartbeat after which a running job is abandoned."""
+        return int(self.config_data.job_configs.visibility_timeout)
+    
+    def getUploadPartSize(self) -> int:
+        """Returns the maximum size of an upload part in bytes."""
+        return int(self.config_data.upload_configs.part_size)
+
+    def getUploadTTL(self) -> int:
+        """Returns the number of seconds an unfinished upload is kept."""
+        return int(self.config_data.upload_configs.upload_ttl)
+
+    def getSessionByteQuota(self) -> int:
+        """Returns the maximum number of bytes a session uploads."""
+        return int(self.config_data.upload_configs.session_byte_quota)
+
+    def getSessionRowQuota(self) -> int:
+        """Returns the maximum number of CSV rows a session stores."""
+        return int(self.config_data.upload_configs.session_row_quota)
+
+    def getPasswordHashWorkers(self) -> int:
+        """Returns the number of passwords hashed at the same time."""
+        return int(self.config_data.security_configs.hash_workers)
+
+    def getBcryptRounds(self) -> int:
+        """Returns the log2 cost of bcrypt password hashes."""
+        return int(self.config_data.security_configs.bcrypt_rounds)
+
+    def getArgon2TimeCost(self) -> int:
+        """Returns the number of argon2 iterations of password hashes."""
+        return int(self.config_data.security_configs.argon2_time_cost)
+
+    def getArgon2MemoryCost(self) -> int:
+        """Returns the memory of argon2 password hashes in KiB."""
+        return int(self.config_data.security_configs.argon2_memory_cost)
+
+    def getArgon2Parallelism(self) -> int:
+        """Returns the number of argon2 lanes of password hashes."""
+        return int(self.config_data.security_configs.argon2_parallelism)
     
     def getSignUpEndpoint(self) -> str:
         """Returns the signup endpoint URL."""
@@ -117,6 +279,30 @@ class Configuration:
     def getEndSessionEndpoint(self) -> str:
         """Returns the end session endpoint URL."""
         return str(self.config_data.end_points.end_session)
+
+    def getUploadInitEndpoint(self) -> str:
+        """Returns the endpoint for starting an upload in parts."""
+        return str(self.config_data.end_points.upload_init)
+
+    def getUploadPartEndpoint(self) -> str:
+        """Returns the endpoint for sending a part of an upload."""
+        return str(self.config_data.end_points.upload_part)
+
+    def getUploadStatusEndpoint(self) -> str:
+        """Returns the endpoint for checking how much of an upload was received."""
+        return str(self.config_data.end_points.upload_status)
+
+    def getUploadCompleteEndpoint(self) -> str:
+        """Returns the endpoint for processing completed uploads."""
+        return str(self.config_data.end_points.upload_complete)
+
+    def getMetricsEndpoint(self) -> str:
+        """Returns the endpoint for scraping the metrics of the process."""
+        return str(self.config_data.end_points.metrics)
+
+    def getTraceEndpoint(self) -> str:
+        """Returns the endpoint for retrieving the spans of a request's trace."""
+        return str(self.config_data.end_points.trace)
     
     def getSyncDatabaseUrl(self) -> str:
         """Returns the synchronous database URL."""
@@ -150,6 +336,14 @@ class Configuration:
         """Returns the directory for log files."""
         return str(self.config_data.paths.log_file_dir)
     
+    def getCorpusDir(self) -> str:
+        """Returns the directory of the shared document corpus."""
+        return str(self.config_data.paths.corpus_dir)
+
+    def getUploadDir(self) -> str:
+        """Returns the directory where uploaded files wait for their job."""
+        return str(self.config_data.paths.upload_dir)
+    
     def getCheckList(self) -> list:
         """Returns the checklist from the configuration."""
         return self.config_data.paths.check_list
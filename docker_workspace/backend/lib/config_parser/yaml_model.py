@@ -1,10 +1,14 @@
 from pydantic import (BaseModel, Field)
-from typing import List
+from typing import List, Optional
 
 # Define regex patterns for validating IP addresses and database URLs
 ip_pattern = r"^(localhost|(\d{1,3}\.){3}\d{1,3})$"
 sync_database_url_pattern = r"^postgresql\+psycopg2:\/\/(?P<username>[^:]+):(?P<password>[^@]+)@(?P<host>[^:]+):(?P<port>\d+)"
 async_database_url_pattern = r"^postgresql\+asyncpg:\/\/(?P<username>[^:]+):(?P<password>[^@]+)@(?P<host>[^:]+):(?P<port>\d+)"
+agent_mode_pattern = r"^(prompt|tool_calling)$"
+llm_backend_pattern = r"^(openai|fake)$"
+embedding_backend_pattern = r"^(openai|hashing)$"
+latency_distribution_pattern = r"^(fixed|uniform|normal|lognormal)$"
 
 class EndPointsModel(BaseModel):
     """
@@ -24,6 +28,12 @@ class EndPointsModel(BaseModel):
     - rag_query (str): Endpoint for executing RAG queries.
     - clear_session (str): Endpoint for clearing a session.
     - end_session (str): Endpoint for ending a session.
+    - upload_init (str): Endpoint for starting an upload in parts.
+    - upload_part (str): Endpoint for sending a part of an upload.
+    - upload_status (str): Endpoint for checking how much of an upload was received.
+    - upload_complete (str): Endpoint for processing completed uploads.
+    - metrics (str): Endpoint for scraping the metrics of the process.
+    - trace (str): Endpoint for retrieving the spans of a request's trace.
     """
     signup: str
     login: str
@@ -36,6 +46,12 @@ class EndPointsModel(BaseModel):
     rag_query: str
     clear_session: str
     end_session: str
+    upload_init: str = "/upload_init"
+    upload_part: str = "/upload_part"
+    upload_status: str = "/upload_status"
+    upload_complete: str = "/upload_complete"
+    metrics: str = "/metrics"
+    trace: str = "/trace"
 
 class ServerModel(BaseModel):
     """
@@ -70,10 +86,118 @@ class LLMConfigs(BaseModel):
     - sql_llm_model_name (str): Name of the SQL LLM model.
     - embedding_model_name (str): Name of the embedding model.
     - llm_max_iteration (int): Maximum iterations for the LLM.
+    - agent_mode (str): How agents pick actions: "prompt" parses prefixed text, "tool_calling" uses native function calling.
+    - embedding_dimensions (Optional[int]): Dimensions of the embedding vectors, None for the model's native size.
+    - embedding_batch_tokens (int): Token budget of one embedding request.
+    - embedding_max_concurrency (int): Maximum number of embedding requests in flight across all sessions.
+    - embedding_max_retries (int): Number of retries of rate limited embedding requests.
+    - llm_backend (str): "openai", or "fake" for a local scripted chat model making no API calls.
+    - embedding_backend (str): "openai", or "hashing" for a local deterministic embedding model making no API calls.
+    - fake_llm_script (Optional[str]): JSON file of the fake chat model's reply rules, None for the built-in script.
+    - fake_llm_latency_distribution (str): Distribution of the fake chat model's latency: "fixed", "uniform", "normal" or "lognormal".
+    - fake_llm_latency_mean (float): Mean latency of the fake chat model in seconds.
+    - fake_llm_latency_stddev (float): Standard deviation of the fake chat model's latency in seconds.
+    - fake_llm_seed (int): Seed of the fake chat model's latency.
+    - llm_cache (bool): Whether replies to identical prompts are cached in Redis and identical calls in flight coalesced.
+    - llm_cache_ttl (int): Seconds an LLM reply is cached.
+    - llm_max_concurrency (int): Maximum number of LLM calls in flight across all sessions.
+    - llm_tokens_per_minute (int): Token budget of the LLM calls per minute, 0 for no budget.
+    - llm_max_queue (int): Number of waiting LLM calls from which new questions are rejected with HTTP 503.
+    - llm_request_budget (float): Seconds an agent may take for a question across all iterations, 0 for no budget.
+    - llm_hedging (bool): Whether LLM calls slower than the hedge quantile are duplicated.
+    - llm_hedge_quantile (float): Latency quantile of recent LLM calls after which a duplicate is sent.
+    - answer_cache (bool): Whether answers to questions similar to earlier questions on the same dataset are reused.
+    - answer_cache_threshold (float): Cosine similarity of two questions from which a cached answer is reused.
+    - answer_cache_max_entries (int): Number of answers cached per dataset.
+    - answer_cache_max_datasets (int): Number of datasets answers are cached for.
+    - answer_cache_ttl (int): Seconds an answer is cached.
     """
     sql_llm_model_name: str
     embedding_model_name: str
     llm_max_iteration: int = Field(..., ge=1, le=65535)  # Must be a positive integer
+    agent_mode: str = Field("prompt", pattern=agent_mode_pattern)  # Agent action selection mode
+    embedding_dimensions: Optional[int] = Field(None, ge=1, le=65535)  # Shortened embeddings, if supported by the model
+    embedding_batch_tokens: int = Field(16000, ge=1)  # Chunks are packed into requests up to this many tokens
+    embedding_max_concurrency: int = Field(4, ge=1, le=1024)  # Requests in flight, halved while rate limited
+    embedding_max_retries: int = Field(6, ge=0, le=100)  # Rate limited requests are retried with backoff
+    llm_backend: str = Field("openai", pattern=llm_backend_pattern)  # The fake backend is meant for load tests
+    embedding_backend: str = Field("openai", pattern=embedding_backend_pattern)  # Hashing vectors have embedding_dimensions entries
+    fake_llm_script: Optional[str] = None
+    fake_llm_latency_distribution: str = Field("lognormal", pattern=latency_distribution_pattern)
+    fake_llm_latency_mean: float = Field(0.0, ge=0, le=600)
+    fake_llm_latency_stddev: float = Field(0.0, ge=0, le=600)
+    fake_llm_seed: int = 0  # The same seed replays the same latencies
+    llm_cache: bool = True  # Keyed by the model and the rendered prompt
+    llm_cache_ttl: int = Field(3600, ge=1)  # Cached replies expire after this many seconds
+    llm_max_concurrency: int = Field(16, ge=1, le=1024)  # Later agent iterations are served before new questions
+    llm_tokens_per_minute: int = Field(0, ge=0)  # Keep below the provider's rate limit
+    llm_max_queue: int = Field(64, ge=1)
+    llm_request_budget: float = Field(120.0, ge=0)  # A partial answer is returned once it runs out
+    llm_hedging: bool = False  # Duplicates cost tokens, so hedging is opt-in
+    llm_hedge_quantile: float = Field(0.95, gt=0, lt=1)
+    answer_cache: bool = False  # Keyed by the agent and the content of the session's tables or files
+    answer_cache_threshold: float = Field(0.95, gt=0, le=1)  # Paraphrases score high, different questions lower
+    answer_cache_max_entries: int = Field(256, ge=1)  # The least recently used answers are evicted first
+    answer_cache_max_datasets: int = Field(1024, ge=1)
+    answer_cache_ttl: int = Field(3600, ge=1)
+
+class VectorStoreConfigs(BaseModel):
+    """
+    @brief Represents configuration settings for the session vector stores.
+
+    Attributes:
+    - index_factory (str): FAISS index factory string of the segment indexes, e.g. "Flat", "HNSW32", "IVF256,PQ32" or "SQ8".
+    - dedup_threshold (float): Estimated similarity from which uploaded chunks count as duplicates, 1 for exact duplicates only.
+    """
+    index_factory: str = Field("Flat", min_length=1)  # Index type of the segments
+    dedup_threshold: float = Field(0.9, gt=0, le=1)  # Near-duplicate chunks aren't embedded
+
+class JobConfigs(BaseModel):
+    """
+    @brief Represents configuration settings for the background jobs.
+
+    Attributes:
+    - worker_concurrency (int): Number of jobs a worker pool runs at the same time.
+    - local_workers (bool): Whether the web application runs a worker pool itself, besides separate worker processes.
+    - job_ttl (int): Seconds the record of a job is kept after its last update.
+    - visibility_timeout (int): Seconds without a heartbeat after which a running job counts as abandoned.
+    """
+    worker_concurrency: int = Field(2, ge=1, le=1024)  # Independent of the web server's concurrency
+    local_workers: bool = True  # Disable when uploads are processed by worker.py processes only
+    job_ttl: int = Field(86400, ge=1)  # Job records expire after this many seconds
+    visibility_timeout: int = Field(60, ge=3)  # Running jobs send a heartbeat three times within it
+
+class UploadConfigs(BaseModel):
+    """
+    @brief Represents configuration settings for uploads and their quotas.
+
+    Attributes:
+    - part_size (int): Maximum size of one part in bytes.
+    - upload_ttl (int): Seconds an unfinished upload can be resumed after its last part.
+    - session_byte_quota (int): Maximum number of bytes a session uploads.
+    - session_row_quota (int): Maximum number of CSV rows a session stores.
+    """
+    part_size: int = Field(8388608, ge=65536, le=268435456)  # Bounds the memory and time of one part request
+    upload_ttl: int = Field(86400, ge=1)  # Unfinished uploads are removed after this many seconds
+    session_byte_quota: int = Field(1073741824, ge=1)  # Enforced while the bytes arrive
+    session_row_quota: int = Field(10000000, ge=1)  # Enforced while the CSV files are converted
+
+class SecurityConfigs(BaseModel):
+    """
+    @brief Represents configuration settings for password hashing.
+
+    Attributes:
+    - hash_workers (int): Number of passwords hashed at the same time.
+    - bcrypt_rounds (int): Log2 cost of the bcrypt hashes still verified.
+    - argon2_time_cost (int): Number of argon2 iterations.
+    - argon2_memory_cost (int): Memory used by argon2 in KiB.
+    - argon2_parallelism (int): Number of argon2 lanes.
+    """
+    hash_workers: int = Field(4, ge=1, le=256)  # Bounds the CPU used by logins and signups
+    bcrypt_rounds: int = Field(12, ge=4, le=31)  # Costs outside passlib's bounds are rejected
+    argon2_time_cost: int = Field(3, ge=1, le=100)  # Hashes with other costs are replaced at login
+    argon2_memory_cost: int = Field(65536, ge=8, le=4194304)
+    argon2_parallelism: int = Field(1, ge=1, le=64)
 
 class PathsModel(BaseModel):
     """
@@ -83,10 +207,14 @@ class PathsModel(BaseModel):
 
     Attributes:
     - log_file_dir (str): Directory for log files.
+    - corpus_dir (str): Directory of the document corpus shared by all sessions.
+    - upload_dir (str): Directory where uploaded files wait for their job.
     - check_list (List[str]): List of items for validation or processing.
     - origin_list (List[str]): List of origins for data processing.
     """
     log_file_dir: str
+    corpus_dir: str = Field("./.vector_stores/_corpus", min_length=1)  # Content-addressed documents shared by the sessions
+    upload_dir: str = Field("./.uploads", min_length=1)  # Must be shared with separate worker processes
     check_list: List[str]
     origin_list: List[str]
 
@@ -102,6 +230,10 @@ class ConfigModel(BaseModel):
     - db_max_table_limit (int): Maximum number of tables allowed in the database.
     - max_file_limit (int): Maximum number of files allowed for uploads.
     - llm_configs (LLMConfigs): Configuration settings for the LLM.
+    - vector_store_configs (VectorStoreConfigs): Configuration settings for the vector stores.
+    - job_configs (JobConfigs): Configuration settings for the background jobs.
+    - upload_configs (UploadConfigs): Configuration settings for uploads and their quotas.
+    - security_configs (SecurityConfigs): Configuration settings for password hashing.
     - end_points (EndPointsModel): API endpoint configurations.
     - server (ServerModel): Server configuration settings.
     - paths (PathsModel): Paths used in the application.
@@ -110,6 +242,10 @@ class ConfigModel(BaseModel):
     db_max_table_limit: int = Field(..., ge=1, le=65535)  # Valid range for table limits
     max_file_limit: int = Field(..., ge=1, le=65535)  # Valid range for file limits
     llm_configs: LLMConfigs
+    vector_store_configs: VectorStoreConfigs = Field(default_factory=VectorStoreConfigs)
+    job_configs: JobConfigs = Field(default_factory=JobConfigs)
+    upload_configs: UploadConfigs = Field(default_factory=UploadConfigs)
+    security_configs: SecurityConfigs = Field(default_factory=SecurityConfigs)
     end_points: EndPointsModel
     server: ServerModel
     paths: PathsModel
\ No newline at end of file
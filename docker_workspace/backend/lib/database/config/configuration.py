@@ -1,6 +1,15 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from lib.instances.instance import Instance
+from lib.tools.metrics import Counter, Gauge, Histogram, FAST_LATENCY_BUCKETS
+from lib.tools.tracing import TRACER
+from contextlib import AsyncExitStack
+import time
+
+# Labelled with "postgres" for the maintenance database and "temporary" for the sessions' databases
+DB_CONNECT_DURATION = Histogram("db_connect_duration_seconds", "Time to open a database connection.", ("database",), buckets=FAST_LATENCY_BUCKETS)
+DB_CONNECTIONS_OPEN = Gauge("db_connections_open", "Database connections in use.", ("database",))
+DB_ERRORS = Counter("db_errors_total", "Database connections that failed or raised an error while in use.", ("database",))
 
 async def getAsyncUserDB():
     """
@@ -18,11 +27,12 @@ async def getAsyncUserDB():
     # Construct the database URL for the user database
     database_user_database_name = instance.async_database_url + "/" + instance.user_database_name
     try:
-        # Create an asynchronous engine for the user database
-        async_user_engine = create_async_engine(database_user_database_name, echo=False, isolation_level="AUTOCOMMIT")
-        
-        # Create a local sessionmaker for asynchronous sessions
-        async_user_session_local = sessionmaker(bind=async_user_engine, class_=AsyncSession, expire_on_commit=False)
+        with TRACER.span("db.create_engine", attributes={"db.system": "postgresql", "db.name": "user"}):
+            # Create an asynchronous engine for the user database
+            async_user_engine = create_async_engine(database_user_database_name, echo=False, isolation_level="AUTOCOMMIT")
+            
+            # Create a local sessionmaker for asynchronous sessions
+            async_user_session_local = sessionmaker(bind=async_user_engine, class_=AsyncSession, expire_on_commit=False)
         
         # Yield a session for use in the context
         async with async_user_session_local() as db:
@@ -47,13 +57,24 @@ async def getAsyncDB(database_name: str):
 
     # Construct the database URL for the specified database
     database_user_database_name = instance.async_database_url + "/" + database_name
+    database_label = "postgres" if database_name == "postgres" else "temporary"  # Session database names aren't used as labels
     try:
-        # Create an asynchronous engine for the specified database
-        async_user_engine = create_async_engine(database_user_database_name, echo=False, isolation_level="AUTOCOMMIT")
-        
-        # Yield a connection for use in the context
-        async with async_user_engine.connect() as db:
-            yield db
+        async with AsyncExitStack() as stack:
+            # The span ends once connected, so it isn't the parent of the caller's spans
+            with TRACER.span("db.connect", kind="CLIENT", attributes={"db.system": "postgresql", "db.name": database_label}):
+                # Create an asynchronous engine for the specified database
+                async_user_engine = create_async_engine(database_user_database_name, echo=False, isolation_level="AUTOCOMMIT")
+
+                # Open a connection for use in the context
+                start = time.perf_counter()
+                db = await stack.enter_async_context(async_user_engine.connect())
+            DB_CONNECT_DURATION.observe(time.perf_counter() - start, database_label)
+            DB_CONNECTIONS_OPEN.inc(database_label)
+            try:
+                yield db
+            finally:
+                DB_CONNECTIONS_OPEN.dec(database_label)
     except Exception as e:
         # Raise an exception if there is an error connecting to the database
+        DB_ERRORS.inc(database_label)
         raise Exception(f"Database error: {e}")
\ No newline at end of file
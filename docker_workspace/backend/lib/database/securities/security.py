@@ -1,21 +1,47 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 
-# Create a CryptContext instance for password hashing using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def createPasswordContext(bcrypt_rounds: int = 12, argon2_time_cost: int = 3, argon2_memory_cost: int = 65536, argon2_parallelism: int = 1) -> CryptContext:
+    """
+    @brief Creates the CryptContext used for password hashing.
+
+    New passwords are hashed with argon2. Hashes of the deprecated bcrypt scheme, and
+    argon2 hashes created with other costs, are still verified but reported as outdated,
+    so they can be replaced when the user logs in.
+
+    @param bcrypt_rounds The log2 cost of the bcrypt hashes still verified.
+    @param argon2_time_cost The number of argon2 iterations.
+    @param argon2_memory_cost The memory used by argon2 in KiB.
+    @param argon2_parallelism The number of argon2 lanes.
+    @return The configured CryptContext.
+    """
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+        bcrypt__rounds=bcrypt_rounds
+    )
 
-def getPasswordHash(password: str) -> str:
+# Create a CryptContext instance for password hashing with the default costs
+pwd_context = createPasswordContext()
+
+def getPasswordHash(password: str, context: CryptContext = pwd_context) -> str:
     """
     @brief Hashes a plaintext password.
 
     This function takes a plaintext password and returns its hashed version
-    using the bcrypt algorithm for secure storage.
+    using the preferred scheme of the context for secure storage.
 
     @param password The plaintext password to be hashed.
+    @param context The CryptContext to hash with.
     @return The hashed password as a string.
     """
-    return pwd_context.hash(password)  # Hash the password using the defined context
+    return context.hash(password)  # Hash the password using the defined context
 
-def verifyPassword(plain_password: str, hashed_password: str) -> bool:
+def verifyPassword(plain_password: str, hashed_password: str, context: CryptContext = pwd_context) -> bool:
     """
     @brief Verifies a plaintext password against a hashed password.
 
@@ -24,6 +50,53 @@ def verifyPassword(plain_password: str, hashed_password: str) -> bool:
 
     @param plain_password The plaintext password to verify.
     @param hashed_password The previously hashed password to compare against.
+    @param context The CryptContext to verify with.
     @return True if the passwords match, otherwise False.
     """
-    return pwd_context.verify(plain_password, hashed_password)  # Verify the plaintext password against the hashed password
\ No newline at end of file
+    return context.verify(plain_password, hashed_password)  # Verify the plaintext password against the hashed password
+
+class PasswordHasher:
+    """
+    @brief Hashes and verifies passwords without blocking the event loop.
+
+    A single hash takes hundreds of milliseconds of CPU time by design. The hashes are
+    computed in a dedicated pool of a fixed number of threads, which bcrypt and argon2 run
+    in without holding the GIL, so a burst of logins waits for the pool instead of stalling
+    every other request, and never uses more than its threads' cores.
+
+    @param context The CryptContext to hash and verify with.
+    @param max_workers The number of passwords hashed at the same time.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int) -> None:
+        self.context = context
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+
+    async def hash(self, password: str) -> str:
+        """
+        @brief Hashes a plaintext password in the pool.
+
+        @param password The plaintext password.
+        @return The hashed password.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, getPasswordHash, password, self.context)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> tuple:
+        """
+        @brief Verifies a plaintext password in the pool and rehashes outdated hashes.
+
+        @param plain_password The plaintext password.
+        @param hashed_password The stored hash.
+        @return Tuple of whether the password matches and, if the stored hash uses a
+                deprecated scheme or other costs, its replacement; otherwise None.
+        """
+        valid, new_hash = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.context.verify_and_update, plain_password, hashed_password
+        )
+        return valid, new_hash
+
+    def shutdown(self) -> None:
+        """
+        @brief Stops the threads of the pool once the running hashes finished.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,16 @@
 from lib.config_parser.config_parser import Configuration
 from lib.tools.redis import RedisTool
+from lib.tools.job_queue import JobQueue
+from lib.tools.chunked_upload import ChunkedUploadStore
+from lib.tools.upload_quota import UploadQuota
+from lib.database.securities.security import PasswordHasher, createPasswordContext
 from lib.ai.memory.memory import CustomMemoryDict
 from lib.ai.llm.llm import LLM
+from lib.ai.llm.llm_scheduler import LLMScheduler
+from lib.ai.llm.llm_cache import CachedLLM
 from lib.ai.llm.embedding import Embedding
+from lib.ai.llm.embedding_scheduler import EmbeddingScheduler
+from lib.ai.agents.answer_cache import SemanticAnswerCache
 
 class Instance:
     _instance = None
@@ -35,7 +43,47 @@ class Instance:
         # Initialize various attributes from the configuration
         self.llm_model_name = self.config.getLLMModelName()
         self.embedding_model_name = self.config.getEmbeddingLLMModelName()
+        self.embedding_dimensions = self.config.getEmbeddingDimensions()
+        self.embedding_batch_tokens = self.config.getEmbeddingBatchTokens()
+        self.embedding_max_concurrency = self.config.getEmbeddingMaxConcurrency()
+        self.embedding_max_retries = self.config.getEmbeddingMaxRetries()
         self.llm_max_iteration = self.config.getLLMMaxIteration()
+        self.agent_mode = self.config.getAgentMode()
+        self.llm_backend = self.config.getLLMBackend()
+        self.embedding_backend = self.config.getEmbeddingBackend()
+        self.fake_llm_script = self.config.getFakeLLMScript()
+        self.fake_llm_latency_distribution = self.config.getFakeLLMLatencyDistribution()
+        self.fake_llm_latency_mean = self.config.getFakeLLMLatencyMean()
+        self.fake_llm_latency_stddev = self.config.getFakeLLMLatencyStddev()
+        self.fake_llm_seed = self.config.getFakeLLMSeed()
+        self.llm_cache = self.config.getLLMCache()
+        self.llm_cache_ttl = self.config.getLLMCacheTTL()
+        self.llm_max_concurrency = self.config.getLLMMaxConcurrency()
+        self.llm_tokens_per_minute = self.config.getLLMTokensPerMinute()
+        self.llm_max_queue = self.config.getLLMMaxQueue()
+        self.llm_request_budget = self.config.getLLMRequestBudget()
+        self.llm_hedging = self.config.getLLMHedging()
+        self.llm_hedge_quantile = self.config.getLLMHedgeQuantile()
+        self.answer_cache_enabled = self.config.getAnswerCache()
+        self.answer_cache_threshold = self.config.getAnswerCacheThreshold()
+        self.answer_cache_max_entries = self.config.getAnswerCacheMaxEntries()
+        self.answer_cache_max_datasets = self.config.getAnswerCacheMaxDatasets()
+        self.answer_cache_ttl = self.config.getAnswerCacheTTL()
+        self.index_factory = self.config.getIndexFactory()
+        self.dedup_threshold = self.config.getDedupThreshold()
+        self.job_worker_concurrency = self.config.getJobWorkerConcurrency()
+        self.job_local_workers = self.config.getJobLocalWorkers()
+        self.job_ttl = self.config.getJobTTL()
+        self.job_visibility_timeout = self.config.getJobVisibilityTimeout()
+        self.upload_part_size = self.config.getUploadPartSize()
+        self.upload_ttl = self.config.getUploadTTL()
+        self.session_byte_quota = self.config.getSessionByteQuota()
+        self.session_row_quota = self.config.getSessionRowQuota()
+        self.password_hash_workers = self.config.getPasswordHashWorkers()
+        self.bcrypt_rounds = self.config.getBcryptRounds()
+        self.argon2_time_cost = self.config.getArgon2TimeCost()
+        self.argon2_memory_cost = self.config.getArgon2MemoryCost()
+        self.argon2_parallelism = self.config.getArgon2Parallelism()
         self.signup_end_point = self.config.getSignUpEndpoint()
         self.login_end_point = self.config.getLoginEndpoint()
         self.start_session_end_point = self.config.getStartSessionEndpoint()
@@ -47,6 +95,12 @@ class Instance:
         self.rag_query_end_point = self.config.getRagQueryEndpoint()
         self.clear_session_end_point = self.config.getClearSessionEndpoint()
         self.end_session_end_point = self.config.getEndSessionEndpoint()
+        self.upload_init_end_point = self.config.getUploadInitEndpoint()
+        self.upload_part_end_point = self.config.getUploadPartEndpoint()
+        self.upload_status_end_point = self.config.getUploadStatusEndpoint()
+        self.upload_complete_end_point = self.config.getUploadCompleteEndpoint()
+        self.metrics_end_point = self.config.getMetricsEndpoint()
+        self.trace_end_point = self.config.getTraceEndpoint()
         self.session_timeout = self.config.getSessionTimeout()
         self.db_max_table_limit = self.config.getDbMaxTableLimit()
         self.max_file_limit = self.config.getMaxFileLimit()
@@ -58,13 +112,46 @@ class Instance:
         self.app_ip = self.config.getAppIP()
         self.app_port = self.config.getAppPort()
         self.log_file_path = self.config.getLogFilePath()
+        self.corpus_dir = self.config.getCorpusDir()
+        self.upload_dir = self.config.getUploadDir()
         self.check_list = self.config.getCheckList()
         self.origin_list = self.config.getOriginList()
 
         # Initialize memory and AI components
         self.memory = CustomMemoryDict()  # Create an instance of custom memory
-        self.llm = LLM(llm_model_name=self.llm_model_name)  # Initialize the LLM
-        self.embedding = Embedding(model_name=self.embedding_model_name).get_embedding()  # Get embedding model
+        self.llm = LLMScheduler(
+            llm=LLM(
+                llm_model_name=self.llm_model_name,
+                backend=self.llm_backend,
+                script_path=self.fake_llm_script,
+                latency_distribution=self.fake_llm_latency_distribution,
+                latency_mean=self.fake_llm_latency_mean,
+                latency_stddev=self.fake_llm_latency_stddev,
+                seed=self.fake_llm_seed
+            ),
+            max_concurrency=self.llm_max_concurrency,
+            tokens_per_minute=self.llm_tokens_per_minute,
+            max_queue=self.llm_max_queue,
+            hedging=self.llm_hedging,
+            hedge_quantile=self.llm_hedge_quantile
+        )  # Initialize the LLM, limited by concurrency and tokens per minute for the whole process
+        self.embedding = Embedding(
+            model_name=self.embedding_model_name,
+            dimensions=self.embedding_dimensions,
+            backend=self.embedding_backend
+        ).get_embedding()  # Get embedding model
+        self.embedding_scheduler = EmbeddingScheduler(
+            embeddings=self.embedding,
+            max_batch_tokens=self.embedding_batch_tokens,
+            max_concurrency=self.embedding_max_concurrency,
+            max_retries=self.embedding_max_retries
+        )  # Shares the embedding rate limit fairly between the sessions
+        self.answer_cache = SemanticAnswerCache(
+            threshold=self.answer_cache_threshold,
+            max_entries=self.answer_cache_max_entries,
+            max_datasets=self.answer_cache_max_datasets,
+            ttl=self.answer_cache_ttl
+        ) if self.answer_cache_enabled else None  # Reuses answers to similar questions on the same dataset
         self.redis_tool = RedisTool(
             memory=self.memory,
             session_timeout=self.session_timeout,
@@ -72,5 +159,28 @@ class Instance:
             redis_port=self.redis_port,
             async_database_url=self.async_database_url
         )  # Initialize the Redis tool with the necessary parameters
+        if self.llm_cache:
+            self.llm = CachedLLM(llm=self.llm, redis=self.redis_tool.redis, ttl=self.llm_cache_ttl)  # Answers repeated prompts from Redis
+        self.job_queue = JobQueue(redis=self.redis_tool.redis, job_ttl=self.job_ttl, visibility_timeout=self.job_visibility_timeout)  # Queue of the background jobs, such as uploads
+        self.upload_store = ChunkedUploadStore(
+            redis=self.redis_tool.redis,
+            upload_dir=self.upload_dir,
+            part_size=self.upload_part_size,
+            upload_ttl=self.upload_ttl
+        )  # Uploads sent in parts until they are complete
+        self.upload_quota = UploadQuota(
+            redis=self.redis_tool.redis,
+            byte_quota=self.session_byte_quota,
+            row_quota=self.session_row_quota
+        )  # Bytes and rows uploaded by every session
+        self.password_hasher = PasswordHasher(
+            context=createPasswordContext(
+                bcrypt_rounds=self.bcrypt_rounds,
+                argon2_time_cost=self.argon2_time_cost,
+                argon2_memory_cost=self.argon2_memory_cost,
+                argon2_parallelism=self.argon2_parallelism
+            ),
+            max_workers=self.password_hash_workers
+        )  # Hashes passwords beside the event loop
 
         self._initialized = True  # Set the initialized flag to True
\ No newline at end of file
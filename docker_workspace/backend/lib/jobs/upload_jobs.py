@@ -0,0 +1,434 @@
+from sqlalchemy import create_engine, text
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from lib.ai.vector_store.vector_store import SessionVectorStore
+from lib.ai.vector_store.corpus import DocumentCorpus
+from lib.ai.vector_store.dedup import ChunkDeduplicator
+from lib.ai.agents.answer_cache import getDatasetVersion
+from lib.tools.upload_quota import QuotaExceededError
+from lib.instances.instance import Instance
+import pandas as pd
+import os, asyncio, hashlib, json, shutil, time, aiofiles
+
+instance = Instance()
+
+# Chunking of uploaded PDF files; part of the corpus key since it changes the stored chunks
+VECTOR_STORES_DIR = "./.vector_stores"  # Holds one vector store directory per session
+PDF_CHUNK_SIZE = 1000
+PDF_CHUNK_OVERLAP = 200
+PDF_SEPARATORS = ["\n\n", "\n", ".", " "]
+
+CSV_CHUNK_ROWS = 50000  # Rows of a CSV file read and stored at a time
+READ_SIZE = 1 << 20  # Stored PDF files are read in 1 MiB pieces
+PROGRESS_INTERVAL = 0.5  # Minimum seconds between two published progress updates
+
+async def _loadPDF(file_path: str) -> tuple:
+    """
+    @brief Loads a PDF file and splits it into chunks.
+
+    Duplicate chunks, like headers, footers and the text repeated by the chunk overlap, are
+    dropped so they aren't embedded, stored and retrieved several times.
+
+    @param file_path The path of the PDF file.
+    @return Tuple containing the deduplicated chunks and the page count.
+    """
+    pdf_loader = PyPDFLoader(file_path)
+    documents = await pdf_loader.aload()
+
+    # Split documents into smaller chunks
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=PDF_CHUNK_SIZE,
+        chunk_overlap=PDF_CHUNK_OVERLAP,
+        separators=PDF_SEPARATORS
+    )
+
+    split_documents = await text_splitter.atransform_documents(documents)
+    split_documents = ChunkDeduplicator(threshold=instance.dedup_threshold).deduplicate(split_documents)
+    return split_documents, len(documents)
+
+async def _reportProgress(job: dict, progress: int) -> None:
+    """
+    @brief Publishes the progress of an upload job to its session and its job record.
+
+    @param job The upload job.
+    @param progress The progress percentage, -1 for a failed upload.
+    """
+    await instance.redis_tool.updateSession(session_id=job["session_id"], key="progress", value=str(progress))
+    await instance.job_queue.updateJob(job["id"], progress=progress)
+
+class _ProgressReporter:
+    """
+    @brief Publishes the progress of an upload job by the bytes it processed.
+
+    Updates are throttled, so a large upload doesn't write to Redis for every piece, and
+    stay below 100 percent until the job finished.
+
+    @param job The upload job.
+    @param total_bytes The size of all uploaded files.
+    """
+
+    def __init__(self, job: dict, total_bytes: int) -> None:
+        self.job = job
+        self.total_bytes = max(total_bytes, 1)
+        self.progress = 0
+        self.published_at = 0.0
+
+    async def update(self, done_bytes: int) -> None:
+        """
+        @brief Publishes the progress if it changed and the last update is old enough.
+
+        @param done_bytes The number of processed bytes.
+        """
+        progress = min(99, int(done_bytes * 100 / self.total_bytes))
+        now = time.monotonic()
+        if progress > self.progress and now - self.published_at >= PROGRESS_INTERVAL:
+            self.progress = progress
+            self.published_at = now
+            await _reportProgress(self.job, progress)
+
+    async def finish(self) -> None:
+        """
+        @brief Publishes the completion of the job.
+        """
+        self.progress = 100
+        await _reportProgress(self.job, 100)
+
+def _getTotalBytes(files: list) -> int:
+    """
+    @brief Sums the sizes of the stored files of an upload job.
+
+    @param files The stored files.
+    @return The number of bytes to process.
+    """
+    return sum(os.path.getsize(file["path"]) for file in files)
+
+async def _reportStatus(job: dict, upload_status: str, message: str = "") -> None:
+    """
+    @brief Publishes the status of an upload job to its session.
+
+    @param job The upload job.
+    @param upload_status "running", "completed" or "failed".
+    @param message The result or error message.
+    """
+    await instance.redis_tool.updateSession(session_id=job["session_id"], key="upload_status", value=upload_status)
+    await instance.redis_tool.updateSession(session_id=job["session_id"], key="upload_message", value=message)
+
+def _hashFile(file_path: str) -> str:
+    """
+    @brief Computes the content hash of a stored file.
+
+    @param file_path The path of the file.
+    @return The SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as stored_file:
+        while piece := stored_file.read(READ_SIZE):
+            digest.update(piece)
+    return digest.hexdigest()
+
+async def _addToDataset(job: dict, agent: str, fingerprints: dict) -> None:
+    """
+    @brief Adds tables or files to the dataset of a session and publishes its new version.
+
+    The fingerprints of the dataset and its version, which keys the cached answers of the
+    agent, are stored in the session as "<agent>_dataset" and "<agent>_dataset_version".
+
+    @param job The upload job.
+    @param agent "sql" for tables, "rag" for files.
+    @param fingerprints The content hash of every added table or file, by its name.
+    """
+    session_id = job["session_id"]
+    stored = await instance.redis_tool.redis.hget(f"session:{session_id}", f"{agent}_dataset")
+    dataset = {**(json.loads(stored) if stored else {}), **fingerprints}
+    await instance.redis_tool.updateSession(session_id=session_id, key=f"{agent}_dataset", value=json.dumps(dataset, sort_keys=True))
+    await instance.redis_tool.updateSession(session_id=session_id, key=f"{agent}_dataset_version", value=getDatasetVersion(dataset))
+
+async def _publishPDFFiles(job: dict, added_files: dict, vector_store_path: str) -> None:
+    """
+    @brief Makes the files added to a session's vector store available to its queries.
+
+    @param job The upload job.
+    @param added_files The content addressed document keys of the added files, by their names.
+    @param vector_store_path The path of the session's vector store.
+    """
+    await _addToDataset(job, "rag", added_files)
+    await instance.redis_tool.updateSession(session_id=job["session_id"], key="vector_store_path", value=vector_store_path)
+
+async def _startUpload(job: dict) -> None:
+    """
+    @brief Marks an upload job as running in its session.
+
+    @param job The upload job.
+
+    @exception RuntimeError If the session ended while the job was queued.
+    """
+    # Updating an ended session would recreate it
+    if not await instance.redis_tool.redis.exists(f"session:{job['session_id']}"):
+        raise RuntimeError("The session ended before the upload was processed.")
+    await _reportStatus(job, "running")
+
+async def _hashUpload(file_path: str, reporter: _ProgressReporter, done_bytes: int) -> tuple:
+    """
+    @brief Hashes a file stored by the upload endpoint piece by piece, reporting the bytes read.
+
+    Reading counts as the first half of the work on a file.
+
+    @param file_path The path of the stored file.
+    @param reporter The progress reporter of the job.
+    @param done_bytes The bytes of the job processed before this file.
+    @return A (SHA-256 hex digest, byte size) tuple of the file.
+    """
+    digest = hashlib.sha256()
+    read_bytes = 0
+    async with aiofiles.open(file_path, "rb") as upload_file:
+        while piece := await upload_file.read(READ_SIZE):
+            digest.update(piece)
+            read_bytes += len(piece)
+            await reporter.update(done_bytes + read_bytes // 2)
+    return digest.hexdigest(), read_bytes
+
+def _getTableNames(engine) -> list:
+    """
+    @brief Lists the tables of the temporary database.
+
+    @param engine The engine of the temporary database.
+    @return The names of the tables.
+    """
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = 'public';"))]
+
+def _writeCSVChunk(engine, df: pd.DataFrame, table_name: str, first_chunk: bool) -> None:
+    """
+    @brief Stores rows of a CSV file in the temporary database.
+
+    @param engine The engine of the temporary database.
+    @param df The rows.
+    @param table_name The table of the file.
+    @param first_chunk Whether the rows start the file, replacing a table of the same name.
+    """
+    with engine.connect() as connection:
+        df.to_sql(table_name, con=connection, index=False, if_exists="replace" if first_chunk else "append")
+
+def _dropTable(engine, table_name: str) -> None:
+    """
+    @brief Removes the partially stored table of a CSV file that failed.
+
+    @param engine The engine of the temporary database.
+    @param table_name The table of the file.
+    """
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {engine.dialect.identifier_preparer.quote(table_name)}"))
+
+async def _storeCSVFile(job: dict, engine, file: dict, table_name: str, reporter: _ProgressReporter, done_bytes: int) -> None:
+    """
+    @brief Streams a CSV file into a table in chunks of rows.
+
+    Only one chunk is held in memory, and its rows are counted against the session's row
+    quota before they are stored. If the file fails, its table and rows are discarded again.
+
+    @param job The upload job.
+    @param engine The engine of the temporary database.
+    @param file The stored file.
+    @param table_name The table of the file.
+    @param reporter The progress reporter of the job.
+    @param done_bytes The bytes of the job processed before this file.
+
+    @exception QuotaExceededError If the file exceeds the session's row quota.
+    """
+    session_id = job["session_id"]
+    stored_rows = 0  # Rows counted against the quota
+    first_chunk = True
+    try:
+        with open(file["path"], "rb") as csv_file:
+            reader = await asyncio.to_thread(pd.read_csv, csv_file, chunksize=CSV_CHUNK_ROWS)
+            with reader:
+                while (df := await asyncio.to_thread(next, reader, None)) is not None:
+                    await instance.upload_quota.reserveRows(session_id=session_id, row_count=len(df))
+                    stored_rows += len(df)
+                    await asyncio.to_thread(_writeCSVChunk, engine, df, table_name, first_chunk)
+                    first_chunk = False
+                    await reporter.update(done_bytes + csv_file.tell())
+    except Exception:
+        if stored_rows or not first_chunk:
+            await asyncio.to_thread(_dropTable, engine, table_name)
+        if stored_rows:
+            await instance.upload_quota.releaseRows(session_id=session_id, row_count=stored_rows)
+        raise
+
+async def processCSVUpload(job: dict) -> str:
+    """
+    @brief Converts uploaded CSV files to tables of the session's temporary database.
+
+    Progress is published by the bytes of the files read so far. A file exceeding the
+    session's row quota fails the job; the files converted before it are kept. The jobs of a
+    session run one at a time, so table names are chosen from the tables stored by now.
+
+    @param job The upload job; its payload holds the stored "files", the "upload_dir" and the
+               "sync_temp_db_url" of the temporary database.
+    @return Information message indicating successful upload.
+    """
+    payload = job["payload"]
+    try:
+        await _startUpload(job)
+        try:
+            reporter = _ProgressReporter(job, _getTotalBytes(payload["files"]))
+            done_bytes = 0
+            engine = create_engine(payload["sync_temp_db_url"])
+            db_tables = await asyncio.to_thread(_getTableNames, engine)
+
+            for file in payload["files"]:
+                table_name = os.path.splitext(file["filename"])[0]  # Extract table name from filename
+
+                # Ensure unique table name by appending a counter if necessary
+                table_counter = 1
+                original_table_name = table_name
+                while table_name in db_tables:
+                    table_name = f"{original_table_name}_{table_counter}"
+                    table_counter += 1
+
+                db_tables.append(table_name)  # Add the new table name to the list
+
+                # Save the file to the temporary database
+                await _storeCSVFile(job, engine, file, table_name, reporter, done_bytes)
+                await _addToDataset(job, "sql", {table_name: await asyncio.to_thread(_hashFile, file["path"])})
+
+                done_bytes += os.path.getsize(file["path"])
+                await reporter.update(done_bytes)
+
+            # Final progress update to 100%
+            await reporter.finish()
+        except QuotaExceededError as e:
+            await _reportProgress(job, -1)
+            await _reportStatus(job, "failed", f"Failed to convert CSV file. {str(e)}")
+            raise
+        except Exception as e:
+            await _reportProgress(job, -1)
+            await _reportStatus(job, "failed", f"Failed to convert CSV file. Error: {str(e)}")
+            raise
+    finally:
+        await asyncio.to_thread(shutil.rmtree, payload["upload_dir"], ignore_errors=True)
+
+    message = "CSV files uploaded and converted to database successfully."
+    await _reportStatus(job, "completed", message)
+    return message
+
+async def processPDFUpload(job: dict) -> str:
+    """
+    @brief Adds uploaded PDF files to the session's vector store.
+
+    Documents are stored once in the shared document corpus, keyed by their content: a
+    document that was ingested before, by any session, is only referenced, and a new one is
+    parsed, embedded and stored as an immutable segment first. The jobs of a session run
+    one at a time, so file names are chosen from the manifest as it stands.
+
+    @param job The upload job; its payload holds the stored "files" and the "upload_dir".
+    @return Information message indicating successful upload.
+    """
+    session_id = job["session_id"]
+    payload = job["payload"]
+    vector_store_path = f"{VECTOR_STORES_DIR}/{session_id}"
+    added_files = {}  # Content addressed document keys of the files added to the session
+
+    try:
+        await _startUpload(job)
+        try:
+            # Embedding requests are queued with those of the other sessions
+            embeddings = instance.embedding_scheduler.forSession(session_id)
+
+            # Every file only adds a reference to the manifest, so existing segments don't need to be loaded
+            vector_store = SessionVectorStore(vector_store_path=vector_store_path, embeddings=embeddings)
+            corpus = DocumentCorpus(
+                corpus_dir=instance.corpus_dir,
+                embeddings=embeddings,
+                index_factory=instance.index_factory,
+                ingest_settings={
+                    "embedding_model_name": instance.embedding_model_name,
+                    "embedding_dimensions": instance.embedding_dimensions,
+                    "chunk_size": PDF_CHUNK_SIZE,
+                    "chunk_overlap": PDF_CHUNK_OVERLAP,
+                    "separators": PDF_SEPARATORS,
+                    "dedup_threshold": instance.dedup_threshold
+                }
+            )
+
+            # Reading a file counts as half of its work and ingesting it as the other half
+            reporter = _ProgressReporter(job, _getTotalBytes(payload["files"]))
+            done_bytes = 0
+
+            for file in payload["files"]:
+                parsed_file_name = os.path.splitext(file["filename"])[0]
+                existing_file_list = [os.path.splitext(f)[0] for f in vector_store.getFileNames()]
+
+                # Ensure unique file name by appending a counter if necessary
+                file_name_counter = 1
+                original_parsed_file_name = parsed_file_name
+
+                while parsed_file_name in existing_file_list:
+                    parsed_file_name = f"{original_parsed_file_name}_{file_name_counter}"
+                    file_name_counter += 1
+
+                parsed_file_name += ".pdf"  # Ensure the file has a .pdf extension
+
+                content_hash, file_size = await _hashUpload(file["path"], reporter, done_bytes)
+
+                # Ingest the document unless the corpus already holds it, then reference it from the session
+                document_key, entry = await corpus.getOrIngest(file_path=file["path"], content_hash=content_hash, loader=_loadPDF)
+                vector_store.addSharedSegment(
+                    file_name=parsed_file_name,
+                    segment_id=document_key,
+                    segment_dir=corpus.getSegmentDir(document_key),
+                    chunk_count=entry["chunks"],
+                    page_count=entry["pages"],
+                    byte_size=entry["bytes"]
+                )
+                added_files[parsed_file_name] = document_key
+
+                # Update progress after processing the documents
+                done_bytes += file_size
+                await reporter.update(done_bytes)
+
+            await reporter.finish()
+        except Exception as e:
+            # Files are only added to the manifest once stored, so files added before the error stay valid
+            if added_files:
+                await _publishPDFFiles(job, added_files, vector_store_path)
+            await _reportProgress(job, -1)
+            await _reportStatus(job, "failed", f"Failed to convert PDF file. Error: {str(e)}")
+            raise
+    finally:
+        await asyncio.to_thread(shutil.rmtree, payload["upload_dir"], ignore_errors=True)
+
+    # Update session with the files and the vector store path
+    await _publishPDFFiles(job, added_files, vector_store_path)
+
+    message = "PDF files uploaded and converted to database successfully."
+    await _reportStatus(job, "completed", message)
+    return message
+
+async def failAbandonedUpload(job: dict) -> None:
+    """
+    @brief Publishes the failure of an upload job whose worker stopped and removes its stored files.
+
+    Tables, files and rows the worker stored before it stopped are kept.
+
+    @param job The abandoned upload job.
+    """
+    try:
+        # Updating an ended session would recreate it
+        if await instance.redis_tool.redis.exists(f"session:{job['session_id']}"):
+            await _reportProgress(job, -1)
+            await _reportStatus(job, "failed", "The upload was interrupted. Please upload the files again.")
+    finally:
+        await asyncio.to_thread(shutil.rmtree, job["payload"]["upload_dir"], ignore_errors=True)
+
+# Handlers of the upload job types, run by the JobWorkerPool
+UPLOAD_JOB_HANDLERS = {
+    "upload_csv": processCSVUpload,
+    "upload_pdf": processPDFUpload
+}
+
+# Failure handlers of the upload job types abandoned by a stopped worker
+UPLOAD_FAILURE_HANDLERS = {
+    "upload_csv": failAbandonedUpload,
+    "upload_pdf": failAbandonedUpload
+}
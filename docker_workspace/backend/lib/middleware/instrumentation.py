@@ -0,0 +1,141 @@
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from lib.tools.metrics import Counter, Gauge, Histogram, SIZE_BUCKETS
+from lib.tools.tracing import TRACER
+import logging, time, json
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+UNMATCHED_ROUTE = "<unmatched>"  # Route label of requests no route matched, so unknown paths don't add label values
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time from receiving a request until its response was sent.", ("method", "route"))
+REQUESTS_TOTAL = Counter("http_requests_total", "Number of handled requests.", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Number of requests being handled.", ("method",))
+REQUEST_SIZE = Histogram("http_request_size_bytes", "Size of the request bodies.", ("method", "route"), buckets=SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Size of the response bodies.", ("method", "route"), buckets=SIZE_BUCKETS)
+
+INTERNAL_ERROR_BODY = json.dumps({"detail": "Unexpected internal server error"}).encode()
+
+def getRouteLabel(scope: Scope) -> str:
+    """
+    @brief Returns the path template of the route that handled a request.
+
+    @param scope The ASGI scope of the request, after routing.
+    @return The template, such as "/upload_part", or UNMATCHED_ROUTE.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+def getHeader(scope: Scope, name: bytes) -> str:
+    """
+    @brief Returns a header of a request.
+
+    @param scope The ASGI scope of the request.
+    @param name The lowercase header name.
+    @return The header value, None if the request has none.
+    """
+    for header_name, value in scope.get("headers", ()):
+        if header_name == name:
+            return value.decode("latin-1")
+    return None
+
+def getContentLength(scope: Scope) -> int:
+    """
+    @brief Returns the size a request declares for its body.
+
+    Bodies without a Content-Length, or only partly read by their endpoint, are measured
+    by the bytes received instead.
+
+    @param scope The ASGI scope of the request.
+    @return The declared size, 0 if there is none.
+    """
+    content_length = getHeader(scope, b"content-length") or ""
+    return int(content_length) if content_length.isdigit() else 0
+
+class InstrumentationMiddleware:
+    """
+    @brief Pure ASGI middleware recording request metrics and traces and logging unexpected errors.
+
+    For every HTTP request, the latency, status, request and response body sizes are
+    recorded per route template, and the number of requests in flight per method. The
+    messages are passed on unchanged, so streaming responses and request bodies keep
+    streaming, and no task is created per request.
+
+    Every request runs in the root span of a trace, continuing the trace of a W3C traceparent
+    header if the caller sent one. The trace id is returned in the X-Trace-Id header and the
+    root span in a traceparent header.
+
+    An unexpected exception is logged and answered with a 500 response if the response
+    hasn't started yet.
+
+    @param app The ASGI application to wrap.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+        start = time.perf_counter()
+        request_size = 0
+        declared_size = getContentLength(scope)
+        response_size = 0
+        status_code = 500
+        response_started = False
+
+        span = TRACER.startTrace(f"{method} request", traceparent=getHeader(scope, b"traceparent"), attributes={
+            "http.request.method": method,
+            "url.path": scope.get("path", ""),
+        })
+        trace_headers = [
+            (b"x-trace-id", span.trace_id.encode()),
+            (b"traceparent", f"00-{span.trace_id}-{span.span_id}-01".encode()),
+        ]
+
+        async def receiveWrapper() -> Message:
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def sendWrapper(message: Message) -> None:
+            nonlocal response_size, status_code, response_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = True
+                message = {**message, "headers": list(message.get("headers", [])) + trace_headers}
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        try:
+            with TRACER.activate(span):
+                await self.app(scope, receiveWrapper, sendWrapper)
+        except Exception as e:
+            # Log the error details with the request method, path and trace
+            logging.error(f"Error processing request {method} {scope.get('path')} in trace {span.trace_id}: {str(e)}", exc_info=True)
+            if response_started:
+                raise
+            await sendWrapper({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(INTERNAL_ERROR_BODY)).encode())]
+            })
+            await sendWrapper({"type": "http.response.body", "body": INTERNAL_ERROR_BODY})
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method)
+            route = getRouteLabel(scope)
+            REQUEST_DURATION.observe(time.perf_counter() - start, method, route)
+            REQUESTS_TOTAL.inc(method, route, str(status_code))
+            REQUEST_SIZE.observe(max(declared_size, request_size), method, route)
+            RESPONSE_SIZE.observe(response_size, method, route)
+
+            span.name = f"{method} {route}"
+            span.setAttribute("http.route", route)
+            span.setAttribute("http.response.status_code", status_code)
+            if status_code >= 500:
+                span.setStatus("ERROR")
@@ -11,4 +11,21 @@ class InformationResponse(BaseModel):
     Attributes:
     - informationMessage (str): A string containing the information message to be conveyed.
     """
-    informationMessage: str
\ No newline at end of file
+    informationMessage: str
+class UploadStatusResponse(BaseModel):
+    """
+    @brief Represents the state of an upload sent in parts.
+
+    This model is used to structure the output data telling the client
+    where to continue an upload, for example after a connection loss.
+
+    Attributes:
+    - uploadId (str): The ID of the upload.
+    - offset (int): The number of bytes received so far, where the next part starts.
+    - fileSize (int): The size of the uploaded file in bytes.
+    - partSize (int): The maximum size of a part in bytes.
+    """
+    uploadId: str
+    offset: int
+    fileSize: int
+    partSize: int
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class ProgressResponse(BaseModel):
     """
@@ -10,5 +11,25 @@ class ProgressResponse(BaseModel):
     
     Attributes:
     - progress (int): An integer representing the current progress percentage (0-100).
+    - status (Optional[str]): The status of the session's last upload job ("queued", "running", "completed" or "failed").
+    - message (Optional[str]): The result or error message of the finished upload job.
     """
-    progress: int
\ No newline at end of file
+    progress: int
+    status: Optional[str] = None
+    message: Optional[str] = None
+
+class TraceResponse(BaseModel):
+    """
+    @brief Represents the trace of a request.
+
+    This model is used to structure the output data showing where the time
+    of a request went, such as LLM calls, SQL queries and Redis commands.
+
+    Attributes:
+    - traceId (str): The ID of the trace, returned in the X-Trace-Id header of the request.
+    - durationMs (float): The duration of the longest span in milliseconds, usually the request's.
+    - spans (List[dict]): The spans in the OpenTelemetry (OTLP JSON) format, ordered by their start.
+    """
+    traceId: str
+    durationMs: float
+    spans: List[dict]
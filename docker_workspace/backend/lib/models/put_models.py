@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Define regex patterns for validating uploaded file types and SHA-256 checksums
+file_type_pattern = r"^(csv|pdf)$"
+sha256_pattern = r"^[0-9a-fA-F]{64}$"
+
+class JobResponse(BaseModel):
+    """
+    @brief Represents the response to a request that queued a background job.
+
+    This model is used to validate and structure the output data returned
+    when work is accepted to be processed later, such as an upload.
+
+    Attributes:
+    - informationMessage (str): A string containing the information message to be conveyed.
+    - jobId (str): The ID of the queued job.
+    """
+    informationMessage: str
+    jobId: str
+
+class UploadInitRequest(BaseModel):
+    """
+    @brief Represents a request to start an upload sent in parts.
+
+    Attributes:
+    - fileName (str): The name of the uploaded file.
+    - fileType (str): The type of the file, "csv" or "pdf".
+    - fileSize (int): The size of the file in bytes.
+    - checksum (Optional[str]): The SHA-256 hex digest of the whole file, verified once the upload is complete.
+    """
+    fileName: str = Field(..., min_length=1, max_length=255)
+    fileType: str = Field(..., pattern=file_type_pattern)
+    fileSize: int = Field(..., ge=1)
+    checksum: Optional[str] = Field(None, pattern=sha256_pattern)
+
+class UploadCompleteRequest(BaseModel):
+    """
+    @brief Represents a request to process completed uploads.
+
+    Attributes:
+    - uploadIds (List[str]): The IDs of the uploads, all of the same file type, processed by one job.
+    """
+    uploadIds: List[str] = Field(..., min_length=1)
@@ -115,6 +115,14 @@ async def clearSession(response: Response, session: tuple = Depends(instance.red
     @param vs_deleted Boolean indicating if the vector store was deleted.
     @return Information message indicating session clearance.
     """
+    session_id, _ = session
+
+    # The cleared uploads no longer count against the session's quotas
+    await instance.upload_quota.resetUsage(session_id=session_id)
+
+    # Nor are questions answered from the answers cached for them
+    await instance.redis_tool.redis.hdel(f"session:{session_id}", "sql_dataset", "sql_dataset_version", "rag_dataset", "rag_dataset_version")
+
     return {"informationMessage": "Session cleared."}
 
 @router.post(instance.end_session_end_point, response_model=InformationResponse)
@@ -1,8 +1,10 @@
-from fastapi import (APIRouter, Depends, HTTPException, status)
-from fastapi.responses import JSONResponse
-from lib.models.get_models import ProgressResponse
-from lib.models.general_models import InformationResponse
+from fastapi import (APIRouter, Depends, HTTPException, status, Query)
+from fastapi.responses import JSONResponse, PlainTextResponse
+from lib.models.get_models import ProgressResponse, TraceResponse
+from lib.models.general_models import InformationResponse, UploadStatusResponse
 from lib.instances.instance import Instance
+from lib.tools.metrics import REGISTRY
+from lib.tools.tracing import EXPORTER
 
 instance = Instance()
 
@@ -38,7 +40,8 @@ async def getProgress(session: tuple = Depends(instance.redis_tool.getSession)):
     @brief Retrieves the progress of the current session.
 
     This endpoint checks the session data for the progress value.
-    If the progress is not found, it raises an HTTP 404 error.
+    If the progress is not found, it raises an HTTP 404 error. While an upload
+    job exists, its status and result message are returned as well.
 
     @param session The session data dependency for validation.
     @return JSON response containing the current progress.
@@ -51,4 +54,68 @@ async def getProgress(session: tuple = Depends(instance.redis_tool.getSession)):
     if progress is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Progress not found.")
 
-    return JSONResponse(content={"progress": progress})
\ No newline at end of file
+    content = {"progress": progress}
+    if session_data.get("upload_status") is not None:
+        content["status"] = session_data["upload_status"]
+        content["message"] = session_data.get("upload_message", "")
+
+    return JSONResponse(content=content)
+
+@router.get(instance.upload_status_end_point, response_model=UploadStatusResponse)
+async def getUploadStatus(uploadId: str = Query(...), session: tuple = Depends(instance.redis_tool.getSession)):
+    """
+    @brief Retrieves how much of an upload sent in parts was received.
+
+    Clients call this endpoint after a failed part to resume the upload at the returned offset.
+
+    @param uploadId The ID of the upload.
+    @param session The session data dependency for validation.
+    @return The offset where the next part starts.
+
+    @exception HTTPException If the upload doesn't exist, expired or belongs to another session.
+    """
+    session_id, _ = session
+    upload = await instance.upload_store.getUpload(upload_id=uploadId, session_id=session_id)
+
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+
+    return {"uploadId": upload["id"], "offset": upload["offset"], "fileSize": upload["file_size"], "partSize": instance.upload_part_size}
+
+@router.get(instance.metrics_end_point, response_class=PlainTextResponse, include_in_schema=False)
+async def getMetrics():
+    """
+    @brief Returns the metrics of the process for scraping.
+
+    The metrics cover request latency, the LLM calls and iterations of the agents, SQL
+    execution, vector store loads and searches, embedding batches, Redis commands, database
+    connections and uploads. Each worker process has its own metrics, so every process is scraped.
+
+    @return The metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get(instance.trace_end_point, response_model=TraceResponse)
+async def getTrace(traceId: str = Query(..., pattern=r"^[0-9a-f]{32}$"), session: tuple = Depends(instance.redis_tool.getSession)):
+    """
+    @brief Retrieves the spans of a request's trace.
+
+    The trace id is returned in the X-Trace-Id header of every response. The spans show the
+    agent iterations, LLM calls, SQL queries, retrievals and Redis and database operations of
+    the request. The latest traces are kept in the memory of the process that handled the request.
+    Only the traces of the session's own requests are returned, since their spans hold its queries.
+
+    @param traceId The ID of the trace.
+    @param session The session data dependency for validation.
+    @return The spans of the trace.
+
+    @exception HTTPException If the trace isn't kept or belongs to another session.
+    """
+    session_id, _ = session
+    spans = EXPORTER.getTrace(traceId)
+
+    # Traces of other sessions are reported as missing, so their ids can't be probed
+    if spans is None or not any(span.owner == session_id for span in spans):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace not found.")
+
+    return {"traceId": traceId, "durationMs": round(max(span.getDuration() for span in spans) * 1000, 3), "spans": [span.toDict() for span in spans]}
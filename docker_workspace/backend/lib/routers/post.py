@@ -3,18 +3,73 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from lib.ai.agents.sql_query_agent import SqlQueryAgent
 from lib.ai.agents.rag_query_agent import RagQueryAgent
+from lib.ai.agents.agent_tools import NO_ANSWER_MESSAGE, PARTIAL_ANSWER_PREFIX
+from lib.ai.llm.llm_scheduler import LLMOverloadedError
 from lib.models.general_models import InformationResponse
 from lib.models.post_models import (HumanRequest, AIResponse)
 from lib.database.models.user_model import User
 from lib.database.config.configuration import getAsyncUserDB
 from lib.database.schemas.database_schema import (UserCreate, UserLogin)
-from lib.database.securities.security import (getPasswordHash, verifyPassword)
 from lib.instances.instance import Instance
+from typing import Awaitable, Callable
 
 instance = Instance()
 
 router = APIRouter()
 
+async def _runAgent(execute: Callable[[str], Awaitable[str]], question: str) -> str:
+    """
+    @brief Answers a question with an agent, rejecting it while the LLM calls are overloaded.
+
+    @param execute The execute method of the agent.
+    @param question The question of the user.
+    @return The answer of the agent.
+
+    @exception HTTPException 503 with a Retry-After header if too many LLM calls are waiting.
+    """
+    try:
+        return await execute(question)
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def _answerQuestion(agent: str, session_id: str, session_data: dict, question: str, session_memory, execute: Callable[[str], Awaitable[str]]) -> str:
+    """
+    @brief Answers a question from the answer cache, or with an agent whose answer is then cached.
+
+    Answers are cached per version of the session's tables ("sql") or files ("rag"), which
+    the upload jobs publish to the session; without a version the agent always runs. Cached
+    answers are shared by the sessions holding the same tables or files, so only questions
+    opening a conversation are looked up and cached: a follow-up question depends on the
+    conversation before it, which the cache doesn't compare.
+
+    @param agent The agent answering the question, "sql" or "rag".
+    @param session_id The ID of the session.
+    @param session_data The data of the session.
+    @param question The question of the user.
+    @param session_memory The conversation memory of the session.
+    @param execute The execute method of the agent.
+    @return The answer.
+    """
+    dataset_version = session_data.get(f"{agent}_dataset_version")
+    if instance.answer_cache is None or not dataset_version or session_memory.memory_data:
+        return await _runAgent(execute, question)
+
+    vector = await instance.embedding_scheduler.forSession(session_id).aembed_query(question)
+    answer = instance.answer_cache.lookup(agent=agent, dataset_version=dataset_version, vector=vector)
+    if answer is not None:
+        # Saved like an answer of the agent, so follow-up questions see it in the history
+        session_memory.saveContext(
+            human_message={"human_message": question},
+            command_result_pair_dict={"command_result_pair_list": []},
+            ai_message={"ai_message": answer}
+        )
+        return answer
+
+    answer = await _runAgent(execute, question)
+    if answer != NO_ANSWER_MESSAGE and not answer.startswith(PARTIAL_ANSWER_PREFIX):
+        instance.answer_cache.store(agent=agent, dataset_version=dataset_version, vector=vector, question=question, answer=answer)
+    return answer
+
 @router.post(instance.signup_end_point, response_model=InformationResponse, status_code=201)
 async def signup(user: UserCreate, db: AsyncSession = Depends(getAsyncUserDB)):
     """
@@ -36,8 +91,8 @@ async def signup(user: UserCreate, db: AsyncSession = Depends(getAsyncUserDB)):
     if db_user:
         raise HTTPException(status_code=400, detail="E-mail already registered")
     
-    # Hash the user's password
-    hashed_password = getPasswordHash(user.password)
+    # Hash the user's password without blocking the other requests
+    hashed_password = await instance.password_hasher.hash(user.password)
     db_user = User(email=user.email, hashed_password=hashed_password)
 
     # Add user to database
@@ -53,7 +108,8 @@ async def login(response: Response, form_data: UserLogin, db: AsyncSession = Dep
     @brief Logs in a user and creates a session.
 
     This endpoint verifies the user's email and password. If valid,
-    it creates a session and sets a cookie for the session ID.
+    it creates a session and sets a cookie for the session ID. A password
+    hash of a deprecated scheme or cost is replaced while the password is known.
     
     @param response FastAPI Response object for setting cookies.
     @param form_data UserLogin object containing email and password.
@@ -66,8 +122,16 @@ async def login(response: Response, form_data: UserLogin, db: AsyncSession = Dep
     # Fetch the user from the database
     result = await db.execute(select(User).where(User.email == form_data.email))
     user = result.scalars().first()
-    if not user or not verifyPassword(form_data.password, user.hashed_password):
+    if not user:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    valid, new_hash = await instance.password_hasher.verify(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
     
     # Create a new session for the user
     session_id = await instance.redis_tool.createSession()
@@ -90,13 +154,14 @@ async def sqlQuery(request: HumanRequest, session: tuple = Depends(instance.redi
     @brief Executes a SQL query using the SqlQueryAgent.
 
     This endpoint retrieves the session's temporary database path
-    and executes a SQL query through the SqlQueryAgent.
+    and executes a SQL query through the SqlQueryAgent, unless a
+    similar question on the same tables was answered before.
     
     @param request HumanRequest object containing the user's query.
     @param session The session data dependency for validation.
     @return AIResponse containing the response from the AI.
 
-    @exception HTTPException If there is no database associated with the session.
+    @exception HTTPException If there is no database associated with the session, or 503 if the LLM calls are overloaded.
     """
     data = request.model_dump()
     session_id, session_data = session
@@ -108,10 +173,10 @@ async def sqlQuery(request: HumanRequest, session: tuple = Depends(instance.redi
 
     # Get the session memory for the SQL query execution
     session_memory = await instance.memory.getMemory(session_id=session_id)
-    sql_query_agent = SqlQueryAgent(llm=instance.llm, memory=session_memory, temp_database_path=temp_database_path, max_iteration=instance.llm_max_iteration)
+    sql_query_agent = SqlQueryAgent(llm=instance.llm, memory=session_memory, temp_database_path=temp_database_path, max_iteration=instance.llm_max_iteration, agent_mode=instance.agent_mode, time_budget=instance.llm_request_budget)
     
     # Execute the SQL query
-    response = await sql_query_agent.execute(data["humanMessage"])
+    response = await _answerQuestion("sql", session_id, session_data, data["humanMessage"], session_memory, sql_query_agent.execute)
 
     await instance.redis_tool.resetSessionTimeout(session_id=session_id)
     
@@ -123,13 +188,14 @@ async def ragQuery(request: HumanRequest, session: tuple = Depends(instance.redi
     @brief Executes a RAG query using the RagQueryAgent.
 
     This endpoint retrieves the session's vector store path
-    and executes a RAG query through the RagQueryAgent.
+    and executes a RAG query through the RagQueryAgent, unless a
+    similar question on the same files was answered before.
     
     @param request HumanRequest object containing the user's query.
     @param session The session data dependency for validation.
     @return AIResponse containing the response from the AI.
 
-    @exception HTTPException If there is no database associated with the session.
+    @exception HTTPException If there is no database associated with the session, or 503 if the LLM calls are overloaded.
     """
     data = request.model_dump()
     session_id, session_data = session
@@ -142,10 +208,10 @@ async def ragQuery(request: HumanRequest, session: tuple = Depends(instance.redi
     # Get the session memory for the RAG query execution
     session_memory = await instance.memory.getMemory(session_id=session_id)
 
-    rag_query_agent = RagQueryAgent(llm=instance.llm, memory=session_memory, vector_store_path=vector_store_path, embeddings=instance.embedding, max_iteration=instance.llm_max_iteration)
+    rag_query_agent = RagQueryAgent(llm=instance.llm, memory=session_memory, vector_store_path=vector_store_path, embeddings=instance.embedding_scheduler.forSession(session_id), max_iteration=instance.llm_max_iteration, agent_mode=instance.agent_mode, time_budget=instance.llm_request_budget)
 
     # Execute the query    
-    response = await rag_query_agent.execute(data["humanMessage"])
+    response = await _answerQuestion("rag", session_id, session_data, data["humanMessage"], session_memory, rag_query_agent.execute)
 
     await instance.redis_tool.resetSessionTimeout(session_id=session_id)
     
@@ -1,19 +1,227 @@
-from fastapi import (APIRouter, Depends, HTTPException, status, UploadFile, File)
-from typing import List
-from sqlalchemy import (text, create_engine)
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores.faiss import FAISS
-from lib.models.general_models import InformationResponse
+from fastapi import (APIRouter, Depends, HTTPException, status, UploadFile, Request, Query)
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartParser, MultiPartException
+from typing import List, Optional, Callable, Awaitable, AsyncIterator
+from sqlalchemy import text
+from lib.ai.vector_store.vector_store import SessionVectorStore
+from lib.models.put_models import JobResponse, UploadInitRequest, UploadCompleteRequest, sha256_pattern
+from lib.models.general_models import UploadStatusResponse
+from lib.tools.chunked_upload import UploadConflictError
+from lib.tools.upload_quota import QuotaExceededError
 from lib.instances.instance import Instance
 from lib.database.config.configuration import getAsyncDB
-import pandas as pd
-import os, asyncio, shutil, aiofiles
+from lib.tools.metrics import Counter, Histogram
+import os, asyncio, shutil, uuid, aiofiles
 
 instance = Instance()
 
 router = APIRouter()
 
+UPLOAD_READ_SIZE = 1 << 20  # Uploads are copied to disk in 1 MiB pieces
+MULTIPART_OVERHEAD = 1 << 16  # Allowance for the boundaries and part headers of a multipart body
+MAX_UPLOAD_FILES = 1000  # Maximum number of files in one multipart body
+
+UPLOADS_TOTAL = Counter("uploads_total", "Uploads by job type and whether their job was queued.", ("job_type", "outcome"))
+UPLOAD_BYTES = Counter("upload_bytes_total", "Bytes of the uploads whose job was queued.", ("job_type",))
+UPLOAD_STORE_DURATION = Histogram("upload_store_duration_seconds", "Time to store the files of an upload for its job.", ("job_type",))
+UPLOAD_REJECTIONS = Counter("upload_rejections_total", "Uploads rejected before their job was queued, by reason.", ("reason",))
+
+async def _limitStream(stream: AsyncIterator[bytes], limit: int, remaining: int) -> AsyncIterator[bytes]:
+    """
+    @brief Passes a request body on while counting its bytes.
+
+    @param stream The body as it arrives.
+    @param limit The number of bytes after which the body is rejected.
+    @param remaining The bytes left in the session's quota, for the error.
+    @return The chunks of the body.
+
+    @exception QuotaExceededError As soon as more than limit bytes arrived.
+    """
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise QuotaExceededError(f"The upload exceeds the session quota of {instance.session_byte_quota} bytes; {remaining} bytes remain.", remaining)
+        yield chunk
+
+async def _receiveUploadFiles(request: Request, session_id: str) -> tuple:
+    """
+    @brief Receives the files of a multipart upload within the session's byte quota.
+
+    The body is parsed as it arrives instead of before the endpoint runs, so an upload
+    announcing more bytes than the session may still upload is rejected before its body is
+    read, and one without a length is rejected as soon as too many bytes arrived.
+
+    @param request The request with the multipart body.
+    @param session_id The ID of the session.
+    @return Tuple containing the parsed form, to be closed, and its uploaded files.
+
+    @exception HTTPException If the quota is exceeded, the body is invalid or holds no files.
+    """
+    remaining = await instance.upload_quota.getRemainingBytes(session_id)
+    limit = remaining + MULTIPART_OVERHEAD
+
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        UPLOAD_REJECTIONS.inc("quota")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"The upload exceeds the session quota of {instance.session_byte_quota} bytes; {remaining} bytes remain."
+        )
+
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        UPLOAD_REJECTIONS.inc("invalid")
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Files must be uploaded as multipart/form-data.")
+
+    try:
+        parser = MultiPartParser(request.headers, _limitStream(request.stream(), limit, remaining), max_files=MAX_UPLOAD_FILES)
+        form = await parser.parse()
+    except QuotaExceededError as e:
+        UPLOAD_REJECTIONS.inc("quota")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MultiPartException as e:
+        UPLOAD_REJECTIONS.inc("invalid")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+
+    files = [file for file in form.getlist("files") if isinstance(file, StarletteUploadFile)]
+    if not files:
+        await form.close()
+        UPLOAD_REJECTIONS.inc("invalid")
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No files were uploaded.")
+
+    return form, files
+
+async def _reserveUploadBytes(session_id: str, byte_count: int) -> None:
+    """
+    @brief Counts uploaded bytes against the session's quota.
+
+    @param session_id The ID of the session.
+    @param byte_count The number of uploaded bytes.
+
+    @exception HTTPException If the session's byte quota would be exceeded.
+    """
+    try:
+        await instance.upload_quota.reserveBytes(session_id=session_id, byte_count=byte_count)
+    except QuotaExceededError as e:
+        UPLOAD_REJECTIONS.inc("quota")
+        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+async def _storeUploads(files: List[UploadFile], upload_dir: str) -> list:
+    """
+    @brief Stores uploaded files where the job workers can read them.
+
+    @param files List of uploaded files.
+    @param upload_dir The directory of this upload.
+    @return The stored files, each with its "path" and original "filename".
+    """
+    await asyncio.to_thread(os.makedirs, upload_dir, exist_ok=True)
+
+    stored_files = []
+    for index, file in enumerate(files):
+        # The index keeps files with the same name apart
+        file_path = os.path.join(upload_dir, f"{index}_{os.path.basename(file.filename)}")
+        async with aiofiles.open(file_path, "wb") as stored_file:
+            while chunk := await file.read(UPLOAD_READ_SIZE):
+                await stored_file.write(chunk)
+        stored_files.append({"path": file_path, "filename": file.filename})
+
+    return stored_files
+
+async def _takeChunkedUploads(uploads: list, upload_dir: str) -> list:
+    """
+    @brief Moves the files of completed uploads where the job workers can read them.
+
+    @param uploads The completed uploads.
+    @param upload_dir The directory of this upload.
+    @return The stored files, each with its "path" and original "filename".
+    """
+    await asyncio.to_thread(os.makedirs, upload_dir, exist_ok=True)
+
+    stored_files = []
+    for index, upload in enumerate(uploads):
+        file_path = os.path.join(upload_dir, f"{index}_{os.path.basename(upload['file_name'])}")
+        await instance.upload_store.takeFile(upload, file_path)
+        stored_files.append({"path": file_path, "filename": upload["file_name"]})
+
+    return stored_files
+
+async def _enqueueUpload(session_id: str, job_type: str, store_files: Callable[[str], Awaitable[list]], payload: dict, byte_count: int) -> str:
+    """
+    @brief Stores uploaded files and queues the job processing them.
+
+    The job's status, progress and result message are published in the session.
+
+    @param session_id The ID of the session.
+    @param job_type The type of the upload job.
+    @param store_files Stores the uploaded files in the given directory and returns them.
+    @param payload Further arguments of the job.
+    @param byte_count The uploaded bytes counted against the session's quota, returned if the upload can't be queued.
+    @return The ID of the queued job.
+
+    @exception HTTPException If the upload couldn't be queued.
+    """
+    # Published before queueing, so a worker taking the job right away isn't overwritten
+    await instance.redis_tool.updateSession(session_id=session_id, key="upload_status", value="queued")
+    await instance.redis_tool.updateSession(session_id=session_id, key="upload_message", value="")
+
+    upload_dir = os.path.join(instance.upload_dir, uuid.uuid4().hex)
+    try:
+        with UPLOAD_STORE_DURATION.time(job_type):
+            stored_files = await store_files(upload_dir)
+        job_id = await instance.job_queue.enqueue(
+            job_type=job_type,
+            session_id=session_id,
+            payload={**payload, "files": stored_files, "upload_dir": upload_dir}
+        )
+    except Exception as e:
+        UPLOADS_TOTAL.inc(job_type, "failed")
+        await asyncio.to_thread(shutil.rmtree, upload_dir, ignore_errors=True)
+        await instance.upload_quota.releaseBytes(session_id=session_id, byte_count=byte_count)
+        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
+        await instance.redis_tool.updateSession(session_id=session_id, key="upload_status", value="failed")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Failed to queue the upload. Error: {str(e)}")
+
+    UPLOADS_TOTAL.inc(job_type, "queued")
+    UPLOAD_BYTES.inc(job_type, amount=byte_count)
+    await instance.redis_tool.updateSession(session_id=session_id, key="upload_job_id", value=job_id)
+    return job_id
+
+async def _checkCSVFileLimit(session_id: str, file_count: int, db_tables: list) -> None:
+    """
+    @brief Checks that the uploaded CSV files fit into the session's temporary database.
+
+    @param session_id The ID of the session.
+    @param file_count The number of uploaded files.
+    @param db_tables The tables of the temporary database.
+
+    @exception HTTPException If the maximum table limit would be exceeded.
+    """
+    if file_count > instance.db_max_table_limit - len(db_tables):
+        UPLOAD_REJECTIONS.inc("file_limit")
+        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"You reached max file limit {instance.db_max_table_limit}")
+
+async def _checkPDFFileLimit(session_id: str, file_count: int) -> None:
+    """
+    @brief Checks that the uploaded PDF files fit into the session's vector store.
+
+    @param session_id The ID of the session.
+    @param file_count The number of uploaded files.
+
+    @exception HTTPException If the maximum file limit would be exceeded.
+    """
+    vector_store_path = f"./.vector_stores/{session_id}"
+    existing_file_count = len(SessionVectorStore(vector_store_path=vector_store_path, embeddings=instance.embedding).getFileNames())
+
+    if existing_file_count + file_count > instance.max_file_limit:
+        UPLOAD_REJECTIONS.inc("file_limit")
+        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"You reached the maximum file limit of {instance.max_file_limit}."
+        )
+
 async def _createTempDatabase(session: tuple = Depends(instance.redis_tool.getSession)):
     """
     @brief Creates a temporary database for the session.
@@ -55,191 +263,250 @@ async def _createTempDatabase(session: tuple = Depends(instance.redis_tool.getSe
 
         return sync_temp_db_url, db_tables
 
-@router.put(instance.upload_csv_end_point, response_model=InformationResponse)
-async def uploadCSV(files: List[UploadFile] = File(...), session: tuple = Depends(instance.redis_tool.getSession), temp_db_urls: tuple = Depends(_createTempDatabase)):
+@router.put(instance.upload_csv_end_point, response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def uploadCSV(request: Request, session: tuple = Depends(instance.redis_tool.getSession)):
     """
-    @brief Uploads CSV files and converts them to a temporary database.
+    @brief Uploads CSV files to be converted to a temporary database.
 
-    This endpoint accepts multiple CSV files, creates a temporary database if needed,
-    and uploads the data to the database, tracking progress in the session.
+    This endpoint accepts multiple CSV files in the "files" field of a multipart body,
+    creates a temporary database if needed, and queues a job converting the files to
+    tables. The job reports its progress and status in the session. The temporary
+    database is only created once the files were received within the byte quota.
 
-    @param files List of uploaded CSV files.
+    @param request The request with the uploaded CSV files.
     @param session The session data dependency for validation.
-    @param temp_db_urls The URLs and tables from the temporary database.
-    @return Information message indicating successful upload.
+    @return Information message and the ID of the queued job.
 
-    @exception HTTPException If the maximum file limit is exceeded.
+    @exception HTTPException If the byte quota or the maximum file limit is exceeded or the upload couldn't be queued.
     """
     session_id, _ = session
 
-    sync_temp_db_url, db_tables = temp_db_urls
-
     # Initialize progress in the session
     await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="0")
 
-    # Check if the number of files exceeds the maximum allowed
-    if len(files) > instance.db_max_table_limit - len(db_tables):
+    try:
+        form, files = await _receiveUploadFiles(request=request, session_id=session_id)
+    except HTTPException:
         await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"You reached max file limit {instance.db_max_table_limit}")
+        raise
 
-    total_steps = len(files) + 1  # Total steps for progress tracking
-    current_step = 0
-
-    for file in files:
-        # Read the CSV file into a DataFrame
-        df = await asyncio.to_thread(pd.read_csv, file.file)
-        table_name = os.path.splitext(file.filename)[0]  # Extract table name from filename
-
-        # Ensure unique table name by appending a counter if necessary
-        table_counter = 1
-        original_table_name = table_name
-        while table_name in db_tables:
-            table_name = f"{original_table_name}_{table_counter}"
-            table_counter += 1
-        
-        db_tables.append(table_name)  # Add the new table name to the list
-
-        # Function to save DataFrame to PostgreSQL
-        def run_pandas_to_postgresql(df, table_name, db_url):
-            engine = create_engine(db_url)
-            with engine.connect() as connection:
-                df.to_sql(table_name, con=connection, index=False, if_exists="replace")
-
-        # Save the DataFrame to the temporary database
-        await asyncio.to_thread(run_pandas_to_postgresql, df=df, table_name=table_name, db_url=sync_temp_db_url)
-
-        # Update progress after each file upload
-        current_step += 1
-        progress = int((current_step / total_steps) * 100)
-        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value=str(progress))
-
-    # Final progress update to 100%
-    await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="100")
-    
-    return {"informationMessage": "CSV files uploaded and converted to database successfully."}
+    try:
+        byte_count = sum(file.size for file in files)
+        await _reserveUploadBytes(session_id=session_id, byte_count=byte_count)
+
+        try:
+            sync_temp_db_url, db_tables = await _createTempDatabase(session=session)
+            # Check if the number of files exceeds the maximum allowed
+            await _checkCSVFileLimit(session_id=session_id, file_count=len(files), db_tables=db_tables)
+        except Exception:
+            await instance.upload_quota.releaseBytes(session_id=session_id, byte_count=byte_count)
+            raise
+
+        job_id = await _enqueueUpload(
+            session_id=session_id,
+            job_type="upload_csv",
+            store_files=lambda upload_dir: _storeUploads(files, upload_dir),
+            payload={"sync_temp_db_url": sync_temp_db_url},
+            byte_count=byte_count
+        )
+    finally:
+        await form.close()
+
+    return {"informationMessage": "CSV files are being converted to database.", "jobId": job_id}
 
-@router.put(instance.upload_pdf_end_point, response_model=InformationResponse)
-async def uploadPDF(files: List[UploadFile] = File(...), session: tuple = Depends(instance.redis_tool.getSession)):
+@router.put(instance.upload_pdf_end_point, response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def uploadPDF(request: Request, session: tuple = Depends(instance.redis_tool.getSession)):
     """
-    @brief Uploads PDF files and converts them to a vector store.
+    @brief Uploads PDF files to be added to the session's vector store.
 
-    This endpoint accepts multiple PDF files, processes them, and stores the
-    resulting vectors in a FAISS vector store, tracking progress in the session.
+    This endpoint accepts multiple PDF files in the "files" field of a multipart body and
+    queues a job adding them to the session's vector store. The job reports its progress
+    and status in the session.
 
-    @param files List of uploaded PDF files.
+    @param request The request with the uploaded PDF files.
     @param session The session data dependency for validation.
-    @return Information message indicating successful upload.
+    @return Information message and the ID of the queued job.
 
-    @exception HTTPException If the maximum file limit is exceeded or if an error occurs during processing.
+    @exception HTTPException If the byte quota or the maximum file limit is exceeded or the upload couldn't be queued.
     """
     session_id, _ = session
-    vector_store_path = f"./.vector_stores/{session_id}"
-    documents_dir = os.path.join(vector_store_path, "documents")
-    faiss_dir = os.path.join(vector_store_path, "faiss")
-    
+
     await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="0")
-    
+
     try:
-        # Load existing FAISS vector store if it exists
-        if os.path.exists(faiss_dir):
-            vector_store = FAISS.load_local(
-                faiss_dir, instance.embedding, allow_dangerous_deserialization=True
-            )
-        else:
-            # Create necessary directories if not already present
-            os.makedirs(vector_store_path, exist_ok=True)
-            os.makedirs(documents_dir, exist_ok=True)
-            vector_store = None
-
-        # Check for existing files in the documents directory
-        existing_files = [
-            f for f in os.listdir(documents_dir)
-            if os.path.isfile(os.path.join(documents_dir, f))
-        ]
-        existing_file_count = len(existing_files)
-
-        new_file_count = len(files)
-
-        # Validate the total number of files
-        if existing_file_count + new_file_count > instance.max_file_limit:
-            await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
+        form, files = await _receiveUploadFiles(request=request, session_id=session_id)
+    except HTTPException:
+        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
+        raise
+
+    try:
+        # Validate the total number of files against the session's vector store
+        await _checkPDFFileLimit(session_id=session_id, file_count=len(files))
+
+        byte_count = sum(file.size for file in files)
+        await _reserveUploadBytes(session_id=session_id, byte_count=byte_count)
+
+        job_id = await _enqueueUpload(
+            session_id=session_id,
+            job_type="upload_pdf",
+            store_files=lambda upload_dir: _storeUploads(files, upload_dir),
+            payload={},
+            byte_count=byte_count
+        )
+    finally:
+        await form.close()
+
+    return {"informationMessage": "PDF files are being converted to database.", "jobId": job_id}
+
+def _getUploadStatus(upload: dict) -> dict:
+    """
+    @brief Describes where an upload sent in parts stands.
+
+    @param upload The upload.
+    @return The response telling the client where to continue.
+    """
+    return {"uploadId": upload["id"], "offset": upload["offset"], "fileSize": upload["file_size"], "partSize": instance.upload_part_size}
+
+async def _getSessionUpload(session_id: str, upload_id: str) -> dict:
+    """
+    @brief Retrieves an upload sent in parts by the session.
+
+    @param session_id The ID of the session.
+    @param upload_id The ID of the upload.
+    @return The upload.
+
+    @exception HTTPException If the upload doesn't exist, expired or belongs to another session.
+    """
+    upload = await instance.upload_store.getUpload(upload_id=upload_id, session_id=session_id)
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+    return upload
+
+@router.put(instance.upload_init_end_point, response_model=UploadStatusResponse, status_code=status.HTTP_201_CREATED)
+async def initUpload(request: UploadInitRequest, session: tuple = Depends(instance.redis_tool.getSession)):
+    """
+    @brief Starts an upload sent in parts.
+
+    Large files are sent in parts of at most the returned part size, so neither the client
+    nor the server holds a whole file in memory and an interrupted upload continues from
+    the last received byte instead of starting over.
+
+    The size of the file is counted against the session's byte quota right away, so an
+    upload that doesn't fit is rejected before any part is sent.
+
+    @param request The name, type, size and optional SHA-256 checksum of the file.
+    @param session The session data dependency for validation.
+    @return The ID of the upload and the offset of its first part.
+
+    @exception HTTPException If the file exceeds the session's byte quota.
+    """
+    session_id, _ = session
+
+    try:
+        await instance.upload_quota.reserveBytes(session_id=session_id, byte_count=request.fileSize)
+    except QuotaExceededError as e:
+        UPLOAD_REJECTIONS.inc("quota")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+    upload = await instance.upload_store.createUpload(
+        session_id=session_id,
+        file_name=request.fileName,
+        file_type=request.fileType,
+        file_size=request.fileSize,
+        checksum=request.checksum
+    )
+
+    return _getUploadStatus(upload)
+
+@router.put(instance.upload_part_end_point, response_model=UploadStatusResponse)
+async def uploadPart(request: Request, uploadId: str = Query(...), offset: int = Query(..., ge=0),
+                     checksum: Optional[str] = Query(None, pattern=sha256_pattern), session: tuple = Depends(instance.redis_tool.getSession)):
+    """
+    @brief Receives a part of an upload and streams it to disk.
+
+    The request body is the raw content of the part. It has to start at the upload's
+    current offset; after a failed part the client asks for the status of the upload and
+    continues from there.
+
+    @param request The request whose body is the part.
+    @param uploadId The ID of the upload.
+    @param offset The position of the part in the file.
+    @param checksum The optional SHA-256 hex digest of the part.
+    @param session The session data dependency for validation.
+    @return The new offset of the upload.
+
+    @exception HTTPException If the upload doesn't exist, the part doesn't start at the current offset, or is invalid.
+    """
+    session_id, _ = session
+    upload = await _getSessionUpload(session_id=session_id, upload_id=uploadId)
+
+    try:
+        await instance.upload_store.writePart(upload=upload, offset=offset, chunks=request.stream(), checksum=checksum)
+    except UploadConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return _getUploadStatus(upload)
+
+@router.put(instance.upload_complete_end_point, response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def completeUpload(request: UploadCompleteRequest, session: tuple = Depends(instance.redis_tool.getSession)):
+    """
+    @brief Processes completed uploads sent in parts.
+
+    The uploads are verified against their checksums and queued as one job, exactly like
+    files uploaded to the CSV or PDF upload endpoints.
+
+    @param request The IDs of the uploads.
+    @param session The session data dependency for validation.
+    @return Information message and the ID of the queued job.
+
+    @exception HTTPException If an upload doesn't exist, is incomplete or corrupted, the uploads
+                             have different types, or a file limit is exceeded.
+    """
+    session_id, _ = session
+    uploads = [await _getSessionUpload(session_id=session_id, upload_id=upload_id) for upload_id in dict.fromkeys(request.uploadIds)]
+
+    file_types = {upload["file_type"] for upload in uploads}
+    if len(file_types) > 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="All files of an upload must have the same type.")
+
+    for upload in uploads:
+        if upload["offset"] < upload["file_size"]:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"You reached the maximum file limit of {instance.max_file_limit}."
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"The upload of {upload['file_name']} is incomplete: {upload['offset']} of {upload['file_size']} bytes were received.",
+                headers={"Upload-Offset": str(upload["offset"])}
             )
+        if not await instance.upload_store.verifyUpload(upload):
+            UPLOAD_REJECTIONS.inc("checksum")
+            await instance.upload_store.deleteUpload(upload["id"])
+            await instance.upload_quota.releaseBytes(session_id=session_id, byte_count=upload["file_size"])
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"The checksum of {upload['file_name']} doesn't match its content.")
 
-        total_steps = new_file_count * 2 + 1  # Total steps for progress tracking
-        current_step = 0
-
-        for file in files:
-            parsed_file_name = os.path.splitext(file.filename)[0]
-            existing_file_list = [
-                os.path.splitext(f)[0] for f in os.listdir(documents_dir)
-                if os.path.isfile(os.path.join(documents_dir, f))
-            ]
-
-            # Ensure unique file name by appending a counter if necessary
-            file_name_counter = 1
-            original_parsed_file_name = parsed_file_name
-
-            while parsed_file_name in existing_file_list:
-                parsed_file_name = f"{original_parsed_file_name}_{file_name_counter}"
-                file_name_counter += 1
-
-            parsed_file_name += ".pdf"  # Ensure the file has a .pdf extension
-            file_path = os.path.join(documents_dir, parsed_file_name)
-
-            # Save the uploaded PDF file to the documents directory
-            async with aiofiles.open(file_path, "wb") as temp_file:
-                await temp_file.write(await file.read())
-
-            # Update progress after saving the file
-            current_step += 1
-            progress = int((current_step / total_steps) * 100)
-            await instance.redis_tool.updateSession(session_id=session_id, key="progress", value=str(progress))
-
-            # Load and process the PDF file
-            pdf_loader = PyPDFLoader(file_path)
-            documents = await pdf_loader.aload()
-
-            # Add metadata to each document
-            for doc in documents:
-                doc.metadata['filename'] = parsed_file_name
-
-            # Split documents into smaller chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                separators=["\n\n", "\n", ".", " "]
-            )
-            
-            split_documents = await text_splitter.atransform_documents(documents)
-
-            # Add documents to the vector store
-            if vector_store is None:
-                vector_store = await FAISS.afrom_documents(split_documents, instance.embedding)
-            else:
-                await vector_store.aadd_documents(split_documents)
-
-            # Update progress after processing the documents
-            current_step += 1
-            progress = int((current_step / total_steps) * 100)
-            await instance.redis_tool.updateSession(session_id=session_id, key="progress", value=str(progress))
-
-        # Save the vector store locally
-        vector_store.save_local(faiss_dir)
-        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="100")
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        # Clean up in case of an error
-        shutil.rmtree(path=vector_store_path, ignore_errors=True)
-        await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="-1")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to convert PDF file. Error: {str(e)}"
+    await instance.redis_tool.updateSession(session_id=session_id, key="progress", value="0")
+    byte_count = sum(upload["file_size"] for upload in uploads)  # Counted against the quota when the uploads started
+
+    if file_types == {"csv"}:
+        sync_temp_db_url, db_tables = await _createTempDatabase(session=session)
+        await _checkCSVFileLimit(session_id=session_id, file_count=len(uploads), db_tables=db_tables)
+
+        job_id = await _enqueueUpload(
+            session_id=session_id,
+            job_type="upload_csv",
+            store_files=lambda upload_dir: _takeChunkedUploads(uploads, upload_dir),
+            payload={"sync_temp_db_url": sync_temp_db_url},
+            byte_count=byte_count
         )
-
-    # Update session with the vector store path
-    await instance.redis_tool.updateSession(session_id=session_id, key="vector_store_path", value=vector_store_path)
-    return {"informationMessage": "PDF files uploaded and converted to database successfully."}
\ No newline at end of file
+        return {"informationMessage": "CSV files are being converted to database.", "jobId": job_id}
+
+    await _checkPDFFileLimit(session_id=session_id, file_count=len(uploads))
+
+    job_id = await _enqueueUpload(
+        session_id=session_id,
+        job_type="upload_pdf",
+        store_files=lambda upload_dir: _takeChunkedUploads(uploads, upload_dir),
+        payload={},
+        byte_count=byte_count
+    )
+    return {"informationMessage": "PDF files are being converted to database.", "jobId": job_id}
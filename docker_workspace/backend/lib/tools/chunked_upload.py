@@ -0,0 +1,245 @@
+from redis.asyncio import Redis
+from typing import AsyncIterator
+import os, asyncio, hashlib, json, shutil, time, uuid, aiofiles
+
+CHUNKED_DIR_NAME = "chunked"  # Subdirectory of the upload directory holding unfinished uploads
+DATA_FILE_NAME = "data"
+OWNER_FILE_NAME = "owner.json"  # The session and size of an upload, still known once its record expired
+LOCK_TIMEOUT = 300  # Seconds after which the lock of an abandoned part request expires
+CHECKSUM_READ_SIZE = 1 << 20  # Completed files are hashed in 1 MiB pieces
+
+class UploadConflictError(Exception):
+    """
+    @brief Raised when a part doesn't continue an upload where it stands.
+
+    @param offset The number of bytes the upload has received so far.
+    """
+
+    def __init__(self, offset: int) -> None:
+        super().__init__(f"The upload continues at offset {offset}.")
+        self.offset = offset
+
+class ChunkedUploadStore:
+    """
+    @brief Stores files uploaded in parts, so large files never have to be held in memory
+           and an interrupted upload continues from the last received byte.
+
+    An upload is created with the size and, optionally, the SHA-256 checksum of its file.
+    Its parts are streamed to a data file in order, each one verified against its own
+    checksum, and the number of bytes received is kept in Redis as the offset the next part
+    has to start at. A part that fails is cut off again, so the client resumes at the
+    stored offset. Once all bytes have arrived, the file is verified and handed over. The
+    session and declared size of every upload are also kept next to its data, so the bytes
+    reserved for an upload that expires unfinished can be returned to its session.
+
+    @param redis The Redis client.
+    @param upload_dir The directory of uploaded files.
+    @param part_size The maximum size of a part in bytes.
+    @param upload_ttl Seconds an unfinished upload is kept after its last part.
+    """
+
+    def __init__(self, redis: Redis, upload_dir: str, part_size: int, upload_ttl: int) -> None:
+        self.redis = redis
+        self.chunked_dir = os.path.join(upload_dir, CHUNKED_DIR_NAME)
+        self.part_size = part_size
+        self.upload_ttl = upload_ttl
+
+    def getDataPath(self, upload_id: str) -> str:
+        """
+        @brief Returns the path of the data file of an upload.
+
+        @param upload_id The ID of the upload.
+        @return The path the parts are written to.
+        """
+        return os.path.join(self.chunked_dir, upload_id, DATA_FILE_NAME)
+
+    async def createUpload(self, session_id: str, file_name: str, file_type: str, file_size: int, checksum: str = None) -> dict:
+        """
+        @brief Creates an empty upload.
+
+        @param session_id The session the upload belongs to.
+        @param file_name The name of the uploaded file.
+        @param file_type The type of the file, "csv" or "pdf".
+        @param file_size The size of the file in bytes.
+        @param checksum The SHA-256 hex digest of the whole file, if the client verifies it.
+        @return The upload.
+        """
+        upload_id = uuid.uuid4().hex
+        upload = {
+            "session_id": session_id,
+            "file_name": file_name,
+            "file_type": file_type,
+            "file_size": str(file_size),
+            "checksum": (checksum or "").lower(),
+            "offset": "0",
+            "created_at": str(time.time())
+        }
+
+        # The record is stored first, so removeExpiredUploads never takes the new directory for an expired one
+        await self.redis.hset(f"upload:{upload_id}", mapping=upload)
+        await self.redis.expire(f"upload:{upload_id}", self.upload_ttl)
+
+        data_path = self.getDataPath(upload_id)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(data_path), exist_ok=True)
+        async with aiofiles.open(data_path, "wb"):
+            pass
+        async with aiofiles.open(os.path.join(self.chunked_dir, upload_id, OWNER_FILE_NAME), "w") as owner_file:
+            await owner_file.write(json.dumps({"session_id": session_id, "file_size": file_size}))
+        return self._decode(upload_id, upload)
+
+    async def getUpload(self, upload_id: str, session_id: str) -> dict:
+        """
+        @brief Retrieves an upload of a session.
+
+        @param upload_id The ID of the upload.
+        @param session_id The session asking for it.
+        @return The upload, or None if it doesn't exist, expired or belongs to another session.
+        """
+        upload = await self.redis.hgetall(f"upload:{upload_id}")
+        if not upload or upload.get("session_id") != session_id:
+            return None
+        return self._decode(upload_id, upload)
+
+    def _decode(self, upload_id: str, upload: dict) -> dict:
+        """
+        @brief Converts a stored upload record to its values.
+
+        @param upload_id The ID of the upload.
+        @param upload The fields stored in Redis.
+        @return The upload with its "id" and integer sizes.
+        """
+        return {
+            **upload,
+            "id": upload_id,
+            "file_size": int(upload["file_size"]),
+            "offset": int(upload["offset"])
+        }
+
+    async def writePart(self, upload: dict, offset: int, chunks: AsyncIterator[bytes], checksum: str = None) -> int:
+        """
+        @brief Streams a part of an upload to disk.
+
+        @param upload The upload.
+        @param offset The position of the part in the file; must be the upload's current offset.
+        @param chunks The bytes of the part as they arrive.
+        @param checksum The SHA-256 hex digest of the part, if the client verifies it.
+        @return The new offset of the upload.
+
+        @exception UploadConflictError If the part doesn't start at the current offset or another part is being written.
+        @exception ValueError If the part is too large or doesn't match its checksum.
+        """
+        lock_key = f"upload:{upload['id']}:lock"
+        if not await self.redis.set(lock_key, "1", nx=True, ex=LOCK_TIMEOUT):
+            raise UploadConflictError(upload["offset"])
+
+        try:
+            # The offset may have moved since the upload was read
+            current_offset = int(await self.redis.hget(f"upload:{upload['id']}", "offset") or 0)
+            if offset != current_offset:
+                raise UploadConflictError(current_offset)
+
+            digest = hashlib.sha256()
+            written = 0
+            async with aiofiles.open(self.getDataPath(upload["id"]), "r+b") as data_file:
+                await data_file.truncate(offset)  # Drops the bytes of an interrupted part
+                await data_file.seek(offset)
+                async for chunk in chunks:
+                    written += len(chunk)
+                    if written > self.part_size:
+                        raise ValueError(f"A part may not be larger than {self.part_size} bytes.")
+                    if offset + written > upload["file_size"]:
+                        raise ValueError(f"The part exceeds the file size of {upload['file_size']} bytes.")
+                    digest.update(chunk)
+                    await data_file.write(chunk)
+
+            if checksum and digest.hexdigest() != checksum.lower():
+                raise ValueError("The checksum of the part doesn't match its content.")
+
+            new_offset = offset + written
+            await self.redis.hset(f"upload:{upload['id']}", "offset", str(new_offset))
+            await self.redis.expire(f"upload:{upload['id']}", self.upload_ttl)
+            upload["offset"] = new_offset
+            return new_offset
+        finally:
+            await self.redis.delete(lock_key)
+
+    async def verifyUpload(self, upload: dict) -> bool:
+        """
+        @brief Checks a completed upload against the checksum given when it was created.
+
+        @param upload The upload.
+        @return True if the checksum matches or none was given.
+        """
+        if not upload["checksum"]:
+            return True
+
+        def computeChecksum(data_path: str) -> str:
+            digest = hashlib.sha256()
+            with open(data_path, "rb") as data_file:
+                while chunk := data_file.read(CHECKSUM_READ_SIZE):
+                    digest.update(chunk)
+            return digest.hexdigest()
+
+        return await asyncio.to_thread(computeChecksum, self.getDataPath(upload["id"])) == upload["checksum"]
+
+    async def takeFile(self, upload: dict, destination: str) -> None:
+        """
+        @brief Moves the file of a completed upload and removes the upload.
+
+        @param upload The upload.
+        @param destination The new path of the file, on the same file system as the upload directory.
+        """
+        await asyncio.to_thread(os.replace, self.getDataPath(upload["id"]), destination)
+        await self.deleteUpload(upload["id"])
+
+    async def deleteUpload(self, upload_id: str) -> None:
+        """
+        @brief Removes an upload and its data.
+
+        The data is removed before the record, so removeExpiredUploads never takes a removed
+        upload for an expired one.
+
+        @param upload_id The ID of the upload.
+        """
+        await asyncio.to_thread(shutil.rmtree, os.path.join(self.chunked_dir, upload_id), ignore_errors=True)
+        await self.redis.delete(f"upload:{upload_id}")
+
+    async def removeExpiredUploads(self) -> list:
+        """
+        @brief Removes the data of uploads whose record expired.
+
+        Each expired upload is returned by exactly one caller, the one removing its owner file,
+        even if several processes remove expired uploads at the same time.
+
+        @return The removed uploads with the "session_id" and "file_size" they were created with.
+        """
+        try:
+            upload_ids = await asyncio.to_thread(os.listdir, self.chunked_dir)
+        except FileNotFoundError:
+            return []
+
+        removed = []
+        for upload_id in upload_ids:
+            if await self.redis.exists(f"upload:{upload_id}"):
+                continue
+
+            owner = await asyncio.to_thread(_claimOwner, os.path.join(self.chunked_dir, upload_id, OWNER_FILE_NAME))
+            await asyncio.to_thread(shutil.rmtree, os.path.join(self.chunked_dir, upload_id), ignore_errors=True)
+            if owner is not None:
+                removed.append({**owner, "id": upload_id})
+        return removed
+
+def _claimOwner(owner_path: str) -> dict:
+    """
+    @brief Reads and removes the owner file of an expired upload.
+
+    @param owner_path The path of the owner file.
+    @return The "session_id" and "file_size" of the upload, or None if another caller claimed it first.
+    """
+    try:
+        with open(owner_path, "r") as owner_file:
+            owner = json.load(owner_file)
+        os.remove(owner_path)
+    except (FileNotFoundError, ValueError):
+        return None
+    return owner
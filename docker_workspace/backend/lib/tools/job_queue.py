@@ -0,0 +1,325 @@
+from redis.asyncio import Redis
+from lib.tools.metrics import Counter, Gauge, Histogram
+import asyncio, json, logging, time, uuid
+
+QUEUE_KEY = "jobs:queue"
+PROCESSING_KEY = "jobs:processing"
+
+JOB_DURATION = Histogram("job_duration_seconds", "Run time of background jobs, by job type and status.", ("job_type", "status"))
+JOB_QUEUE_WAIT = Histogram("job_queue_wait_seconds", "Time background jobs waited in the queue, by job type.", ("job_type",))
+JOBS_RUNNING = Gauge("jobs_running", "Background jobs being run by the workers of this process.")
+JOBS_DEFERRED = Counter("jobs_deferred_total", "Jobs put back into the queue because another job of their session was running, by job type.", ("job_type",))
+JOBS_REAPED = Counter("jobs_reaped_total", "Jobs failed because the worker running them stopped sending heartbeats, by job type.", ("job_type",))
+
+HEARTBEATS_PER_TIMEOUT = 3  # Heartbeats a running job sends within one visibility timeout
+SESSION_BUSY_DELAY = 1.0  # Seconds a worker waits after putting back a job whose session has a running job
+
+class JobQueue:
+    """
+    @brief A Redis-backed queue of background jobs.
+
+    Every job is stored as a hash `job:<job_id>` holding its type, session, status, progress,
+    result message and JSON payload, and its id is pushed to a shared list. Workers of any
+    process move ids atomically from the queue to a processing list, so a job is taken by
+    exactly one worker, and remove them once the job has finished. The jobs of a session run
+    one at a time: a worker takes a job only with the lock `jobs:session:<session_id>` and
+    puts it back at the end of the queue otherwise, so it doesn't hold up other sessions. Running jobs send heartbeats, which
+    also renew the lock;
+    a job whose worker crashed or was redeployed stops sending them and is failed by the next
+    worker pool reaping the processing list.
+
+    @param redis The Redis client.
+    @param job_ttl Seconds the record of a job is kept after it was last updated.
+    @param visibility_timeout Seconds without a heartbeat after which a running job counts as abandoned.
+    """
+
+    def __init__(self, redis: Redis, job_ttl: int, visibility_timeout: int = 60) -> None:
+        self.redis = redis
+        self.job_ttl = job_ttl
+        self.visibility_timeout = visibility_timeout
+        self._unclaimed_since = {}  # Jobs found in the processing list before their first heartbeat
+
+    async def enqueue(self, job_type: str, session_id: str, payload: dict) -> str:
+        """
+        @brief Adds a job to the queue.
+
+        @param job_type The type of the job, selecting its handler.
+        @param session_id The session the job belongs to.
+        @param payload The JSON serializable arguments of the job.
+        @return The ID of the new job.
+        """
+        job_id = str(uuid.uuid4())
+        await self.redis.hset(f"job:{job_id}", mapping={
+            "type": job_type,
+            "session_id": session_id,
+            "status": "queued",
+            "progress": "0",
+            "message": "",
+            "payload": json.dumps(payload),
+            "created_at": str(time.time())
+        })
+        await self.redis.expire(f"job:{job_id}", self.job_ttl)
+        await self.redis.lpush(QUEUE_KEY, job_id)
+        return job_id
+
+    async def dequeue(self, timeout: float) -> dict:
+        """
+        @brief Takes the oldest queued job whose session has no running job and marks it as running.
+
+        @param timeout Seconds to wait for a job.
+        @return The job with its "id" and decoded "payload", or None if no job could be taken in time.
+        """
+        job_id = await self.redis.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+
+        job = await self.getJob(job_id)
+        if job is None:
+            # The record expired while the job was queued
+            await self.redis.lrem(PROCESSING_KEY, 0, job_id)
+            return None
+
+        if not await self.redis.set(self._getSessionLockKey(job["session_id"]), job_id, nx=True, ex=self.visibility_timeout):
+            # Behind the other queued jobs; pushed before it is removed, so a crash can't lose it
+            await self.redis.lpush(QUEUE_KEY, job_id)
+            await self.redis.lrem(PROCESSING_KEY, 0, job_id)
+            JOBS_DEFERRED.inc(job["type"])
+            await asyncio.sleep(min(timeout, SESSION_BUSY_DELAY))
+            return None
+
+        await self.updateJob(job_id, status="running", heartbeat_at=time.time())
+        job["status"] = "running"
+        return job
+
+    async def heartbeat(self, job: dict) -> None:
+        """
+        @brief Records that the worker running a job is alive and keeps the lock of its session.
+
+        @param job The running job.
+        """
+        await self.updateJob(job["id"], heartbeat_at=time.time())
+        await self.redis.expire(self._getSessionLockKey(job["session_id"]), self.visibility_timeout)
+
+    async def reapStaleJobs(self) -> list:
+        """
+        @brief Fails the running jobs whose worker stopped sending heartbeats.
+
+        A job is only failed by the worker pool that removes it from the processing list, so
+        pools of several processes reaping at the same time don't fail a job twice.
+
+        @return The failed jobs.
+        """
+        now = time.time()
+        job_ids = await self.redis.lrange(PROCESSING_KEY, 0, -1)
+        self._unclaimed_since = {job_id: self._unclaimed_since.get(job_id, now) for job_id in job_ids}
+
+        stale_jobs = []
+        for job_id in job_ids:
+            job = await self.getJob(job_id)
+            if job is None:
+                await self.redis.lrem(PROCESSING_KEY, 0, job_id)  # The record expired
+                continue
+
+            # Taken just now and not marked as running yet, or by a worker that crashed in between
+            heartbeat_at = float(job.get("heartbeat_at") or self._unclaimed_since[job_id])
+            if now - heartbeat_at <= self.visibility_timeout:
+                continue
+
+            if await self.redis.lrem(PROCESSING_KEY, 0, job_id):
+                message = "The worker running the job stopped."
+                await self.updateJob(job_id, status="failed", message=message)
+                stale_jobs.append({**job, "status": "failed", "message": message})
+        return stale_jobs
+
+    async def getJob(self, job_id: str) -> dict:
+        """
+        @brief Retrieves a job.
+
+        @param job_id The ID of the job.
+        @return The job with its "id" and decoded "payload", or None if it doesn't exist.
+        """
+        job = await self.redis.hgetall(f"job:{job_id}")
+        if not job:
+            return None
+
+        job["id"] = job_id
+        job["payload"] = json.loads(job.get("payload", "{}"))
+        return job
+
+    async def updateJob(self, job_id: str, **fields) -> None:
+        """
+        @brief Updates fields of a job, such as its progress, and resets its expiry.
+
+        @param job_id The ID of the job.
+        @param fields The fields to set.
+        """
+        await self.redis.hset(f"job:{job_id}", mapping={key: str(value) for key, value in fields.items()})
+        await self.redis.expire(f"job:{job_id}", self.job_ttl)
+
+    async def finishJob(self, job: dict, status: str, message: str) -> None:
+        """
+        @brief Records the outcome of a job, removes it from the processing list and unlocks its session.
+
+        @param job The finished job.
+        @param status "completed" or "failed".
+        @param message The result or error message.
+        """
+        await self.updateJob(job["id"], status=status, message=message)
+        await self.redis.lrem(PROCESSING_KEY, 0, job["id"])
+
+        lock_key = self._getSessionLockKey(job["session_id"])
+        if await self.redis.get(lock_key) == job["id"]:
+            await self.redis.delete(lock_key)
+
+    def _getSessionLockKey(self, session_id: str) -> str:
+        """
+        @brief Builds the key of the lock held by the running job of a session.
+
+        @param session_id The ID of the session.
+        @return The Redis key of the lock.
+        """
+        return f"jobs:session:{session_id}"
+
+class JobWorkerPool:
+    """
+    @brief Runs queued jobs with a fixed number of concurrent workers.
+
+    The pool runs inside the web application or in a separate worker process, and its
+    concurrency is independent of the number of requests the web server handles. Besides
+    its workers, the pool reaps the jobs abandoned by stopped workers, at startup and then
+    once per visibility timeout, and hands them to the failure handler of their type.
+
+    @param job_queue The queue to take jobs from.
+    @param handlers Async functions taking a job and returning its result message, by job type.
+    @param concurrency The number of jobs run at the same time.
+    @param poll_timeout Seconds a worker waits for a job before checking for shutdown.
+    @param failure_handlers Async functions publishing the failure of an abandoned job, by job type.
+    """
+
+    def __init__(self, job_queue: JobQueue, handlers: dict, concurrency: int, poll_timeout: float = 5.0, failure_handlers: dict = None) -> None:
+        self.job_queue = job_queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self.failure_handlers = failure_handlers or {}
+        self.tasks = []
+
+    def start(self) -> None:
+        """
+        @brief Starts the workers and the reaper on the running event loop.
+        """
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self.tasks.append(asyncio.create_task(self._reap()))
+
+    async def stop(self) -> None:
+        """
+        @brief Stops the workers, cancelling the jobs they are running.
+
+        Cancelled jobs are failed and handed to the failure handler of their type.
+        """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _work(self) -> None:
+        """
+        @brief Takes and runs jobs until the worker is cancelled.
+        """
+        while True:
+            try:
+                job = await self.job_queue.dequeue(timeout=self.poll_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to take a job from the queue: {str(e)}")
+                await asyncio.sleep(self.poll_timeout)
+                continue
+
+            if job is not None:
+                await self.runJob(job)
+
+    async def _reap(self) -> None:
+        """
+        @brief Fails abandoned jobs until the pool is stopped.
+        """
+        while True:
+            try:
+                for job in await self.job_queue.reapStaleJobs():
+                    JOBS_REAPED.inc(job["type"] if job["type"] in self.handlers else "unknown")
+                    logging.error(f"Job {job['id']} of type {job['type']} was abandoned by its worker.")
+                    failure_handler = self.failure_handlers.get(job["type"])
+                    if failure_handler is not None:
+                        await failure_handler(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to reap abandoned jobs: {str(e)}")
+            await asyncio.sleep(self.job_queue.visibility_timeout)
+
+    async def _failCancelledJob(self, job: dict) -> None:
+        """
+        @brief Fails a job cancelled by the shutdown of its worker and hands it to the failure handler of its type.
+
+        The job leaves the processing list, so the reaper never sees it, and its handler was
+        interrupted before it could publish its outcome; the failure handler publishes it instead.
+
+        @param job The cancelled job.
+        """
+        await self.job_queue.finishJob(job, status="failed", message="The job was cancelled.")
+
+        failure_handler = self.failure_handlers.get(job["type"])
+        if failure_handler is not None:
+            try:
+                await failure_handler(job)
+            except Exception as e:
+                logging.error(f"Failed to handle the cancellation of job {job['id']}: {str(e)}")
+
+    async def _heartbeat(self, job: dict) -> None:
+        """
+        @brief Sends the heartbeats of a running job until it is cancelled.
+
+        @param job The running job.
+        """
+        while True:
+            await asyncio.sleep(self.job_queue.visibility_timeout / HEARTBEATS_PER_TIMEOUT)
+            try:
+                await self.job_queue.heartbeat(job)
+            except Exception as e:
+                logging.error(f"Failed to send the heartbeat of job {job['id']}: {str(e)}")
+
+    async def runJob(self, job: dict) -> None:
+        """
+        @brief Runs one job with its handler and records the outcome.
+
+        @param job The job to run.
+        """
+        handler = self.handlers.get(job["type"])
+        job_type = job["type"] if handler is not None else "unknown"  # Unknown types aren't used as labels
+
+        try:
+            JOB_QUEUE_WAIT.observe(max(0.0, time.time() - float(job["created_at"])), job_type)
+        except (KeyError, TypeError, ValueError):
+            pass  # Jobs queued without a creation time
+
+        JOBS_RUNNING.inc()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job['type']}")
+            message = await handler(job)
+        except asyncio.CancelledError:
+            JOB_DURATION.observe(time.perf_counter() - start, job_type, "cancelled")
+            await asyncio.shield(self._failCancelledJob(job))
+            raise
+        except Exception as e:
+            JOB_DURATION.observe(time.perf_counter() - start, job_type, "failed")
+            logging.error(f"Job {job['id']} of type {job['type']} failed: {str(e)}")
+            await self.job_queue.finishJob(job, status="failed", message=str(e))
+        else:
+            JOB_DURATION.observe(time.perf_counter() - start, job_type, "completed")
+            await self.job_queue.finishJob(job, status="completed", message=message)
+        finally:
+            heartbeat.cancel()
+            JOBS_RUNNING.dec()
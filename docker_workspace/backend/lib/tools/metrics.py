@@ -0,0 +1,245 @@
+from bisect import bisect_left
+import math, time
+
+# Default buckets of latency histograms in seconds, from 5 ms to 2 minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Buckets of latency histograms of fast operations in seconds, such as Redis commands, from 100 us to 1 second
+FAST_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Default buckets of size histograms in bytes, from 100 B to 1 GiB
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000, 1073741824)
+
+def _formatValue(value: float) -> str:
+    """
+    @brief Formats a sample value as the Prometheus text format expects it.
+
+    @param value The value.
+    @return The formatted value.
+    """
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escapeLabelValue(value) -> str:
+    """
+    @brief Escapes a label value as the Prometheus text format expects it.
+
+    @param value The label value.
+    @return The escaped value.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _formatLabels(label_names: tuple, label_values: tuple, extra: tuple = ()) -> str:
+    """
+    @brief Formats the labels of a sample.
+
+    @param label_names The names of the labels.
+    @param label_values The values of the labels.
+    @param extra An additional (name, value) label, such as the bound of a bucket.
+    @return The labels in braces, or an empty string without labels.
+    """
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escapeLabelValue(value)}"' for name, value in pairs) + "}"
+
+class MetricsRegistry:
+    """
+    @brief Holds the metrics of the process and renders them for scraping.
+
+    Metrics are kept in memory and updated from the event loop, so recording a sample is a
+    dictionary lookup and a few additions, without locks or I/O.
+    """
+
+    def __init__(self) -> None:
+        self.metrics = {}
+
+    def register(self, metric: "_Metric") -> None:
+        """
+        @brief Adds a metric.
+
+        @param metric The metric.
+
+        @exception ValueError If a metric of the same name is registered.
+        """
+        if metric.name in self.metrics:
+            raise ValueError(f"The metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        @brief Renders all metrics in the Prometheus text exposition format.
+
+        @return The exposition text.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+# The registry of the process
+REGISTRY = MetricsRegistry()
+
+class _Metric:
+    """
+    @brief Base class of the metric types.
+
+    @param name The name of the metric.
+    @param documentation The help text of the metric.
+    @param label_names The names of the metric's labels; their values must have few distinct values.
+    @param registry The registry the metric is added to.
+    """
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), registry: MetricsRegistry = REGISTRY) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+        registry.register(self)
+
+    def samples(self) -> list:
+        """
+        @brief Returns the exposition lines of the metric's samples.
+        """
+        return [f"{self.name}{_formatLabels(self.label_names, labels)} {_formatValue(value)}" for labels, value in self.values.items()]
+
+class Counter(_Metric):
+    """
+    @brief A value that only increases, such as a number of requests.
+    """
+    metric_type = "counter"
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        """
+        @brief Increases the counter.
+
+        @param label_values The values of the metric's labels, in order.
+        @param amount The increase.
+        """
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+class Gauge(_Metric):
+    """
+    @brief A value that goes up and down, such as a number of requests in flight.
+    """
+    metric_type = "gauge"
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        """
+        @brief Increases the gauge.
+
+        @param label_values The values of the metric's labels, in order.
+        @param amount The increase.
+        """
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1) -> None:
+        """
+        @brief Decreases the gauge.
+
+        @param label_values The values of the metric's labels, in order.
+        @param amount The decrease.
+        """
+        self.values[label_values] = self.values.get(label_values, 0) - amount
+
+    def set(self, *label_values, value: float) -> None:
+        """
+        @brief Sets the gauge.
+
+        @param label_values The values of the metric's labels, in order.
+        @param value The new value.
+        """
+        self.values[label_values] = value
+
+class Histogram(_Metric):
+    """
+    @brief Counts observations, such as latencies, in cumulative buckets.
+
+    @param buckets The upper bounds of the buckets, ascending; +Inf is added.
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), registry: MetricsRegistry = REGISTRY, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names, registry)
+
+    def observe(self, value: float, *label_values) -> None:
+        """
+        @brief Records an observation.
+
+        @param value The observed value.
+        @param label_values The values of the metric's labels, in order.
+        """
+        state = self.values.get(label_values)
+        if state is None:
+            # Counts per bucket, the last one for values above all bounds, then the sum
+            state = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, *label_values) -> "_Timer":
+        """
+        @brief Measures the duration of a block of code.
+
+        The duration is observed when the block is left, also by an exception.
+
+        @param label_values The values of the metric's labels, in order.
+        @return The context manager measuring the block.
+        """
+        return _Timer(self, label_values)
+
+    def getCount(self, *label_values) -> int:
+        """
+        @brief Returns the number of observations of a label combination.
+
+        @param label_values The values of the metric's labels, in order.
+        @return The number of observations.
+        """
+        state = self.values.get(label_values)
+        return sum(state[:-1]) if state else 0
+
+    def getSum(self, *label_values) -> float:
+        """
+        @brief Returns the sum of the observations of a label combination.
+
+        @param label_values The values of the metric's labels, in order.
+        @return The sum of the observed values.
+        """
+        state = self.values.get(label_values)
+        return state[-1] if state else 0.0
+
+    def samples(self) -> list:
+        lines = []
+        for labels, state in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                bucket_labels = _formatLabels(self.label_names, labels, ("le", _formatValue(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_formatLabels(self.label_names, labels)} {_formatValue(state[-1])}")
+            lines.append(f"{self.name}_count{_formatLabels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class _Timer:
+    """
+    @brief Observes the duration of a with block in a histogram.
+    """
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram: Histogram, label_values: tuple) -> None:
+        self.histogram = histogram
+        self.label_values = label_values
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
@@ -3,8 +3,34 @@ from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.sql import text
 from lib.ai.memory.memory import CustomMemoryDict
+from lib.tools.metrics import Counter, Histogram, FAST_LATENCY_BUCKETS
+from lib.tools.tracing import TRACER, getCurrentSpan
 import os, asyncio, shutil, uuid, time
 
+REDIS_COMMAND_DURATION = Histogram("redis_command_duration_seconds", "Round-trip time of Redis commands.", ("command",), buckets=FAST_LATENCY_BUCKETS)
+REDIS_COMMAND_ERRORS = Counter("redis_command_errors_total", "Redis commands that raised an error.", ("command",))
+
+class InstrumentedRedis(Redis):
+    """
+    @brief A Redis client recording the round-trip time of every command.
+
+    Commands are labelled with their name, such as HSET, and never with their keys.
+    Blocking commands such as BLMOVE include the time they waited. Within a request
+    every command is traced as a span.
+    """
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            with TRACER.span(f"redis {command}", kind="CLIENT", attributes={"db.system": "redis", "db.operation": command}):
+                return await super().execute_command(*args, **options)
+        except Exception:
+            REDIS_COMMAND_ERRORS.inc(command)
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, command)
+
 class RedisTool:
     """
     @brief A tool for managing session storage and handling expiration events in Redis.
@@ -20,7 +46,7 @@ class RedisTool:
     """
 
     def __init__(self, memory: CustomMemoryDict, session_timeout: int, redis_ip: str, redis_port: int, async_database_url) -> None:
-        self.redis = Redis(host=redis_ip, port=redis_port, decode_responses=True, db=0)
+        self.redis = InstrumentedRedis(host=redis_ip, port=redis_port, decode_responses=True, db=0)
         self.memory = memory
         self.session_timeout = session_timeout
         self.async_database_url = async_database_url
@@ -47,6 +73,8 @@ class RedisTool:
     async def getSession(self, session_id: str = Cookie(None)) -> tuple:
         """
         @brief Retrieves session data for the provided session ID.
+
+        The trace of the request is marked as belonging to the session.
         
         @param session_id The ID of the session to retrieve.
         @return Tuple of session ID and session data.
@@ -62,7 +90,8 @@ class RedisTool:
                 detail="Authentication failed. Invalid session.",
                 headers={"WWW-Authenticate": "Bearer"}
             )
-        
+
+        getCurrentSpan().setOwner(session_id)
         return session_id, session_data
     
     async def getAllSessions(self) -> list:
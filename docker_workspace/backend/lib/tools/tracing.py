@@ -0,0 +1,317 @@
+from collections import OrderedDict
+from contextvars import ContextVar
+import os, re, time
+
+MAX_TRACES = 1000  # Finished traces kept in memory, the oldest are dropped first
+MAX_SPANS_PER_TRACE = 2000  # Spans kept per trace, so a runaway loop can't fill the memory
+MAX_ATTRIBUTE_LENGTH = 1000  # Longer string attributes, such as SQL statements, are truncated
+
+SPAN_KINDS = {"INTERNAL", "SERVER", "CLIENT"}
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# The span of the running task; copied into the tasks it creates, so concurrent children find their parent
+_current_span = ContextVar("current_span", default=None)
+
+def _toAnyValue(value) -> dict:
+    """
+    @brief Encodes an attribute value as an OTLP AnyValue.
+
+    @param value The attribute value.
+    @return The encoded value.
+    """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def parseTraceparent(header: str) -> tuple:
+    """
+    @brief Reads the trace and parent span ids of a W3C traceparent header.
+
+    @param header The header value, such as "00-<trace id>-<span id>-01".
+    @return Tuple of the trace id and parent span id, or (None, None) if the header is missing or invalid.
+    """
+    match = _TRACEPARENT_PATTERN.match((header or "").strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None, None
+    return match.group(1), match.group(2)
+
+class Span:
+    """
+    @brief A timed operation of a trace, following the OpenTelemetry span data model.
+
+    Attributes:
+    - trace_id (str): The 32 hex digit id of the trace.
+    - span_id (str): The 16 hex digit id of the span.
+    - parent_span_id (str): The id of the parent span, None for the root span of this process.
+    - name (str): The name of the operation, such as "llm.ainvoke".
+    - kind (str): "SERVER", "CLIENT" or "INTERNAL".
+    - attributes (dict): The attributes of the operation.
+    - status (str): "UNSET", "OK" or "ERROR".
+    - status_message (str): The description of an error status.
+    - start_time (int): The start in nanoseconds since the epoch.
+    - end_time (int): The end in nanoseconds since the epoch, None while the span runs.
+    - owner (str): The session the operation ran for, None if unknown; it isn't exported.
+    """
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_span_id", "name", "kind", "attributes",
+                 "status", "status_message", "start_time", "end_time", "owner", "_start")
+
+    is_recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_span_id: str = None, kind: str = "INTERNAL", attributes: dict = None) -> None:
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind if kind in SPAN_KINDS else "INTERNAL"
+        self.attributes = {}
+        self.status = "UNSET"
+        self.status_message = ""
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.owner = None
+        self._start = time.perf_counter_ns()  # Durations are measured on the monotonic clock
+        for key, value in (attributes or {}).items():
+            self.setAttribute(key, value)
+
+    def setAttribute(self, key: str, value) -> None:
+        """
+        @brief Sets an attribute of the span.
+
+        @param key The attribute name, such as "db.system".
+        @param value A string, number or boolean; longer strings are truncated.
+        """
+        if isinstance(value, str) and len(value) > MAX_ATTRIBUTE_LENGTH:
+            value = value[:MAX_ATTRIBUTE_LENGTH] + "..."
+        self.attributes[key] = value
+
+    def setStatus(self, status: str, message: str = "") -> None:
+        """
+        @brief Sets the status of the span.
+
+        @param status "OK" or "ERROR".
+        @param message The description of an error.
+        """
+        self.status = status
+        self.status_message = message
+
+    def setOwner(self, owner: str) -> None:
+        """
+        @brief Marks the span as run for a session, so only that session may read its trace.
+
+        @param owner The ID of the session.
+        """
+        self.owner = owner
+
+    def recordException(self, exception: BaseException) -> None:
+        """
+        @brief Marks the span as failed by an exception.
+
+        @param exception The raised exception.
+        """
+        self.setStatus("ERROR", str(exception))
+        self.setAttribute("exception.type", type(exception).__name__)
+        self.setAttribute("exception.message", str(exception))
+
+    def end(self) -> None:
+        """
+        @brief Ends the span and hands it to the exporter of its tracer.
+        """
+        if self.end_time is not None:
+            return
+        self.end_time = self.start_time + time.perf_counter_ns() - self._start
+        self.tracer.exporter.export(self)
+
+    def getDuration(self) -> float:
+        """
+        @brief Returns the duration of the span in seconds, up to now while it runs.
+        """
+        end_time = self.end_time if self.end_time is not None else self.start_time + time.perf_counter_ns() - self._start
+        return (end_time - self.start_time) / 1e9
+
+    def toDict(self) -> dict:
+        """
+        @brief Encodes the span in the OTLP JSON format, with its duration added for readability.
+
+        @return The encoded span.
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or 0),
+            "durationMs": round(self.getDuration() * 1000, 3),
+            "attributes": [{"key": key, "value": _toAnyValue(value)} for key, value in self.attributes.items()],
+            "status": {"code": f"STATUS_CODE_{self.status}", "message": self.status_message},
+        }
+        if self.parent_span_id is not None:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+class _NonRecordingSpan:
+    """
+    @brief The span of operations outside of a trace, such as background jobs; it records nothing.
+    """
+    is_recording = False
+    trace_id = None
+    span_id = None
+
+    def setAttribute(self, key: str, value) -> None:
+        pass
+
+    def setStatus(self, status: str, message: str = "") -> None:
+        pass
+
+    def setOwner(self, owner: str) -> None:
+        pass
+
+    def recordException(self, exception: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+class _SpanScope:
+    """
+    @brief Makes a span the current span for a with block and ends it afterwards.
+
+    An exception leaving the block marks the span as failed and is raised on.
+    """
+    __slots__ = ("span", "token")
+
+    def __init__(self, span) -> None:
+        self.span = span
+        self.token = None
+
+    def __enter__(self):
+        if self.span.is_recording:
+            self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.token is not None:
+            _current_span.reset(self.token)
+        if exc_value is not None and isinstance(exc_value, Exception):
+            self.span.recordException(exc_value)
+        self.span.end()
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+_NON_RECORDING_SCOPE = _SpanScope(NON_RECORDING_SPAN)  # Holds no state, so it is shared
+
+class InMemorySpanExporter:
+    """
+    @brief Keeps the spans of the latest traces in memory, so traces are available offline.
+
+    @param max_traces The number of traces kept; the oldest trace is dropped for a new one.
+    @param max_spans_per_trace The number of spans kept per trace.
+    """
+
+    def __init__(self, max_traces: int = MAX_TRACES, max_spans_per_trace: int = MAX_SPANS_PER_TRACE) -> None:
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self.traces = OrderedDict()
+
+    def export(self, span: Span) -> None:
+        """
+        @brief Stores a finished span.
+
+        @param span The span.
+        """
+        spans = self.traces.get(span.trace_id)
+        if spans is None:
+            spans = self.traces[span.trace_id] = []
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        if len(spans) < self.max_spans_per_trace:
+            spans.append(span)
+
+    def getTrace(self, trace_id: str) -> list:
+        """
+        @brief Returns the finished spans of a trace.
+
+        @param trace_id The id of the trace.
+        @return The spans ordered by their start, None if the trace isn't kept.
+        """
+        spans = self.traces.get(trace_id)
+        if spans is None:
+            return None
+        return sorted(spans, key=lambda span: span.start_time)
+
+    def clear(self) -> None:
+        """
+        @brief Drops all traces.
+        """
+        self.traces.clear()
+
+class Tracer:
+    """
+    @brief Creates the spans of the traces of the process.
+
+    A trace is started for every request. The operations of the request open child spans
+    of the current span, which is tracked per task with a context variable, so spans of
+    concurrent requests and of concurrently gathered operations get the right parents.
+    Outside of a trace no spans are recorded.
+
+    @param exporter The exporter receiving the finished spans.
+    """
+
+    def __init__(self, exporter: InMemorySpanExporter) -> None:
+        self.exporter = exporter
+
+    def startTrace(self, name: str, traceparent: str = None, kind: str = "SERVER", attributes: dict = None) -> Span:
+        """
+        @brief Starts the root span of a request, continuing the caller's trace if it sent one.
+
+        The span isn't made current; use activate to run the request in it.
+
+        @param name The name of the span.
+        @param traceparent The W3C traceparent header of the request, if any.
+        @param kind The kind of the span.
+        @param attributes The attributes of the span.
+        @return The root span.
+        """
+        trace_id, parent_span_id = parseTraceparent(traceparent)
+        return Span(self, name, trace_id or os.urandom(16).hex(), parent_span_id, kind, attributes)
+
+    def activate(self, span: Span) -> _SpanScope:
+        """
+        @brief Makes a span current for a with block and ends it afterwards.
+
+        @param span The span.
+        @return The context manager yielding the span.
+        """
+        return _SpanScope(span)
+
+    def span(self, name: str, kind: str = "INTERNAL", attributes: dict = None) -> _SpanScope:
+        """
+        @brief Times an operation as a child of the current span.
+
+        Outside of a trace the returned span records nothing and costs next to nothing.
+
+        @param name The name of the operation, such as "db.query".
+        @param kind The kind of the span, "CLIENT" for calls to other services.
+        @param attributes The attributes of the span.
+        @return The context manager yielding the span.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            return _NON_RECORDING_SCOPE
+        return _SpanScope(Span(self, name, parent.trace_id, parent.span_id, kind, attributes))
+
+def getCurrentSpan():
+    """
+    @brief Returns the span of the running operation.
+
+    @return The current span, or a span recording nothing outside of a trace.
+    """
+    return _current_span.get() or NON_RECORDING_SPAN
+
+# The tracer of the process and the exporter keeping its traces
+EXPORTER = InMemorySpanExporter()
+TRACER = Tracer(EXPORTER)
@@ -0,0 +1,148 @@
+from redis.asyncio import Redis
+
+BYTES_FIELD = "upload_bytes"
+ROWS_FIELD = "upload_rows"
+
+# Adds to a usage field of an existing session unless the quota would be exceeded:
+# returns the new usage, -1 if the session doesn't exist, or -2 if the quota is exceeded
+_RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local used = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if used + tonumber(ARGV[2]) > tonumber(ARGV[3]) then
+    return -2
+end
+return redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+"""
+
+# Subtracts from a usage field of an existing session without going below zero, as the usage
+# may have been reset since the amount was reserved: returns the new usage, or -1 if the session doesn't exist
+_RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local used = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local remaining = math.max(0, used - tonumber(ARGV[2]))
+redis.call('HSET', KEYS[1], ARGV[1], remaining)
+return remaining
+"""
+
+class QuotaExceededError(Exception):
+    """
+    @brief Raised when an upload would exceed the quota of its session.
+
+    @param message The error message naming the quota.
+    @param remaining The amount still available to the session.
+    """
+
+    def __init__(self, message: str, remaining: int) -> None:
+        super().__init__(message)
+        self.remaining = remaining
+
+class UploadQuota:
+    """
+    @brief Limits the bytes and CSV rows a session uploads.
+
+    The usage is kept in the session's Redis hash, so it ends with the session. Every
+    reservation is checked and added in one atomic step, so concurrent uploads of a
+    session can't exceed the quota together.
+
+    @param redis The Redis client.
+    @param byte_quota The maximum number of bytes a session uploads.
+    @param row_quota The maximum number of CSV rows a session stores.
+    """
+
+    def __init__(self, redis: Redis, byte_quota: int, row_quota: int) -> None:
+        self.redis = redis
+        self.byte_quota = byte_quota
+        self.row_quota = row_quota
+
+    async def getRemainingBytes(self, session_id: str) -> int:
+        """
+        @brief Returns the number of bytes a session can still upload.
+
+        @param session_id The ID of the session.
+        @return The remaining byte quota.
+        """
+        used = await self.redis.hget(f"session:{session_id}", BYTES_FIELD)
+        return max(0, self.byte_quota - int(used or 0))
+
+    async def reserveBytes(self, session_id: str, byte_count: int) -> None:
+        """
+        @brief Counts uploaded bytes against the session's quota.
+
+        @param session_id The ID of the session.
+        @param byte_count The number of bytes.
+
+        @exception QuotaExceededError If the session's byte quota would be exceeded.
+        """
+        await self._reserve(session_id, BYTES_FIELD, byte_count, self.byte_quota, "bytes")
+
+    async def reserveRows(self, session_id: str, row_count: int) -> None:
+        """
+        @brief Counts stored CSV rows against the session's quota.
+
+        @param session_id The ID of the session.
+        @param row_count The number of rows.
+
+        @exception QuotaExceededError If the session's row quota would be exceeded.
+        """
+        await self._reserve(session_id, ROWS_FIELD, row_count, self.row_quota, "rows")
+
+    async def releaseBytes(self, session_id: str, byte_count: int) -> None:
+        """
+        @brief Returns bytes of an upload that was discarded.
+
+        @param session_id The ID of the session.
+        @param byte_count The number of bytes.
+        """
+        await self._release(session_id, BYTES_FIELD, byte_count)
+
+    async def releaseRows(self, session_id: str, row_count: int) -> None:
+        """
+        @brief Returns rows of a table that was discarded.
+
+        @param session_id The ID of the session.
+        @param row_count The number of rows.
+        """
+        await self._release(session_id, ROWS_FIELD, row_count)
+
+    async def resetUsage(self, session_id: str) -> None:
+        """
+        @brief Resets the usage of a session whose uploaded data was cleared.
+
+        @param session_id The ID of the session.
+        """
+        await self.redis.hdel(f"session:{session_id}", BYTES_FIELD, ROWS_FIELD)
+
+    async def _reserve(self, session_id: str, field: str, amount: int, quota: int, unit: str) -> None:
+        """
+        @brief Adds to a usage field of a session within its quota.
+
+        @param session_id The ID of the session.
+        @param field The usage field.
+        @param amount The amount to add.
+        @param quota The quota of the field.
+        @param unit The name of the counted unit, for the error message.
+
+        @exception QuotaExceededError If the quota would be exceeded.
+        @exception RuntimeError If the session ended.
+        """
+        result = await self.redis.eval(_RESERVE_SCRIPT, 1, f"session:{session_id}", field, amount, quota)
+        if result == -1:
+            raise RuntimeError("The session ended.")
+        if result == -2:
+            used = int(await self.redis.hget(f"session:{session_id}", field) or 0)
+            remaining = max(0, quota - used)
+            raise QuotaExceededError(f"The upload exceeds the session quota of {quota} {unit}; {remaining} {unit} remain.", remaining)
+
+    async def _release(self, session_id: str, field: str, amount: int) -> None:
+        """
+        @brief Subtracts from a usage field of an existing session.
+
+        @param session_id The ID of the session.
+        @param field The usage field.
+        @param amount The amount to subtract.
+        """
+        await self.redis.eval(_RELEASE_SCRIPT, 1, f"session:{session_id}", field, amount)
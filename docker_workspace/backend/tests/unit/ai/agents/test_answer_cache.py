@@ -0,0 +1,82 @@
+from unittest.mock import patch
+from lib.ai.agents.answer_cache import SemanticAnswerCache, getDatasetVersion, ANSWER_CACHE_REQUESTS, ANSWER_CACHE_EVICTIONS, ANSWER_CACHE_ENTRIES
+
+def _vector(*values) -> list:
+    return list(values)
+
+def test_answer_cache_returns_answers_to_similar_questions():
+    """
+    Test that a question similar enough to a cached question on the same dataset gets its answer,
+    while dissimilar questions, other datasets and other agents miss.
+    """
+    cache = SemanticAnswerCache(threshold=0.9)
+    hits = ANSWER_CACHE_REQUESTS.values.get(("sql", "hit"), 0)
+    misses = ANSWER_CACHE_REQUESTS.values.get(("sql", "miss"), 0)
+
+    assert cache.lookup("sql", "v1", _vector(1.0, 0.0, 0.0)) is None
+    cache.store("sql", "v1", _vector(1.0, 0.0, 0.0), "total sales by region", "North: 10, South: 20")
+
+    # Vectors are compared by direction, not length
+    assert cache.lookup("sql", "v1", _vector(2.0, 0.2, 0.0)) == "North: 10, South: 20"
+    assert cache.lookup("sql", "v1", _vector(0.0, 1.0, 0.0)) is None
+    assert cache.lookup("sql", "v2", _vector(1.0, 0.0, 0.0)) is None
+    assert cache.lookup("rag", "v1", _vector(1.0, 0.0, 0.0)) is None
+
+    assert ANSWER_CACHE_REQUESTS.values[("sql", "hit")] == hits + 1
+    assert ANSWER_CACHE_REQUESTS.values[("sql", "miss")] == misses + 3
+
+def test_answer_cache_replaces_answers_of_similar_questions():
+    """
+    Test that storing the answer to a question similar to a cached one replaces the cached answer.
+    """
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("sql", "v1", _vector(1.0, 0.0), "total sales by region", "old answer")
+    cache.store("sql", "v1", _vector(1.0, 0.1), "sales per region?", "new answer")
+
+    assert len(cache.datasets[("sql", "v1")].entries) == 1
+    assert cache.lookup("sql", "v1", _vector(1.0, 0.0)) == "new answer"
+
+def test_answer_cache_evicts_least_recently_used_answers():
+    """
+    Test that answers beyond the capacity of a dataset are evicted least recently used first.
+    """
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2)
+    evictions = ANSWER_CACHE_EVICTIONS.values.get(("rag", "capacity"), 0)
+
+    cache.store("rag", "v1", _vector(1.0, 0.0, 0.0), "first", "a")
+    cache.store("rag", "v1", _vector(0.0, 1.0, 0.0), "second", "b")
+    assert cache.lookup("rag", "v1", _vector(1.0, 0.0, 0.0)) == "a"  # The first answer is now the most recently used
+    cache.store("rag", "v1", _vector(0.0, 0.0, 1.0), "third", "c")
+
+    assert cache.lookup("rag", "v1", _vector(1.0, 0.0, 0.0)) == "a"
+    assert cache.lookup("rag", "v1", _vector(0.0, 1.0, 0.0)) is None
+    assert cache.lookup("rag", "v1", _vector(0.0, 0.0, 1.0)) == "c"
+    assert ANSWER_CACHE_EVICTIONS.values[("rag", "capacity")] == evictions + 1
+
+def test_answer_cache_expires_answers_and_evicts_datasets():
+    """
+    Test that answers expire after their time to live, that the least recently used dataset is
+    evicted beyond the number of datasets, and that the entries gauge follows the cached answers.
+    """
+    cache = SemanticAnswerCache(threshold=0.9, max_datasets=2, ttl=60)
+    entries = ANSWER_CACHE_ENTRIES.values.get(("sql",), 0)
+
+    with patch("lib.ai.agents.answer_cache.time.monotonic", return_value=1000.0):
+        cache.store("sql", "v1", _vector(1.0, 0.0), "question", "answer 1")
+        cache.store("sql", "v2", _vector(1.0, 0.0), "question", "answer 2")
+        cache.lookup("sql", "v1", _vector(1.0, 0.0))  # v2 becomes the least recently used dataset
+        cache.store("sql", "v3", _vector(1.0, 0.0), "question", "answer 3")
+        assert list(cache.datasets) == [("sql", "v1"), ("sql", "v3")]
+        assert ANSWER_CACHE_ENTRIES.values[("sql",)] == entries + 2
+
+    with patch("lib.ai.agents.answer_cache.time.monotonic", return_value=1060.0):
+        assert cache.lookup("sql", "v1", _vector(1.0, 0.0)) is None
+    assert ANSWER_CACHE_ENTRIES.values[("sql",)] == entries + 1
+
+def test_get_dataset_version():
+    """
+    Test that the dataset version depends on the names and contents of the tables or files, not on their order.
+    """
+    assert getDatasetVersion({"a": "1", "b": "2"}) == getDatasetVersion({"b": "2", "a": "1"})
+    assert getDatasetVersion({"a": "1"}) != getDatasetVersion({"a": "2"})
+    assert getDatasetVersion({"a": "1"}) != getDatasetVersion({"b": "1"})
@@ -1,15 +1,16 @@
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.documents import Document
 from lib.ai.agents.rag_query_agent import RagQueryAgent
+from lib.ai.agents.agent_tools import FINAL_ANSWER_NOT_ALONE_MESSAGE
 
 @pytest.fixture
 async def mock_rag_agent():
-    # Set up a mock RagQueryAgent instance with mocked FAISS vector store, retriever, memory, and embeddings
-    with patch("lib.ai.agents.rag_query_agent.FAISS.load_local", new_callable=MagicMock) as mock_faiss_load_local:
+    # Set up a mock RagQueryAgent instance with mocked vector store, memory, and embeddings
+    with patch("lib.ai.agents.rag_query_agent.SessionVectorStore", new_callable=MagicMock) as mock_session_vector_store:
         mock_vector_store = MagicMock()
-        mock_retriever = MagicMock()
-        mock_vector_store.as_retriever.return_value = mock_retriever
-        mock_faiss_load_local.return_value = mock_vector_store
+        mock_session_vector_store.return_value = mock_vector_store
 
         memory_mock = MagicMock()
         llm_mock = AsyncMock()
@@ -32,21 +33,21 @@ async def test_rag_agent_query_execution_success(mock_rag_agent):
     """
     rag_agent_instance = await mock_rag_agent
 
-    # Mock search responses from the retriever for different documents
+    # Mock search responses from the vector store for different documents
     mock_retriever_search = AsyncMock()
     mock_document1 = MagicMock()
     mock_document1.page_content = "Content of file1"
     mock_document2 = MagicMock()
     mock_document2.page_content = "Content of file2"
     mock_retriever_search.side_effect = [
-        [mock_document1],
-        [mock_document2],
-        [mock_document1],
-        [mock_document2]
+        [(mock_document1, 0.1)],
+        [(mock_document2, 0.2)],
+        [(mock_document1, 0.1)],
+        [(mock_document2, 0.2)]
     ]
 
     # Set up LLM chain responses to simulate different iteration actions
-    with patch.object(rag_agent_instance.retriever, 'ainvoke', mock_retriever_search):
+    with patch.object(rag_agent_instance.vector_store, 'hybridSearch', mock_retriever_search):
         mock_llm_chain = AsyncMock()
         mock_llm_chain.ainvoke.side_effect = [
             "Filter Command: file1.txt",
@@ -94,18 +95,18 @@ async def test_rag_agent_max_iteration_success(mock_rag_agent):
     """
     rag_agent_instance = await mock_rag_agent
 
-    # Mock retriever's response for each iteration
+    # Mock vector store's response for each iteration
     mock_retriever_search = AsyncMock()
     mock_retriever_search.side_effect = [
-        [MagicMock(page_content="Content of file1")],
-        [MagicMock(page_content="Content of file2")],
-        [MagicMock(page_content="Content of file1")],
-        [MagicMock(page_content="Content of file2")],
-        [MagicMock(page_content="Content of file1")]
+        [(MagicMock(page_content="Content of file1"), 0.1)],
+        [(MagicMock(page_content="Content of file2"), 0.1)],
+        [(MagicMock(page_content="Content of file1"), 0.1)],
+        [(MagicMock(page_content="Content of file2"), 0.1)],
+        [(MagicMock(page_content="Content of file1"), 0.1)]
     ]
 
     # Set up LLM chain response to repeat command generation without reaching final answer
-    with patch.object(rag_agent_instance.retriever, 'ainvoke', mock_retriever_search):
+    with patch.object(rag_agent_instance.vector_store, 'hybridSearch', mock_retriever_search):
         mock_llm_chain = AsyncMock()
         mock_llm_chain.ainvoke.side_effect = ["Filter Command: file1.txt"] * 5
 
@@ -126,16 +127,16 @@ async def test_rag_agent_save_history_to_memory_success(mock_rag_agent):
     """
     rag_agent_instance = await mock_rag_agent
 
-    # Mock retriever and LLM chain responses for iteration processing
+    # Mock vector store and LLM chain responses for iteration processing
     mock_retriever_search = AsyncMock()
     mock_retriever_search.side_effect = [
-        [MagicMock(page_content="Content of file1")],
-        [MagicMock(page_content="Content of file2")]
+        [(MagicMock(page_content="Content of file1"), 0.1)],
+        [(MagicMock(page_content="Content of file2"), 0.1)]
     ]
     mock_llm_chain = AsyncMock()
     mock_llm_chain.ainvoke.side_effect = ["Filter Command: file1.txt", "Final answer"]
 
-    with patch.object(rag_agent_instance.retriever, 'ainvoke', mock_retriever_search):
+    with patch.object(rag_agent_instance.vector_store, 'hybridSearch', mock_retriever_search):
         with patch.object(rag_agent_instance, 'llm_chain', mock_llm_chain):
             user_query = "Find information about file1 and file2"
             result = await rag_agent_instance.execute(user_query)
@@ -164,23 +165,195 @@ async def test_rag_agent_get_history_from_memory_success(mock_rag_agent):
 async def test_rag_agent_get_available_files_success(mock_rag_agent):
     """
     Test for retrieving available file names from vector store.
-    Ensures getAvailableFiles accurately lists unique file names in the vector store.
+    Ensures getAvailableFiles lists the files that have their own index in the vector store.
     """
     rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.vector_store.getFileNames.return_value = ['file1.txt', 'file2.txt']
 
-    # Set up mock documents with file metadata for unique file names
-    mock_document1 = MagicMock()
-    mock_document1.metadata = {'filename': 'file1.txt'}
-    mock_document2 = MagicMock()
-    mock_document2.metadata = {'filename': 'file2.txt'}
-    mock_document3 = MagicMock()
-    mock_document3.metadata = {'filename': 'file1.txt'}
-    
-    rag_agent_instance.vector_store.docstore._dict.values.return_value = [mock_document1, mock_document2, mock_document3]
-
-    # Retrieve available files and validate they are unique
+    # Retrieve available files and validate they come from the vector store
     result = rag_agent_instance.getAvailableFiles()
-    result.sort()
     
     assert result == ['file1.txt', 'file2.txt']
-    rag_agent_instance.vector_store.docstore._dict.values.assert_called_once()
\ No newline at end of file
+    rag_agent_instance.vector_store.getFileNames.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_rag_agent_execute_with_tools_success(mock_rag_agent):
+    """
+    Test the tool calling mode for a turn with two retrievals followed by a final answer.
+    Ensures both retrievals run in the same turn and an empty file list searches all files.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.agent_mode = "tool_calling"
+    rag_agent_instance.memory.getHistory.return_value = ""
+    rag_agent_instance.getAvailableFiles = MagicMock(return_value=["file1.pdf", "file2.pdf"])
+
+    # Mock searches returning one chunk per searched file
+    async def mock_similarity_search(query, k, file_names):
+        return [(MagicMock(page_content=f"Content of {file_name} about {query}"), 0.1) for file_name in file_names]
+    rag_agent_instance.vector_store.hybridSearch = AsyncMock(side_effect=mock_similarity_search)
+
+    # First turn retrieves with two queries, second turn returns the final answer
+    rag_agent_instance.llm.ainvoke = AsyncMock(side_effect=[
+        AIMessage(content="", tool_calls=[
+            {"name": "retrieve", "args": {"files": ["file1.pdf"], "query": "topic"}, "id": "call_1"},
+            {"name": "retrieve", "args": {"files": [], "query": "summary"}, "id": "call_2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "final_answer", "args": {"answer": "Both files discuss the topic."}, "id": "call_3"},
+        ]),
+    ])
+
+    result = await rag_agent_instance.execute("What do the files say about the topic?")
+
+    # Assert the final answer is returned after two LLM round trips
+    assert result == "Both files discuss the topic."
+    assert rag_agent_instance.llm.ainvoke.call_count == 2
+    assert rag_agent_instance.vector_store.hybridSearch.await_count == 2
+    rag_agent_instance.vector_store.hybridSearch.assert_any_await("topic", k=20, file_names=["file1.pdf"])
+    rag_agent_instance.vector_store.hybridSearch.assert_any_await("summary", k=20, file_names=["file1.pdf", "file2.pdf"])
+
+    # The second turn must see both retrieval results
+    second_turn_messages = rag_agent_instance.llm.ainvoke.call_args_list[1][0][0]
+    tool_messages = [message for message in second_turn_messages if isinstance(message, ToolMessage)]
+    assert [message.content for message in tool_messages] == [
+        "Content of file1.pdf about topic",
+        "Content of file1.pdf about summary\n\nContent of file2.pdf about summary"
+    ]
+    rag_agent_instance.memory.saveContext.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_rag_agent_execute_with_tools_rejects_final_answer_with_other_tools(mock_rag_agent):
+    """
+    Test that a final answer requested together with a retrieval isn't accepted.
+    Ensures the retrieval runs and the model answers again after seeing its result.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.agent_mode = "tool_calling"
+    rag_agent_instance.memory.getHistory.return_value = ""
+    rag_agent_instance.getAvailableFiles = MagicMock(return_value=["file1.pdf"])
+    rag_agent_instance.vector_store.hybridSearch = AsyncMock(return_value=[(MagicMock(page_content="The topic is covered."), 0.1)])
+
+    rag_agent_instance.llm.ainvoke = AsyncMock(side_effect=[
+        AIMessage(content="", tool_calls=[
+            {"name": "retrieve", "args": {"files": [], "query": "topic"}, "id": "call_1"},
+            {"name": "final_answer", "args": {"answer": "The files don't cover it."}, "id": "call_2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "final_answer", "args": {"answer": "The file covers the topic."}, "id": "call_3"},
+        ]),
+    ])
+
+    result = await rag_agent_instance.execute("Is the topic covered?")
+
+    assert result == "The file covers the topic."
+    rag_agent_instance.vector_store.hybridSearch.assert_awaited_once()
+
+    # Both calls of the first turn get a result, the answer one asking to answer alone
+    second_turn_messages = rag_agent_instance.llm.ainvoke.call_args_list[1][0][0]
+    tool_messages = {message.tool_call_id: message.content for message in second_turn_messages if isinstance(message, ToolMessage)}
+    assert tool_messages == {"call_1": "The topic is covered.", "call_2": FINAL_ANSWER_NOT_ALONE_MESSAGE}
+
+@pytest.mark.asyncio
+async def test_rag_agent_execute_with_tools_plain_answer(mock_rag_agent):
+    """
+    Test the tool calling mode when the model answers with plain text instead of a tool call.
+    Ensures the text is returned as the final answer.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.agent_mode = "tool_calling"
+    rag_agent_instance.memory.getHistory.return_value = ""
+    rag_agent_instance.getAvailableFiles = MagicMock(return_value=["file1.pdf"])
+    rag_agent_instance.llm.ainvoke = AsyncMock(return_value=AIMessage(content="Hello!"))
+
+    result = await rag_agent_instance.execute("Hi")
+
+    assert result == "Hello!"
+    rag_agent_instance.llm.ainvoke.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_rag_agent_multi_file_filter_command_success(mock_rag_agent):
+    """
+    Test a filter command naming several files.
+    Ensures all files are searched in one iteration through a single vector store search.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.getAvailableFiles = MagicMock(return_value=["file1.pdf", "file2.pdf", "file3.pdf"])
+
+    # The vector store returns the merged matches of both files
+    rag_agent_instance.vector_store.hybridSearch = AsyncMock(return_value=[
+        (MagicMock(page_content="only file2"), 0.1),
+        (MagicMock(page_content="shared"), 0.2),
+        (MagicMock(page_content="only file1"), 0.9),
+    ])
+
+    mock_llm_chain = AsyncMock()
+    mock_llm_chain.ainvoke.side_effect = ["Filter Command: file1.pdf, file2.pdf", "Final answer"]
+
+    with patch.object(rag_agent_instance, 'llm_chain', mock_llm_chain):
+        result = await rag_agent_instance.execute("Compare the files")
+
+    # Both files were searched in a single iteration
+    assert result == "Final answer"
+    assert mock_llm_chain.ainvoke.call_count == 2
+    rag_agent_instance.vector_store.hybridSearch.assert_awaited_once_with(
+        "Compare the files", k=20, file_names=["file1.pdf", "file2.pdf"]
+    )
+
+    # The second iteration sees the merged results in order
+    command_result_pair = mock_llm_chain.ainvoke.call_args_list[1][1]["input"]["command_result_pair"]
+    assert command_result_pair == [{
+        "Filter Command 0": "file1.pdf, file2.pdf",
+        "Filter Command Result 0": "only file2\n\nshared\n\nonly file1"
+    }]
+
+@pytest.mark.asyncio
+async def test_rag_agent_parse_filter_command_success(mock_rag_agent):
+    """
+    Test parsing of single, multiple and wildcard filter commands.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.getAvailableFiles = MagicMock(return_value=["a.pdf", "b, c.pdf"])
+
+    assert rag_agent_instance.parseFilterCommand("a.pdf") == ["a.pdf"]
+    assert rag_agent_instance.parseFilterCommand("b, c.pdf") == ["b, c.pdf"]
+    assert rag_agent_instance.parseFilterCommand('"a.pdf", x.pdf') == ["a.pdf", "x.pdf"]
+    assert rag_agent_instance.parseFilterCommand("*") == ["a.pdf", "b, c.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_rag_agent_get_file_catalog_success(mock_rag_agent):
+    """
+    Test that the file catalog shown to the LLM is built from the manifest statistics.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.vector_store.getFileStats.return_value = {
+        "b.pdf": {"chunks": 4, "pages": 2, "bytes": 100},
+        "a.pdf": {"chunks": 10, "pages": 5, "bytes": 300},
+    }
+
+    assert rag_agent_instance.getFileCatalog() == [
+        {"file_name": "a.pdf", "pages": 5, "chunks": 10},
+        {"file_name": "b.pdf", "pages": 2, "chunks": 4},
+    ]
+
+@pytest.mark.asyncio
+async def test_rag_agent_retrieve_documents_removes_duplicates(mock_rag_agent):
+    """
+    Test that retrieval drops repeated chunks and still fills top_k from the extra candidates.
+    """
+    rag_agent_instance = await mock_rag_agent
+    rag_agent_instance.top_k = 2
+
+    boilerplate = "This manual is provided as is without warranty of any kind, express or implied."
+    rag_agent_instance.vector_store.hybridSearch = AsyncMock(return_value=[
+        (Document(page_content=boilerplate, metadata={"filename": "a.pdf"}), 0.9),
+        (Document(page_content=boilerplate, metadata={"filename": "b.pdf"}), 0.8),
+        (Document(page_content="Tighten the bolts to 35 Nm.", metadata={"filename": "a.pdf"}), 0.7),
+        (Document(page_content="Replace the filter yearly.", metadata={"filename": "a.pdf"}), 0.6),
+    ])
+
+    documents = await rag_agent_instance.retrieveDocuments("warranty", ["a.pdf", "b.pdf"])
+
+    rag_agent_instance.vector_store.hybridSearch.assert_awaited_once_with("warranty", k=4, file_names=["a.pdf", "b.pdf"])
+    assert [doc.page_content for doc in documents] == [boilerplate, "Tighten the bolts to 35 Nm."]
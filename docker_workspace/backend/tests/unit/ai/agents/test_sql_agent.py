@@ -1,7 +1,9 @@
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
 from sqlalchemy import text
+from langchain_core.messages import AIMessage, ToolMessage
 from lib.ai.agents.sql_query_agent import SqlQueryAgent
+from lib.ai.agents.agent_tools import FINAL_ANSWER_NOT_ALONE_MESSAGE
 
 class _MockInstance:
     def __init__(self):
@@ -182,4 +184,124 @@ async def test_sql_agent_get_history_from_memory_success(sql_agent):
     # Execute getHistoryFromMemory and verify the result
     result = await sql_agent_instance.getHistoryFromMemory()
     assert result == "This is the SQL history"
-    sql_agent_instance.memory.getHistory.assert_called_once_with()
\ No newline at end of file
+    sql_agent_instance.memory.getHistory.assert_called_once_with()
+@pytest.mark.asyncio
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.getHistoryFromMemory", new_callable=AsyncMock, return_value="")
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.runSQLQuery", new_callable=AsyncMock)
+async def test_sql_agent_execute_with_tools_success(mock_sql_query, mock_get_history, sql_agent):
+    """
+    Test the tool calling mode for a turn with several SQL tool calls followed by a final answer.
+    Ensures all tool calls of a turn are executed and only two LLM round trips are made.
+    """
+    sql_agent_instance = await sql_agent
+    sql_agent_instance.agent_mode = "tool_calling"
+
+    # Table names, column names, then the two queries requested in the same turn
+    mock_sql_query.side_effect = [[("table1",)], [("id",)], [(3,)], [(5,)]]
+
+    # First turn requests two queries at once, second turn returns the final answer
+    sql_agent_instance.llm.ainvoke = AsyncMock(side_effect=[
+        AIMessage(content="", tool_calls=[
+            {"name": "run_sql", "args": {"query": "SELECT COUNT(*) FROM table1;"}, "id": "call_1"},
+            {"name": "run_sql", "args": {"query": "SELECT MAX(id) FROM table1;"}, "id": "call_2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "final_answer", "args": {"answer": "There are 3 rows, max id is 5."}, "id": "call_3"},
+        ]),
+    ])
+
+    result = await sql_agent_instance.execute("How many rows and what is the max id?")
+
+    # Assert the final answer is returned and both queries were executed
+    assert result == "There are 3 rows, max id is 5."
+    assert sql_agent_instance.llm.ainvoke.call_count == 2
+    mock_sql_query.assert_any_call("SELECT COUNT(*) FROM table1;")
+    mock_sql_query.assert_any_call("SELECT MAX(id) FROM table1;")
+
+    # The second turn must see both tool results
+    second_turn_messages = sql_agent_instance.llm.ainvoke.call_args_list[1][0][0]
+    tool_messages = [message for message in second_turn_messages if isinstance(message, ToolMessage)]
+    assert [message.tool_call_id for message in tool_messages] == ["call_1", "call_2"]
+    sql_agent_instance.memory.saveContext.assert_called_once()
+
+@pytest.mark.asyncio
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.getHistoryFromMemory", new_callable=AsyncMock, return_value="")
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.runSQLQuery", new_callable=AsyncMock)
+async def test_sql_agent_execute_with_tools_rejects_final_answer_with_other_tools(mock_sql_query, mock_get_history, sql_agent):
+    """
+    Test that a final answer requested together with a query isn't accepted.
+    Ensures the query runs and the model answers again after seeing its result.
+    """
+    sql_agent_instance = await sql_agent
+    sql_agent_instance.agent_mode = "tool_calling"
+
+    # Table names, column names, then the query requested with the premature answer
+    mock_sql_query.side_effect = [[("table1",)], [("id",)], [(3,)]]
+
+    sql_agent_instance.llm.ainvoke = AsyncMock(side_effect=[
+        AIMessage(content="", tool_calls=[
+            {"name": "run_sql", "args": {"query": "SELECT COUNT(*) FROM table1;"}, "id": "call_1"},
+            {"name": "final_answer", "args": {"answer": "There are probably 10 rows."}, "id": "call_2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "final_answer", "args": {"answer": "There are 3 rows."}, "id": "call_3"},
+        ]),
+    ])
+
+    result = await sql_agent_instance.execute("How many rows are there?")
+
+    assert result == "There are 3 rows."
+    mock_sql_query.assert_any_call("SELECT COUNT(*) FROM table1;")
+
+    # Both calls of the first turn get a result, the answer one asking to answer alone
+    second_turn_messages = sql_agent_instance.llm.ainvoke.call_args_list[1][0][0]
+    tool_messages = {message.tool_call_id: message.content for message in second_turn_messages if isinstance(message, ToolMessage)}
+    assert tool_messages == {"call_1": "[(3,)]", "call_2": FINAL_ANSWER_NOT_ALONE_MESSAGE}
+
+@pytest.mark.asyncio
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.getHistoryFromMemory", new_callable=AsyncMock, return_value="")
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.runSQLQuery", new_callable=AsyncMock, return_value=[("table1",)])
+async def test_sql_agent_execute_with_tools_max_iteration_reached(mock_sql_query, mock_get_history, sql_agent):
+    """
+    Test the tool calling mode when the model never calls the final answer tool.
+    Ensures the agent stops at the max iteration limit.
+    """
+    sql_agent_instance = await sql_agent
+    sql_agent_instance.agent_mode = "tool_calling"
+    sql_agent_instance.llm.ainvoke = AsyncMock(return_value=AIMessage(content="", tool_calls=[
+        {"name": "run_sql", "args": {"query": "SELECT * FROM table1;"}, "id": "call_1"},
+    ]))
+
+    result = await sql_agent_instance.execute("Get all records from table1")
+
+    # Validate the result matches the expected response for max iteration limit
+    assert result == "I couldn't generate an answer according to your question. Please change your question and try again."
+    assert sql_agent_instance.llm.ainvoke.call_count == 10
+
+@pytest.mark.asyncio
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.addHistoryToMemory", new_callable=AsyncMock)
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.getHistoryFromMemory", new_callable=AsyncMock, return_value="")
+@patch("lib.ai.agents.sql_query_agent.SqlQueryAgent.runSQLQuery", new_callable=AsyncMock)
+async def test_sql_agent_execute_deadline_returns_partial_answer(mock_sql_query, mock_get_history, mock_add_history, sql_agent):
+    """
+    Test that the LLM call running when the time budget runs out is cancelled, and that the
+    last query result is returned as a partial answer.
+    """
+    import asyncio
+    sql_agent_instance = await sql_agent
+    sql_agent_instance.time_budget = 0.2
+    mock_sql_query.side_effect = [[("table1",)], [("id",)], [(42,)]]
+
+    async def slowSecondReply(input):
+        if input["iteration"] > 1:
+            await asyncio.sleep(5)
+        return "SQL Query: SELECT count(*) FROM table1;"
+
+    mock_llm_chain = MagicMock()
+    mock_llm_chain.ainvoke = slowSecondReply
+    with patch.object(sql_agent_instance, 'llm_chain', mock_llm_chain):
+        result = await sql_agent_instance.execute("How many rows are there?")
+
+    assert result.startswith("I couldn't finish answering your question in time.")
+    assert "[(42,)]" in result
+    mock_add_history.assert_called_once_with("How many rows are there?", [{"SQL Query 0": "SELECT count(*) FROM table1;", "SQL Query Result 0": [(42,)]}], "Time budget was reached.")
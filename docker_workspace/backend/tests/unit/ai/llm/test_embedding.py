@@ -23,7 +23,7 @@ def test_embedding_initialization_success(mock_openai_embeddings, mock_env):
     embedding_instance = Embedding(model_name=model_name)
 
     # Verify OpenAIEmbeddings was called with the correct arguments
-    mock_openai_embeddings.assert_called_once_with(model=model_name, openai_api_key="test_api_key")
+    mock_openai_embeddings.assert_called_once_with(model=model_name, dimensions=None, max_retries=0, openai_api_key="test_api_key")
     # Ensure the instance has the expected type
     assert isinstance(embedding_instance.get_embedding(), OpenAIEmbeddings)
 
@@ -58,4 +58,13 @@ def test_embedding_get_embedding(mock_openai_embeddings, mock_env):
 
     # Ensure the returned instance matches the expected type
     assert isinstance(embedding, OpenAIEmbeddings)
-    mock_openai_embeddings.assert_called_once()
\ No newline at end of file
+    mock_openai_embeddings.assert_called_once()
+
+@patch("lib.ai.llm.embedding.OpenAIEmbeddings")
+def test_embedding_initialization_with_dimensions(mock_openai_embeddings, mock_env):
+    """
+    Test to verify the requested embedding dimensions are passed to OpenAIEmbeddings.
+    """
+    Embedding(model_name="text-embedding-3-large", dimensions=256)
+
+    mock_openai_embeddings.assert_called_once_with(model="text-embedding-3-large", dimensions=256, max_retries=0, openai_api_key="test_api_key")
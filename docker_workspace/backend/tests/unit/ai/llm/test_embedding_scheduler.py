@@ -0,0 +1,140 @@
+import pytest, asyncio
+from lib.ai.llm.embedding_scheduler import EmbeddingScheduler, isRateLimitError, isTransientError, getRetryAfter
+
+class RateLimitError(Exception):
+    status_code = 429
+
+class ServerError(Exception):
+    status_code = 503
+
+class FakeEmbeddings:
+    """
+    Records every batch and embeds a text as its length; fails the first `rate_limits` batches with a 429
+    and the following `server_errors` batches with a 503.
+    """
+    def __init__(self, rate_limits: int = 0, error: Exception = None, server_errors: int = 0):
+        self.batches = []
+        self.rate_limits = rate_limits
+        self.server_errors = server_errors
+        self.error = error
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(0)  # Let other sessions submit while the batch is in flight
+        self.batches.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        if self.rate_limits > 0:
+            self.rate_limits -= 1
+            raise RateLimitError("Too many requests")
+        if self.server_errors > 0:
+            self.server_errors -= 1
+            raise ServerError("Service unavailable")
+        return [[float(len(text))] for text in texts]
+
+def countWords(text: str) -> int:
+    return len(text.split())
+
+@pytest.mark.asyncio
+async def test_scheduler_packs_batches_by_tokens():
+    """
+    Test that texts are packed into batches within the token budget and the vectors are returned in order.
+    """
+    embeddings = FakeEmbeddings()
+    scheduler = EmbeddingScheduler(embeddings, max_batch_tokens=4, max_concurrency=1, token_counter=countWords)
+
+    vectors = await scheduler.forSession("a").aembed_documents(["one two", "three four", "five six", "a much longer text than the budget"])
+
+    assert vectors == [[7.0], [10.0], [8.0], [34.0]]
+    assert embeddings.batches == [["one two", "three four"], ["five six"], ["a much longer text than the budget"]]
+
+@pytest.mark.asyncio
+async def test_scheduler_interleaves_sessions():
+    """
+    Test that a session submitting after a large upload is served in the next batch instead of after the upload.
+    """
+    embeddings = FakeEmbeddings()
+    scheduler = EmbeddingScheduler(embeddings, max_batch_tokens=2, max_concurrency=1, token_counter=countWords)
+
+    upload = asyncio.ensure_future(scheduler.embed("a", [f"a{i}" for i in range(6)]))
+    await asyncio.sleep(0)  # The upload's first batch is in flight
+    query = await scheduler.forSession("b").aembed_query("query")
+    await upload
+
+    assert query == [5.0]
+    assert embeddings.batches[:2] == [["a0", "a1"], ["a2", "query"]]
+
+@pytest.mark.asyncio
+async def test_scheduler_backs_off_on_rate_limit():
+    """
+    Test that a rate limited batch is retried after a pause with a lowered concurrency limit.
+    """
+    embeddings = FakeEmbeddings(rate_limits=1)
+    scheduler = EmbeddingScheduler(embeddings, max_concurrency=4, initial_backoff=0.01, token_counter=countWords)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    vectors = await scheduler.embed("a", ["alpha", "beta"])
+
+    assert vectors == [[5.0], [4.0]]
+    assert len(embeddings.batches) == 2
+    assert loop.time() - start >= 0.005
+    # Halved by the rate limit, raised by one by the successful retry
+    assert scheduler.concurrency_limit == 3
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_transient_errors():
+    """
+    Test that a batch failing with a server error is retried after a pause without lowering the
+    concurrency limit, and fails once it failed more often than allowed.
+    """
+    embeddings = FakeEmbeddings(server_errors=1)
+    scheduler = EmbeddingScheduler(embeddings, max_concurrency=4, initial_backoff=0.01, token_counter=countWords)
+
+    assert await scheduler.embed("a", ["alpha"]) == [[5.0]]
+    assert len(embeddings.batches) == 2
+    assert scheduler.concurrency_limit == 4
+
+    embeddings.server_errors = 10
+    scheduler = EmbeddingScheduler(embeddings, max_retries=1, initial_backoff=0.001, token_counter=countWords)
+    with pytest.raises(ServerError):
+        await scheduler.embed("a", ["alpha"])
+    assert len(embeddings.batches) == 4
+
+@pytest.mark.asyncio
+async def test_scheduler_fails_after_max_retries():
+    """
+    Test that a text rate limited more often than allowed fails its request.
+    """
+    embeddings = FakeEmbeddings(rate_limits=10)
+    scheduler = EmbeddingScheduler(embeddings, max_retries=1, initial_backoff=0.001, token_counter=countWords)
+
+    with pytest.raises(RateLimitError):
+        await scheduler.embed("a", ["alpha"])
+    assert len(embeddings.batches) == 2
+
+@pytest.mark.asyncio
+async def test_scheduler_propagates_other_errors():
+    """
+    Test that errors other than rate limits fail the batch without retries.
+    """
+    embeddings = FakeEmbeddings(error=ValueError("invalid input"))
+    scheduler = EmbeddingScheduler(embeddings, token_counter=countWords)
+
+    with pytest.raises(ValueError):
+        await scheduler.embed("a", ["alpha"])
+    assert len(embeddings.batches) == 1
+    assert scheduler.in_flight == 0
+
+def test_rate_limit_helpers():
+    """
+    Test the detection of rate limit and transient errors and the parsing of the Retry-After header.
+    """
+    error = RateLimitError("Too many requests")
+    error.response = type("Response", (), {"headers": {"retry-after": "2.5"}})()
+
+    assert isRateLimitError(error)
+    assert not isRateLimitError(ValueError())
+    assert isTransientError(ServerError()) and isTransientError(TimeoutError()) and isTransientError(ConnectionError())
+    assert not isTransientError(error) and not isTransientError(ValueError())
+    assert getRetryAfter(error) == 2.5
+    assert getRetryAfter(ValueError()) == 0.0
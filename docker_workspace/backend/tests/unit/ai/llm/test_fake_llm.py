@@ -0,0 +1,98 @@
+import json
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from lib.ai.llm.fake_llm import LatencyDistribution, ScriptedChatModel, loadScript
+from lib.ai.llm.llm import LLM
+from lib.ai.agents.agent_tools import SQL_AGENT_TOOLS
+
+def test_latency_distribution_is_reproducible():
+    """
+    Test to verify that the same seed draws the same latencies, with the configured mean and no negative values.
+    """
+    first = LatencyDistribution(distribution="lognormal", mean=0.5, stddev=0.2, seed=3)
+    second = LatencyDistribution(distribution="lognormal", mean=0.5, stddev=0.2, seed=3)
+
+    samples = [first.sample() for _ in range(5000)]
+    assert samples[:100] == [second.sample() for _ in range(100)]
+    assert min(samples) >= 0
+    assert sum(samples) / len(samples) == pytest.approx(0.5, rel=0.05)
+
+    assert LatencyDistribution(distribution="fixed", mean=0.25, stddev=1.0).sample() == 0.25
+    uniform = LatencyDistribution(distribution="uniform", mean=0.1, stddev=1.0)
+    assert all(0 <= uniform.sample() <= 0.2 for _ in range(100))
+
+def test_latency_distribution_rejects_unknown_distribution():
+    """
+    Test to verify that unknown distributions and negative parameters are rejected.
+    """
+    with pytest.raises(ValueError):
+        LatencyDistribution(distribution="pareto", mean=1.0)
+    with pytest.raises(ValueError):
+        LatencyDistribution(distribution="normal", mean=-1.0)
+
+def test_scripted_model_drives_sql_agent_in_prompt_mode():
+    """
+    Test to verify that the built-in script queries the first table in the first iteration and answers afterwards.
+    """
+    model = ScriptedChatModel()
+
+    first = model.invoke('Table names: "[(\'sales\',)]" Past SQL Commands and Results: "[]" Current Iteration: "1"')
+    assert first.content == 'SQL Query: SELECT * FROM "sales" LIMIT 10;'
+
+    second = model.invoke('Table names: "[(\'sales\',)]" Past SQL Commands and Results: "[{\'SQL Query 0\': \'x\'}]" Current Iteration: "2"')
+    assert second.content == "This is a scripted answer."
+
+@pytest.mark.asyncio
+async def test_scripted_model_calls_tools():
+    """
+    Test to verify that tools can be bound and the built-in script requests a tool and then the final answer.
+    """
+    model = ScriptedChatModel().bind_tools(SQL_AGENT_TOOLS)
+    messages = [SystemMessage(content='Table names: "[(\'sales\',)]"'), HumanMessage(content="How many sales?")]
+
+    reply = await model.ainvoke(messages)
+    assert reply.tool_calls[0]["name"] == "run_sql"
+    assert reply.tool_calls[0]["args"] == {"query": 'SELECT * FROM "sales" LIMIT 10;'}
+
+    messages += [reply, ToolMessage(content="[(1,)]", tool_call_id=reply.tool_calls[0]["id"])]
+    reply = await model.ainvoke(messages)
+    assert reply.tool_calls[0]["name"] == "final_answer"
+    assert reply.tool_calls[0]["args"] == {"answer": "This is a scripted answer."}
+
+@pytest.mark.asyncio
+async def test_scripted_model_waits_for_sampled_latency():
+    """
+    Test to verify that every reply waits for a latency drawn from the distribution.
+    """
+    model = ScriptedChatModel(latency=LatencyDistribution(distribution="fixed", mean=0.25))
+    with patch("lib.ai.llm.fake_llm.asyncio.sleep") as mock_sleep:
+        await model.ainvoke("Hello")
+    mock_sleep.assert_awaited_once_with(0.25)
+
+def test_load_script_from_file(tmp_path):
+    """
+    Test to verify that a script file is loaded, its groups are substituted and unmatched conversations get the default reply.
+    """
+    script_path = tmp_path / "script.json"
+    script_path.write_text(json.dumps({"rules": [{"match": r"weather in (?P<city>\w+)", "reply": r"Sunny in \g<city>."}], "default": "No idea."}))
+
+    model = ScriptedChatModel(script=loadScript(str(script_path)))
+    assert model.invoke("What is the weather in Ankara?").content == "Sunny in Ankara."
+    assert model.invoke("Who are you?").content == "No idea."
+
+    script_path.write_text(json.dumps({"rules": [{"reply": "Missing match."}]}))
+    with pytest.raises(ValueError):
+        loadScript(str(script_path))
+
+@patch("lib.ai.llm.llm.ChatOpenAI")
+def test_llm_fake_backend(mock_ChatOpenAI):
+    """
+    Test to verify that the fake backend builds the scripted model with its latency distribution and makes no OpenAI client.
+    """
+    llm_instance = LLM(llm_model_name="gpt-4o-mini", backend="fake", latency_distribution="normal", latency_mean=0.3, latency_stddev=0.1, seed=5)
+
+    mock_ChatOpenAI.assert_not_called()
+    assert isinstance(llm_instance.get_baseLLM(), ScriptedChatModel)
+    assert llm_instance.get_baseLLM().latency.distribution == "normal"
+    assert llm_instance.get_baseLLM().latency.mean == 0.3
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from lib.ai.llm.hashing_embeddings import HashingEmbeddings
+from lib.ai.llm.embedding import Embedding
+
+def test_hashing_embeddings_are_deterministic_unit_vectors():
+    """
+    Test to verify that the vectors have the configured size and unit length, and are the same for the same text.
+    """
+    embeddings = HashingEmbeddings(dimensions=64)
+
+    vectors = embeddings.embed_documents(["The quick brown fox", "The quick brown fox", ""])
+    assert len(vectors[0]) == 64
+    assert vectors[0] == vectors[1]
+    assert np.linalg.norm(vectors[0]) == pytest.approx(1.0)
+    assert np.linalg.norm(vectors[2]) == pytest.approx(1.0)
+    assert HashingEmbeddings().dimensions == 1024
+
+def test_hashing_embeddings_similarity_follows_shared_words():
+    """
+    Test to verify that texts sharing words are more similar than unrelated texts.
+    """
+    embeddings = HashingEmbeddings(dimensions=1024)
+    query = np.array(embeddings.embed_query("annual revenue of the company"))
+    related = np.array(embeddings.embed_query("The company reported its annual revenue"))
+    unrelated = np.array(embeddings.embed_query("Penguins live in Antarctica"))
+
+    assert query @ related > query @ unrelated
+
+@pytest.mark.asyncio
+async def test_hashing_embeddings_async_matches_sync():
+    """
+    Test to verify that the asynchronous methods return the synchronous vectors.
+    """
+    embeddings = HashingEmbeddings(dimensions=32)
+    assert await embeddings.aembed_documents(["a b c"]) == embeddings.embed_documents(["a b c"])
+    assert await embeddings.aembed_query("a b c") == embeddings.embed_query("a b c")
+
+@patch("lib.ai.llm.embedding.OpenAIEmbeddings")
+def test_embedding_hashing_backend(mock_openai_embeddings):
+    """
+    Test to verify that the hashing backend is built with the configured dimensions and makes no OpenAI client.
+    """
+    embedding = Embedding(model_name="text-embedding-3-large", dimensions=256, backend="hashing").get_embedding()
+
+    mock_openai_embeddings.assert_not_called()
+    assert isinstance(embedding, HashingEmbeddings)
+    assert embedding.dimensions == 256
@@ -0,0 +1,111 @@
+import pytest, asyncio
+from unittest.mock import patch
+from lib.ai.llm.hedging import LatencyTracker, hedgedCall, LLM_HEDGED_REQUESTS
+from lib.ai.llm.deadline import Deadline
+
+@pytest.mark.asyncio
+async def test_hedged_call_duplicate_wins_and_the_slow_call_is_cancelled():
+    """
+    Test that a call still running after the delay is duplicated, that the faster duplicate's
+    reply is returned, and that the slow call is cancelled.
+    """
+    latencies = [5, 0.01]
+    cancelled = []
+    sent = LLM_HEDGED_REQUESTS.values.get(("sent",), 0)
+    won = LLM_HEDGED_REQUESTS.values.get(("won",), 0)
+
+    async def call(latency):
+        try:
+            await asyncio.sleep(latency)
+            return f"reply after {latency}"
+        except asyncio.CancelledError:
+            cancelled.append(latency)
+            raise
+
+    result = await hedgedCall(lambda: call(latencies.pop(0)), delay=0.05)
+    await asyncio.sleep(0)
+
+    assert result == "reply after 0.01"
+    assert cancelled == [5]
+    assert LLM_HEDGED_REQUESTS.values[("sent",)] == sent + 1
+    assert LLM_HEDGED_REQUESTS.values[("won",)] == won + 1
+
+@pytest.mark.asyncio
+async def test_hedged_call_fast_call_is_not_duplicated():
+    """
+    Test that a call answering before the delay is not duplicated.
+    """
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "reply"
+
+    assert await hedgedCall(call, delay=1) == "reply"
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_hedged_call_failed_call_is_replaced_by_the_duplicate():
+    """
+    Test that the duplicate may still answer when the first call fails after the delay,
+    and that the error of the first call is raised when both fail.
+    """
+    async def failing(latency):
+        await asyncio.sleep(latency)
+        raise RuntimeError(f"failed after {latency}")
+
+    async def answering():
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    calls = [failing(0.1), answering()]
+    assert await hedgedCall(lambda: calls.pop(0), delay=0.01) == "reply"
+
+    calls = [failing(0.05), failing(0.02)]
+    with pytest.raises(RuntimeError, match="failed after 0.05"):
+        await hedgedCall(lambda: calls.pop(0), delay=0.01)
+
+@pytest.mark.asyncio
+async def test_hedged_call_cancelled_duplicate_leaves_the_first_call():
+    """
+    Test that a duplicate cancelled before it answered doesn't end the hedged call, which
+    returns the reply of the first call.
+    """
+    async def answering():
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    assert await hedgedCall(answering, delay=0.01, duplicate=cancelled) == "reply"
+
+def test_latency_tracker_needs_enough_samples():
+    """
+    Test that no quantile is estimated before enough calls were recorded, and that only the
+    recent calls count.
+    """
+    tracker = LatencyTracker(window=10, min_samples=5)
+    for latency in range(4):
+        tracker.record(latency)
+    assert tracker.quantile(0.95) is None
+
+    for latency in range(10):
+        tracker.record(100 + latency)
+    assert tracker.quantile(0.0) == 100
+    assert tracker.quantile(1.0) == 109
+
+def test_deadline_remaining():
+    """
+    Test that the remaining time of a deadline shrinks to zero, and that no budget never expires.
+    """
+    with patch("lib.ai.llm.deadline.time.monotonic", return_value=100.0):
+        deadline = Deadline(10)
+        assert Deadline(0).remaining() is None
+        assert Deadline().expired() is False
+
+    with patch("lib.ai.llm.deadline.time.monotonic", return_value=104.0):
+        assert deadline.remaining() == 6.0
+    with patch("lib.ai.llm.deadline.time.monotonic", return_value=111.0):
+        assert deadline.remaining() == 0.0
+        assert deadline.expired() is True
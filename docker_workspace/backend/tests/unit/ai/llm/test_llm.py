@@ -1,4 +1,5 @@
-from unittest.mock import patch, MagicMock
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
 from lib.ai.llm.llm import LLM
 
 @patch("langchain_openai.ChatOpenAI")
@@ -72,4 +73,28 @@ def test_llm_get_base_llm(mock_getenv, mock_ChatOpenAI):
     base_llm = llm_instance.get_baseLLM()
 
     # Assert that the returned base LLM matches the mock ChatOpenAI instance
-    assert base_llm == mock_llm_instance
\ No newline at end of file
+    assert base_llm == mock_llm_instance
+
+@pytest.mark.asyncio
+@patch("lib.ai.llm.llm.ChatOpenAI")
+@patch("lib.ai.llm.llm.os.getenv")
+async def test_llm_ainvoke_with_tools(mock_getenv, mock_ChatOpenAI):
+    """
+    Test to check if ainvoke binds the given tools before invoking the model.
+    Ensures the tool-bound model is the one that receives the messages.
+    """
+    mock_getenv.return_value = "test_key"  # Mock API key retrieval
+    mock_llm_instance = MagicMock()
+    mock_bound_llm = MagicMock()
+    mock_bound_llm.ainvoke = AsyncMock(return_value="Mocked tool call")
+    mock_llm_instance.bind_tools.return_value = mock_bound_llm
+    mock_ChatOpenAI.return_value = mock_llm_instance
+
+    llm_instance = LLM(llm_model_name="gpt-3.5-turbo")
+    tools = [MagicMock()]
+    response = await llm_instance.ainvoke(["message"], tools=tools)
+
+    # Ensure tools were bound and the bound model was invoked
+    mock_llm_instance.bind_tools.assert_called_once_with(tools)
+    mock_bound_llm.ainvoke.assert_awaited_once_with(["message"])
+    assert response == "Mocked tool call"
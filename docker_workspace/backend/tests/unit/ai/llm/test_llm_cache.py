@@ -0,0 +1,152 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from lib.ai.llm.llm_cache import CachedLLM, CACHE_KEY_PREFIX
+from lib.ai.agents.agent_tools import SQL_AGENT_TOOLS
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.set_calls = []
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.set_calls.append((key, ex))
+        self.values[key] = value
+
+def _createLLM(reply: AIMessage, delay: float = 0.0, model_name: str = "gpt-4o-mini") -> MagicMock:
+    async def ainvoke(messages, tools=None):
+        await asyncio.sleep(delay)
+        return reply
+
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock(side_effect=ainvoke)
+    llm.get_baseLLM.return_value.model_name = model_name
+    return llm
+
+@pytest.mark.asyncio
+async def test_cached_llm_answers_repeated_prompts_from_cache():
+    """
+    Test to verify that the reply to a prompt is cached with the TTL and returned without calling the model again.
+    """
+    llm = _createLLM(AIMessage(content="42"))
+    redis = _FakeRedis()
+    cached_llm = CachedLLM(llm=llm, redis=redis, ttl=120)
+
+    first = await cached_llm.ainvoke([HumanMessage(content="How many rows?")])
+    second = await cached_llm.ainvoke([HumanMessage(content="How many rows?")])
+
+    assert first.content == second.content == "42"
+    llm.ainvoke.assert_awaited_once()
+    assert redis.set_calls[0][0].startswith(CACHE_KEY_PREFIX)
+    assert redis.set_calls[0][1] == 120
+
+@pytest.mark.asyncio
+async def test_cached_llm_coalesces_identical_calls_in_flight():
+    """
+    Test to verify that identical concurrent calls share one model call, and different prompts don't.
+    """
+    llm = _createLLM(AIMessage(content="answer"), delay=0.05)
+    cached_llm = CachedLLM(llm=llm, redis=_FakeRedis())
+
+    replies = await asyncio.gather(*[cached_llm.ainvoke("Same question") for _ in range(5)], cached_llm.ainvoke("Other question"))
+
+    assert [reply.content for reply in replies] == ["answer"] * 6
+    assert llm.ainvoke.await_count == 2
+    assert cached_llm.in_flight == {}
+    assert cached_llm.waiters == {}
+
+@pytest.mark.asyncio
+async def test_cached_llm_cancels_model_call_when_all_callers_left():
+    """
+    Test to verify that a shared model call keeps running while one of its callers remains,
+    and is cancelled once the last caller was cancelled.
+    """
+    model_call_cancelled = asyncio.Event()
+
+    async def ainvoke(messages, tools=None):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            model_call_cancelled.set()
+            raise
+
+    llm = _createLLM(AIMessage(content="unused"))
+    llm.ainvoke.side_effect = ainvoke
+    cached_llm = CachedLLM(llm=llm, redis=_FakeRedis())
+
+    first = asyncio.create_task(cached_llm.ainvoke("Same question"))
+    second = asyncio.create_task(cached_llm.ainvoke("Same question"))
+    await asyncio.sleep(0.01)
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not model_call_cancelled.is_set()
+    assert len(cached_llm.in_flight) == 1
+
+    second.cancel()
+    await asyncio.wait_for(model_call_cancelled.wait(), timeout=1)
+    for caller in (first, second):
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+    llm.ainvoke.assert_awaited_once()
+    assert cached_llm.in_flight == {}
+    assert cached_llm.waiters == {}
+
+@pytest.mark.asyncio
+async def test_cached_llm_keeps_tool_calls_and_keys_by_tools_and_model():
+    """
+    Test to verify that cached tool calls are restored, and that the tools and the model are part of the key.
+    """
+    reply = AIMessage(content="", tool_calls=[{"name": "run_sql", "args": {"query": "SELECT 1;"}, "id": "call_1"}])
+    llm = _createLLM(reply)
+    cached_llm = CachedLLM(llm=llm, redis=_FakeRedis())
+
+    await cached_llm.ainvoke("Count the rows", tools=SQL_AGENT_TOOLS)
+    cached = await cached_llm.ainvoke("Count the rows", tools=SQL_AGENT_TOOLS)
+    assert cached.tool_calls[0]["name"] == "run_sql"
+    assert cached.tool_calls[0]["args"] == {"query": "SELECT 1;"}
+    assert llm.ainvoke.await_count == 1
+
+    await cached_llm.ainvoke("Count the rows")
+    assert llm.ainvoke.await_count == 2
+
+    key = cached_llm.getCacheKey([HumanMessage(content="Count the rows")])
+    llm.get_baseLLM.return_value.model_name = "gpt-4o"
+    assert cached_llm.getCacheKey([HumanMessage(content="Count the rows")]) != key
+
+@pytest.mark.asyncio
+async def test_cached_llm_calls_model_when_redis_fails():
+    """
+    Test to verify that Redis errors don't fail the call and the model answers instead.
+    """
+    llm = _createLLM(AIMessage(content="answer"))
+    redis = MagicMock()
+    redis.get = AsyncMock(side_effect=ConnectionError("Redis is down"))
+    redis.set = AsyncMock(side_effect=ConnectionError("Redis is down"))
+    cached_llm = CachedLLM(llm=llm, redis=redis)
+
+    reply = await cached_llm.ainvoke("Question")
+
+    assert reply.content == "answer"
+    llm.ainvoke.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_cached_llm_in_prompt_chain():
+    """
+    Test to verify that the cache works in the agents' prompt chains, keyed by the rendered prompt.
+    """
+    llm = _createLLM(AIMessage(content="SQL Query: SELECT 1;"))
+    chain = PromptTemplate.from_template("Question: {input}") | CachedLLM(llm=llm, redis=_FakeRedis()) | StrOutputParser()
+
+    assert await chain.ainvoke({"input": "one"}) == "SQL Query: SELECT 1;"
+    assert await chain.ainvoke({"input": "one"}) == "SQL Query: SELECT 1;"
+    await chain.ainvoke({"input": "two"})
+
+    assert llm.ainvoke.await_count == 2
+    assert llm.ainvoke.await_args_list[0].args[0] == [HumanMessage(content="Question: one")]
@@ -0,0 +1,183 @@
+import pytest, asyncio, time
+from langchain_core.messages import AIMessage, HumanMessage
+from lib.ai.llm.llm_scheduler import LLMScheduler, LLMOverloadedError, LLM_ITERATION, LLM_CALLS_SHED, LLM_QUEUE_DEPTH
+
+class _GatedLLM:
+    """
+    An LLM whose calls are answered once their gate is opened, recording the order they were sent in.
+    """
+    def __init__(self, usage: dict = None):
+        self.sent = []
+        self.gates = {}
+        self.usage = usage
+
+    async def ainvoke(self, messages, tools=None):
+        name = messages[0].content
+        self.sent.append(name)
+        await self.gates.setdefault(name, asyncio.Event()).wait()
+        return AIMessage(content=f"reply to {name}", usage_metadata=self.usage)
+
+    def open(self, name: str) -> None:
+        self.gates.setdefault(name, asyncio.Event()).set()
+
+async def _call(scheduler: LLMScheduler, name: str, iteration: int = 1):
+    LLM_ITERATION.set(iteration)  # Tasks run in a copy of the context
+    return await scheduler.ainvoke([HumanMessage(content=name)])
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_serves_continuations_first():
+    """
+    Test that calls beyond the concurrency limit wait, and that later iterations of started
+    questions are sent before the first calls of new questions.
+    """
+    llm = _GatedLLM()
+    scheduler = LLMScheduler(llm=llm, max_concurrency=1)
+
+    first = asyncio.create_task(_call(scheduler, "first"))
+    await _settle()
+    new_question = asyncio.create_task(_call(scheduler, "new question"))
+    await _settle()
+    continuation = asyncio.create_task(_call(scheduler, "continuation", iteration=2))
+    await _settle()
+    assert llm.sent == ["first"]
+
+    for name in ("first", "continuation", "new question"):
+        llm.open(name)
+    assert (await first).content == "reply to first"
+    await asyncio.gather(new_question, continuation)
+
+    assert llm.sent == ["first", "continuation", "new question"]
+    assert scheduler.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_sheds_new_questions_when_the_queue_is_full():
+    """
+    Test that new questions are rejected with a retry delay once too many calls are waiting,
+    while continuations are still queued.
+    """
+    llm = _GatedLLM()
+    scheduler = LLMScheduler(llm=llm, max_concurrency=1, max_queue=1)
+    shed = LLM_CALLS_SHED.values.get((), 0)
+
+    first = asyncio.create_task(_call(scheduler, "first"))
+    await _settle()
+    waiting = asyncio.create_task(_call(scheduler, "waiting"))
+    await _settle()
+
+    with pytest.raises(LLMOverloadedError) as error:
+        await _call(scheduler, "rejected")
+    assert error.value.retry_after >= 1
+    assert LLM_CALLS_SHED.values[()] == shed + 1
+
+    continuation = asyncio.create_task(_call(scheduler, "continuation", iteration=3))
+    await _settle()
+    assert len(scheduler.waiters) == 2
+
+    for name in ("first", "waiting", "continuation"):
+        llm.open(name)
+    await asyncio.gather(first, waiting, continuation)
+    assert "rejected" not in llm.sent
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_cancelled_waiters_free_their_place():
+    """
+    Test that a caller cancelled while waiting is skipped and doesn't hold a slot.
+    """
+    llm = _GatedLLM()
+    scheduler = LLMScheduler(llm=llm, max_concurrency=1)
+
+    first = asyncio.create_task(_call(scheduler, "first"))
+    await _settle()
+    cancelled = asyncio.create_task(_call(scheduler, "cancelled"))
+    second = asyncio.create_task(_call(scheduler, "second"))
+    await _settle()
+    cancelled.cancel()
+
+    llm.open("first")
+    llm.open("second")
+    await asyncio.gather(first, second)
+
+    assert llm.sent == ["first", "second"]
+    assert scheduler.in_flight == 0
+    assert scheduler.waiters == []
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_cancelled_waiters_leave_the_queue_at_once():
+    """
+    Test that callers cancelled while waiting leave the queue right away, so they neither
+    count towards the queue depth nor get new questions shed.
+    """
+    llm = _GatedLLM()
+    scheduler = LLMScheduler(llm=llm, max_concurrency=1, max_queue=1)
+    queue_depth = LLM_QUEUE_DEPTH.values.get(("new_question",), 0)
+
+    first = asyncio.create_task(_call(scheduler, "first"))
+    await _settle()
+    timed_out = asyncio.create_task(_call(scheduler, "timed out"))
+    await _settle()
+    assert LLM_QUEUE_DEPTH.values[("new_question",)] == queue_depth + 1
+
+    timed_out.cancel()
+    await _settle()
+    assert scheduler.waiters == []
+    assert LLM_QUEUE_DEPTH.values[("new_question",)] == queue_depth
+
+    # The slot is still taken, but the queue has room for a new question
+    waiting = asyncio.create_task(_call(scheduler, "waiting"))
+    await _settle()
+    llm.open("first")
+    llm.open("waiting")
+    await asyncio.gather(first, waiting)
+
+    assert llm.sent == ["first", "waiting"]
+    assert scheduler.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_waits_for_the_token_budget():
+    """
+    Test that a call waits until the budget refilled enough for its estimated tokens, and that
+    the budget is corrected by the usage the model reports.
+    """
+    llm = _GatedLLM(usage={"input_tokens": 900, "output_tokens": 100, "total_tokens": 1000})
+    llm.open("call")
+    scheduler = LLMScheduler(llm=llm, max_concurrency=4, tokens_per_minute=60000)  # 1000 tokens per second
+
+    scheduler.tokens = 0.0
+    start = time.monotonic()
+    await _call(scheduler, "call")
+
+    # The estimate of the short prompt is covered after about a quarter of a second
+    assert 0.2 <= time.monotonic() - start < 2
+    # The call used more than estimated, which is taken from the budget afterwards
+    assert scheduler.tokens < 0
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+async def test_llm_scheduler_hedged_duplicate_takes_its_own_slot(max_concurrency):
+    """
+    Test that the duplicate of a slow call waits for a concurrency slot of its own, so hedging
+    never exceeds the limit, and that both slots are freed once the first reply arrived.
+    """
+    llm = _GatedLLM()
+    scheduler = LLMScheduler(llm=llm, max_concurrency=max_concurrency, hedging=True, hedge_quantile=0.5)
+    for _ in range(scheduler.latencies.min_samples):
+        scheduler.latencies.record(0.01)
+
+    call = asyncio.create_task(_call(scheduler, "slow"))
+    await asyncio.sleep(0.05)
+
+    # With a free slot the duplicate is sent, otherwise it waits like any call
+    assert llm.sent == ["slow"] * max_concurrency
+    assert scheduler.in_flight == max_concurrency
+    assert len(scheduler.waiters) == 2 - max_concurrency
+
+    llm.open("slow")
+    assert (await call).content == "reply to slow"
+    await _settle()
+
+    assert scheduler.in_flight == 0
+    assert len(scheduler.latencies.latencies) > scheduler.latencies.min_samples  # Answered calls are timed
@@ -0,0 +1,79 @@
+import os
+from langchain_core.documents import Document
+from lib.ai.vector_store.bm25 import BM25Index, tokenize, createIdFilter
+from lib.ai.vector_store.hybrid import reciprocalRankFusion, rerankByTermCoverage
+
+def test_tokenize_keeps_compound_identifiers_and_their_parts():
+    """
+    Test that part numbers are kept whole and also split into their parts.
+    """
+    assert tokenize("Replace part AB-1234 now") == ["replace", "part", "ab-1234", "ab", "1234", "now"]
+
+def test_bm25_search_ranks_exact_identifier_match_first():
+    """
+    Test that the chunk containing an exact error code is ranked first.
+    """
+    bm25_index = BM25Index.build([
+        "the device shows an error on startup",
+        "error 0x80070005 means access is denied",
+        "restart the device to clear the error",
+    ])
+
+    results = bm25_index.search("what is error 0x80070005", k=3)
+
+    assert results[0][0] == 1
+    assert all(score > 0 for _, score in results)
+
+def test_bm25_search_returns_nothing_for_unknown_terms():
+    """
+    Test that a query without known terms matches no documents.
+    """
+    assert BM25Index.build(["alpha beta"]).search("gamma", k=5) == []
+
+def test_bm25_search_only_scores_selected_ranges():
+    """
+    Test that a search restricted to id ranges only returns documents inside them, whatever the order of the ranges.
+    """
+    bm25_index = BM25Index.build([f"alpha {i}" for i in range(10)])
+
+    results = bm25_index.search("alpha", k=10, id_ranges=[(7, 9), (0, 2)])
+
+    assert sorted(doc_id for doc_id, _ in results) == [0, 1, 7, 8]
+
+def test_id_filter_checks_range_bounds():
+    """
+    Test that the id filter includes range starts and excludes range ends and gaps.
+    """
+    in_ranges = createIdFilter([(5, 8), (0, 2)])
+
+    assert [doc_id for doc_id in range(10) if in_ranges(doc_id)] == [0, 1, 5, 6, 7]
+
+def test_bm25_save_and_load_roundtrip(tmp_path):
+    """
+    Test that a saved index returns the same results after loading.
+    """
+    bm25_index = BM25Index.build(["alpha beta", "beta gamma", "gamma delta"])
+    path = os.path.join(tmp_path, "bm25.json")
+    bm25_index.save(path)
+
+    assert BM25Index.load(path).search("gamma", k=3) == bm25_index.search("gamma", k=3)
+
+def test_reciprocal_rank_fusion_merges_rankings():
+    """
+    Test that a document ranked by both retrievers is fused ahead of single-list documents.
+    """
+    doc_a, doc_b, doc_c = Document(page_content="a"), Document(page_content="b"), Document(page_content="c")
+
+    fused = reciprocalRankFusion([[doc_a, doc_b], [doc_c, doc_b]])
+
+    assert [doc.page_content for doc, _ in fused] == ["b", "a", "c"]
+
+def test_rerank_by_term_coverage_prefers_chunks_with_query_terms():
+    """
+    Test that a chunk containing the query's part number overtakes an equally fused chunk.
+    """
+    scored_docs = [(Document(page_content="general maintenance notes"), 0.03), (Document(page_content="part AB-1234 specs"), 0.03)]
+
+    reranked = rerankByTermCoverage("AB-1234 specs", scored_docs)
+
+    assert reranked[0][0].page_content == "part AB-1234 specs"
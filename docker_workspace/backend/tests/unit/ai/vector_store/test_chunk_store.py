@@ -0,0 +1,46 @@
+import pytest
+from langchain_core.documents import Document
+from lib.ai.vector_store.chunk_store import ChunkStore, writeChunks
+
+def test_chunk_store_random_access_by_vector_id(tmp_path):
+    """
+    Test that written records can be read back individually, by slice and by negative index.
+    """
+    documents = [Document(page_content=f"chunk {i} ünicode", metadata={"filename": "a.pdf", "page": i}) for i in range(5)]
+    writeChunks(str(tmp_path), documents)
+
+    chunk_store = ChunkStore(str(tmp_path))
+
+    assert len(chunk_store) == 5
+    assert chunk_store[3] == documents[3]
+    assert chunk_store[-1] == documents[4]
+    assert chunk_store[1:3] == documents[1:3]
+    assert list(chunk_store) == documents
+    with pytest.raises(IndexError):
+        chunk_store[5]
+
+def test_chunk_store_stores_metadata_columnar(tmp_path):
+    """
+    Test that metadata is dictionary encoded per key, keeps value types and omits missing keys.
+    """
+    documents = [
+        Document(page_content="a", metadata={"filename": "a.pdf", "page": 0}),
+        Document(page_content="b", metadata={"filename": "a.pdf", "page": 1}),
+        Document(page_content="c", metadata={"filename": "a.pdf"}),
+    ]
+    writeChunks(str(tmp_path), documents)
+
+    chunk_store = ChunkStore(str(tmp_path))
+
+    assert chunk_store.columns == ["filename", "page"]
+    assert chunk_store.column_values == {"filename": ["a.pdf"], "page": [0, 1]}
+    assert chunk_store.getMetadata(1) == {"filename": "a.pdf", "page": 1}
+    assert chunk_store.getMetadata(2) == {"filename": "a.pdf"}
+
+def test_chunk_store_empty(tmp_path):
+    """
+    Test that a store without records can be opened.
+    """
+    writeChunks(str(tmp_path), [])
+
+    assert len(ChunkStore(str(tmp_path))) == 0
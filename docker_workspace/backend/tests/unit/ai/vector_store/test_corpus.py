@@ -0,0 +1,135 @@
+import pytest, os, asyncio, hashlib, shutil
+from unittest.mock import AsyncMock
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from lib.ai.vector_store.corpus import DocumentCorpus, removeUnreferencedDocuments, UNREFERENCED_GRACE_PERIOD
+from lib.ai.vector_store.vector_store import SessionVectorStore
+
+@pytest.fixture
+def embeddings():
+    # Deterministic embeddings so identical texts always map to identical vectors
+    return DeterministicFakeEmbedding(size=16)
+
+@pytest.fixture
+def corpus(tmp_path, embeddings):
+    return DocumentCorpus(corpus_dir=str(tmp_path / "corpus"), embeddings=embeddings, index_factory="Flat", ingest_settings={"chunk_size": 1000})
+
+@pytest.fixture
+def storeUpload(tmp_path):
+    """
+    Stores uploaded content as the upload endpoint does and returns the corpus arguments for it.
+    """
+    def store(content: bytes) -> dict:
+        file_path = tmp_path / "uploads" / hashlib.md5(content).hexdigest()
+        file_path.parent.mkdir(exist_ok=True)
+        file_path.write_bytes(content)
+        return {"file_path": str(file_path), "content_hash": hashlib.sha256(content).hexdigest()}
+    return store
+
+def getKey(corpus, content: bytes) -> str:
+    """
+    Computes the document key the corpus uses for uploaded content.
+    """
+    return corpus.getDocumentKey(hashlib.sha256(content).hexdigest())
+
+def createLoader(texts: list) -> AsyncMock:
+    """
+    Creates a loader returning one chunk per text, with the upload specific metadata a PDF loader adds.
+    """
+    async def load(file_path):
+        await asyncio.sleep(0)  # Let concurrent uploads reach the corpus
+        documents = [Document(page_content=text, metadata={"source": file_path, "filename": "upload.pdf", "page": i}) for i, text in enumerate(texts)]
+        return documents, len(texts)
+    return AsyncMock(side_effect=load)
+
+@pytest.mark.asyncio
+async def test_corpus_second_upload_is_metadata_hit(corpus, storeUpload):
+    """
+    Test that a document is copied, parsed and embedded only on its first upload, and that the key depends on the content.
+    """
+    loader = createLoader(["alpha", "beta"])
+
+    key, entry = await corpus.getOrIngest(**storeUpload(b"%PDF a"), loader=loader)
+    second_key, second_entry = await corpus.getOrIngest(**storeUpload(b"%PDF a"), loader=loader)
+
+    assert loader.await_count == 1
+    assert (second_key, second_entry) == (key, entry)
+    assert entry == {"chunks": 2, "pages": 2, "bytes": 6}
+    assert os.path.isdir(corpus.getSegmentDir(key))
+    with open(os.path.join(corpus.corpus_dir, key, "document.pdf"), "rb") as document_file:
+        assert document_file.read() == b"%PDF a"
+    assert getKey(corpus, b"%PDF b") != key
+
+@pytest.mark.asyncio
+async def test_corpus_key_depends_on_ingest_settings(corpus, embeddings):
+    """
+    Test that changing the ingestion settings doesn't reuse documents ingested with other settings.
+    """
+    other_corpus = DocumentCorpus(corpus_dir=corpus.corpus_dir, embeddings=embeddings, index_factory="Flat", ingest_settings={"chunk_size": 500})
+
+    assert getKey(other_corpus, b"%PDF a") != getKey(corpus, b"%PDF a")
+
+@pytest.mark.asyncio
+async def test_corpus_concurrent_uploads_ingest_once(corpus, storeUpload):
+    """
+    Test that concurrent uploads of the same document share one ingestion.
+    """
+    loader = createLoader(["alpha"])
+
+    results = await asyncio.gather(*[corpus.getOrIngest(**storeUpload(b"%PDF a"), loader=loader) for _ in range(4)])
+
+    assert loader.await_count == 1
+    assert len(set(key for key, _ in results)) == 1
+
+@pytest.mark.asyncio
+async def test_corpus_shared_segment_is_named_per_session(tmp_path, corpus, embeddings, storeUpload):
+    """
+    Test that sessions referencing the same stored document see it under their own file names,
+    and that the stored chunks don't keep the metadata of the upload that created them.
+    """
+    key, entry = await corpus.getOrIngest(**storeUpload(b"%PDF a"), loader=createLoader(["alpha", "query text"]))
+
+    names = {"first": "report.pdf", "second": "copy.pdf"}
+    for session, file_name in names.items():
+        vector_store = SessionVectorStore(vector_store_path=str(tmp_path / session), embeddings=embeddings)
+        vector_store.addSharedSegment(file_name=file_name, segment_id=key, segment_dir=corpus.getSegmentDir(key), chunk_count=entry["chunks"], page_count=entry["pages"], byte_size=entry["bytes"])
+
+    for session, file_name in names.items():
+        vector_store = SessionVectorStore(vector_store_path=str(tmp_path / session), embeddings=embeddings)
+        results = await vector_store.asimilarity_search_with_score("query text", k=1, file_names=[file_name])
+
+        assert vector_store.getFileStats() == {file_name: {"chunks": 2, "pages": 2, "bytes": 6}}
+        assert results[0][0] == Document(page_content="query text", metadata={"page": 1, "filename": file_name})
+
+def ageEntry(corpus, document_key: str, seconds: float) -> None:
+    """
+    Moves the last use of a stored document the given number of seconds into the past.
+    """
+    last_use = os.path.getmtime(os.path.join(corpus.corpus_dir, document_key, "info.json")) - seconds
+    os.utime(os.path.join(corpus.corpus_dir, document_key, "info.json"), (last_use, last_use))
+
+@pytest.mark.asyncio
+async def test_corpus_removes_only_unreferenced_idle_documents(tmp_path, corpus, embeddings, storeUpload):
+    """
+    Test that a document is removed once no session references it and it wasn't used for the
+    grace period, while referenced documents and recently resolved ones are kept.
+    """
+    vector_stores_dir = str(tmp_path / "sessions")
+    keys = {}
+    for name in ["referenced", "deleted", "resolved"]:
+        keys[name], entry = await corpus.getOrIngest(**storeUpload(name.encode()), loader=createLoader([name]))
+        vector_store = SessionVectorStore(vector_store_path=os.path.join(vector_stores_dir, name), embeddings=embeddings)
+        vector_store.addSharedSegment(file_name=f"{name}.pdf", segment_id=keys[name], segment_dir=corpus.getSegmentDir(keys[name]), chunk_count=entry["chunks"])
+        ageEntry(corpus, keys[name], UNREFERENCED_GRACE_PERIOD + 1)
+
+    # Deleting a session drops its references; an upload resolving a document marks it as used
+    shutil.rmtree(os.path.join(vector_stores_dir, "deleted"))
+    shutil.rmtree(os.path.join(vector_stores_dir, "resolved"))
+    await corpus.getOrIngest(**storeUpload(b"resolved"), loader=createLoader(["resolved"]))
+
+    removed = await removeUnreferencedDocuments(corpus_dir=corpus.corpus_dir, vector_stores_dir=vector_stores_dir)
+
+    assert removed == [keys["deleted"]]
+    assert not os.path.exists(os.path.join(corpus.corpus_dir, keys["deleted"]))
+    assert corpus.getEntry(keys["referenced"]) is not None
+    assert corpus.getEntry(keys["resolved"]) is not None
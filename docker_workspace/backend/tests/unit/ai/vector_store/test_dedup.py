@@ -0,0 +1,77 @@
+from langchain_core.documents import Document
+from lib.ai.vector_store.dedup import ChunkDeduplicator, removeOverlappingResults, normalizeText, findOverlap
+
+LEGAL_TEXT = (
+    "This document is confidential and intended solely for the use of the individual to whom it is addressed. "
+    "Any unauthorized review, use, disclosure or distribution is prohibited and may be unlawful. "
+    "If you are not the intended recipient please contact the sender and destroy all copies of the original message."
+)
+
+def test_normalize_text_ignores_case_punctuation_and_whitespace():
+    """
+    Test that chunks differing only in layout normalize to the same text.
+    """
+    assert normalizeText("Page  1:\n\nHello, World!") == normalizeText("page 1 hello world")
+
+def test_deduplicator_drops_exact_duplicates():
+    """
+    Test that chunks with the same normalized text are kept once, in their original order.
+    """
+    documents = [
+        Document(page_content="Header Text", metadata={"page": 0}),
+        Document(page_content="unique body", metadata={"page": 0}),
+        Document(page_content="header  text.", metadata={"page": 1}),
+    ]
+
+    kept = ChunkDeduplicator(threshold=1).deduplicate(documents)
+
+    assert kept == documents[:2]
+
+def test_deduplicator_drops_near_duplicates():
+    """
+    Test that boilerplate differing in a few words is dropped while different text is kept.
+    """
+    documents = [
+        Document(page_content=f"Page 1 of 10. {LEGAL_TEXT}"),
+        Document(page_content="The torque specification of part XK-4471 is 35 Nm, applied in two passes."),
+        Document(page_content=f"Page 2 of 10. {LEGAL_TEXT}"),
+    ]
+
+    assert ChunkDeduplicator(threshold=0.8).deduplicate(documents) == documents[:2]
+    # Exact duplicate removal alone keeps the boilerplate of every page
+    assert ChunkDeduplicator(threshold=1).deduplicate(documents) == documents
+
+def test_remove_overlapping_results_drops_contained_chunks():
+    """
+    Test that a result repeating a better ranked result, even from another file, is dropped.
+    """
+    documents = [
+        Document(page_content=LEGAL_TEXT, metadata={"filename": "a.pdf"}),
+        Document(page_content=f"Footer. {LEGAL_TEXT}", metadata={"filename": "b.pdf"}),
+        Document(page_content="The torque specification of part XK-4471 is 35 Nm.", metadata={"filename": "b.pdf"}),
+    ]
+
+    assert removeOverlappingResults(documents) == [documents[0], documents[2]]
+
+def test_remove_overlapping_results_trims_neighbour_overlap():
+    """
+    Test that the text a neighbour chunk repeats at the boundary is cut from the worse ranked chunk only.
+    """
+    shared = "the overlap that the splitter copies from one chunk into the next one"
+    first = Document(page_content=f"Earlier section about the bolts. {shared}", metadata={"filename": "a.pdf"})
+    second = Document(page_content=f"{shared} and the later section about the nuts.", metadata={"filename": "a.pdf"})
+    other_file = Document(page_content=f"{shared} in another file.", metadata={"filename": "b.pdf"})
+
+    results = removeOverlappingResults([second, first, other_file])
+
+    assert results[0] == second
+    assert results[1] == Document(page_content="Earlier section about the bolts.", metadata={"filename": "a.pdf"})
+    assert results[2] == other_file
+
+def test_find_overlap():
+    """
+    Test that the longest end of the first text starting the second text is found.
+    """
+    assert findOverlap("abcdefgh", "efghijk", 2) == 4
+    assert findOverlap("abcdefgh", "xyz", 2) == 0
+    assert findOverlap("abcdefgh", "efghijk", 5) == 0
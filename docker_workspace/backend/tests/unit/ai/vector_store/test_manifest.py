@@ -0,0 +1,73 @@
+import os, json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from lib.ai.vector_store.manifest import StoreManifest
+
+def _fileEntry(chunks: int, offset: int = 0) -> dict:
+    return {"chunks": chunks, "pages": 1, "bytes": 10, "offset": offset}
+
+def test_manifest_empty_when_missing(tmp_path):
+    """
+    Test that a vector store without a manifest has no files or segments.
+    """
+    manifest = StoreManifest(str(tmp_path))
+
+    assert manifest.getFiles() == {}
+    assert manifest.getSegments() == {}
+    assert manifest.load()["version"] == 0
+
+def test_manifest_add_segment_persists_files(tmp_path):
+    """
+    Test that added segments are written to disk with their files and a new version.
+    """
+    manifest = StoreManifest(str(tmp_path))
+    manifest.addSegment(segment_id="s1", chunk_count=10, files={"a.pdf": {"chunks": 10, "pages": 3, "bytes": 2048, "offset": 0}}, path="/corpus/s1")
+    manifest.addSegment(segment_id="s2", chunk_count=1, files={"b.pdf": _fileEntry(1)}, path="/corpus/s2")
+
+    with open(os.path.join(tmp_path, "manifest.json")) as manifest_file:
+        data = json.load(manifest_file)
+
+    assert data["version"] == 2
+    assert data["files"]["a.pdf"] == {"chunks": 10, "pages": 3, "bytes": 2048, "offset": 0, "segment": "s1"}
+    assert data["segments"] == {"s1": {"chunks": 10, "path": "/corpus/s1"}, "s2": {"chunks": 1, "path": "/corpus/s2"}}
+    assert StoreManifest(str(tmp_path)).getFiles() == data["files"]
+
+def test_manifest_concurrent_writers_keep_every_segment(tmp_path):
+    """
+    Test that segments added concurrently are all kept and no temporary file is left behind.
+    """
+    def addSegment(index: int) -> None:
+        StoreManifest(str(tmp_path)).addSegment(segment_id=f"s{index}", chunk_count=1, files={f"{index}.pdf": _fileEntry(1)}, path=f"/corpus/s{index}")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(addSegment, range(32)))
+
+    manifest = StoreManifest(str(tmp_path)).load()
+    assert manifest["version"] == 32
+    assert len(manifest["segments"]) == 32
+    assert sorted(os.listdir(tmp_path)) == ["manifest.json", "manifest.json.lock"]
+
+def test_manifest_load_is_cached(tmp_path):
+    """
+    Test that the manifest is parsed once and reused while the file is unchanged.
+    """
+    StoreManifest(str(tmp_path)).addSegment(segment_id="s1", chunk_count=1, files={"a.pdf": _fileEntry(1)}, path="/corpus/s1")
+
+    with patch("lib.ai.vector_store.manifest.json.load") as mock_json_load:
+        for _ in range(5):
+            StoreManifest(str(tmp_path)).getFiles()
+
+    mock_json_load.assert_not_called()
+
+def test_manifest_reload_after_external_update(tmp_path):
+    """
+    Test that a manifest rewritten by another process is reloaded.
+    """
+    manifest = StoreManifest(str(tmp_path))
+    manifest.addSegment(segment_id="s1", chunk_count=1, files={"a.pdf": _fileEntry(1)}, path="/corpus/s1")
+
+    # Simulate another worker writing a new manifest
+    with open(manifest.manifest_path, "w") as manifest_file:
+        json.dump({"version": 7, "files": {"other.pdf": {**_fileEntry(2), "segment": "s9"}}, "segments": {"s9": {"chunks": 2, "path": "/corpus/s9"}}}, manifest_file)
+
+    assert list(manifest.getFiles()) == ["other.pdf"]
@@ -0,0 +1,97 @@
+import os, pytest, faiss
+import numpy as np
+from unittest.mock import patch
+from langchain_core.documents import Document
+from lib.ai.vector_store.segment import Segment
+from lib.ai.vector_store.chunk_store import ChunkStore
+
+def _buildSegment() -> Segment:
+    documents = [Document(page_content=f"chunk {i}", metadata={"filename": "a.pdf", "page": i}) for i in range(4)]
+    vectors = [[float(i), 0.0] for i in range(4)]
+    return Segment.fromEmbeddings(vectors, documents)
+
+def test_segment_save_and_load_roundtrip(tmp_path):
+    """
+    Test that a saved segment loads with the same chunk records and search results.
+    """
+    segment_dir = os.path.join(tmp_path, "s1")
+    _buildSegment().save(segment_dir)
+
+    segment = Segment.load(segment_dir)
+
+    assert segment.documents[2] == Document(page_content="chunk 2", metadata={"filename": "a.pdf", "page": 2})
+    assert [doc.page_content for doc, _ in segment.similaritySearchByVector([3.0, 0.0], k=2)] == ["chunk 3", "chunk 2"]
+
+def test_segment_search_restricted_to_id_ranges():
+    """
+    Test that dense and BM25 searches only return chunks inside the given id ranges.
+    """
+    segment = _buildSegment()
+
+    dense_results = segment.similaritySearchByVector([3.0, 0.0], k=4, id_ranges=[(0, 1), (2, 3)])
+    sparse_results = segment.bm25Search("chunk", k=4, id_ranges=[(1, 2)])
+
+    assert [doc.page_content for doc, _ in dense_results] == ["chunk 2", "chunk 0"]
+    assert [doc.page_content for doc, _ in sparse_results] == ["chunk 1"]
+
+def test_segment_save_failure_leaves_no_directory(tmp_path):
+    """
+    Test that a segment failing to be written leaves neither the segment nor its temporary directory.
+    """
+    segment = _buildSegment()
+
+    with patch.object(segment.bm25_index, "save", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            segment.save(os.path.join(tmp_path, "s1"))
+
+    assert os.listdir(tmp_path) == []
+
+def test_segment_load_memory_maps_index_and_chunks(tmp_path):
+    """
+    Test that a loaded segment opens its index with IO_FLAG_MMAP and reads chunks lazily.
+    """
+    segment_dir = os.path.join(tmp_path, "s1")
+    _buildSegment().save(segment_dir)
+
+    with patch("lib.ai.vector_store.segment.faiss.read_index", wraps=faiss.read_index) as mock_read_index:
+        segment = Segment.load(segment_dir)
+
+    assert mock_read_index.call_args.args[1] & faiss.IO_FLAG_MMAP
+    assert isinstance(segment.documents, ChunkStore)
+    assert segment.index.ntotal == 4
+
+def _randomSegment(count: int, index_factory: str) -> tuple:
+    vectors = np.random.default_rng(0).random((count, 16), dtype=np.float32)
+    documents = [Document(page_content=f"chunk {i}") for i in range(count)]
+    return vectors, Segment.fromEmbeddings(vectors, documents, index_factory)
+
+@pytest.mark.parametrize("index_factory, index_type", [
+    ("HNSW16", faiss.IndexHNSWFlat),
+    ("IVF4,Flat", faiss.IndexIVFFlat),
+    ("IVF4,PQ4x4", faiss.IndexIVFPQ),
+    ("SQ8", faiss.IndexScalarQuantizer),
+    ("PQ4x4", faiss.IndexPQ),
+])
+def test_segment_index_factory_supports_filtered_search(tmp_path, index_factory, index_type):
+    """
+    Test that every configured index type is built, survives a save and load, and
+    honours id range filters, including types without selector support.
+    """
+    vectors, segment = _randomSegment(300, index_factory)
+    segment.save(os.path.join(tmp_path, "s1"))
+    segment = Segment.load(os.path.join(tmp_path, "s1"))
+
+    results = segment.similaritySearchByVector(vectors[150], k=5, id_ranges=[(100, 200)])
+
+    assert isinstance(segment.index, index_type)
+    assert results[0][0].page_content == "chunk 150"
+    assert all(100 <= int(doc.page_content.split()[1]) < 200 for doc, _ in results)
+
+def test_segment_index_factory_falls_back_to_flat_when_too_small():
+    """
+    Test that a segment with too few vectors to train its index gets a flat index.
+    """
+    _, segment = _randomSegment(10, "IVF64,PQ4")
+
+    assert isinstance(segment.index, faiss.IndexFlatL2)
+    assert segment.index.ntotal == 10
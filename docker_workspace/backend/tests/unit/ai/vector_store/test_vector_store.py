@@ -0,0 +1,110 @@
+import pytest, os
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from lib.ai.vector_store.segment import Segment
+from lib.ai.vector_store.vector_store import SessionVectorStore, mergeSearchResults
+
+@pytest.fixture
+def embeddings():
+    # Deterministic embeddings so identical texts always map to identical vectors
+    return DeterministicFakeEmbedding(size=16)
+
+async def addFile(vector_store, corpus_dir, file_name: str, texts: list, page_count: int = 0, byte_size: int = 0) -> str:
+    """
+    Stores the texts as a corpus segment and references it from the session under the file name.
+    """
+    documents = [Document(page_content=text) for text in texts]
+    segment = await Segment.afromDocuments(documents, vector_store.embeddings)
+    segment_dir = os.path.join(corpus_dir, file_name, "segment")
+    os.makedirs(os.path.dirname(segment_dir), exist_ok=True)
+    segment.save(segment_dir)
+    vector_store.addSharedSegment(file_name=file_name, segment_id=file_name, segment_dir=segment_dir, chunk_count=len(documents), page_count=page_count, byte_size=byte_size)
+    return segment_dir
+
+@pytest.mark.asyncio
+async def test_vector_store_add_shared_segment_only_writes_manifest(tmp_path, embeddings):
+    """
+    Test that adding a file only references its corpus segment.
+    Ensures the session stores nothing but its manifest.
+    """
+    vector_store = SessionVectorStore(vector_store_path=str(tmp_path / "session"), embeddings=embeddings)
+
+    await addFile(vector_store, str(tmp_path / "corpus"), "a.pdf", ["alpha"])
+    segment_dir = await addFile(vector_store, str(tmp_path / "corpus"), "b.pdf", ["beta"], page_count=1, byte_size=42)
+
+    assert vector_store.getFileNames() == ["a.pdf", "b.pdf"]
+    assert vector_store.getFileStats()["b.pdf"] == {"chunks": 1, "pages": 1, "bytes": 42}
+    assert vector_store.manifest.getSegments()["b.pdf"] == {"chunks": 1, "path": segment_dir}
+    assert sorted(os.listdir(tmp_path / "session")) == ["manifest.json", "manifest.json.lock"]
+
+@pytest.mark.asyncio
+async def test_vector_store_filtered_search_only_scans_selected_files(tmp_path, embeddings):
+    """
+    Test that a search restricted to one file only returns that file's chunks,
+    even when other files contain a closer match.
+    """
+    vector_store = SessionVectorStore(vector_store_path=str(tmp_path), embeddings=embeddings)
+    await addFile(vector_store, str(tmp_path / "corpus"), "a.pdf", [f"a chunk {i}" for i in range(3)])
+    await addFile(vector_store, str(tmp_path / "corpus"), "b.pdf", ["query text"])
+
+    # Reopen the store to make sure the indexes are loaded from disk
+    reopened_store = SessionVectorStore(vector_store_path=str(tmp_path), embeddings=embeddings)
+    results = await reopened_store.asimilarity_search_with_score("query text", k=10, file_names=["a.pdf"])
+
+    assert len(results) == 3
+    assert all(doc.metadata["filename"] == "a.pdf" for doc, _ in results)
+
+@pytest.mark.asyncio
+async def test_vector_store_unfiltered_search_fans_out(tmp_path, embeddings):
+    """
+    Test that a search without a file filter covers all files and ranks the best match first.
+    """
+    vector_store = SessionVectorStore(vector_store_path=str(tmp_path), embeddings=embeddings)
+    await addFile(vector_store, str(tmp_path / "corpus"), "a.pdf", ["a chunk"])
+    await addFile(vector_store, str(tmp_path / "corpus"), "b.pdf", ["query text"])
+
+    results = await vector_store.asimilarity_search_with_score("query text", k=10)
+
+    assert [doc.page_content for doc, _ in results] == ["query text", "a chunk"]
+
+@pytest.mark.asyncio
+async def test_vector_store_search_unknown_file_returns_empty(tmp_path, embeddings):
+    """
+    Test that searching a file without an index returns no results.
+    """
+    vector_store = SessionVectorStore(vector_store_path=str(tmp_path), embeddings=embeddings)
+
+    assert await vector_store.asimilarity_search_with_score("query", k=10, file_names=["missing.pdf"]) == []
+    assert vector_store.getFileNames() == []
+
+def test_merge_search_results_deduplicates_and_ranks():
+    """
+    Test that merged results keep the best distance of duplicate chunks and are ordered by distance.
+    """
+    results = [
+        [(Document(page_content="shared"), 0.5), (Document(page_content="only a"), 0.9)],
+        [(Document(page_content="shared"), 0.2), (Document(page_content="only b"), 0.1)],
+    ]
+
+    merged = mergeSearchResults(results, k=2)
+
+    assert [(doc.page_content, score) for doc, score in merged] == [("only b", 0.1), ("shared", 0.2)]
+
+@pytest.mark.asyncio
+async def test_vector_store_hybrid_search_finds_exact_keyword_match(tmp_path, embeddings):
+    """
+    Test that hybrid search returns the chunk with an exact part number match first,
+    even though fake embeddings make dense ranking arbitrary, and that the BM25 index
+    is persisted in the segment.
+    """
+    vector_store = SessionVectorStore(vector_store_path=str(tmp_path), embeddings=embeddings)
+    texts = [f"generic chunk number {i}" for i in range(5)] + ["replacement part XK-4471 torque spec"]
+    segment_dir = await addFile(vector_store, str(tmp_path / "corpus"), "a.pdf", texts)
+
+    assert os.path.exists(os.path.join(segment_dir, "bm25.json"))
+
+    reopened_store = SessionVectorStore(vector_store_path=str(tmp_path), embeddings=embeddings)
+    results = await reopened_store.hybridSearch("XK-4471 torque", k=3)
+
+    assert len(results) == 3
+    assert results[0][0].page_content == "replacement part XK-4471 torque spec"
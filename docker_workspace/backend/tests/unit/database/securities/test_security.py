@@ -1,5 +1,10 @@
+import pytest, threading
 from unittest.mock import patch
-from lib.database.securities.security import getPasswordHash, verifyPassword
+from passlib.hash import bcrypt
+from lib.database.securities.security import getPasswordHash, verifyPassword, createPasswordContext, PasswordHasher
+
+# Low costs keep the tests fast
+FAST_COSTS = {"bcrypt_rounds": 4, "argon2_time_cost": 1, "argon2_memory_cost": 8, "argon2_parallelism": 1}
 
 @patch("lib.database.securities.security.pwd_context.hash")
 def test_db_security_get_password_success(mock_hash):
@@ -33,4 +38,49 @@ def test_db_security_verify_password_success(mock_verify):
     mock_verify.assert_called_once_with("mysecretpassword", "hashedpassword")
 
     # Confirm that the result indicates a successful match
-    assert result == True
\ No newline at end of file
+    assert result == True
+
+@pytest.mark.asyncio
+async def test_password_hasher_runs_beside_event_loop():
+    """
+    Test to verify that passwords are hashed and verified in the hasher's threads with argon2.
+    """
+    hasher = PasswordHasher(context=createPasswordContext(**FAST_COSTS), max_workers=2)
+    threads = []
+    context_hash = hasher.context.hash
+
+    def recordingHash(password):
+        threads.append(threading.current_thread().name)
+        return context_hash(password)
+
+    try:
+        with patch.object(hasher.context, "hash", side_effect=recordingHash):
+            hashed = await hasher.hash("mysecretpassword")
+
+        assert hashed.startswith("$argon2id$")
+        assert threads[0].startswith("password-hasher")
+        assert threads[0] != threading.current_thread().name
+        assert await hasher.verify("mysecretpassword", hashed) == (True, None)
+        assert await hasher.verify("wrongpassword", hashed) == (False, None)
+    finally:
+        hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_password_hasher_upgrades_outdated_hashes():
+    """
+    Test to verify that bcrypt hashes and argon2 hashes of other costs are replaced on a successful verification only.
+    """
+    hasher = PasswordHasher(context=createPasswordContext(**FAST_COSTS), max_workers=1)
+    bcrypt_hash = bcrypt.using(rounds=4).hash("mysecretpassword")
+    costlier_hash = createPasswordContext(**{**FAST_COSTS, "argon2_time_cost": 2}).hash("mysecretpassword")
+
+    try:
+        valid, new_hash = await hasher.verify("mysecretpassword", bcrypt_hash)
+        assert valid and new_hash.startswith("$argon2id$v=19$m=8,t=1,p=1$")
+
+        valid, new_hash = await hasher.verify("mysecretpassword", costlier_hash)
+        assert valid and new_hash.startswith("$argon2id$v=19$m=8,t=1,p=1$")
+
+        assert await hasher.verify("wrongpassword", bcrypt_hash) == (False, None)
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,351 @@
+import pytest, os, hashlib, json
+import pandas as pd
+from unittest.mock import AsyncMock, MagicMock, patch, call
+from langchain_core.documents import Document
+from lib.tools.upload_quota import QuotaExceededError
+from lib.ai.agents.answer_cache import getDatasetVersion
+from tests.unit.routers._mock_instance import _MockInstance
+
+FAKE_SESSION_ID = "session123"
+
+@pytest.fixture
+def upload_jobs():
+    """
+    Provides the upload jobs module with the instance replaced by the mock instance.
+    """
+    with patch('lib.instances.instance.Instance', new=_MockInstance, create=True):
+        import lib.jobs.upload_jobs as upload_jobs
+        mock_instance = _MockInstance()
+        mock_instance.redis_tool.updateSession = AsyncMock()
+        mock_instance.redis_tool.redis.exists = AsyncMock(return_value=True)
+        mock_instance.redis_tool.redis.hget = AsyncMock(return_value=None)
+        mock_instance.job_queue.updateJob = AsyncMock()
+        mock_instance.upload_quota.reserveRows = AsyncMock()
+        mock_instance.upload_quota.releaseRows = AsyncMock()
+        # Publish every progress change instead of throttling them
+        with patch.object(upload_jobs, "instance", mock_instance), patch.object(upload_jobs, "PROGRESS_INTERVAL", 0):
+            yield upload_jobs
+
+def _createJob(tmp_path, file_contents: dict, payload: dict = None) -> dict:
+    """
+    Stores files as the upload endpoint does and returns the job processing them.
+    """
+    upload_dir = tmp_path / "upload"
+    upload_dir.mkdir()
+    files = []
+    for index, (filename, content) in enumerate(file_contents):
+        file_path = upload_dir / f"{index}_{filename}"
+        file_path.write_bytes(content)
+        files.append({"path": str(file_path), "filename": filename})
+    return {"id": "job-id", "session_id": FAKE_SESSION_ID, "payload": {**(payload or {}), "files": files, "upload_dir": str(upload_dir)}}
+
+def _setupCorpus(mock_document_corpus):
+    """
+    Configures the DocumentCorpus mock so every upload resolves to a stored entry named after its content.
+    """
+    mock_corpus = MagicMock()
+
+    async def getOrIngest(file_path, content_hash, loader):
+        with open(file_path, "rb") as stored_file:
+            file_content = stored_file.read()
+        return f"key-{file_content.decode()}", {"chunks": 3, "pages": 2, "bytes": len(file_content)}
+
+    mock_corpus.getOrIngest = AsyncMock(side_effect=getOrIngest)
+    mock_corpus.getSegmentDir.side_effect = lambda key: f"./corpus/{key}/segment"
+    mock_document_corpus.return_value = mock_corpus
+    return mock_corpus
+
+@pytest.mark.asyncio
+async def test_process_pdf_upload_success(upload_jobs, tmp_path):
+    """
+    Test that queued PDF files are renamed to unique names, resolved through the shared corpus,
+    referenced by the session, and that progress and status are published.
+    """
+    instance = upload_jobs.instance
+    vector_store_path = f"./.vector_stores/{FAKE_SESSION_ID}"
+    job = _createJob(tmp_path, [("test1.pdf", b"%PDF-1.4 a"), ("test1.pdf", b"%PDF-1.4 b")])
+
+    # Setup vector store mock whose file list grows as files are added
+    file_names = ['test1.pdf', 'test2.pdf']
+    mock_vector_store = MagicMock()
+    mock_vector_store.getFileNames.side_effect = lambda: list(file_names)
+    mock_vector_store.addSharedSegment.side_effect = lambda file_name, **kwargs: file_names.append(file_name)
+
+    with patch.object(upload_jobs, "SessionVectorStore", return_value=mock_vector_store) as mock_session_vector_store, \
+         patch.object(upload_jobs, "DocumentCorpus") as mock_document_corpus:
+        mock_corpus = _setupCorpus(mock_document_corpus)
+        message = await upload_jobs.processPDFUpload(job)
+
+    assert message == "PDF files uploaded and converted to database successfully."
+
+    # Verify the session store and the corpus were created with the configured settings and the session's embeddings
+    instance.embedding_scheduler.forSession.assert_called_with(FAKE_SESSION_ID)
+    mock_session_vector_store.assert_called_once_with(
+        vector_store_path=vector_store_path,
+        embeddings=instance.embedding_scheduler.forSession.return_value
+    )
+    mock_document_corpus.assert_called_once_with(
+        corpus_dir=instance.corpus_dir,
+        embeddings=instance.embedding_scheduler.forSession.return_value,
+        index_factory=instance.index_factory,
+        ingest_settings={
+            "embedding_model_name": instance.embedding_model_name,
+            "embedding_dimensions": instance.embedding_dimensions,
+            "chunk_size": 1000,
+            "chunk_overlap": 200,
+            "separators": ["\n\n", "\n", ".", " "],
+            "dedup_threshold": instance.dedup_threshold
+        }
+    )
+
+    # Verify every stored file was passed to the corpus by path and content hash, and referenced under a unique name
+    files = job["payload"]["files"]
+    mock_corpus.getOrIngest.assert_has_awaits([
+        call(file_path=files[0]["path"], content_hash=hashlib.sha256(b"%PDF-1.4 a").hexdigest(), loader=upload_jobs._loadPDF),
+        call(file_path=files[1]["path"], content_hash=hashlib.sha256(b"%PDF-1.4 b").hexdigest(), loader=upload_jobs._loadPDF),
+    ])
+    mock_vector_store.addSharedSegment.assert_has_calls([
+        call(file_name="test1_1.pdf", segment_id="key-%PDF-1.4 a", segment_dir="./corpus/key-%PDF-1.4 a/segment", chunk_count=3, page_count=2, byte_size=10),
+        call(file_name="test1_2.pdf", segment_id="key-%PDF-1.4 b", segment_dir="./corpus/key-%PDF-1.4 b/segment", chunk_count=3, page_count=2, byte_size=10),
+    ])
+
+    dataset = {"test1_1.pdf": "key-%PDF-1.4 a", "test1_2.pdf": "key-%PDF-1.4 b"}
+    expected_calls = [
+        call(session_id=FAKE_SESSION_ID, key="upload_status", value="running"),
+        call(session_id=FAKE_SESSION_ID, key="upload_message", value=""),
+        # Progress follows the bytes read and ingested, and stays below 100 until the job finished
+        call(session_id=FAKE_SESSION_ID, key="progress", value="25"),
+        call(session_id=FAKE_SESSION_ID, key="progress", value="50"),
+        call(session_id=FAKE_SESSION_ID, key="progress", value="75"),
+        call(session_id=FAKE_SESSION_ID, key="progress", value="99"),
+        call(session_id=FAKE_SESSION_ID, key="progress", value="100"),
+        # The files are added to the dataset keying the cached answers, by their content addressed keys
+        call(session_id=FAKE_SESSION_ID, key="rag_dataset", value=json.dumps(dataset, sort_keys=True)),
+        call(session_id=FAKE_SESSION_ID, key="rag_dataset_version", value=getDatasetVersion(dataset)),
+        call(session_id=FAKE_SESSION_ID, key="vector_store_path", value=vector_store_path),
+        call(session_id=FAKE_SESSION_ID, key="upload_status", value="completed"),
+        call(session_id=FAKE_SESSION_ID, key="upload_message", value=message),
+    ]
+    assert instance.redis_tool.updateSession.await_args_list == expected_calls
+    instance.job_queue.updateJob.assert_any_await("job-id", progress=100)
+
+    # The stored upload is removed once processed
+    assert not os.path.exists(job["payload"]["upload_dir"])
+
+@pytest.mark.asyncio
+async def test_process_pdf_upload_same_content_shares_document(upload_jobs, tmp_path):
+    """
+    Test that uploading to an empty session keeps the file names and that identical
+    content is referenced as the same stored document.
+    """
+    job = _createJob(tmp_path, [("test1.pdf", b"%PDF-1.4"), ("test2.pdf", b"%PDF-1.4")])
+
+    mock_vector_store = MagicMock()
+    mock_vector_store.getFileNames.return_value = []
+
+    with patch.object(upload_jobs, "SessionVectorStore", return_value=mock_vector_store), \
+         patch.object(upload_jobs, "DocumentCorpus") as mock_document_corpus:
+        _setupCorpus(mock_document_corpus)
+        await upload_jobs.processPDFUpload(job)
+
+    # Identical content resolves to the same stored document under both names
+    assert [kwargs["file_name"] for _, kwargs in mock_vector_store.addSharedSegment.call_args_list] == ["test1.pdf", "test2.pdf"]
+    assert {kwargs["segment_id"] for _, kwargs in mock_vector_store.addSharedSegment.call_args_list} == {"key-%PDF-1.4"}
+
+@pytest.mark.asyncio
+async def test_process_pdf_upload_failure(upload_jobs, tmp_path):
+    """
+    Test that an error while processing fails the job and publishes the failure to the session.
+    """
+    instance = upload_jobs.instance
+    job = _createJob(tmp_path, [("test1.pdf", b"%PDF-1.4")])
+
+    with patch.object(upload_jobs, "SessionVectorStore", side_effect=Exception("Test Error")):
+        with pytest.raises(Exception, match="Test Error"):
+            await upload_jobs.processPDFUpload(job)
+
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="upload_status", value="failed")
+    instance.redis_tool.updateSession.assert_any_await(
+        session_id=FAKE_SESSION_ID, key="upload_message", value="Failed to convert PDF file. Error: Test Error"
+    )
+    assert not os.path.exists(job["payload"]["upload_dir"])
+
+@pytest.mark.asyncio
+async def test_process_pdf_upload_partial_failure(upload_jobs, tmp_path):
+    """
+    Test that the files added before a failing file stay reachable by the session's queries.
+    """
+    instance = upload_jobs.instance
+    job = _createJob(tmp_path, [("test1.pdf", b"%PDF-1.4 a"), ("test2.pdf", b"%PDF-1.4 b")])
+
+    mock_vector_store = MagicMock()
+    mock_vector_store.getFileNames.return_value = []
+
+    with patch.object(upload_jobs, "SessionVectorStore", return_value=mock_vector_store), \
+         patch.object(upload_jobs, "DocumentCorpus") as mock_document_corpus:
+        mock_corpus = _setupCorpus(mock_document_corpus)
+        mock_corpus.getOrIngest.side_effect = [("key-a", {"chunks": 3, "pages": 2, "bytes": 10}), Exception("broken file")]
+        with pytest.raises(Exception, match="broken file"):
+            await upload_jobs.processPDFUpload(job)
+
+    dataset = {"test1.pdf": "key-a"}
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="rag_dataset", value=json.dumps(dataset, sort_keys=True))
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="vector_store_path", value=f"./.vector_stores/{FAKE_SESSION_ID}")
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="upload_status", value="failed")
+
+@pytest.mark.asyncio
+async def test_process_upload_of_ended_session(upload_jobs, tmp_path):
+    """
+    Test that a job whose session ended while it was queued fails without recreating the session.
+    """
+    instance = upload_jobs.instance
+    instance.redis_tool.redis.exists = AsyncMock(return_value=False)
+    job = _createJob(tmp_path, [("test1.pdf", b"%PDF-1.4")])
+
+    with pytest.raises(RuntimeError):
+        await upload_jobs.processPDFUpload(job)
+
+    instance.redis_tool.updateSession.assert_not_called()
+    assert not os.path.exists(job["payload"]["upload_dir"])
+
+@pytest.mark.asyncio
+async def test_fail_abandoned_upload(upload_jobs, tmp_path):
+    """
+    Test that an upload abandoned by its worker is published as failed and its stored files are
+    removed, without recreating an ended session.
+    """
+    instance = upload_jobs.instance
+    job = _createJob(tmp_path, [("test1.pdf", b"%PDF-1.4")])
+
+    await upload_jobs.failAbandonedUpload(job)
+
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="upload_status", value="failed")
+    assert not os.path.exists(job["payload"]["upload_dir"])
+
+    instance.redis_tool.updateSession.reset_mock()
+    instance.redis_tool.redis.exists = AsyncMock(return_value=False)
+    await upload_jobs.failAbandonedUpload(job)
+    instance.redis_tool.updateSession.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_process_csv_upload_success(upload_jobs, tmp_path):
+    """
+    Test that queued CSV files are converted to uniquely named tables of the temporary database,
+    which are added to the session's dataset by their content.
+    """
+    instance = upload_jobs.instance
+    # The session stores what is written to it, and already holds a table
+    session = {"sql_dataset": json.dumps({"table1": "earlier"})}
+    instance.redis_tool.updateSession = AsyncMock(side_effect=lambda session_id, key, value: session.__setitem__(key, value))
+    instance.redis_tool.redis.hget = AsyncMock(side_effect=lambda session_key, key: session.get(key))
+    job = _createJob(
+        tmp_path,
+        [("test1.csv", b"col1,col2\n1,3\n2,4"), ("table1.csv", b"col1,col2\n5,6\n7,8")],
+        payload={"sync_temp_db_url": "db_url"}
+    )
+
+    with patch.object(upload_jobs, "create_engine") as mock_create_engine, \
+         patch.object(pd.DataFrame, "to_sql", new=MagicMock()) as mock_to_sql:
+        mock_connection = MagicMock()
+        mock_connection.execute.return_value = [("table1",)]  # Stored by an earlier job of the session
+        mock_create_engine.return_value.connect.return_value.__enter__.return_value = mock_connection
+        message = await upload_jobs.processCSVUpload(job)
+
+    assert message == "CSV files uploaded and converted to database successfully."
+    mock_create_engine.assert_called_with("db_url")
+    mock_to_sql.assert_has_calls([
+        call("test1", con=mock_connection, index=False, if_exists="replace"),
+        call("table1_1", con=mock_connection, index=False, if_exists="replace"),
+    ])
+
+    # Every row is counted against the session's quota
+    instance.upload_quota.reserveRows.assert_has_awaits([
+        call(session_id=FAKE_SESSION_ID, row_count=2),
+        call(session_id=FAKE_SESSION_ID, row_count=2),
+    ])
+
+    # Progress follows the bytes of the files read so far
+    progress_calls = [c for c in instance.redis_tool.updateSession.await_args_list if c.kwargs["key"] == "progress"]
+    assert [c.kwargs["value"] for c in progress_calls] == ["50", "99", "100"]
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="upload_status", value="completed")
+
+    dataset = {
+        "table1": "earlier",
+        "test1": hashlib.sha256(b"col1,col2\n1,3\n2,4").hexdigest(),
+        "table1_1": hashlib.sha256(b"col1,col2\n5,6\n7,8").hexdigest()
+    }
+    assert json.loads(session["sql_dataset"]) == dataset
+    assert session["sql_dataset_version"] == getDatasetVersion(dataset)
+    assert not os.path.exists(job["payload"]["upload_dir"])
+
+@pytest.mark.asyncio
+async def test_process_csv_upload_failure(upload_jobs, tmp_path):
+    """
+    Test that an unreadable CSV file fails the job and publishes the failure to the session.
+    """
+    instance = upload_jobs.instance
+    job = _createJob(tmp_path, [("test1.csv", b"col1,col2\n1,3")], payload={"sync_temp_db_url": "db_url"})
+
+    with patch.object(upload_jobs, "create_engine"), patch.object(upload_jobs.pd, "read_csv", side_effect=ValueError("bad csv")):
+        with pytest.raises(ValueError):
+            await upload_jobs.processCSVUpload(job)
+
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    instance.redis_tool.updateSession.assert_any_await(
+        session_id=FAKE_SESSION_ID, key="upload_message", value="Failed to convert CSV file. Error: bad csv"
+    )
+
+@pytest.mark.asyncio
+async def test_process_csv_upload_exceeding_row_quota(upload_jobs, tmp_path):
+    """
+    Test that a CSV file exceeding the session's row quota fails the job while it is streamed,
+    and that its partial table and rows are discarded.
+    """
+    instance = upload_jobs.instance
+    instance.upload_quota.reserveRows = AsyncMock(side_effect=[None, QuotaExceededError("The upload exceeds the session quota of 1 rows; 0 rows remain.", 0)])
+    job = _createJob(tmp_path, [("test1.csv", b"col1,col2\n1,3\n2,4")], payload={"sync_temp_db_url": "db_url"})
+
+    with patch.object(upload_jobs, "create_engine") as mock_create_engine, \
+         patch.object(upload_jobs, "CSV_CHUNK_ROWS", 1), \
+         patch.object(pd.DataFrame, "to_sql", new=MagicMock()) as mock_to_sql:
+        mock_engine = mock_create_engine.return_value
+        mock_engine.dialect.identifier_preparer.quote.side_effect = lambda name: f'"{name}"'
+        with pytest.raises(QuotaExceededError):
+            await upload_jobs.processCSVUpload(job)
+
+    # Only the first chunk was stored before the quota stopped the file
+    assert mock_to_sql.call_count == 1
+    assert str(mock_engine.begin.return_value.__enter__.return_value.execute.call_args.args[0]) == 'DROP TABLE IF EXISTS "test1"'
+    instance.upload_quota.releaseRows.assert_awaited_once_with(session_id=FAKE_SESSION_ID, row_count=1)
+
+    instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    instance.redis_tool.updateSession.assert_any_await(
+        session_id=FAKE_SESSION_ID, key="upload_message",
+        value="Failed to convert CSV file. The upload exceeds the session quota of 1 rows; 0 rows remain."
+    )
+    assert not os.path.exists(job["payload"]["upload_dir"])
+
+@pytest.mark.asyncio
+async def test_load_pdf(upload_jobs):
+    """
+    Test to verify the corpus loader parses the stored PDF, splits it with the configured chunking and drops duplicate chunks.
+    """
+    with patch.object(upload_jobs, "PyPDFLoader") as mock_pypdf_loader, \
+         patch.object(upload_jobs, "RecursiveCharacterTextSplitter") as mock_recursive_character_text_splitter:
+        mock_pypdf_loader.return_value.aload = AsyncMock(return_value=[MagicMock(), MagicMock()])
+        mock_split_documents = [
+            Document(page_content="Confidential - Page 1", metadata={"page": 0}),
+            Document(page_content="Body text", metadata={"page": 0}),
+            Document(page_content="confidential, page 1", metadata={"page": 1}),
+        ]
+        mock_recursive_character_text_splitter.return_value.atransform_documents = AsyncMock(return_value=mock_split_documents)
+
+        split_documents, page_count = await upload_jobs._loadPDF("./corpus/key/document.pdf")
+
+    mock_pypdf_loader.assert_called_once_with("./corpus/key/document.pdf")
+    mock_recursive_character_text_splitter.assert_called_once_with(chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", ".", " "])
+    # The repeated footer is only embedded once
+    assert split_documents == mock_split_documents[:2]
+    assert page_count == 2
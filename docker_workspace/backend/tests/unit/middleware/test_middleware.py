@@ -1,4 +1,5 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 import pytest
@@ -7,17 +8,28 @@ class _MockInstance:
     def __init__(self):
         self.log_file_path = 'temp_path.log'
 
-@patch('lib.instances.instance.Instance', new=_MockInstance)
-def test_middleware_success_unexpected_exception():
+@pytest.fixture
+def middleware_module():
     """
-    Test to verify LogRequestsMiddleware logs an error and raises HTTP 500 for an unexpected exception.
+    Provides the instrumentation middleware's module, with the logging of the middleware module configured by the mock instance.
+    """
+    with patch('lib.instances.instance.Instance', new=_MockInstance):
+        import lib.middleware.middleware
+        import lib.middleware.instrumentation as middleware_module
+        yield middleware_module
+
+def _createApp(middleware_module) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware_module.InstrumentationMiddleware)
+    return app
+
+def test_middleware_success_unexpected_exception(middleware_module):
+    """
+    Test to verify InstrumentationMiddleware logs an unexpected exception and answers with HTTP 500.
     Ensures logging and error response behavior is correct.
     """
-    with patch("lib.middleware.middleware.logging.error") as mock_log_error:
-        from lib.middleware.middleware import LogRequestsMiddleware, instance
-        
-        app = FastAPI()
-        app.add_middleware(LogRequestsMiddleware)
+    with patch("lib.middleware.instrumentation.logging.error") as mock_log_error:
+        app = _createApp(middleware_module)
 
         @app.get("/unexpected_error")
         async def error_route():
@@ -25,31 +37,28 @@ def test_middleware_success_unexpected_exception():
             raise Exception("This is a test error")
 
         client = TestClient(app)
-        
+
         # Test the response for an unexpected error
-        with pytest.raises(HTTPException) as excinfo:
-            response = client.get("/unexpected_error")
+        response = client.get("/unexpected_error")
 
         # Check that the response is an HTTP 500 error
-        assert excinfo.value.status_code == 500
-        assert excinfo.value.detail == "Unexpected internal server error"
+        assert response.status_code == 500
+        assert response.json() == {"detail": "Unexpected internal server error"}
 
-        # Ensure that the error was logged once
+        # Ensure that the error was logged once and counted
         mock_log_error.assert_called_once()
+        assert middleware_module.REQUESTS_TOTAL.values[("GET", "/unexpected_error", "500")] == 1
         # Verify log file path is correctly set
+        from lib.middleware.middleware import instance
         assert instance.log_file_path == 'temp_path.log'
 
-@patch('lib.instances.instance.Instance', new=_MockInstance)
-def test_middleware_success_http_exception():
+def test_middleware_success_http_exception(middleware_module):
     """
-    Test to verify LogRequestsMiddleware correctly handles and does not log HTTPExceptions.
+    Test to verify InstrumentationMiddleware correctly handles and does not log HTTPExceptions.
     Ensures the response and logging behavior align with the expected FastAPI error handling.
     """
-    with patch("lib.middleware.middleware.logging.error") as mock_log_error:
-        from lib.middleware.middleware import LogRequestsMiddleware
-        
-        app = FastAPI()
-        app.add_middleware(LogRequestsMiddleware)
+    with patch("lib.middleware.instrumentation.logging.error") as mock_log_error:
+        app = _createApp(middleware_module)
 
         @app.get("/http_error")
         async def error_route():
@@ -57,7 +66,7 @@ def test_middleware_success_http_exception():
             raise HTTPException(status_code=400, detail="Test exception")
 
         client = TestClient(app)
-        
+
         # Test the response for an HTTPException
         response = client.get("/http_error")
 
@@ -66,4 +75,83 @@ def test_middleware_success_http_exception():
         assert response.json()['detail'] == "Test exception"
 
         # Ensure no logging occurred for this expected error
-        mock_log_error.assert_not_called()
\ No newline at end of file
+        mock_log_error.assert_not_called()
+
+def test_middleware_records_request_metrics(middleware_module):
+    """
+    Test to verify that latency, status, sizes and in-flight requests are recorded per route template,
+    and that unknown paths share one label.
+    """
+    app = _createApp(middleware_module)
+    in_flight = []
+
+    @app.post("/items/{item_id}")
+    async def item_route(item_id: int):
+        in_flight.append(middleware_module.REQUESTS_IN_FLIGHT.values[("POST",)])
+        return {"item": item_id}
+
+    client = TestClient(app)
+    before = middleware_module.REQUEST_DURATION.getCount("POST", "/items/{item_id}")
+
+    client.post("/items/1", content=b"x" * 10)
+    client.post("/items/2", content=b"x" * 10)
+    client.get("/unknown/path")
+
+    assert middleware_module.REQUEST_DURATION.getCount("POST", "/items/{item_id}") == before + 2
+    assert middleware_module.REQUESTS_TOTAL.values[("POST", "/items/{item_id}", "200")] >= 2
+    assert middleware_module.REQUESTS_TOTAL.values[("GET", middleware_module.UNMATCHED_ROUTE, "404")] >= 1
+    assert middleware_module.REQUEST_SIZE.getSum("POST", "/items/{item_id}") >= 20
+    assert middleware_module.RESPONSE_SIZE.getSum("POST", "/items/{item_id}") >= 2 * len(b'{"item":1}')
+    # The request was counted while it was handled, and not after
+    assert in_flight[0] >= 1
+    assert middleware_module.REQUESTS_IN_FLIGHT.values[("POST",)] == 0
+
+def test_middleware_keeps_responses_streaming(middleware_module):
+    """
+    Test to verify that a streaming response is passed on chunk by chunk and its size recorded.
+    """
+    app = _createApp(middleware_module)
+
+    @app.get("/stream")
+    async def stream_route():
+        async def chunks():
+            for chunk in (b"first ", b"second"):
+                yield chunk
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    client = TestClient(app)
+    before = middleware_module.RESPONSE_SIZE.getSum("GET", "/stream")
+
+    with client.stream("GET", "/stream") as response:
+        received = list(response.iter_bytes())
+
+    assert b"".join(received) == b"first second"
+    assert middleware_module.RESPONSE_SIZE.getSum("GET", "/stream") == before + len(b"first second")
+
+def test_middleware_traces_requests(middleware_module):
+    """
+    Test to verify that every request runs in a trace whose id is returned in the X-Trace-Id header,
+    and that a trace started by the caller is continued.
+    """
+    from lib.tools.tracing import TRACER, EXPORTER
+    app = _createApp(middleware_module)
+
+    @app.get("/traced/{item_id}")
+    async def traced_route(item_id: int):
+        with TRACER.span("db.query"):
+            return {"item": item_id}
+
+    client = TestClient(app)
+    response = client.get("/traced/1")
+
+    trace_id = response.headers["x-trace-id"]
+    spans = EXPORTER.getTrace(trace_id)
+    assert [span.name for span in spans] == ["GET /traced/{item_id}", "db.query"]
+    assert spans[1].parent_span_id == spans[0].span_id
+    assert spans[0].attributes["http.response.status_code"] == 200
+    assert response.headers["traceparent"] == f"00-{trace_id}-{spans[0].span_id}-01"
+
+    caller_trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = client.get("/traced/2", headers={"traceparent": f"00-{caller_trace_id}-00f067aa0ba902b7-01"})
+    assert response.headers["x-trace-id"] == caller_trace_id
+    assert EXPORTER.getTrace(caller_trace_id)[0].parent_span_id == "00f067aa0ba902b7"
@@ -19,6 +19,43 @@ class _MockInstance:
         self.llm_model_name = 'mock_llm_model_name'
         self.embedding_model_name = 'mock_embedding_model_name'
         self.llm_max_iteration = 5
+        self.agent_mode = 'prompt'
+        self.llm_backend = 'openai'
+        self.embedding_backend = 'openai'
+        self.fake_llm_script = None
+        self.fake_llm_latency_distribution = 'lognormal'
+        self.fake_llm_latency_mean = 0.0
+        self.fake_llm_latency_stddev = 0.0
+        self.fake_llm_seed = 0
+        self.llm_cache = True
+        self.llm_cache_ttl = 3600
+        self.llm_max_concurrency = 16
+        self.llm_tokens_per_minute = 0
+        self.llm_max_queue = 64
+        self.llm_request_budget = 120.0
+        self.llm_hedging = False
+        self.llm_hedge_quantile = 0.95
+        self.answer_cache_enabled = False
+        self.answer_cache_threshold = 0.95
+        self.answer_cache_max_entries = 256
+        self.answer_cache_max_datasets = 1024
+        self.answer_cache_ttl = 3600
+        self.embedding_dimensions = None
+        self.index_factory = 'Flat'
+        self.dedup_threshold = 0.9
+        self.job_worker_concurrency = 2
+        self.job_local_workers = True
+        self.job_ttl = 86400
+        self.job_visibility_timeout = 60
+        self.upload_part_size = 8388608
+        self.upload_ttl = 86400
+        self.session_byte_quota = 1073741824
+        self.session_row_quota = 10000000
+        self.password_hash_workers = 4
+        self.bcrypt_rounds = 12
+        self.argon2_time_cost = 3
+        self.argon2_memory_cost = 65536
+        self.argon2_parallelism = 1
 
         # Define API endpoint paths
         self.signup_end_point = '/signup'
@@ -32,6 +69,12 @@ class _MockInstance:
         self.rag_query_end_point = '/rag_query'
         self.clear_session_end_point = '/clear_session'
         self.end_session_end_point = '/end_session'
+        self.upload_init_end_point = '/upload_init'
+        self.upload_part_end_point = '/upload_part'
+        self.upload_status_end_point = '/upload_status'
+        self.upload_complete_end_point = '/upload_complete'
+        self.metrics_end_point = '/metrics'
+        self.trace_end_point = '/trace'
 
         # Define other configuration settings
         self.session_timeout = 3600  # session timeout in seconds
@@ -47,6 +90,8 @@ class _MockInstance:
         self.app_ip = 'localhost'  # application IP
         self.app_port = 8000  # application port
         self.log_file_path = '/var/log/app.log'  # log file path
+        self.corpus_dir = './.vector_stores/_corpus'  # shared document corpus
+        self.upload_dir = './.uploads'  # uploaded files waiting for their job
 
         # Additional attributes for tracking in tests
         self.check_list = []
@@ -56,7 +101,13 @@ class _MockInstance:
         self.memory = Mock()
         self.llm = Mock()
         self.embedding = Mock()
+        self.embedding_scheduler = Mock()
+        self.answer_cache = Mock()
         self.redis_tool = Mock()
+        self.job_queue = Mock()
+        self.upload_store = Mock()
+        self.upload_quota = Mock()
+        self.password_hasher = Mock()
 
         # Mark the instance as initialized to prevent re-initialization
         self._initialized = True
\ No newline at end of file
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
 from httpx import AsyncClient, ASGITransport
 from delete_fixtures import fixture_test_app, patched_delete_module, FAKE_URL, FAKE_SESSION_ID
 
@@ -18,6 +18,8 @@ async def test_delete_clear_session(mock_delete_vector, mock_clear_temp_db, patc
 
     # Override the getSession dependency to use the mock version
     fixture_test_app.dependency_overrides[patched_delete_module.instance.redis_tool.getSession] = mock_getSession
+    patched_delete_module.instance.upload_quota.resetUsage = AsyncMock()
+    patched_delete_module.instance.redis_tool.redis.hdel = AsyncMock()
 
     # Send the DELETE request to clear the session
     async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
@@ -26,4 +28,10 @@ async def test_delete_clear_session(mock_delete_vector, mock_clear_temp_db, patc
     # Check that the response is successful with a 200 status code
     assert response.status_code == 200
     # Validate that the response message confirms the session was cleared
-    assert response.json() == {"informationMessage": "Session cleared."}
\ No newline at end of file
+    assert response.json() == {"informationMessage": "Session cleared."}
+    # Validate that the cleared uploads no longer count against the session's quotas
+    patched_delete_module.instance.upload_quota.resetUsage.assert_awaited_once_with(session_id=FAKE_SESSION_ID)
+    # Validate that the versions keying the cached answers of the cleared data were removed
+    patched_delete_module.instance.redis_tool.redis.hdel.assert_awaited_once_with(
+        f"session:{FAKE_SESSION_ID}", "sql_dataset", "sql_dataset_version", "rag_dataset", "rag_dataset_version"
+    )
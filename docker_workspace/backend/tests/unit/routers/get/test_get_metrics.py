@@ -0,0 +1,26 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from get_fixtures import fixture_test_app, patched_get_module, FAKE_URL
+from fastapi import status
+
+@pytest.mark.asyncio
+async def test_get_metrics(patched_get_module, fixture_test_app):
+    """
+    Test for verifying the 'metrics' endpoint.
+    This test checks that the metrics recorded by the agents, tools and routers are returned in the Prometheus text format.
+    """
+    # Import the modules recording metrics, so their metrics are registered
+    import lib.ai.agents.agent_metrics, lib.tools.redis, lib.tools.job_queue
+    lib.ai.agents.agent_metrics.AGENT_ITERATIONS.observe(3, "sql", "answer")
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.get(patched_get_module.instance.metrics_end_point)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    # Every metric is described, and the observation is counted
+    assert "# TYPE llm_request_duration_seconds histogram" in response.text
+    assert "# TYPE redis_command_duration_seconds histogram" in response.text
+    assert "# TYPE job_duration_seconds histogram" in response.text
+    assert 'agent_iterations_count{agent="sql",outcome="answer"}' in response.text
@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import AsyncMock
 from httpx import AsyncClient, ASGITransport
 from get_fixtures import fixture_test_app, patched_get_module, FAKE_URL, FAKE_SESSION_ID
 from fastapi import status
@@ -49,4 +50,44 @@ async def test_get_get_progress_not_found(patched_get_module, fixture_test_app):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
     # Verify that the response JSON contains the correct error message.
-    assert response.json() == {"detail": "Progress not found."}
\ No newline at end of file
+    assert response.json() == {"detail": "Progress not found."}
+@pytest.mark.asyncio
+async def test_get_get_progress_with_upload_status(patched_get_module, fixture_test_app):
+    """
+    Test case for the 'get_progress' endpoint while an upload job exists.
+    This test ensures the status and result message of the job are returned with the progress.
+    """
+    
+    # Mock the session data of a finished upload job.
+    async def override_getSession():
+        yield FAKE_SESSION_ID, {"progress": 100, "upload_status": "completed", "upload_message": "Done."}
+
+    fixture_test_app.dependency_overrides[patched_get_module.instance.redis_tool.getSession] = override_getSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.get(patched_get_module.instance.progress_end_point)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"progress": 100, "status": "completed", "message": "Done."}
+
+@pytest.mark.asyncio
+async def test_get_upload_status(patched_get_module, fixture_test_app):
+    """
+    Test case for the 'upload_status' endpoint.
+    This test ensures the offset to resume an upload at is returned, and unknown uploads are not found.
+    """
+    async def override_getSession():
+        yield FAKE_SESSION_ID, {}
+
+    fixture_test_app.dependency_overrides[patched_get_module.instance.redis_tool.getSession] = override_getSession
+
+    upload = {"id": "u1", "offset": 4, "file_size": 10}
+    patched_get_module.instance.upload_store.getUpload = AsyncMock(side_effect=lambda upload_id, session_id: upload if upload_id == "u1" else None)
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.get(patched_get_module.instance.upload_status_end_point, params={"uploadId": "u1"})
+        not_found = await client.get(patched_get_module.instance.upload_status_end_point, params={"uploadId": "u2"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"uploadId": "u1", "offset": 4, "fileSize": 10, "partSize": patched_get_module.instance.upload_part_size}
+    assert not_found.status_code == status.HTTP_404_NOT_FOUND
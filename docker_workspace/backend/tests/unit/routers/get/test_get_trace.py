@@ -0,0 +1,73 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from get_fixtures import fixture_test_app, patched_get_module, FAKE_URL, FAKE_SESSION_ID
+from fastapi import status
+
+@pytest.mark.asyncio
+async def test_get_trace(patched_get_module, fixture_test_app):
+    """
+    Test for verifying the 'trace' endpoint.
+    This test checks that the spans of a kept trace of the session are returned in their start order.
+    """
+    from lib.tools.tracing import TRACER
+
+    root = TRACER.startTrace("POST /sql_query")
+    with TRACER.activate(root):
+        root.setOwner(FAKE_SESSION_ID)
+        with TRACER.span("llm.ainvoke", kind="CLIENT", attributes={"agent": "sql"}):
+            pass
+
+    async def override_getSession():
+        return FAKE_SESSION_ID, {}
+
+    fixture_test_app.dependency_overrides[patched_get_module.instance.redis_tool.getSession] = override_getSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.get(patched_get_module.instance.trace_end_point, params={"traceId": root.trace_id})
+
+    assert response.status_code == status.HTTP_200_OK
+    trace = response.json()
+    assert trace["traceId"] == root.trace_id
+    assert [span["name"] for span in trace["spans"]] == ["POST /sql_query", "llm.ainvoke"]
+    assert trace["spans"][1]["parentSpanId"] == root.span_id
+    assert trace["durationMs"] == trace["spans"][0]["durationMs"]
+
+@pytest.mark.asyncio
+async def test_get_trace_failure_not_found(patched_get_module, fixture_test_app):
+    """
+    Test for verifying that the 'trace' endpoint responds with 404 for a trace that isn't kept.
+    """
+    async def override_getSession():
+        return FAKE_SESSION_ID, {}
+
+    fixture_test_app.dependency_overrides[patched_get_module.instance.redis_tool.getSession] = override_getSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.get(patched_get_module.instance.trace_end_point, params={"traceId": "0" * 32})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "Trace not found."
+
+@pytest.mark.asyncio
+async def test_get_trace_failure_other_session(patched_get_module, fixture_test_app):
+    """
+    Test for verifying that the 'trace' endpoint doesn't reveal the trace of another session's request.
+    """
+    from lib.tools.tracing import TRACER
+
+    root = TRACER.startTrace("POST /sql_query")
+    with TRACER.activate(root):
+        root.setOwner("other-session-id")
+        with TRACER.span("db.query", kind="CLIENT", attributes={"db.statement": "SELECT * FROM secrets;"}):
+            pass
+
+    async def override_getSession():
+        return FAKE_SESSION_ID, {}
+
+    fixture_test_app.dependency_overrides[patched_get_module.instance.redis_tool.getSession] = override_getSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.get(patched_get_module.instance.trace_end_point, params={"traceId": root.trace_id})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "Trace not found."
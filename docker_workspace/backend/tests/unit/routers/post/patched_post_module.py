@@ -26,8 +26,6 @@ class PatchedPostModule:
         self.patcher_sql_query_agent = patch('lib.routers.post.SqlQueryAgent', self.mock_SqlQueryAgent)
         self.patcher_rag_query_agent = patch('lib.routers.post.RagQueryAgent', self.mock_RagQueryAgent)
         self.patcher_get_async_user_db = patch('lib.routers.post.getAsyncUserDB', self.mock_getAsyncUserDB)
-        self.patcher_get_password_hash = patch('lib.routers.post.getPasswordHash', self.mock_getPasswordHash)
-        self.patcher_verify_password = patch('lib.routers.post.verifyPassword', self.mock_verifyPassword)
 
     def __enter__(self):
         # Start all patches to apply the mocked behavior
@@ -35,14 +33,16 @@ class PatchedPostModule:
         self.patcher_sql_query_agent.start()
         self.patcher_rag_query_agent.start()
         self.patcher_get_async_user_db.start()
-        self.patcher_get_password_hash.start()
-        self.patcher_verify_password.start()
 
         # Import the 'post' router and instance after patching to use them in tests
         from lib.routers.post import instance, router
         self.instance = instance
         self.router = router
 
+        # Route the password hasher of the instance to the hashing mocks; stored hashes are up to date
+        self.instance.password_hasher.hash = AsyncMock(side_effect=lambda password: self.mock_getPasswordHash(password))
+        self.instance.password_hasher.verify = AsyncMock(side_effect=lambda password, hashed: (self.mock_verifyPassword(password, hashed), None))
+
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -51,5 +51,3 @@ class PatchedPostModule:
         self.patcher_sql_query_agent.stop()
         self.patcher_rag_query_agent.stop()
         self.patcher_get_async_user_db.stop()
-        self.patcher_get_password_hash.stop()
-        self.patcher_verify_password.stop()
\ No newline at end of file
@@ -130,4 +130,29 @@ async def test_post_login_failure_wrong_email_and_password(patched_post_module,
     patched_post_module.instance.memory.getMemory.assert_not_called()
     patched_post_module.instance.redis_tool.createSession.assert_not_called()
     patched_post_module.instance.redis_tool.updateSession.assert_not_called()
-    assert response.headers.get("set-cookie") != f"session_id={FAKE_SESSION_ID}; HttpOnly; SameSite=None; Secure"
\ No newline at end of file
+    assert response.headers.get("set-cookie") != f"session_id={FAKE_SESSION_ID}; HttpOnly; SameSite=None; Secure"
+
+@pytest.mark.asyncio
+async def test_post_login_rehashes_outdated_password(patched_post_module, fixture_test_app):
+    """Test case for a successful login replacing an outdated password hash with the new one."""
+    user = User(email=FAKE_EMAIL, hashed_password="$2b$12$outdated")
+    mock_scalars = Mock()
+    mock_result = Mock()
+    mock_scalars.first.return_value = user
+    mock_result.scalars.return_value = mock_scalars
+
+    patched_post_module.mock_getAsyncUserDB.execute.return_value = mock_result
+    patched_post_module.mock_getAsyncUserDB.commit = AsyncMock()
+    patched_post_module.instance.password_hasher.verify = AsyncMock(return_value=(True, "$argon2id$upgraded"))
+    patched_post_module.instance.memory.createMemory = AsyncMock(return_value=[])
+    patched_post_module.instance.redis_tool.createSession = AsyncMock(return_value=FAKE_SESSION_ID)
+    patched_post_module.instance.redis_tool.updateSession = AsyncMock()
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.post(patched_post_module.instance.login_end_point, json={"email": FAKE_EMAIL, "password": FAKE_PASSWORD})
+
+    # The password was verified in the hasher's pool and its hash replaced
+    assert response.status_code == 200
+    patched_post_module.instance.password_hasher.verify.assert_awaited_once_with(FAKE_PASSWORD, "$2b$12$outdated")
+    assert user.hashed_password == "$argon2id$upgraded"
+    patched_post_module.mock_getAsyncUserDB.commit.assert_awaited_once()
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, Mock
 from httpx import AsyncClient, ASGITransport
 from post_fixtures import fixture_test_app, patched_post_module, FAKE_SESSION_ID, FAKE_VECTOR_STORE_PATH, FAKE_URL
 
@@ -30,12 +30,15 @@ async def test_post_rag_query_success(patched_post_module, fixture_test_app):
     assert response.json()['aiMessage'] == 'Mock response'
     assert mock_getTrueRAGSession.call_count == 1, f"mock_getSession was called {mock_getTrueRAGSession.call_count} times"
     patched_post_module.instance.memory.getMemory.assert_called_once_with(session_id=FAKE_SESSION_ID)
+    patched_post_module.instance.embedding_scheduler.forSession.assert_called_with(FAKE_SESSION_ID)
     patched_post_module.mock_RagQueryAgent.assert_called_once_with(
         llm=patched_post_module.instance.llm,
         memory=patched_post_module.instance.memory.getMemory.return_value,
         vector_store_path=FAKE_VECTOR_STORE_PATH,
-        embeddings=patched_post_module.instance.embedding,
-        max_iteration=patched_post_module.instance.llm_max_iteration
+        embeddings=patched_post_module.instance.embedding_scheduler.forSession.return_value,
+        max_iteration=patched_post_module.instance.llm_max_iteration,
+        agent_mode=patched_post_module.instance.agent_mode,
+        time_budget=patched_post_module.instance.llm_request_budget
     )
     patched_post_module.mock_RagQueryAgent.return_value.execute.assert_called_once_with('Give me all file names')
     patched_post_module.instance.redis_tool.resetSessionTimeout.assert_called_once_with(session_id=FAKE_SESSION_ID)
@@ -69,4 +72,60 @@ async def test_post_rag_query_failure_no_database(patched_post_module, fixture_t
     patched_post_module.instance.memory.getMemory.assert_not_called()
     patched_post_module.mock_RagQueryAgent.assert_not_called()
     patched_post_module.mock_RagQueryAgent.return_value.execute.assert_not_called()
-    patched_post_module.instance.redis_tool.resetSessionTimeout.assert_not_called()
\ No newline at end of file
+    patched_post_module.instance.redis_tool.resetSessionTimeout.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_post_rag_query_answer_cached(patched_post_module, fixture_test_app):
+    """Test case for a RAG query missing the answer cache, whose answer is cached unless the agent found none."""
+    patched_post_module.instance.memory.getMemory = AsyncMock(return_value=Mock(memory_data=[]))
+    patched_post_module.instance.redis_tool.resetSessionTimeout = AsyncMock()
+    patched_post_module.instance.embedding_scheduler.forSession.return_value.aembed_query = AsyncMock(return_value=[0.0, 1.0])
+    patched_post_module.instance.answer_cache = Mock()
+    patched_post_module.instance.answer_cache.lookup.return_value = None
+
+    # Mock session retrieval whose files have a dataset version
+    async def mock_getVersionedRAGSession():
+        yield (FAKE_SESSION_ID, {'vector_store_path': FAKE_VECTOR_STORE_PATH, 'rag_dataset_version': 'v1'})
+
+    fixture_test_app.dependency_overrides[patched_post_module.instance.redis_tool.getSession] = mock_getVersionedRAGSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.post(patched_post_module.instance.rag_query_end_point, json={'humanMessage': 'Give me all file names'})
+
+        # The answer of the agent is cached for the files of the session
+        assert response.json()['aiMessage'] == 'Mock response'
+        patched_post_module.mock_RagQueryAgent.return_value.execute.assert_called_once_with('Give me all file names')
+        patched_post_module.instance.answer_cache.store.assert_called_once_with(
+            agent='rag', dataset_version='v1', vector=[0.0, 1.0], question='Give me all file names', answer='Mock response'
+        )
+
+        # A question the agent couldn't answer isn't cached
+        from lib.ai.agents.agent_tools import NO_ANSWER_MESSAGE
+        patched_post_module.mock_RagQueryAgent.return_value.execute.return_value = NO_ANSWER_MESSAGE
+        response = await client.post(patched_post_module.instance.rag_query_end_point, json={'humanMessage': 'Unanswerable'})
+
+    assert response.json()['aiMessage'] == NO_ANSWER_MESSAGE
+    patched_post_module.instance.answer_cache.store.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_post_rag_query_follow_up_skips_answer_cache(patched_post_module, fixture_test_app):
+    """Test case for a follow-up RAG query, which depends on the conversation and is neither looked up nor cached."""
+    session_memory = Mock(memory_data=[{'human_message': 'Which files are there?', 'command_result_pair_list': [], 'ai_message': 'report.pdf'}])
+    patched_post_module.instance.memory.getMemory = AsyncMock(return_value=session_memory)
+    patched_post_module.instance.redis_tool.resetSessionTimeout = AsyncMock()
+    patched_post_module.instance.embedding_scheduler.forSession.return_value.aembed_query = AsyncMock(return_value=[0.0, 1.0])
+    patched_post_module.instance.answer_cache = Mock()
+
+    async def mock_getVersionedRAGSession():
+        yield (FAKE_SESSION_ID, {'vector_store_path': FAKE_VECTOR_STORE_PATH, 'rag_dataset_version': 'v1'})
+
+    fixture_test_app.dependency_overrides[patched_post_module.instance.redis_tool.getSession] = mock_getVersionedRAGSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.post(patched_post_module.instance.rag_query_end_point, json={'humanMessage': 'What does it say about revenue?'})
+
+    assert response.json()['aiMessage'] == 'Mock response'
+    patched_post_module.mock_RagQueryAgent.return_value.execute.assert_called_once_with('What does it say about revenue?')
+    patched_post_module.instance.embedding_scheduler.forSession.return_value.aembed_query.assert_not_called()
+    patched_post_module.instance.answer_cache.lookup.assert_not_called()
+    patched_post_module.instance.answer_cache.store.assert_not_called()
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, Mock
 from httpx import AsyncClient, ASGITransport
 from post_fixtures import fixture_test_app, patched_post_module, FAKE_SESSION_ID, FAKE_DB_PATH, FAKE_URL
 
@@ -38,7 +38,9 @@ async def test_post_sql_query_success(patched_post_module, fixture_test_app):
         llm=patched_post_module.instance.llm,
         memory=patched_post_module.instance.memory.getMemory.return_value,
         temp_database_path=FAKE_DB_PATH,
-        max_iteration=patched_post_module.instance.llm_max_iteration
+        max_iteration=patched_post_module.instance.llm_max_iteration,
+        agent_mode=patched_post_module.instance.agent_mode,
+        time_budget=patched_post_module.instance.llm_request_budget
     )
     patched_post_module.mock_SqlQueryAgent.return_value.execute.assert_called_once_with('Give me all users name')
     patched_post_module.instance.redis_tool.resetSessionTimeout.assert_called_once_with(session_id=FAKE_SESSION_ID)
@@ -76,4 +78,59 @@ async def test_post_sql_query_failure_no_database(patched_post_module, fixture_t
     patched_post_module.instance.memory.getMemory.assert_not_called()
     patched_post_module.mock_SqlQueryAgent.assert_not_called()
     patched_post_module.mock_SqlQueryAgent.return_value.execute.assert_not_called()
-    patched_post_module.instance.redis_tool.resetSessionTimeout.assert_not_called()
\ No newline at end of file
+    patched_post_module.instance.redis_tool.resetSessionTimeout.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_post_sql_query_answered_from_cache(patched_post_module, fixture_test_app):
+    """Test case for a SQL query answered from the answer cache without running the agent."""
+    session_memory = Mock(memory_data=[])
+    patched_post_module.instance.memory.getMemory = AsyncMock(return_value=session_memory)
+    patched_post_module.instance.redis_tool.resetSessionTimeout = AsyncMock()
+    patched_post_module.instance.embedding_scheduler.forSession.return_value.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    patched_post_module.instance.answer_cache = Mock()
+    patched_post_module.instance.answer_cache.lookup.return_value = 'Cached response'
+
+    # Mock session generator whose tables have a dataset version
+    async def mock_getVersionedSQLSession():
+        yield (FAKE_SESSION_ID, {'temp_database_path': FAKE_DB_PATH, 'sql_dataset_version': 'v1'})
+
+    fixture_test_app.dependency_overrides[patched_post_module.instance.redis_tool.getSession] = mock_getVersionedSQLSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.post(patched_post_module.instance.sql_query_end_point, json={'humanMessage': 'Total sales per region?'})
+
+    # The cached answer is returned and saved to the history, and the agent doesn't run
+    assert response.status_code == 200
+    assert response.json()['aiMessage'] == 'Cached response'
+    patched_post_module.instance.embedding_scheduler.forSession.assert_called_with(FAKE_SESSION_ID)
+    patched_post_module.instance.answer_cache.lookup.assert_called_once_with(agent='sql', dataset_version='v1', vector=[1.0, 0.0])
+    session_memory.saveContext.assert_called_once_with(
+        human_message={'human_message': 'Total sales per region?'},
+        command_result_pair_dict={'command_result_pair_list': []},
+        ai_message={'ai_message': 'Cached response'}
+    )
+    patched_post_module.mock_SqlQueryAgent.return_value.execute.assert_not_called()
+    patched_post_module.instance.answer_cache.store.assert_not_called()
+    patched_post_module.instance.redis_tool.resetSessionTimeout.assert_called_once_with(session_id=FAKE_SESSION_ID)
+
+
+@pytest.mark.asyncio
+async def test_post_sql_query_failure_overloaded(patched_post_module, fixture_test_app):
+    """Test case for a SQL query rejected with HTTP 503 and Retry-After while the LLM calls are overloaded."""
+    from lib.ai.llm.llm_scheduler import LLMOverloadedError
+    patched_post_module.instance.memory.getMemory = AsyncMock(return_value=[])
+    patched_post_module.instance.redis_tool.resetSessionTimeout = AsyncMock()
+    patched_post_module.mock_SqlQueryAgent.return_value.execute = AsyncMock(side_effect=LLMOverloadedError("The service is overloaded.", 7))
+
+    async def mock_getTrueSQLSession():
+        yield (FAKE_SESSION_ID, {'temp_database_path': FAKE_DB_PATH})
+
+    fixture_test_app.dependency_overrides[patched_post_module.instance.redis_tool.getSession] = mock_getTrueSQLSession
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.post(patched_post_module.instance.sql_query_end_point, json={'humanMessage': 'Give me all users name'})
+
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '7'
+    assert response.json()['detail'] == 'The service is overloaded.'
+    patched_post_module.instance.redis_tool.resetSessionTimeout.assert_not_called()
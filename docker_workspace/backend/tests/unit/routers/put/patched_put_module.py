@@ -27,6 +27,11 @@ class PatchedPutModule:
         self.instance = instance
         self.router = router
 
+        # Every upload fits the session's quotas unless a test says otherwise
+        self.instance.upload_quota.getRemainingBytes = AsyncMock(return_value=self.instance.session_byte_quota)
+        self.instance.upload_quota.reserveBytes = AsyncMock()
+        self.instance.upload_quota.releaseBytes = AsyncMock()
+
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
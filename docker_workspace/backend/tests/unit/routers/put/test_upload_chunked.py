@@ -0,0 +1,211 @@
+import os
+import pytest
+from unittest.mock import AsyncMock, patch
+from httpx import AsyncClient, ASGITransport
+from lib.tools.upload_quota import QuotaExceededError
+from put_fixture import patched_put_module, fixture_test_app, FAKE_URL, FAKE_SESSION_ID
+
+def _createUpload(upload_id: str, file_type: str = "pdf", file_size: int = 10, offset: int = 10) -> dict:
+    return {
+        "id": upload_id, "session_id": FAKE_SESSION_ID, "file_name": f"{upload_id}.{file_type}",
+        "file_type": file_type, "file_size": file_size, "offset": offset, "checksum": ""
+    }
+
+def _overrideSession(patched_put_module, fixture_test_app):
+    async def override_getSession():
+        return FAKE_SESSION_ID, {}
+
+    fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
+
+def _setupStore(patched_put_module, uploads: list):
+    """
+    Configures the upload store mock to hold the given uploads and write their files when taken.
+    """
+    upload_store = patched_put_module.instance.upload_store
+    uploads_by_id = {upload["id"]: upload for upload in uploads}
+    upload_store.getUpload = AsyncMock(side_effect=lambda upload_id, session_id: uploads_by_id.get(upload_id))
+    upload_store.verifyUpload = AsyncMock(return_value=True)
+    upload_store.deleteUpload = AsyncMock()
+
+    async def takeFile(upload, destination):
+        with open(destination, "wb") as taken_file:
+            taken_file.write(upload["id"].encode())
+
+    upload_store.takeFile = AsyncMock(side_effect=takeFile)
+    return upload_store
+
+@pytest.mark.asyncio
+async def test_init_upload(patched_put_module, fixture_test_app):
+    """
+    Test that starting an upload creates it for the session and returns where its first part starts.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+    patched_put_module.instance.upload_store.createUpload = AsyncMock(return_value=_createUpload("u1", offset=0))
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(
+            patched_put_module.instance.upload_init_end_point,
+            json={"fileName": "u1.pdf", "fileType": "pdf", "fileSize": 10, "checksum": "A" * 64}
+        )
+
+    assert response.status_code == 201, response.json()
+    assert response.json() == {"uploadId": "u1", "offset": 0, "fileSize": 10, "partSize": patched_put_module.instance.upload_part_size}
+    patched_put_module.instance.upload_store.createUpload.assert_awaited_once_with(
+        session_id=FAKE_SESSION_ID, file_name="u1.pdf", file_type="pdf", file_size=10, checksum="A" * 64
+    )
+
+@pytest.mark.asyncio
+async def test_init_upload_rejects_unknown_file_type(patched_put_module, fixture_test_app):
+    """
+    Test that only CSV and PDF uploads can be started.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(patched_put_module.instance.upload_init_end_point, json={"fileName": "a.exe", "fileType": "exe", "fileSize": 10})
+
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_init_upload_over_quota(patched_put_module, fixture_test_app):
+    """
+    Test that an upload larger than the session's remaining byte quota is rejected before any part is sent.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+    patched_put_module.instance.upload_quota.reserveBytes = AsyncMock(
+        side_effect=QuotaExceededError("The upload exceeds the session quota of 100 bytes; 5 bytes remain.", 5)
+    )
+    patched_put_module.instance.upload_store.createUpload = AsyncMock()
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(patched_put_module.instance.upload_init_end_point, json={"fileName": "u1.pdf", "fileType": "pdf", "fileSize": 10})
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "The upload exceeds the session quota of 100 bytes; 5 bytes remain."
+    patched_put_module.instance.upload_quota.reserveBytes.assert_awaited_once_with(session_id=FAKE_SESSION_ID, byte_count=10)
+    patched_put_module.instance.upload_store.createUpload.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_upload_part(patched_put_module, fixture_test_app):
+    """
+    Test that the body of a part is streamed to the store and the new offset is returned.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+    upload = _createUpload("u1", offset=0)
+    upload_store = _setupStore(patched_put_module, [upload])
+    received = []
+
+    async def writePart(upload, offset, chunks, checksum):
+        async for chunk in chunks:
+            received.append(chunk)
+        upload["offset"] = offset + sum(len(chunk) for chunk in received)
+        return upload["offset"]
+
+    upload_store.writePart = AsyncMock(side_effect=writePart)
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(patched_put_module.instance.upload_part_end_point, params={"uploadId": "u1", "offset": 0}, content=b"%PDF-1")
+
+    assert response.status_code == 200, response.json()
+    assert response.json()["offset"] == 6
+    assert b"".join(received) == b"%PDF-1"
+
+@pytest.mark.asyncio
+async def test_upload_part_failures(patched_put_module, fixture_test_app):
+    """
+    Test that unknown uploads, parts out of order and invalid parts are rejected with their status codes.
+    """
+    from lib.tools.chunked_upload import UploadConflictError
+
+    _overrideSession(patched_put_module, fixture_test_app)
+    upload_store = _setupStore(patched_put_module, [_createUpload("u1", offset=4)])
+    upload_store.writePart = AsyncMock(side_effect=[UploadConflictError(4), ValueError("The checksum of the part doesn't match its content.")])
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        not_found = await client.put(patched_put_module.instance.upload_part_end_point, params={"uploadId": "u2", "offset": 0}, content=b"a")
+        conflict = await client.put(patched_put_module.instance.upload_part_end_point, params={"uploadId": "u1", "offset": 0}, content=b"a")
+        invalid = await client.put(patched_put_module.instance.upload_part_end_point, params={"uploadId": "u1", "offset": 4}, content=b"a")
+
+    assert not_found.status_code == 404
+    assert conflict.status_code == 409
+    assert conflict.headers["Upload-Offset"] == "4"
+    assert invalid.status_code == 400
+    assert invalid.json()["detail"] == "The checksum of the part doesn't match its content."
+
+@pytest.mark.asyncio
+@patch('lib.routers.put.SessionVectorStore')
+async def test_complete_upload_pdf(mock_session_vector_store, patched_put_module, fixture_test_app, tmp_path):
+    """
+    Test that completed PDF uploads are moved into one upload directory and queued as one job.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+    patched_put_module.instance.upload_dir = str(tmp_path)
+    patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock(return_value="job-id")
+    mock_session_vector_store.return_value.getFileNames.return_value = []
+    upload_store = _setupStore(patched_put_module, [_createUpload("u1"), _createUpload("u2")])
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(patched_put_module.instance.upload_complete_end_point, json={"uploadIds": ["u1", "u2", "u1"]})
+
+    assert response.status_code == 202, response.json()
+    assert response.json() == {"informationMessage": "PDF files are being converted to database.", "jobId": "job-id"}
+    assert upload_store.verifyUpload.await_count == 2
+
+    kwargs = patched_put_module.instance.job_queue.enqueue.await_args.kwargs
+    assert kwargs["job_type"] == "upload_pdf"
+    stored_files = kwargs["payload"]["files"]
+    assert [file["filename"] for file in stored_files] == ["u1.pdf", "u2.pdf"]
+    for file, upload_id in zip(stored_files, ["u1", "u2"]):
+        assert os.path.dirname(file["path"]) == kwargs["payload"]["upload_dir"]
+        with open(file["path"], "rb") as stored_file:
+            assert stored_file.read() == upload_id.encode()
+
+@pytest.mark.asyncio
+async def test_complete_upload_csv(patched_put_module, fixture_test_app, tmp_path):
+    """
+    Test that completed CSV uploads are queued for the session's temporary database.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+    patched_put_module.instance.upload_dir = str(tmp_path)
+    patched_put_module.instance.db_max_table_limit = 5
+    patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock(return_value="job-id")
+    _setupStore(patched_put_module, [_createUpload("u1", file_type="csv")])
+
+    with patch('lib.routers.put._createTempDatabase', new=AsyncMock(return_value=("db_url", ["table1"]))):
+        async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+            response = await client.put(patched_put_module.instance.upload_complete_end_point, json={"uploadIds": ["u1"]})
+
+    assert response.status_code == 202, response.json()
+    kwargs = patched_put_module.instance.job_queue.enqueue.await_args.kwargs
+    assert kwargs["job_type"] == "upload_csv"
+    assert kwargs["payload"]["sync_temp_db_url"] == "db_url"
+    assert "db_tables" not in kwargs["payload"]
+
+@pytest.mark.asyncio
+async def test_complete_upload_failures(patched_put_module, fixture_test_app):
+    """
+    Test that incomplete, corrupted and mixed uploads are not queued.
+    """
+    _overrideSession(patched_put_module, fixture_test_app)
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
+    upload_store = _setupStore(patched_put_module, [
+        _createUpload("partial", offset=4), _createUpload("corrupt"), _createUpload("table", file_type="csv")
+    ])
+    upload_store.verifyUpload = AsyncMock(return_value=False)
+
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        incomplete = await client.put(patched_put_module.instance.upload_complete_end_point, json={"uploadIds": ["partial"]})
+        corrupted = await client.put(patched_put_module.instance.upload_complete_end_point, json={"uploadIds": ["corrupt"]})
+        mixed = await client.put(patched_put_module.instance.upload_complete_end_point, json={"uploadIds": ["corrupt", "table"]})
+
+    assert incomplete.status_code == 409
+    assert incomplete.headers["Upload-Offset"] == "4"
+    assert corrupted.status_code == 400
+    assert corrupted.json()["detail"] == "The checksum of corrupt.pdf doesn't match its content."
+    upload_store.deleteUpload.assert_awaited_once_with("corrupt")
+    # The discarded upload no longer counts against the session's quota
+    patched_put_module.instance.upload_quota.releaseBytes.assert_awaited_once_with(session_id=FAKE_SESSION_ID, byte_count=10)
+    assert mixed.status_code == 400
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
@@ -1,76 +1,70 @@
-import pytest, io, pandas as pd
-from unittest.mock import AsyncMock, patch, MagicMock, call
+import pytest, io, os
+from unittest.mock import AsyncMock, call, patch
 from httpx import AsyncClient, ASGITransport
-from fastapi import Depends
+from lib.tools.upload_quota import QuotaExceededError
 from put_fixture import fixture_test_app, patched_put_module, FAKE_URL
 
 @pytest.mark.asyncio
-async def test_upload_csv_success(patched_put_module, fixture_test_app):
+async def test_upload_csv_success(patched_put_module, fixture_test_app, tmp_path):
     """
-    Test to verify the successful upload and processing of CSV files.
-    Ensures files are processed, converted to database tables, and session progress is updated.
+    Test to verify that uploaded CSV files are stored and a conversion job is queued.
+    Ensures the endpoint answers with 202 and the job ID, and the session holds the job's status.
     """
     fixture_test_app.dependency_overrides = {}
     session_id = "test-session-id"
     temp_db_name = "temporary_database_test_session"
     sync_temp_db_url = f"{patched_put_module.instance.sync_database_url}/{temp_db_name}"
 
+    patched_put_module.instance.upload_dir = str(tmp_path)
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock(return_value="job-id")
 
     # Mock session dependency to return a specific session ID and vector store path
     async def override_getSession():
         return "test-session-id", {'vector_store_path': "fake_path"}
 
-    # Mock temporary database creation
-    async def override_createTempDatabase(session: tuple = Depends(override_getSession)):
-        temp_db_name = "temporary_database_test_session"
-        sync_temp_db_url = f"{patched_put_module.instance.sync_database_url}/{temp_db_name}"
-        return sync_temp_db_url, []
-
-    from lib.routers.put import _createTempDatabase
-
-    fixture_test_app.dependency_overrides[_createTempDatabase] = override_createTempDatabase
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
-    with patch('lib.routers.put.create_engine') as mock_create_engine:
-        # Mock database connection and table creation process
-        mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
-        mock_connection = MagicMock()
-        mock_engine.connect.return_value.__enter__.return_value = mock_connection
-
-        # Mock reading CSV and converting it to SQL
-        with patch('lib.routers.put.pd.read_csv', return_value=pd.DataFrame({"col1": [1, 2], "col2": [3, 4]})):
-            with patch.object(pd.DataFrame, 'to_sql', new=MagicMock()) as mock_to_sql:
-                files = [
-                    ("files", ("test1.csv", io.BytesIO(b"col1,col2\n1,3\n2,4"), "text/csv")),
-                    ("files", ("test2.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                ]
-
-                # Send the request
-                async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
-                    response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
-
-    # Assert that the response is successful and contains the expected message
-    assert response.status_code == 200, response.json()
-    assert response.json() == {"informationMessage": "CSV files uploaded and converted to database successfully."}
-
-    # Verify progress updates throughout the upload process
+    files = [
+        ("files", ("test1.csv", io.BytesIO(b"col1,col2\n1,3\n2,4"), "text/csv")),
+        ("files", ("test2.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
+    ]
+
+    # Send the request with the temporary database creation mocked
+    with patch('lib.routers.put._createTempDatabase', new=AsyncMock(return_value=(sync_temp_db_url, ["table1"]))) as mock_create_temp_db:
+        async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+            response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
+
+    # Assert that the upload was accepted for background processing
+    assert response.status_code == 202, response.json()
+    assert response.json() == {"informationMessage": "CSV files are being converted to database.", "jobId": "job-id"}
+
+    # Verify the temporary database was created after the bytes were counted against the quota
+    patched_put_module.instance.upload_quota.reserveBytes.assert_awaited_once_with(session_id=session_id, byte_count=34)
+    mock_create_temp_db.assert_awaited_once_with(session=(session_id, {'vector_store_path': "fake_path"}))
+
+    # Verify the job was queued with the stored files and the temporary database
+    patched_put_module.instance.job_queue.enqueue.assert_awaited_once()
+    kwargs = patched_put_module.instance.job_queue.enqueue.await_args.kwargs
+    assert kwargs["job_type"] == "upload_csv"
+    assert kwargs["session_id"] == session_id
+    payload = kwargs["payload"]
+    assert payload["sync_temp_db_url"] == sync_temp_db_url
+    assert "db_tables" not in payload  # Listed by the job, after the session's earlier jobs ran
+    assert os.path.dirname(payload["upload_dir"]) == str(tmp_path)
+    assert [file["filename"] for file in payload["files"]] == ["test1.csv", "test2.csv"]
+    with open(payload["files"][1]["path"], "rb") as stored_file:
+        assert stored_file.read() == b"col1,col2\n5,6\n7,8"
+
+    # Verify the session tracks the job
     expected_calls = [
         call(session_id=session_id, key="progress", value="0"),
-        call(session_id=session_id, key="progress", value="33"),
-        call(session_id=session_id, key="progress", value="66"),
-        call(session_id=session_id, key="progress", value="100"),
+        call(session_id=session_id, key="upload_status", value="queued"),
+        call(session_id=session_id, key="upload_message", value=""),
+        call(session_id=session_id, key="upload_job_id", value="job-id"),
     ]
-    assert patched_put_module.instance.redis_tool.updateSession.await_count == 4
     patched_put_module.instance.redis_tool.updateSession.assert_has_awaits(expected_calls, any_order=False)
-
-    # Check that database engine is created and tables are created as expected
-    assert mock_create_engine.call_count == 2
-    mock_create_engine.assert_called_with(sync_temp_db_url)
-    assert mock_to_sql.call_count == 2
-    mock_to_sql.assert_any_call('test1', con=mock_connection, index=False, if_exists="replace")
-    mock_to_sql.assert_any_call('test2', con=mock_connection, index=False, if_exists="replace")
+    assert patched_put_module.instance.redis_tool.updateSession.await_count == 4
 
 @pytest.mark.asyncio
 async def test_upload_csv_failure_max_file_limit_exceeded(patched_put_module, fixture_test_app):
@@ -84,50 +78,32 @@ async def test_upload_csv_failure_max_file_limit_exceeded(patched_put_module, fi
 
     patched_put_module.instance.db_max_table_limit = max_table_limit
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
 
-    # Mock session and database dependencies
+    # Mock session dependency
     async def override_getSession():
         return "test-session-id", {'vector_store_path': "fake_path"}
 
-    async def override_createTempDatabase(session: tuple = Depends(override_getSession)):
-        temp_db_name = "temporary_database_test_session"
-        sync_temp_db_url = f"{patched_put_module.instance.sync_database_url}/{temp_db_name}"
-        return sync_temp_db_url, db_tables
-
-    from lib.routers.put import _createTempDatabase
-
-    fixture_test_app.dependency_overrides[_createTempDatabase] = override_createTempDatabase
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
     # Attempt to upload more files than the limit allows
-    with patch('lib.routers.put.create_engine') as mock_create_engine:
-        mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
-        mock_connection = MagicMock()
-        mock_engine.connect.return_value.__enter__.return_value = mock_connection
-
-        with patch('lib.routers.put.pd.read_csv', return_value=pd.DataFrame({"col1": [1, 2], "col2": [3, 4]})):
-            with patch.object(pd.DataFrame, 'to_sql', new=MagicMock()) as mock_to_sql:
-                files = [
-                    ("files", ("test1.csv", io.BytesIO(b"col1,col2\n1,3\n2,4"), "text/csv")),
-                    ("files", ("test2.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                    ("files", ("test3.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                    ("files", ("test4.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                    ("files", ("test5.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                    ("files", ("test6.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                ]
-
-                async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
-                    response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
+    files = [("files", (f"test{i}.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")) for i in range(1, 7)]
+
+    temp_db_url = f"{patched_put_module.instance.sync_database_url}/temporary_database_test_session"
+    with patch('lib.routers.put._createTempDatabase', new=AsyncMock(return_value=(temp_db_url, db_tables))):
+        async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+            response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
 
     # Assert that the response contains the expected error message
     assert response.status_code == 400
     assert response.json()['detail'] == f"You reached max file limit {max_table_limit}"
 
-    # Verify that progress was set to reflect the failure state
+    # Verify that progress was set to reflect the failure state and nothing was queued
     patched_put_module.instance.redis_tool.updateSession.assert_any_await(
         session_id=session_id, key="progress", value="-1"
     )
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
+    patched_put_module.instance.upload_quota.releaseBytes.assert_awaited_once_with(session_id=session_id, byte_count=102)
 
 @pytest.mark.asyncio
 async def test_upload_csv_failure_max_file_limit_exceeded_with_before_uploaded_file(patched_put_module, fixture_test_app):
@@ -141,45 +117,88 @@ async def test_upload_csv_failure_max_file_limit_exceeded_with_before_uploaded_f
 
     patched_put_module.instance.db_max_table_limit = max_table_limit
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
 
-    # Mock session and database dependencies
+    # Mock session dependency
     async def override_getSession():
         return "test-session-id", {'vector_store_path': "fake_path"}
 
-    async def override_createTempDatabase(session: tuple = Depends(override_getSession)):
-        temp_db_name = "temporary_database_test_session"
-        sync_temp_db_url = f"{patched_put_module.instance.sync_database_url}/{temp_db_name}"
-        return sync_temp_db_url, db_tables
-
-    from lib.routers.put import _createTempDatabase
-
-    fixture_test_app.dependency_overrides[_createTempDatabase] = override_createTempDatabase
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
     # Attempt to upload files such that total tables would exceed the limit
-    with patch('lib.routers.put.create_engine') as mock_create_engine:
-        mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
-        mock_connection = MagicMock()
-        mock_engine.connect.return_value.__enter__.return_value = mock_connection
-
-        with patch('lib.routers.put.pd.read_csv', return_value=pd.DataFrame({"col1": [1, 2], "col2": [3, 4]})):
-            with patch.object(pd.DataFrame, 'to_sql', new=MagicMock()) as mock_to_sql:
-                files = [
-                    ("files", ("test1.csv", io.BytesIO(b"col1,col2\n1,3\n2,4"), "text/csv")),
-                    ("files", ("test2.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                    ("files", ("test3.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                    ("files", ("test4.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")),
-                ]
-
-                async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
-                    response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
+    files = [("files", (f"test{i}.csv", io.BytesIO(b"col1,col2\n5,6\n7,8"), "text/csv")) for i in range(1, 5)]
+
+    temp_db_url = f"{patched_put_module.instance.sync_database_url}/temporary_database_test_session"
+    with patch('lib.routers.put._createTempDatabase', new=AsyncMock(return_value=(temp_db_url, db_tables))):
+        async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+            response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
 
     # Assert that the response contains the expected error message
     assert response.status_code == 400
     assert response.json()['detail'] == f"You reached max file limit {max_table_limit}"
 
-    # Verify that progress was set to reflect the failure state
+    # Verify that progress was set to reflect the failure state and nothing was queued
     patched_put_module.instance.redis_tool.updateSession.assert_any_await(
         session_id=session_id, key="progress", value="-1"
-    )
\ No newline at end of file
+    )
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
+    patched_put_module.instance.upload_quota.releaseBytes.assert_awaited_once_with(session_id=session_id, byte_count=68)
+
+@pytest.mark.asyncio
+async def test_upload_csv_failure_queue_unavailable(patched_put_module, fixture_test_app, tmp_path):
+    """
+    Test to verify behavior when the upload job can't be queued.
+    Ensures a 503 is returned, the stored files are removed and the session reflects the failure.
+    """
+    session_id = "test-session-id"
+
+    patched_put_module.instance.upload_dir = str(tmp_path)
+    patched_put_module.instance.db_max_table_limit = 5
+    patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock(side_effect=ConnectionError("Redis is down"))
+
+    async def override_getSession():
+        return session_id, {}
+
+    fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
+
+    files = [("files", ("test1.csv", io.BytesIO(b"col1,col2\n1,3"), "text/csv"))]
+
+    with patch('lib.routers.put._createTempDatabase', new=AsyncMock(return_value=("db_url", []))):
+        async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+            response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
+
+    assert response.status_code == 503
+    assert response.json()['detail'] == "Failed to queue the upload. Error: Redis is down"
+    assert os.listdir(tmp_path) == []
+    patched_put_module.instance.redis_tool.updateSession.assert_any_await(session_id=session_id, key="progress", value="-1")
+    patched_put_module.instance.redis_tool.updateSession.assert_any_await(session_id=session_id, key="upload_status", value="failed")
+
+@pytest.mark.asyncio
+async def test_upload_csv_over_quota_creates_no_database(patched_put_module, fixture_test_app):
+    """
+    Test to verify that CSV files exceeding the session's byte quota are rejected before the temporary database is created.
+    """
+    session_id = "test-session-id"
+
+    patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
+    patched_put_module.instance.upload_quota.reserveBytes = AsyncMock(
+        side_effect=QuotaExceededError("The upload exceeds the session quota of 10 bytes; 2 bytes remain.", 2)
+    )
+
+    async def override_getSession():
+        return session_id, {}
+
+    fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
+
+    files = [("files", ("test1.csv", io.BytesIO(b"col1,col2\n1,3"), "text/csv"))]
+
+    with patch('lib.routers.put._createTempDatabase', new=AsyncMock()) as mock_create_temp_db:
+        async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+            response = await client.put(patched_put_module.instance.upload_csv_end_point, files=files)
+
+    assert response.status_code == 413
+    assert response.json()['detail'] == "The upload exceeds the session quota of 10 bytes; 2 bytes remain."
+    mock_create_temp_db.assert_not_called()
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
@@ -1,34 +1,21 @@
-import io
-import os
+import io, os
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock, call
 from httpx import AsyncClient, ASGITransport
+from lib.tools.upload_quota import QuotaExceededError
 from put_fixture import patched_put_module, fixture_test_app, FAKE_URL, FAKE_SESSION_ID
 
 
 @pytest.mark.asyncio
-@patch('lib.routers.put.RecursiveCharacterTextSplitter')
-@patch('os.path.exists', return_value=True)
-@patch('os.makedirs')
-@patch('os.listdir', return_value=['test1.pdf', 'test2.pdf'])
-@patch('os.path.isfile', return_value=True)
-@patch('lib.routers.put.aiofiles.open', new_callable=MagicMock)
-@patch('lib.routers.put.PyPDFLoader')
-@patch('lib.routers.put.FAISS')
-async def test_upload_pdf_success_with_existing_files(
-    mock_faiss, mock_pypdf_loader, mock_aiofiles_open, mock_isfile, mock_listdir, mock_makedirs, mock_exists, mock_recursive_character_text_splitter,
-    patched_put_module, fixture_test_app
-):
+@patch('lib.routers.put.SessionVectorStore')
+async def test_upload_pdf_success(mock_session_vector_store, patched_put_module, fixture_test_app, tmp_path):
     """
-    Test to verify successful upload and processing of PDF files when some documents already exist in the target directory.
-    This test checks that existing documents are handled correctly, the appropriate sessions are updated, and the documents are
-    correctly processed with the PDF loader and FAISS.
+    Test to verify that uploaded PDF files are stored and a job adding them to the vector store is queued.
+    Ensures the endpoint answers with 202 and the job ID, and the session holds the job's status.
     """
-    vector_store_path = f"./.vector_stores/{FAKE_SESSION_ID}"
-    documents_dir = os.path.join(vector_store_path, "documents")
-    faiss_dir = os.path.join(vector_store_path, "faiss")
-
+    patched_put_module.instance.upload_dir = str(tmp_path)
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock(return_value="job-id")
 
     # Mock session dependency
     async def override_getSession():
@@ -36,35 +23,12 @@ async def test_upload_pdf_success_with_existing_files(
 
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
-    # Setup the async mock for file operations
-    mock_file_handle = MagicMock()
-    mock_file_handle.write = AsyncMock()
-    mock_aiofiles_open.return_value.__aenter__.return_value = mock_file_handle
-    mock_aiofiles_open.return_value.__aexit__.return_value = AsyncMock()
-
-    # Setup the PDF loader mock
-    mock_document = MagicMock()
-    mock_document.metadata = {"filename": "test1.pdf"}
-    mock_document.page_content = "Sample PDF content text"
-    mock_pypdf_loader_instance = mock_pypdf_loader.return_value
-    mock_pypdf_loader_instance.aload = AsyncMock(return_value=[mock_document])
-
-    # Setup FAISS mock
-    mock_vector_store = AsyncMock()
-    mock_vector_store.aadd_documents = AsyncMock()
-    mock_vector_store.save_local = AsyncMock()
-
-    mock_faiss.load_local.return_value = mock_vector_store
-
-    mock_split_documents = AsyncMock()
-    mock_text_splitter = AsyncMock()
-    mock_text_splitter.atransform_documents = AsyncMock(return_value = mock_split_documents)
-    mock_recursive_character_text_splitter.return_value = mock_text_splitter
+    mock_session_vector_store.return_value.getFileNames.return_value = ['test1.pdf']
 
-    # Define the PDF files to be uploaded
+    # Files with the same name are stored apart
     files = [
-        ("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
-        ("files", ("test2.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
+        ("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4 a"), "application/pdf")),
+        ("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4 b"), "application/pdf")),
     ]
 
     # Send the request
@@ -72,68 +36,46 @@ async def test_upload_pdf_success_with_existing_files(
         response = await client.put(patched_put_module.instance.upload_pdf_end_point, files=files)
 
     # Assertions
-    assert response.status_code == 200, response.json()
-    assert response.json() == {"informationMessage": "PDF files uploaded and converted to database successfully."}
+    assert response.status_code == 202, response.json()
+    assert response.json() == {"informationMessage": "PDF files are being converted to database.", "jobId": "job-id"}
+
+    # The file limit is checked against the session's vector store
+    mock_session_vector_store.assert_called_once_with(
+        vector_store_path=f"./.vector_stores/{FAKE_SESSION_ID}",
+        embeddings=patched_put_module.instance.embedding
+    )
+
+    patched_put_module.instance.job_queue.enqueue.assert_awaited_once()
+    kwargs = patched_put_module.instance.job_queue.enqueue.await_args.kwargs
+    assert kwargs["job_type"] == "upload_pdf"
+    assert kwargs["session_id"] == FAKE_SESSION_ID
+    stored_files = kwargs["payload"]["files"]
+    assert [file["filename"] for file in stored_files] == ["test1.pdf", "test1.pdf"]
+    assert len({file["path"] for file in stored_files}) == 2
+    for file, content in zip(stored_files, [b"%PDF-1.4 a", b"%PDF-1.4 b"]):
+        assert os.path.dirname(file["path"]) == kwargs["payload"]["upload_dir"]
+        with open(file["path"], "rb") as stored_file:
+            assert stored_file.read() == content
 
     expected_calls = [
         call(session_id=FAKE_SESSION_ID, key="progress", value="0"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="20"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="40"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="60"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="80"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="100"),
-        call(session_id=FAKE_SESSION_ID, key="vector_store_path", value=vector_store_path)
+        call(session_id=FAKE_SESSION_ID, key="upload_status", value="queued"),
+        call(session_id=FAKE_SESSION_ID, key="upload_message", value=""),
+        call(session_id=FAKE_SESSION_ID, key="upload_job_id", value="job-id"),
     ]
-
-    assert patched_put_module.instance.redis_tool.updateSession.await_count == 7
+    assert patched_put_module.instance.redis_tool.updateSession.await_count == 4
     patched_put_module.instance.redis_tool.updateSession.assert_has_awaits(expected_calls, any_order=False)
 
-    mock_recursive_character_text_splitter.assert_called_with(chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", ".", " "])
-
-    # Ensure file operations were called with the correct file paths and contents
-    mock_exists.called_once_with(faiss_dir)
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test1.pdf"))
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test2.pdf"))
-    # Ensure no directory creation attempts
-    mock_makedirs.assert_not_called()
-
-    mock_listdir.assert_called_with(documents_dir)
-    mock_aiofiles_open.assert_any_call(os.path.join(documents_dir, "test1_1.pdf"), "wb")
-    mock_aiofiles_open.assert_any_call(os.path.join(documents_dir, "test2_1.pdf"), "wb")
-    mock_file_handle.write.assert_called_with(b"%PDF-1.4")
-
-    # Verify FAISS operations were called with expected parameters
-    mock_faiss.load_local.assert_called_once_with(faiss_dir, patched_put_module.instance.embedding, allow_dangerous_deserialization=True)
-    mock_vector_store.aadd_documents.call_count == 2 # Corrected to mock_vector_store
-
-    # Check PDF loader instance call for PDF loading and splitting documents
-    assert mock_pypdf_loader_instance.aload.call_count == 2
-    mock_pypdf_loader.assert_any_call(os.path.join(documents_dir, "test1_1.pdf"))
-    mock_pypdf_loader.assert_any_call(os.path.join(documents_dir, "test2_1.pdf"))
-
 
 @pytest.mark.asyncio
-@patch('lib.routers.put.RecursiveCharacterTextSplitter')
-@patch('os.path.exists', return_value=False)
-@patch('os.makedirs')
-@patch('os.listdir', return_value=[])
-@patch('os.path.isfile', return_value=True)
-@patch('lib.routers.put.aiofiles.open', new_callable=MagicMock)
-@patch('lib.routers.put.PyPDFLoader')
-@patch('lib.routers.put.FAISS')
-async def test_upload_pdf_success_with_no_existing_files(
-    mock_faiss, mock_pypdf_loader, mock_aiofiles_open, mock_isfile, mock_listdir, mock_makedirs, mock_exists, mock_recursive_character_text_splitter,
-    patched_put_module, fixture_test_app
-):
+@patch('lib.routers.put.SessionVectorStore')
+async def test_upload_pdf_failure_reach_max_file_limit(mock_session_vector_store, patched_put_module, fixture_test_app):
     """
-    Test to verify successful upload and processing of PDF files when no existing documents are found in the directory.
-    This test ensures that new directories are created, documents are processed with the PDF loader, and FAISS handles the new embeddings.
+    Test to verify that the upload process fails when the maximum file limit is reached.
+    This test ensures that no job is queued and the session progress is updated accordingly.
     """
-    vector_store_path = f"./.vector_stores/{FAKE_SESSION_ID}"
-    documents_dir = os.path.join(vector_store_path, "documents")
-    faiss_dir = os.path.join(vector_store_path, "faiss")
-
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
 
     # Mock session dependency
     async def override_getSession():
@@ -141,33 +83,12 @@ async def test_upload_pdf_success_with_no_existing_files(
 
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
-    # Setup text splitter mocks
-    mock_split_documents = AsyncMock()
-    mock_text_splitter = AsyncMock()
-    mock_text_splitter.atransform_documents = AsyncMock(return_value = mock_split_documents)
-    mock_recursive_character_text_splitter.return_value = mock_text_splitter
-
-    # Setup the async mock for file operations
-    mock_file_handle = MagicMock()
-    mock_file_handle.write = AsyncMock()
-    mock_aiofiles_open.return_value.__aenter__.return_value = mock_file_handle
-    mock_aiofiles_open.return_value.__aexit__.return_value = AsyncMock()
-
-    # Setup the PDF loader mock
-    mock_document = MagicMock()
-    mock_document.metadata = {"filename": "test1.pdf"}
-    mock_document.page_content = "Sample PDF content text"
-    mock_pypdf_loader_instance = mock_pypdf_loader.return_value
-    mock_pypdf_loader_instance.aload = AsyncMock(return_value=[mock_document])
-
-    # Setup FAISS mock
-    mock_faiss.afrom_documents = AsyncMock()
-    mock_faiss.save_local = AsyncMock()
+    mock_session_vector_store.return_value.getFileNames.return_value = ['test1.pdf', 'test2.pdf', 'test3.pdf', 'test4.pdf', 'test5.pdf']
 
     # Define the PDF files to be uploaded
     files = [
-        ("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
-        ("files", ("test2.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
+        ("files", ("test6.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
+        ("files", ("test7.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf"))
     ]
 
     # Send the request
@@ -175,168 +96,141 @@ async def test_upload_pdf_success_with_no_existing_files(
         response = await client.put(patched_put_module.instance.upload_pdf_end_point, files=files)
 
     # Assertions
-    assert response.status_code == 200, response.json()
-    assert response.json() == {"informationMessage": "PDF files uploaded and converted to database successfully."}
+    assert response.status_code == 400, response.json()
+    assert response.json()['detail'] == f"You reached the maximum file limit of {patched_put_module.instance.max_file_limit}."
 
     expected_calls = [
         call(session_id=FAKE_SESSION_ID, key="progress", value="0"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="20"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="40"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="60"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="80"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="100"),
-        call(session_id=FAKE_SESSION_ID, key="vector_store_path", value=vector_store_path)
+        call(session_id=FAKE_SESSION_ID, key="progress", value="-1")
     ]
 
-    mock_recursive_character_text_splitter.assert_called_with(chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", ".", " "])
-
-    assert patched_put_module.instance.redis_tool.updateSession.await_count == 7
+    assert patched_put_module.instance.redis_tool.updateSession.await_count == 2
     patched_put_module.instance.redis_tool.updateSession.assert_has_awaits(expected_calls, any_order=False)
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch('lib.routers.put.SessionVectorStore')
+async def test_upload_pdf_failure_queue_unavailable(mock_session_vector_store, patched_put_module, fixture_test_app, tmp_path):
+    """
+    Test to verify behavior when the upload job can't be queued.
+    This test ensures a 503 is returned, the stored files are removed and the session reflects the failure.
+    """
+    patched_put_module.instance.upload_dir = str(tmp_path)
+    patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.job_queue.enqueue = AsyncMock(side_effect=ConnectionError("Redis is down"))
 
-    mock_exists.called_once_with(faiss_dir)
-    mock_isfile.assert_not_called()
+    # Mock session dependency
+    async def override_getSession():
+        return FAKE_SESSION_ID, {'vector_store_path': "_"}
 
-    mock_listdir.assert_called_with(documents_dir)
+    fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
-    # Ensure important operations were called with correct parameters
-    mock_makedirs.assert_any_call(vector_store_path, exist_ok=True)
-    mock_makedirs.assert_any_call(documents_dir, exist_ok=True)
+    mock_session_vector_store.return_value.getFileNames.return_value = []
 
-    # Ensure file operations were called with the correct file paths and contents
-    mock_aiofiles_open.assert_any_call(os.path.join(documents_dir, "test1.pdf"), "wb")
-    mock_aiofiles_open.assert_any_call(os.path.join(documents_dir, "test2.pdf"), "wb")
-    mock_file_handle.write.assert_called_with(b"%PDF-1.4")
+    files = [("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf"))]
 
-    mock_faiss.afrom_documents.assert_awaited_once_with(mock_split_documents, patched_put_module.instance.embedding)
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(patched_put_module.instance.upload_pdf_end_point, files=files)
 
-    # Check PDF loader instance call for PDF loading and splitting documents
-    assert mock_pypdf_loader_instance.aload.call_count == 2
-    mock_pypdf_loader.assert_any_call(os.path.join(documents_dir, "test1.pdf"))
-    mock_pypdf_loader.assert_any_call(os.path.join(documents_dir, "test2.pdf"))
+    assert response.status_code == 503, response.json()
+    assert response.json()['detail'] == "Failed to queue the upload. Error: Redis is down"
+    assert os.listdir(tmp_path) == []
+    patched_put_module.instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    patched_put_module.instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="upload_status", value="failed")
+    # The bytes of the discarded upload no longer count against the session's quota
+    patched_put_module.instance.upload_quota.releaseBytes.assert_awaited_once_with(session_id=FAKE_SESSION_ID, byte_count=8)
 
 
 @pytest.mark.asyncio
-@patch('lib.routers.put.RecursiveCharacterTextSplitter')
-@patch('os.path.exists', return_value=True)
-@patch('os.makedirs')
-@patch('os.listdir', return_value=['test1.pdf', 'test2.pdf', 'test3.pdf', 'test4.pdf', 'test5.pdf'])
-@patch('os.path.isfile', return_value=True)
-@patch('lib.routers.put.aiofiles.open', new_callable=MagicMock)
-@patch('lib.routers.put.PyPDFLoader')
-@patch('lib.routers.put.FAISS')
-async def test_upload_pdf_failure_reach_max_file_limit(
-    mock_faiss, mock_pypdf_loader, mock_aiofiles_open, mock_isfile, mock_listdir, mock_makedirs, mock_exists, mock_recursive_character_text_splitter,
-    patched_put_module, fixture_test_app
-):
+async def test_upload_pdf_rejects_announced_body_over_quota(patched_put_module, fixture_test_app):
     """
-    Test to verify that the upload process fails when the maximum file limit is reached.
-    This test ensures that no additional processing occurs and the session progress is updated accordingly.
+    Test to verify that a body announcing more bytes than the session may still upload is rejected
+    with 413 before it is read.
     """
-    vector_store_path = f"./.vector_stores/{FAKE_SESSION_ID}"
-    documents_dir = os.path.join(vector_store_path, "documents")
-    faiss_dir = os.path.join(vector_store_path, "faiss")
-
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.upload_quota.getRemainingBytes = AsyncMock(return_value=0)
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
 
-    # Mock session dependency
     async def override_getSession():
         return FAKE_SESSION_ID, {'vector_store_path': "_"}
 
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
+    from lib.routers.put import MULTIPART_OVERHEAD
 
-    mock_split_documents = AsyncMock()
-    mock_text_splitter = AsyncMock()
-    mock_text_splitter.atransform_documents = AsyncMock(return_value = mock_split_documents)
-    mock_recursive_character_text_splitter.return_value = mock_text_splitter
+    files = [("files", ("large.pdf", io.BytesIO(b"0" * (MULTIPART_OVERHEAD + 1)), "application/pdf"))]
 
-    # Setup the async mock for file operations
-    mock_file_handle = MagicMock()
-    mock_file_handle.write = AsyncMock()
-    mock_aiofiles_open.return_value.__aenter__.return_value = mock_file_handle
-    mock_aiofiles_open.return_value.__aexit__.return_value = AsyncMock()
-
-    # Setup the PDF loader mock
-    mock_document = MagicMock()
-    mock_document.metadata = {"filename": "test1.pdf"}
-    mock_document.page_content = "Sample PDF content text"
-    mock_pypdf_loader_instance = mock_pypdf_loader.return_value
-    mock_pypdf_loader_instance.aload = AsyncMock(return_value=[mock_document])
-
-    # Setup FAISS mock
-    mock_faiss.afrom_documents = AsyncMock()  # Ensure aadd_documents is an async mock method
-    mock_faiss.save_local = AsyncMock()  # Mock save_local as an async function
-
-    # Define the PDF files to be uploaded
-    files = [
-        ("files", ("test6.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
-        ("files", ("test7.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf"))
-    ]
-
-    # Send the request
     async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
         response = await client.put(patched_put_module.instance.upload_pdf_end_point, files=files)
 
-    # Assertions
-    assert response.status_code == 400, response.json()
-    assert response.json()['detail'] == f"You reached the maximum file limit of {patched_put_module.instance.max_file_limit}."
+    assert response.status_code == 413
+    assert response.json()['detail'] == f"The upload exceeds the session quota of {patched_put_module.instance.session_byte_quota} bytes; 0 bytes remain."
+    patched_put_module.instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
 
-    expected_calls = [
-        call(session_id=FAKE_SESSION_ID, key="progress", value="0"),
-        call(session_id=FAKE_SESSION_ID, key="progress", value="-1")
-    ]
 
-    mock_recursive_character_text_splitter.assert_not_called()
+@pytest.mark.asyncio
+async def test_upload_pdf_rejects_streamed_body_over_quota(patched_put_module, fixture_test_app):
+    """
+    Test to verify that a body without a length is rejected with 413 as soon as it exceeds the session's quota.
+    """
+    patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.upload_quota.getRemainingBytes = AsyncMock(return_value=0)
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
+    sent_chunks = []
 
-    assert patched_put_module.instance.redis_tool.updateSession.await_count == 2
-    patched_put_module.instance.redis_tool.updateSession.assert_has_awaits(expected_calls, any_order=False)
+    async def override_getSession():
+        return FAKE_SESSION_ID, {'vector_store_path': "_"}
 
-    mock_exists.called_once_with(faiss_dir)
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test1.pdf"))
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test2.pdf"))
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test3.pdf"))
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test4.pdf"))
-    mock_isfile.assert_any_call(os.path.join(documents_dir, "test5.pdf"))
-    mock_makedirs.assert_not_called()
+    fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
-    mock_listdir.assert_called_with(documents_dir)
+    async def body():
+        yield b'--boundary\r\nContent-Disposition: form-data; name="files"; filename="large.pdf"\r\nContent-Type: application/pdf\r\n\r\n'
+        for _ in range(100):
+            sent_chunks.append(1)
+            yield b"0" * 4096
+        yield b"\r\n--boundary--\r\n"
 
-    # Ensure file operations were called with the correct file paths and contents
-    mock_aiofiles_open.assert_not_called()
-    mock_file_handle.write.assert_not_called()
+    async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
+        response = await client.put(
+            patched_put_module.instance.upload_pdf_end_point,
+            content=body(),
+            headers={"Content-Type": "multipart/form-data; boundary=boundary"}
+        )
 
-    mock_faiss.afrom_documents.assert_not_called()
+    assert response.status_code == 413
+    # The body stopped being read once it exceeded the quota
+    assert len(sent_chunks) < 100
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
 
-    # Check PDF loader instance call for PDF loading and splitting documents
-    assert mock_pypdf_loader_instance.aload.call_count == 0
-    mock_pypdf_loader.assert_not_called()
 
 @pytest.mark.asyncio
-@patch('os.path.exists')
-async def test_upload_pdf_failure_unexpected_error(mock_exists, patched_put_module, fixture_test_app):
+@patch('lib.routers.put.SessionVectorStore')
+async def test_upload_pdf_files_over_quota(mock_session_vector_store, patched_put_module, fixture_test_app):
     """
-    Test to verify behavior when an unexpected error occurs during the PDF upload process.
-    This test ensures that the error is handled gracefully and an appropriate HTTP error response is returned.
+    Test to verify that files exceeding the session's byte quota are rejected with 413 and not queued.
     """
-    mock_exists.side_effect = Exception('Test Error')
     patched_put_module.instance.redis_tool.updateSession = AsyncMock()
+    patched_put_module.instance.upload_quota.reserveBytes = AsyncMock(
+        side_effect=QuotaExceededError("The upload exceeds the session quota of 10 bytes; 2 bytes remain.", 2)
+    )
+    patched_put_module.instance.job_queue.enqueue = AsyncMock()
 
-    # Mock session dependency
     async def override_getSession():
         return FAKE_SESSION_ID, {'vector_store_path': "_"}
 
     fixture_test_app.dependency_overrides[patched_put_module.instance.redis_tool.getSession] = override_getSession
 
-    # Define the PDF files to be uploaded
-    files = [
-        ("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")),
-        ("files", ("test2.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf"))
-    ]
+    mock_session_vector_store.return_value.getFileNames.return_value = []
+
+    files = [("files", ("test1.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf")), ("files", ("test2.pdf", io.BytesIO(b"%PDF-1.4"), "application/pdf"))]
 
-    # Send the request
     async with AsyncClient(transport=ASGITransport(app=fixture_test_app), base_url=FAKE_URL) as client:
         response = await client.put(patched_put_module.instance.upload_pdf_end_point, files=files)
 
-    # Assertions
-    assert response.status_code == 400, response.json()
-    assert response.json()['detail'] == "Failed to convert PDF file. Error: Test Error"
\ No newline at end of file
+    assert response.status_code == 413
+    assert response.json()['detail'] == "The upload exceeds the session quota of 10 bytes; 2 bytes remain."
+    patched_put_module.instance.upload_quota.reserveBytes.assert_awaited_once_with(session_id=FAKE_SESSION_ID, byte_count=16)
+    patched_put_module.instance.redis_tool.updateSession.assert_any_await(session_id=FAKE_SESSION_ID, key="progress", value="-1")
+    patched_put_module.instance.job_queue.enqueue.assert_not_called()
@@ -0,0 +1,123 @@
+import pytest, hashlib, os
+from lib.tools.chunked_upload import ChunkedUploadStore, UploadConflictError
+
+FAKE_SESSION_ID = "session123"
+
+class FakeRedis:
+    """
+    Keeps the hashes and keys the store uses in memory.
+    """
+    def __init__(self):
+        self.data = {}
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        self.data.setdefault(key, {}).update(mapping or {field: value})
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def expire(self, key, ttl):
+        pass
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+async def _stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+@pytest.fixture
+def upload_store(tmp_path):
+    return ChunkedUploadStore(redis=FakeRedis(), upload_dir=str(tmp_path), part_size=8, upload_ttl=60)
+
+@pytest.mark.asyncio
+async def test_upload_in_parts(upload_store):
+    """
+    Test that parts are appended in order and the completed file matches its checksum.
+    """
+    content = b"col1,col2\n1,2\n"
+    upload = await upload_store.createUpload(FAKE_SESSION_ID, "a.csv", "csv", len(content), hashlib.sha256(content).hexdigest())
+
+    assert await upload_store.writePart(upload, 0, _stream(content[:4], content[4:8]), hashlib.sha256(content[:8]).hexdigest()) == 8
+    assert await upload_store.writePart(upload, 8, _stream(content[8:])) == len(content)
+
+    stored = await upload_store.getUpload(upload["id"], FAKE_SESSION_ID)
+    assert stored["offset"] == len(content)
+    assert await upload_store.verifyUpload(stored)
+    with open(upload_store.getDataPath(upload["id"]), "rb") as data_file:
+        assert data_file.read() == content
+
+@pytest.mark.asyncio
+async def test_upload_rejects_parts_out_of_order(upload_store):
+    """
+    Test that a part not starting at the received offset is rejected with the offset to resume at.
+    """
+    upload = await upload_store.createUpload(FAKE_SESSION_ID, "a.pdf", "pdf", 10)
+    await upload_store.writePart(upload, 0, _stream(b"abcd"))
+
+    with pytest.raises(UploadConflictError) as error:
+        await upload_store.writePart(upload, 0, _stream(b"abcd"))
+    assert error.value.offset == 4
+
+@pytest.mark.asyncio
+async def test_upload_resumes_after_failed_part(upload_store):
+    """
+    Test that the bytes of a failed part are discarded and the part can be sent again.
+    """
+    upload = await upload_store.createUpload(FAKE_SESSION_ID, "a.pdf", "pdf", 10)
+    await upload_store.writePart(upload, 0, _stream(b"abcd"))
+
+    with pytest.raises(ValueError, match="checksum"):
+        await upload_store.writePart(upload, 4, _stream(b"XXXX"), hashlib.sha256(b"efgh").hexdigest())
+    with pytest.raises(ValueError, match="larger"):
+        await upload_store.writePart(upload, 4, _stream(b"efgh", b"ijklm"))
+
+    assert (await upload_store.getUpload(upload["id"], FAKE_SESSION_ID))["offset"] == 4
+    await upload_store.writePart(upload, 4, _stream(b"efghij"))
+    with open(upload_store.getDataPath(upload["id"]), "rb") as data_file:
+        assert data_file.read() == b"abcdefghij"
+
+@pytest.mark.asyncio
+async def test_upload_rejects_bytes_beyond_file_size_and_other_sessions(upload_store):
+    """
+    Test that an upload can't grow past its declared size and isn't visible to other sessions.
+    """
+    upload = await upload_store.createUpload(FAKE_SESSION_ID, "a.pdf", "pdf", 3)
+
+    with pytest.raises(ValueError, match="file size"):
+        await upload_store.writePart(upload, 0, _stream(b"abcd"))
+    assert await upload_store.getUpload(upload["id"], "other-session") is None
+
+@pytest.mark.asyncio
+async def test_take_file_and_remove_expired_uploads(upload_store, tmp_path):
+    """
+    Test that a completed file is moved out of the store and data of expired uploads is removed,
+    returning their session and size once.
+    """
+    taken = await upload_store.createUpload(FAKE_SESSION_ID, "a.pdf", "pdf", 2)
+    await upload_store.writePart(taken, 0, _stream(b"ab"))
+    expired = await upload_store.createUpload(FAKE_SESSION_ID, "b.pdf", "pdf", 1024)
+    kept = await upload_store.createUpload(FAKE_SESSION_ID, "c.pdf", "pdf", 2)
+
+    destination = str(tmp_path / "a.pdf")
+    await upload_store.takeFile(taken, destination)
+    await upload_store.redis.delete(f"upload:{expired['id']}")  # The record expired
+
+    assert await upload_store.removeExpiredUploads() == [{"session_id": FAKE_SESSION_ID, "file_size": 1024, "id": expired["id"]}]
+    assert await upload_store.removeExpiredUploads() == []
+    with open(destination, "rb") as taken_file:
+        assert taken_file.read() == b"ab"
+    assert await upload_store.getUpload(taken["id"], FAKE_SESSION_ID) is None
+    assert sorted(os.listdir(upload_store.chunked_dir)) == [kept["id"]]
@@ -0,0 +1,238 @@
+import pytest, asyncio, json
+from unittest.mock import AsyncMock, Mock, patch
+from lib.tools.job_queue import JobQueue, JobWorkerPool, QUEUE_KEY, PROCESSING_KEY
+
+FAKE_TTL = 60
+FAKE_VISIBILITY_TIMEOUT = 30
+
+@pytest.fixture
+def job_queue():
+    return JobQueue(redis=AsyncMock(), job_ttl=FAKE_TTL, visibility_timeout=FAKE_VISIBILITY_TIMEOUT)
+
+@pytest.mark.asyncio
+async def test_job_queue_enqueue(job_queue):
+    """
+    Test that a job record is stored with an expiry before its ID is pushed to the queue.
+    """
+    job_id = await job_queue.enqueue(job_type="upload_pdf", session_id="session-id", payload={"files": []})
+
+    mapping = job_queue.redis.hset.await_args.kwargs["mapping"]
+    job_queue.redis.hset.assert_awaited_once()
+    assert job_queue.redis.hset.await_args.args == (f"job:{job_id}",)
+    assert mapping["type"] == "upload_pdf"
+    assert mapping["session_id"] == "session-id"
+    assert mapping["status"] == "queued"
+    assert json.loads(mapping["payload"]) == {"files": []}
+    job_queue.redis.expire.assert_awaited_once_with(f"job:{job_id}", FAKE_TTL)
+    job_queue.redis.lpush.assert_awaited_once_with(QUEUE_KEY, job_id)
+
+@pytest.mark.asyncio
+async def test_job_queue_dequeue(job_queue):
+    """
+    Test that a dequeued job is moved to the processing list, decoded and marked as running.
+    """
+    job_queue.redis.blmove.return_value = "job-id"
+    job_queue.redis.hgetall.return_value = {"type": "upload_pdf", "session_id": "session-id", "status": "queued", "payload": '{"a": 1}'}
+
+    with patch("lib.tools.job_queue.time.time", return_value=1000.0):
+        job = await job_queue.dequeue(timeout=1)
+
+    job_queue.redis.blmove.assert_awaited_once_with(QUEUE_KEY, PROCESSING_KEY, 1, "RIGHT", "LEFT")
+    assert job["id"] == "job-id"
+    assert job["payload"] == {"a": 1}
+    assert job["status"] == "running"
+    job_queue.redis.hset.assert_awaited_once_with("job:job-id", mapping={"status": "running", "heartbeat_at": "1000.0"})
+
+@pytest.mark.asyncio
+async def test_job_queue_dequeue_timeout_and_expired_job(job_queue):
+    """
+    Test that no job is returned when none arrives in time or its record expired while queued.
+    """
+    job_queue.redis.blmove.return_value = None
+    assert await job_queue.dequeue(timeout=1) is None
+
+    job_queue.redis.blmove.return_value = "job-id"
+    job_queue.redis.hgetall.return_value = {}
+    assert await job_queue.dequeue(timeout=1) is None
+    job_queue.redis.lrem.assert_awaited_once_with(PROCESSING_KEY, 0, "job-id")
+
+@pytest.mark.asyncio
+async def test_job_worker_pool_records_outcomes():
+    """
+    Test that the worker pool records the result of successful, failing and unknown jobs.
+    """
+    job_queue = Mock(visibility_timeout=60)
+    job_queue.finishJob = AsyncMock()
+
+    async def succeed(job):
+        return "done"
+
+    async def fail(job):
+        raise ValueError("broken file")
+
+    pool = JobWorkerPool(job_queue=job_queue, handlers={"ok": succeed, "fail": fail}, concurrency=1)
+
+    await pool.runJob({"id": "1", "type": "ok"})
+    await pool.runJob({"id": "2", "type": "fail"})
+    await pool.runJob({"id": "3", "type": "unknown"})
+
+    assert job_queue.finishJob.await_args_list[0].args == ({"id": "1", "type": "ok"},)
+    assert job_queue.finishJob.await_args_list[0].kwargs == {"status": "completed", "message": "done"}
+    assert job_queue.finishJob.await_args_list[1].kwargs == {"status": "failed", "message": "broken file"}
+    assert job_queue.finishJob.await_args_list[2].kwargs == {"status": "failed", "message": "Unknown job type: unknown"}
+
+@pytest.mark.asyncio
+async def test_job_worker_pool_runs_jobs_concurrently():
+    """
+    Test that the workers take jobs from the queue in parallel up to the configured concurrency and stop cleanly.
+    """
+    jobs = asyncio.Queue()
+    for i in range(3):
+        jobs.put_nowait({"id": str(i), "type": "slow"})
+
+    async def dequeue(timeout):
+        try:
+            return await asyncio.wait_for(jobs.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    job_queue = Mock(visibility_timeout=60)
+    job_queue.dequeue = dequeue
+    job_queue.finishJob = AsyncMock()
+    job_queue.reapStaleJobs = AsyncMock(return_value=[])
+
+    running, peak = 0, 0
+    release = asyncio.Event()
+
+    async def slow(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        return "done"
+
+    pool = JobWorkerPool(job_queue=job_queue, handlers={"slow": slow}, concurrency=2, poll_timeout=0.01)
+    pool.start()
+    await asyncio.sleep(0.05)
+    assert peak == 2  # The third job waits for a free worker
+
+    release.set()
+    await asyncio.sleep(0.05)
+    await pool.stop()
+
+    assert job_queue.finishJob.await_count == 3
+    assert pool.tasks == []
+
+@pytest.mark.asyncio
+async def test_job_queue_reaps_stale_jobs(job_queue):
+    """
+    Test that running jobs without a recent heartbeat are removed from the processing list and
+    failed, while live jobs are kept and jobs whose record expired are only removed.
+    """
+    records = {
+        "stale": {"type": "upload_csv", "status": "running", "heartbeat_at": "900.0"},
+        "live": {"type": "upload_csv", "status": "running", "heartbeat_at": "980.0"},
+        "unclaimed": {"type": "upload_pdf", "status": "queued"}
+    }
+    job_queue.redis.lrange.return_value = ["stale", "live", "unclaimed", "expired"]
+    job_queue.redis.hgetall.side_effect = lambda key: dict(records.get(key.split(":")[1], {}))
+    job_queue.redis.lrem.return_value = 1
+
+    with patch("lib.tools.job_queue.time.time", return_value=1000.0):
+        stale_jobs = await job_queue.reapStaleJobs()
+
+    assert [job["id"] for job in stale_jobs] == ["stale"]
+    assert stale_jobs[0]["status"] == "failed"
+    job_queue.redis.lrem.assert_any_await(PROCESSING_KEY, 0, "expired")
+    job_queue.redis.hset.assert_awaited_once_with("job:stale", mapping={"status": "failed", "message": "The worker running the job stopped."})
+
+    # A job taken before its first heartbeat is stale once it stayed so for a whole timeout
+    job_queue.redis.lrange.return_value = ["unclaimed"]
+    with patch("lib.tools.job_queue.time.time", return_value=1000.0 + FAKE_VISIBILITY_TIMEOUT + 1):
+        assert [job["id"] for job in await job_queue.reapStaleJobs()] == ["unclaimed"]
+
+@pytest.mark.asyncio
+async def test_job_worker_pool_sends_heartbeats_and_fails_abandoned_jobs():
+    """
+    Test that a running job sends heartbeats, and that the reaper hands abandoned jobs to the
+    failure handler of their type.
+    """
+    job_queue = Mock(visibility_timeout=0.03)
+    job_queue.heartbeat = AsyncMock()
+    job_queue.finishJob = AsyncMock()
+
+    async def dequeue(timeout):
+        await asyncio.sleep(timeout)  # No job arrives
+
+    job_queue.dequeue = dequeue
+    job_queue.reapStaleJobs = AsyncMock(side_effect=[[{"id": "1", "type": "upload_csv"}], []])
+    failure_handler = AsyncMock()
+
+    async def slow(job):
+        await asyncio.sleep(0.05)
+        return "done"
+
+    pool = JobWorkerPool(job_queue=job_queue, handlers={"upload_csv": slow}, concurrency=1, poll_timeout=0.01, failure_handlers={"upload_csv": failure_handler})
+    await pool.runJob({"id": "2", "type": "upload_csv", "session_id": "session-id"})
+    job_queue.heartbeat.assert_awaited_with({"id": "2", "type": "upload_csv", "session_id": "session-id"})
+
+    pool.start()
+    await asyncio.sleep(0.01)
+    await pool.stop()
+    failure_handler.assert_awaited_once_with({"id": "1", "type": "upload_csv"})
+
+@pytest.mark.asyncio
+async def test_job_worker_pool_stop_fails_running_jobs():
+    """
+    Test that stopping the pool fails the jobs it is running and hands them to the failure
+    handler of their type, since the reaper never sees them.
+    """
+    job = {"id": "1", "type": "upload_pdf", "session_id": "session-id"}
+    jobs = [job]
+
+    async def dequeue(timeout):
+        if jobs:
+            return jobs.pop()
+        await asyncio.sleep(timeout)
+
+    job_queue = Mock(visibility_timeout=60)
+    job_queue.dequeue = dequeue
+    job_queue.finishJob = AsyncMock()
+    job_queue.reapStaleJobs = AsyncMock(return_value=[])
+    failure_handler = AsyncMock()
+    started = asyncio.Event()
+
+    async def endless(job):
+        started.set()
+        await asyncio.Event().wait()
+
+    pool = JobWorkerPool(job_queue=job_queue, handlers={"upload_pdf": endless}, concurrency=1, poll_timeout=0.01, failure_handlers={"upload_pdf": failure_handler})
+    pool.start()
+    await started.wait()
+    await pool.stop()
+
+    job_queue.finishJob.assert_awaited_once_with(job, status="failed", message="The job was cancelled.")
+    failure_handler.assert_awaited_once_with(job)
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_the_jobs_of_a_session_one_at_a_time(job_queue):
+    """
+    Test that a job is put back at the end of the queue while another job of its session runs,
+    and that finishing a job unlocks its session.
+    """
+    job_queue.redis.blmove.return_value = "job-2"
+    job_queue.redis.hgetall.return_value = {"type": "upload_csv", "session_id": "session-id", "status": "queued", "payload": "{}"}
+    job_queue.redis.set.return_value = None  # job-1 holds the lock of the session
+
+    with patch("lib.tools.job_queue.SESSION_BUSY_DELAY", 0):
+        assert await job_queue.dequeue(timeout=1) is None
+
+    job_queue.redis.set.assert_awaited_once_with("jobs:session:session-id", "job-2", nx=True, ex=FAKE_VISIBILITY_TIMEOUT)
+    job_queue.redis.lpush.assert_awaited_once_with(QUEUE_KEY, "job-2")
+    job_queue.redis.lrem.assert_awaited_once_with(PROCESSING_KEY, 0, "job-2")
+    job_queue.redis.hset.assert_not_awaited()
+
+    job_queue.redis.get.return_value = "job-1"
+    await job_queue.finishJob({"id": "job-1", "session_id": "session-id"}, status="completed", message="done")
+    job_queue.redis.delete.assert_awaited_once_with("jobs:session:session-id")
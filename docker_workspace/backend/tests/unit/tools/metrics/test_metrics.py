@@ -0,0 +1,65 @@
+import pytest
+from lib.tools.metrics import MetricsRegistry, Counter, Gauge, Histogram
+
+def test_metrics_render_prometheus_text():
+    """
+    Test that counters, gauges and histograms are rendered in the Prometheus text format,
+    with cumulative buckets and escaped label values.
+    """
+    registry = MetricsRegistry()
+    requests = Counter("requests_total", "Number of requests.", ("route",), registry=registry)
+    in_flight = Gauge("in_flight", "Requests in flight.", registry=registry)
+    latency = Histogram("latency_seconds", "Request latency.", ("route",), registry=registry, buckets=(0.1, 1.0))
+
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+    latency.observe(3, "/a")
+
+    assert registry.render() == "\n".join([
+        "# HELP requests_total Number of requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a\\"b"} 3',
+        "# HELP in_flight Requests in flight.",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+        "# HELP latency_seconds Request latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 3.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]) + "\n"
+    assert latency.getCount("/a") == 3
+    assert latency.getCount("/b") == 0
+
+def test_metrics_names_are_unique():
+    """
+    Test that a metric name can't be registered twice.
+    """
+    registry = MetricsRegistry()
+    Counter("requests_total", "Number of requests.", registry=registry)
+
+    with pytest.raises(ValueError):
+        Gauge("requests_total", "Number of requests.", registry=registry)
+
+def test_metrics_histogram_times_blocks():
+    """
+    Test that a timed block is observed once it is left, also when it raises.
+    """
+    registry = MetricsRegistry()
+    duration = Histogram("duration_seconds", "Duration.", ("step",), registry=registry)
+
+    with duration.time("load"):
+        pass
+    with pytest.raises(RuntimeError):
+        with duration.time("load"):
+            raise RuntimeError("failed")
+
+    assert duration.getCount("load") == 2
+    assert duration.getSum("load") >= 0
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import AsyncMock, patch, Mock
-from lib.tools.redis import RedisTool
+from lib.tools.redis import RedisTool, InstrumentedRedis, REDIS_COMMAND_DURATION, REDIS_COMMAND_ERRORS
 from fastapi import status
 from sqlalchemy.sql import text
 
@@ -51,16 +51,21 @@ async def test_redis_create_session_success(mock_time, redis_tool):
 async def test_redis_get_session_data_success(redis_tool):
     """
     Test to verify successful retrieval of session data from Redis.
-    Ensures data consistency with expected session attributes.
+    Ensures data consistency with expected session attributes and that the request's trace is marked as the session's.
     """
+    from lib.tools.tracing import TRACER
+
     session_id = '12345'
     session_data = {"created_at": "1698245632.0", "data": "{}"}
     redis_tool.redis.hgetall = AsyncMock(return_value=session_data)
 
     # Fetch session data and assert results
-    returned_session_id, returned_session_data = await redis_tool.getSession(session_id=session_id)
+    root = TRACER.startTrace("GET /progress")
+    with TRACER.activate(root):
+        returned_session_id, returned_session_data = await redis_tool.getSession(session_id=session_id)
     assert returned_session_id == session_id
     assert returned_session_data == session_data
+    assert root.owner == session_id
 
 @pytest.mark.asyncio
 async def test_redis_get_session_data_failure_invalid_data(redis_tool):
@@ -191,4 +196,22 @@ async def test_redis_delete_temp_database_success_database_not_exist(mock_create
 
     mock_create_async_engine.assert_called_once_with(db_url, echo=False, isolation_level="AUTOCOMMIT")
     assert mock_connection.execute.call_count == 1
-    assert expected_queries == called_queries
\ No newline at end of file
+    assert expected_queries == called_queries
+
+@pytest.mark.asyncio
+async def test_redis_commands_are_timed_by_name():
+    """
+    Test to verify that the round-trip time of every command is recorded under the command's name,
+    and that failed commands are counted.
+    """
+    client = InstrumentedRedis(host=FAKE_IP_ADDR, port=FAKE_PORT, decode_responses=True)
+    before = REDIS_COMMAND_DURATION.getCount("HSET")
+    errors_before = REDIS_COMMAND_ERRORS.values.get(("HSET",), 0)
+
+    with patch("redis.asyncio.Redis.execute_command", new=AsyncMock(side_effect=[1, ConnectionError("down")])):
+        assert await client.hset("session:1", "key", "value") == 1
+        with pytest.raises(ConnectionError):
+            await client.hset("session:1", "key", "value")
+
+    assert REDIS_COMMAND_DURATION.getCount("HSET") == before + 2
+    assert REDIS_COMMAND_ERRORS.values[("HSET",)] == errors_before + 1
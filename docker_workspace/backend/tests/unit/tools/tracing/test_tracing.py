@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from lib.tools.tracing import Tracer, InMemorySpanExporter, parseTraceparent, getCurrentSpan
+
+@pytest.fixture
+def tracer():
+    return Tracer(InMemorySpanExporter(max_traces=2))
+
+@pytest.mark.asyncio
+async def test_tracing_concurrent_children_get_their_parents(tracer):
+    """
+    Test that spans opened by concurrently gathered operations are children of the span that gathered them,
+    and that the spans of a trace are exported in their start order.
+    """
+    async def query(name):
+        with tracer.span("db.query", attributes={"name": name}) as span:
+            await asyncio.sleep(0)
+            return span
+
+    root = tracer.startTrace("POST /sql_query")
+    with tracer.activate(root):
+        with tracer.span("sql_agent.iteration") as iteration:
+            first, second = await asyncio.gather(query("a"), query("b"))
+            assert getCurrentSpan() is iteration
+
+    assert getCurrentSpan().is_recording is False
+    assert first.parent_span_id == second.parent_span_id == iteration.span_id
+    assert iteration.parent_span_id == root.span_id
+    assert {span.trace_id for span in (first, second, iteration)} == {root.trace_id}
+
+    spans = tracer.exporter.getTrace(root.trace_id)
+    assert [span.name for span in spans] == ["POST /sql_query", "sql_agent.iteration", "db.query", "db.query"]
+    assert spans[0].toDict()["kind"] == "SPAN_KIND_SERVER"
+    assert "parentSpanId" not in spans[0].toDict()
+
+def test_tracing_records_nothing_outside_of_a_trace(tracer):
+    """
+    Test that operations outside of a request, such as background jobs, don't create traces.
+    """
+    with tracer.span("redis BLMOVE") as span:
+        span.setAttribute("db.system", "redis")
+
+    assert span.is_recording is False
+    assert tracer.exporter.traces == {}
+
+def test_tracing_marks_failed_spans(tracer):
+    """
+    Test that an exception leaving a span is recorded in its status and raised on.
+    """
+    root = tracer.startTrace("GET /rag_query")
+    with pytest.raises(ValueError):
+        with tracer.activate(root):
+            with tracer.span("llm.ainvoke", kind="CLIENT"):
+                raise ValueError("rate limited")
+
+    llm_span = tracer.exporter.getTrace(root.trace_id)[1].toDict()
+    assert llm_span["status"] == {"code": "STATUS_CODE_ERROR", "message": "rate limited"}
+    assert {"key": "exception.type", "value": {"stringValue": "ValueError"}} in llm_span["attributes"]
+
+def test_tracing_continues_traceparent_and_drops_old_traces(tracer):
+    """
+    Test that a valid traceparent header is continued, an invalid one starts a new trace,
+    and that only the latest traces are kept.
+    """
+    trace_id, parent_span_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    assert parseTraceparent(f"00-{trace_id}-{parent_span_id}-01") == (trace_id, parent_span_id)
+    assert parseTraceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") == (None, None)
+    assert parseTraceparent("invalid") == (None, None)
+
+    continued = tracer.startTrace("GET /check_session", traceparent=f"00-{trace_id}-{parent_span_id}-01")
+    assert continued.trace_id == trace_id and continued.parent_span_id == parent_span_id
+
+    spans = [tracer.startTrace("GET /check_session") for _ in range(3)]
+    for span in spans:
+        span.end()
+
+    assert tracer.exporter.getTrace(spans[0].trace_id) is None
+    assert list(tracer.exporter.traces) == [spans[1].trace_id, spans[2].trace_id]
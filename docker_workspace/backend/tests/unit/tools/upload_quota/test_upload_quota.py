@@ -0,0 +1,98 @@
+import pytest
+from lib.tools.upload_quota import UploadQuota, QuotaExceededError, _RELEASE_SCRIPT
+
+FAKE_SESSION_ID = "session123"
+
+class FakeRedis:
+    """
+    Keeps session hashes in memory and runs the reservation and release scripts as Redis would.
+    """
+    def __init__(self):
+        self.data = {f"session:{FAKE_SESSION_ID}": {}}
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    async def eval(self, script, key_count, key, field, amount, quota=None):
+        if key not in self.data:
+            return -1
+        used = int(self.data[key].get(field, 0))
+        if script == _RELEASE_SCRIPT:
+            self.data[key][field] = str(max(0, used - amount))
+            return max(0, used - amount)
+        if used + amount > quota:
+            return -2
+        self.data[key][field] = str(used + amount)
+        return used + amount
+
+@pytest.fixture
+def upload_quota():
+    return UploadQuota(redis=FakeRedis(), byte_quota=100, row_quota=10)
+
+@pytest.mark.asyncio
+async def test_reserve_and_release_bytes(upload_quota):
+    """
+    Test that reserved bytes reduce the remaining quota until they are released.
+    """
+    await upload_quota.reserveBytes(FAKE_SESSION_ID, 60)
+    assert await upload_quota.getRemainingBytes(FAKE_SESSION_ID) == 40
+
+    await upload_quota.releaseBytes(FAKE_SESSION_ID, 60)
+    assert await upload_quota.getRemainingBytes(FAKE_SESSION_ID) == 100
+
+@pytest.mark.asyncio
+async def test_release_after_reset_keeps_the_usage_at_zero(upload_quota):
+    """
+    Test that bytes released after the usage was reset, like those of an upload that expired
+    after the session was cleared, don't raise the quota beyond its limit.
+    """
+    await upload_quota.reserveBytes(FAKE_SESSION_ID, 60)
+    await upload_quota.resetUsage(FAKE_SESSION_ID)
+    await upload_quota.releaseBytes(FAKE_SESSION_ID, 60)
+
+    with pytest.raises(QuotaExceededError):
+        await upload_quota.reserveBytes(FAKE_SESSION_ID, 101)
+    assert await upload_quota.getRemainingBytes(FAKE_SESSION_ID) == 100
+
+@pytest.mark.asyncio
+async def test_reservation_exceeding_quota(upload_quota):
+    """
+    Test that a reservation exceeding the quota is rejected without counting it, naming what remains.
+    """
+    await upload_quota.reserveBytes(FAKE_SESSION_ID, 60)
+
+    with pytest.raises(QuotaExceededError) as exc_info:
+        await upload_quota.reserveBytes(FAKE_SESSION_ID, 50)
+
+    assert exc_info.value.remaining == 40
+    assert str(exc_info.value) == "The upload exceeds the session quota of 100 bytes; 40 bytes remain."
+    assert await upload_quota.getRemainingBytes(FAKE_SESSION_ID) == 40
+
+@pytest.mark.asyncio
+async def test_rows_are_counted_separately(upload_quota):
+    """
+    Test that rows have their own quota and that resetting the usage clears both quotas.
+    """
+    await upload_quota.reserveBytes(FAKE_SESSION_ID, 100)
+    await upload_quota.reserveRows(FAKE_SESSION_ID, 10)
+
+    with pytest.raises(QuotaExceededError, match="10 rows; 0 rows remain"):
+        await upload_quota.reserveRows(FAKE_SESSION_ID, 1)
+
+    await upload_quota.resetUsage(FAKE_SESSION_ID)
+    await upload_quota.reserveRows(FAKE_SESSION_ID, 10)
+    assert await upload_quota.getRemainingBytes(FAKE_SESSION_ID) == 100
+
+@pytest.mark.asyncio
+async def test_reservation_of_ended_session(upload_quota):
+    """
+    Test that reserving for an ended session fails instead of recreating the session.
+    """
+    with pytest.raises(RuntimeError, match="The session ended."):
+        await upload_quota.reserveBytes("ended-session", 1)
+
+    assert "session:ended-session" not in upload_quota.redis.data
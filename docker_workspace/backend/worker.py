@@ -0,0 +1,32 @@
+from lib.instances.instance import Instance
+from lib.tools.job_queue import JobWorkerPool
+from lib.jobs.upload_jobs import UPLOAD_JOB_HANDLERS, UPLOAD_FAILURE_HANDLERS
+import asyncio, signal, logging
+
+# Create an instance of the application configuration
+instance = Instance()
+
+async def main() -> None:
+    """
+    @brief Runs upload job workers outside of the web application.
+
+    The workers take jobs from the same Redis queue as the workers of the web
+    application, so worker processes can be added to process uploads without
+    competing with the web server for its event loop. They run until SIGINT or
+    SIGTERM is received.
+    """
+    worker_pool = JobWorkerPool(job_queue=instance.job_queue, handlers=UPLOAD_JOB_HANDLERS, concurrency=instance.job_worker_concurrency, failure_handlers=UPLOAD_FAILURE_HANDLERS)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    worker_pool.start()
+    logging.info(f"Job worker started with {instance.job_worker_concurrency} concurrent jobs.")
+    await stop_event.wait()
+    await worker_pool.stop()
+
+# Run the workers until they are stopped
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,8 +8,10 @@ import axios from 'axios';
 import { AuthContext } from '../context/AuthContext';
 import {
     START_SESSION_URL,
-    UPLOAD_CSV_URL,
-    UPLOAD_PDF_URL,
+    UPLOAD_INIT_URL,
+    UPLOAD_PART_URL,
+    UPLOAD_STATUS_URL,
+    UPLOAD_COMPLETE_URL,
     SQL_QUERY_URL,
     RAG_QUERY_URL,
     CLEAR_SESSION_URL,
@@ -18,6 +20,71 @@ import {
 } from '../config/constants';
 import Cookies from 'js-cookie';
 
+const MAX_PART_RETRIES = 5; // Attempts to resume an upload after failed parts
+
+/**
+ * @brief Computes the SHA-256 checksum of a part, if the browser allows it.
+ *
+ * Web Crypto is only available in secure contexts; elsewhere the part is sent without checksum.
+ *
+ * @param {ArrayBuffer} buffer The content of the part.
+ * @return {Promise<string|null>} The hex digest, or null if it can't be computed.
+ */
+const computeChecksum = async (buffer) => {
+    if (!window.crypto || !window.crypto.subtle) {
+        return null;
+    }
+    const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest)).map(byte => byte.toString(16).padStart(2, '0')).join('');
+};
+
+/**
+ * @brief Uploads a file in parts, resuming at the received offset after a failed part.
+ *
+ * @param {File} file The file to upload.
+ * @param {string} fileType The type of the file, "csv" or "pdf".
+ * @param {function} onProgress Called with the number of bytes the server received.
+ * @return {Promise<string>} The ID of the completed upload.
+ */
+const uploadFileInParts = async (file, fileType, onProgress) => {
+    const initResponse = await axios.put(UPLOAD_INIT_URL, {
+        fileName: file.name,
+        fileType: fileType,
+        fileSize: file.size
+    }, { withCredentials: true });
+
+    const { uploadId, partSize } = initResponse.data;
+    let offset = initResponse.data.offset;
+    let failures = 0;
+
+    while (offset < file.size) {
+        const part = await file.slice(offset, offset + partSize).arrayBuffer();
+        const checksum = await computeChecksum(part);
+        try {
+            const partResponse = await axios.put(UPLOAD_PART_URL, part, {
+                params: checksum ? { uploadId, offset, checksum } : { uploadId, offset },
+                headers: { 'Content-Type': 'application/octet-stream' },
+                withCredentials: true
+            });
+            offset = partResponse.data.offset;
+            failures = 0;
+            onProgress(offset);
+        } catch (error) {
+            failures += 1;
+            if (failures > MAX_PART_RETRIES || error.response?.status === 404 || error.response?.status === 401) {
+                throw error;
+            }
+            // Continue from what the server received, e.g. after a connection loss
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            const statusResponse = await axios.get(UPLOAD_STATUS_URL, { params: { uploadId }, withCredentials: true });
+            offset = statusResponse.data.offset;
+            onProgress(offset);
+        }
+    }
+
+    return uploadId;
+};
+
 /**
  * @brief Main application component for user interaction.
  *
@@ -238,62 +305,60 @@ const MainApp = () => {
             return true;
         }
 
-        const uploadUrl = selectedPanel === 'sql' ? UPLOAD_CSV_URL : UPLOAD_PDF_URL;
+        const fileType = selectedPanel === 'sql' ? 'csv' : 'pdf';
 
         try {
             setUploading(true);
             setProgress(0);
 
-            let polling = true;
-
-            const pollProgress = async () => {
-                try {
-                    const response = await axios.get(GET_PROGRESS_URL, { withCredentials: true });
-                    const progressValue = parseInt(response.data.progress);
-                    console.log("Progress value received:", progressValue);
-
-                    setProgress(progressValue);
+            // Files are sent in parts, so large files are never read whole and survive connection losses
+            const totalBytes = selectedFiles.reduce((total, file) => total + file.size, 0);
+            let sentBytes = 0;
+            const uploadIds = [];
+            for (const file of selectedFiles) {
+                // The transfer is shown by the bytes the server received, then the job's progress follows
+                uploadIds.push(await uploadFileInParts(file, fileType, offset => {
+                    setProgress(totalBytes > 0 ? Math.floor((sentBytes + offset) * 100 / totalBytes) : 100);
+                }));
+                sentBytes += file.size;
+            }
+            setProgress(0);
 
-                    if (progressValue >= 100 || progressValue === -1) {
-                        polling = false;
-                    }
-                } catch (error) {
-                    console.error("Error polling progress:", error);
-                    polling = false;
-                }
-            };
+            // The completed upload is accepted right away and processed by a background job
+            const uploadResponse = await axios.put(UPLOAD_COMPLETE_URL, { uploadIds }, { withCredentials: true });
 
-            const startPolling = () => {
+            const waitForJob = () => new Promise((resolve, reject) => {
                 const pollInterval = 2000;
-                const intervalId = setInterval(() => {
-                    if (polling) {
-                        pollProgress();
-                    } else {
+                const intervalId = setInterval(async () => {
+                    try {
+                        const response = await axios.get(GET_PROGRESS_URL, { withCredentials: true });
+                        const progressValue = parseInt(response.data.progress);
+                        const jobStatus = response.data.status;
+                        console.log("Progress value received:", progressValue, jobStatus);
+
+                        setProgress(progressValue);
+
+                        if (jobStatus === 'failed' || progressValue === -1) {
+                            clearInterval(intervalId);
+                            reject(new Error(response.data.message || 'The upload failed.'));
+                        } else if (jobStatus === 'completed' || (jobStatus === undefined && progressValue >= 100)) {
+                            clearInterval(intervalId);
+                            resolve(response.data.message);
+                        }
+                    } catch (error) {
                         clearInterval(intervalId);
+                        reject(error);
                     }
                 }, pollInterval);
-            };
-
-            const formData = new FormData();
-            selectedFiles.forEach(file => {
-                formData.append("files", file);
-            });
-
-            const uploadPromise = axios.put(uploadUrl, formData, {
-                headers: {
-                    'Content-Type': 'multipart/form-data',
-                },
-                withCredentials: true
             });
 
-            startPolling();
-
-            const uploadResponse = await uploadPromise;
+            const resultMessage = await waitForJob();
+            const informationMessage = resultMessage || uploadResponse.data.informationMessage;
 
-            if (uploadResponse.data.informationMessage) {
+            if (informationMessage) {
                 setMessages(prevMessages => [
                     ...prevMessages,
-                    { type: 'system', text: uploadResponse.data.informationMessage }
+                    { type: 'system', text: informationMessage }
                 ]);
             }
 
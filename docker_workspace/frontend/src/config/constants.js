@@ -76,4 +76,32 @@ export const CHECK_SESSION_URL = `${API_BASE_URL}/check_session`;
  *
  * This URL is used to remove session data and clear any stored information.
  */
-export const CLEAR_SESSION_URL = `${API_BASE_URL}/clear_session`;
\ No newline at end of file
+export const CLEAR_SESSION_URL = `${API_BASE_URL}/clear_session`;
+
+/**
+ * @brief API endpoint for starting an upload sent in parts.
+ *
+ * This URL is used to announce a file that is then sent in parts, so large files can be resumed.
+ */
+export const UPLOAD_INIT_URL = `${API_BASE_URL}/upload_init`;
+
+/**
+ * @brief API endpoint for sending a part of an upload.
+ *
+ * This URL is used to send the bytes of a file starting at a given offset.
+ */
+export const UPLOAD_PART_URL = `${API_BASE_URL}/upload_part`;
+
+/**
+ * @brief API endpoint for checking how much of an upload was received.
+ *
+ * This URL is used to find the offset to resume an interrupted upload at.
+ */
+export const UPLOAD_STATUS_URL = `${API_BASE_URL}/upload_status`;
+
+/**
+ * @brief API endpoint for processing completed uploads.
+ *
+ * This URL is used to start the conversion of files once all their parts were sent.
+ */
+export const UPLOAD_COMPLETE_URL = `${API_BASE_URL}/upload_complete`;